@@ -10,27 +10,26 @@ Logs every state-changing request in a human-readable format:
 
 Plus a structured tail for filtering/grouping in Grafana:
     [method=POST path=/api/stories status=200 duration_ms=42 ip=1.2.3.4]
+
+It is a plain ASGI middleware. Requests it doesn't audit (every GET,
+including media streamed from /api/uploads/, and the skip paths) are
+handed to the app with the original receive/send untouched, after one
+set lookup or one regex match. Audited requests only get a send wrapper
+that notes the status code. Log lines go out through the queued "audit"
+logger (see main.py), so writing them never blocks the event loop.
 """
 import time
-import os
 import re
 from typing import Optional, Tuple
 
-from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.responses import Response
-from jose import jwt, JWTError
-from sqlalchemy.orm import Session
+from starlette.requests import Request
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 from logging_config import get_logger
-from database import SessionLocal
-from models import User
+from auth_utils import resolve_principal
 
 logger = get_logger("audit")
 
-SECRET_KEY = os.getenv("SECRET_KEY", "dev-only-insecure-secret-key")
-ALGORITHM = "HS256"
-
 # Paths that should never be audited (noise / health checks / static files)
 SKIP_PATHS = (
     "/health",
@@ -165,49 +164,72 @@ ACTION_MAP: list[Tuple[str, re.Pattern, str]] = [
 ]
 
 
+# SKIP_PATHS as one anchored alternation: a single match instead of a
+# startswith() per prefix.
+_SKIP_RE = re.compile("|".join(re.escape(prefix) for prefix in SKIP_PATHS))
+
+LOGIN_PATHS = {("POST", "/api/auth/login"), ("POST", "/api/auth/register")}
+
+
+def _compile_action_map() -> dict[str, tuple[re.Pattern, list]]:
+    """Per method, one regex that is the alternation of its ACTION_MAP
+    patterns, each wrapped in a named group. Alternatives are tried in
+    list order, so the first pattern that matches wins, as before.
+    """
+    by_method: dict[str, list] = {}
+    for method, pattern, action in ACTION_MAP:
+        by_method.setdefault(method, []).append((pattern, action))
+
+    compiled = {}
+    for method, entries in by_method.items():
+        alternatives = "|".join(
+            f"(?P<a{i}>{pattern.pattern.lstrip('^').rstrip('$')})"
+            for i, (pattern, _) in enumerate(entries)
+        )
+        compiled[method] = (re.compile(f"^(?:{alternatives})$"), entries)
+    return compiled
+
+
+_ACTIONS_BY_METHOD = _compile_action_map()
+
+
+def _should_audit(method: str, path: str) -> bool:
+    if (method, path) in FORCE_AUDIT:
+        return True
+    return method not in READ_METHODS and _SKIP_RE.match(path) is None
+
+
 def _describe_action(method: str, path: str) -> Optional[str]:
     """Translate a method+path into a human-readable action phrase.
 
     Returns None for paths we don't know how to describe — caller should
     skip logging those.
     """
-    for m, pattern, action in ACTION_MAP:
-        if m != method:
-            continue
-        match = pattern.match(path)
-        if match:
-            return action(match) if callable(action) else action
-    return None
+    combined = _ACTIONS_BY_METHOD.get(method)
+    if combined is None:
+        return None
+    regex, entries = combined
+    match = regex.match(path)
+    if match is None:
+        return None
+    pattern, action = entries[int(match.lastgroup[1:])]
+    # Re-match the winning pattern alone so the action sees its own groups.
+    return action(pattern.match(path)) if callable(action) else action
 
 
 def _decode_user_from_request(request: Request) -> Optional[dict]:
-    """Extract user info from JWT. Returns None if no valid token."""
-    auth = request.headers.get("authorization", "")
-    if not auth.lower().startswith("bearer "):
-        return None
+    """Actor for the log line. Returns None if no valid token.
 
-    token = auth[7:]
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email = payload.get("sub")
-        if not email:
-            return None
-    except JWTError:
+    Authenticated endpoints have already resolved the principal onto
+    request.state; otherwise the token is decoded here, through the same
+    per-worker principal cache.
+    """
+    principal = resolve_principal(request)
+    if principal is None:
         return None
-
-    db: Session = SessionLocal()
-    try:
-        user = db.query(User).filter(User.email == email).first()
-        if user:
-            # Prefer name, fall back to email username
-            display = user.name or user.email.split("@")[0]
-            return {"display": display, "email": user.email, "is_admin": user.is_admin}
-    except Exception:
-        pass
-    finally:
-        db.close()
-
-    return {"display": email.split("@")[0], "email": email, "is_admin": False}
+    # Prefer name, fall back to email username
+    display = principal.name or principal.email.split("@")[0]
+    return {"display": display, "email": principal.email, "is_admin": principal.is_admin}
 
 
 def _extract_email_from_body_for_login(body_bytes: bytes) -> Optional[str]:
@@ -220,35 +242,45 @@ def _extract_email_from_body_for_login(body_bytes: bytes) -> Optional[str]:
         return None
 
 
-class AuditMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        method = request.method
-        path = request.url.path
+class AuditMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
 
-        # Decide whether to audit this request
-        is_force_audit = (method, path) in FORCE_AUDIT
-        is_skip_path = any(path.startswith(p) for p in SKIP_PATHS)
-        is_read = method in READ_METHODS
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not _should_audit(scope["method"], scope["path"]):
+            await self.app(scope, receive, send)
+            return
 
-        should_audit = is_force_audit or (not is_read and not is_skip_path)
-
-        if not should_audit:
-            return await call_next(request)
+        method = scope["method"]
+        path = scope["path"]
 
         # Capture body for login/register (to get email of un-authenticated user)
-        body_bytes = b""
-        if (method, path) in (("POST", "/api/auth/login"), ("POST", "/api/auth/register")):
-            body_bytes = await request.body()
+        # as the app reads it, so the app still consumes the original stream.
+        body_chunks: list[bytes] = []
+        if (method, path) in LOGIN_PATHS:
+            original_receive = receive
+
+            async def receive() -> Message:
+                message = await original_receive()
+                if message["type"] == "http.request":
+                    body_chunks.append(message.get("body", b""))
+                return message
 
-            # Rebuild the request so downstream can read body again
-            async def receive():
-                return {"type": "http.request", "body": body_bytes}
-            request._receive = receive
+        status = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
 
         start = time.perf_counter()
-        response: Response = await call_next(request)
+        await self.app(scope, receive, send_with_status)
         duration_ms = int((time.perf_counter() - start) * 1000)
 
+        request = Request(scope)
+        body_bytes = b"".join(body_chunks)
+
         # Figure out the actor
         user = _decode_user_from_request(request)
         if user:
@@ -267,7 +299,6 @@ class AuditMiddleware(BaseHTTPMiddleware):
             # Unknown endpoint — use a generic description
             action = f"{method} {path}"
 
-        status = response.status_code
         status_icon = "✗" if status >= 400 else "✓"
 
         # Client IP
@@ -284,5 +315,3 @@ class AuditMiddleware(BaseHTTPMiddleware):
 
         log_level = logger.warning if status >= 400 else logger.info
         log_level("%s %s %s", status_icon, human, tail)
-
-        return response
@@ -1,18 +1,27 @@
+from collections import OrderedDict
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
 import bcrypt
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy import event, inspect
 from sqlalchemy.orm import Session
+import json
 import os
+import threading
+import time
 from dotenv import load_dotenv
 
-from database import get_db
+from database import SessionLocal, get_db
+from logging_config import get_logger
 from models import User
 
 load_dotenv()
 
+logger = get_logger(__name__)
+
 SECRET_KEY = os.getenv("SECRET_KEY")
 if not SECRET_KEY:
     import warnings
@@ -26,6 +35,18 @@ if not SECRET_KEY:
 ALGORITHM = "HS256"
 # Increase token expiration to 7 days for better UX
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "10080"))  # 7 days default
+# How long a worker trusts a cached principal. Edits made through the ORM
+# are published on PRINCIPAL_CHANNEL and every worker drops the entry at
+# once; this bounds staleness while Redis is unreachable, or for raw SQL.
+PRINCIPAL_CACHE_SECONDS = int(os.getenv("PRINCIPAL_CACHE_SECONDS", "30"))
+PRINCIPAL_NOTIFY_ENABLED = os.getenv("PRINCIPAL_NOTIFY", "true").lower() != "false"
+PRINCIPAL_CHANNEL = "principals:changed"
+REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379/0")
+# Publishing happens inside the committing request; fail fast.
+PRINCIPAL_REDIS_TIMEOUT_SECONDS = 0.25
+PRINCIPAL_RESUBSCRIBE_DELAY_SECONDS = 5
+# Most distinct callers kept per worker; the least recently used go first.
+PRINCIPAL_CACHE_MAX = int(os.getenv("PRINCIPAL_CACHE_MAX", "10000"))
 
 security = HTTPBearer()
 
@@ -73,30 +94,249 @@ def verify_token(token: str):
         return None
 
 
-def get_current_user(
+# ─────────────────────────────────────────────────────────────────────
+# Principals
+#
+# Who is making a request, resolved once per request and kept on
+# `request.state.principal` (the audit middleware reads it back), and
+# cached per worker by email so authenticated calls don't look the user
+# up every time. Admin/manager dependencies return a Principal, not a
+# User row; load the row (db.get(User, principal.id)) to modify it.
+# ─────────────────────────────────────────────────────────────────────
+
+@dataclass(frozen=True)
+class Principal:
+    id: int
+    email: str
+    name: Optional[str]
+    role: str
+    is_admin: bool
+    is_active: bool
+
+    @property
+    def is_manager(self) -> bool:
+        return self.role == "manager"
+
+    @classmethod
+    def from_user(cls, user: User) -> "Principal":
+        return cls(
+            id=user.id,
+            email=user.email,
+            name=user.name,
+            role=user.role or ("admin" if user.is_admin else "user"),
+            is_admin=bool(user.is_admin),
+            is_active=bool(user.is_active),
+        )
+
+
+_principal_lock = threading.Lock()
+# email -> (expires_at, principal), least recently used first
+_principals: "OrderedDict[str, tuple[float, Principal]]" = OrderedDict()
+# Bumped by every invalidation, so a lookup that raced an edit is not cached.
+_principal_generation = 0
+
+
+def load_principal(email: str, db: Optional[Session] = None) -> Optional[Principal]:
+    """Principal for `email`, from the cache or the users table."""
+    _ensure_principal_subscriber()
+    with _principal_lock:
+        cached = _principals.get(email)
+        if cached is not None:
+            if cached[0] > time.monotonic():
+                _principals.move_to_end(email)
+                return cached[1]
+            del _principals[email]
+
+    generation = _principal_generation
+    session = db if db is not None else SessionLocal()
+    try:
+        user = session.query(User).filter(User.email == email).first()
+    finally:
+        if db is None:
+            session.close()
+    if user is None:
+        return None
+
+    principal = Principal.from_user(user)
+    with _principal_lock:
+        if generation == _principal_generation:
+            _principals[email] = (time.monotonic() + PRINCIPAL_CACHE_SECONDS, principal)
+            _principals.move_to_end(email)
+            while len(_principals) > PRINCIPAL_CACHE_MAX:
+                _principals.popitem(last=False)
+    return principal
+
+
+def invalidate_principal(*emails: str) -> None:
+    """Forget cached principals for `emails` (all of them if none given)."""
+    global _principal_generation
+    with _principal_lock:
+        _principal_generation += 1
+        if emails:
+            for email in emails:
+                _principals.pop(email, None)
+        else:
+            _principals.clear()
+
+
+# ── Cross-worker invalidation (Redis pub/sub, like settings_service) ──
+#
+# A commit that changes users publishes the affected emails ("*" for all)
+# on PRINCIPAL_CHANNEL. Each worker runs one subscriber thread, started on
+# first use, that drops those entries; it clears everything on (re)subscribe
+# in case something was published while it wasn't listening.
+
+_principal_publisher = None
+_principal_subscriber: Optional[threading.Thread] = None
+
+
+def _principal_publisher_redis():
+    global _principal_publisher
+    if _principal_publisher is None:
+        import redis
+
+        _principal_publisher = redis.Redis.from_url(
+            REDIS_URL,
+            socket_timeout=PRINCIPAL_REDIS_TIMEOUT_SECONDS,
+            socket_connect_timeout=PRINCIPAL_REDIS_TIMEOUT_SECONDS,
+        )
+    return _principal_publisher
+
+
+def publish_principal_change(*emails: str) -> None:
+    """Tell every worker to forget `emails` (all principals if none given)."""
+    if not PRINCIPAL_NOTIFY_ENABLED:
+        return
+    try:
+        _principal_publisher_redis().publish(PRINCIPAL_CHANNEL, json.dumps(sorted(emails) if emails else "*"))
+    except Exception as exc:
+        logger.warning("Could not publish principal change: %s", exc)
+
+
+def _apply_principal_message(data) -> None:
+    emails = json.loads(data)
+    if emails == "*":
+        invalidate_principal()
+    else:
+        invalidate_principal(*emails)
+
+
+def _listen_principals() -> None:
+    import redis
+
+    while True:
+        try:
+            client = redis.Redis.from_url(REDIS_URL, health_check_interval=30)
+            pubsub = client.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(PRINCIPAL_CHANNEL)
+            invalidate_principal()
+            for message in pubsub.listen():
+                if message["type"] == "message":
+                    _apply_principal_message(message["data"])
+        except Exception as exc:
+            logger.warning("Principal subscription lost: %s", exc)
+        time.sleep(PRINCIPAL_RESUBSCRIBE_DELAY_SECONDS)
+
+
+def _ensure_principal_subscriber() -> None:
+    # Started lazily so it lives in the worker process, not a pre-fork parent.
+    global _principal_subscriber
+    if not PRINCIPAL_NOTIFY_ENABLED or (_principal_subscriber is not None and _principal_subscriber.is_alive()):
+        return
+    with _principal_lock:
+        if _principal_subscriber is None or not _principal_subscriber.is_alive():
+            _principal_subscriber = threading.Thread(
+                target=_listen_principals, name="principal-subscriber", daemon=True,
+            )
+            _principal_subscriber.start()
+
+
+def resolve_principal(request: Request, db: Optional[Session] = None) -> Optional[Principal]:
+    """The request's principal, decoding its bearer token at most once."""
+    if hasattr(request.state, "principal"):
+        return request.state.principal
+
+    principal = None
+    auth = request.headers.get("authorization", "")
+    if auth.lower().startswith("bearer "):
+        email = verify_token(auth[7:])
+        if email is not None:
+            principal = load_principal(email, db)
+    request.state.principal = principal
+    return principal
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changed_principals(session: Session, flush_context) -> None:
+    emails = set()
+    for obj in (*session.dirty, *session.deleted):
+        if isinstance(obj, User):
+            emails.add(obj.email)
+            # A changed email: the old address must go too.
+            emails.update(inspect(obj).attrs.email.history.deleted or ())
+    if emails:
+        session.info.setdefault("changed_principals", set()).update(emails)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _collect_bulk_user_writes(state) -> None:
+    # Bulk update()/delete() don't say which users they touched: forget everyone.
+    if (state.is_update or state.is_delete) and \
+            getattr(getattr(state.statement, "table", None), "name", None) == User.__tablename__:
+        state.session.info.setdefault("changed_principals", set()).add(None)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed_principals(session: Session) -> None:
+    emails = session.info.pop("changed_principals", None)
+    if emails and None in emails:
+        invalidate_principal()
+        publish_principal_change()
+    elif emails:
+        invalidate_principal(*emails)
+        publish_principal_change(*emails)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changed_principals(session: Session) -> None:
+    session.info.pop("changed_principals", None)
+
+
+def get_current_principal(
+    request: Request,
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: Session = Depends(get_db)
+) -> Principal:
+    """Get the current authenticated principal (no user query on a cache hit)"""
+    principal = resolve_principal(request, db)
+    if principal is None or not principal.is_active:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    return principal
+
+
+def get_current_user(
+    principal: Principal = Depends(get_current_principal),
+    db: Session = Depends(get_db)
 ):
-    """Get current authenticated user"""
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-    
-    email = verify_token(credentials.credentials)
-    if email is None:
-        raise credentials_exception
-    
-    user = db.query(User).filter(User.email == email).first()
+    """Get current authenticated user as a User row"""
+    user = db.get(User, principal.id)
     if user is None or not user.is_active:
-        raise credentials_exception
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
     
     return user
 
 
 def get_current_admin(
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Get current user and verify they have admin privileges"""
     if not current_user.is_admin:
@@ -109,11 +349,10 @@ def get_current_admin(
 
 
 def get_current_manager_or_admin(
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Allow either admins or managers — used for endpoints that managers can access."""
-    role = getattr(current_user, "role", None) or ("admin" if current_user.is_admin else "user")
-    if role not in ("admin", "manager"):
+    if current_user.role not in ("admin", "manager"):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not enough permissions. Manager or admin access required."
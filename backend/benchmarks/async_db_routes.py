@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Benchmark: sync Session vs AsyncSession inside `async def` routes.
+
+Serves two otherwise identical endpoints from one uvicorn worker on the
+Postgres pointed to by DATABASE_URL, then fires concurrent requests at each
+and reports p50 / p99 latency and throughput:
+
+  before  — `async def` handler running a query on a sync Session (get_db),
+            as the public routes did; every round-trip blocks the event loop
+  after   — the same query awaited on an AsyncSession (get_async_db)
+
+Each request runs `SELECT pg_sleep(:latency)` so the database time is fixed
+and only the serving model differs. With one worker the "before" endpoint
+serialises requests, so p99 grows with concurrency; the "after" endpoint
+overlaps them up to the async pool size.
+
+Never touches the application tables.
+
+    DATABASE_URL=postgresql://... python benchmarks/async_db_routes.py --concurrency 100 --requests 2000
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import threading
+import time
+
+import httpx
+import uvicorn
+from fastapi import Depends, FastAPI
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import DATABASE_URL, get_async_db, get_db  # noqa: E402
+
+QUERY = text("SELECT pg_sleep(:latency)")
+
+
+def build_app(latency: float) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/before")
+    async def before(db: Session = Depends(get_db)):
+        db.execute(QUERY, {"latency": latency})
+        return {"ok": True}
+
+    @app.get("/after")
+    async def after(db: AsyncSession = Depends(get_async_db)):
+        await db.execute(QUERY, {"latency": latency})
+        return {"ok": True}
+
+    return app
+
+
+def serve(app: FastAPI, port: int) -> uvicorn.Server:
+    server = uvicorn.Server(uvicorn.Config(app, port=port, log_level="warning", limit_concurrency=1000))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+async def load(url: str, requests: int, concurrency: int) -> tuple[list[float], float]:
+    latencies: list[float] = []
+    queue: asyncio.Queue = asyncio.Queue()
+    for _ in range(requests):
+        queue.put_nowait(None)
+
+    async def worker(client: httpx.AsyncClient):
+        while not queue.empty():
+            queue.get_nowait()
+            t0 = time.perf_counter()
+            response = await client.get(url)
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - t0)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=120) as client:
+        await client.get(url)  # warm the pools
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return latencies, elapsed
+
+
+def report(label: str, latencies: list[float], elapsed: float) -> None:
+    ms = sorted(x * 1000 for x in latencies)
+    p50 = statistics.median(ms)
+    p99 = ms[max(0, int(len(ms) * 0.99) - 1)]
+    print(f"{label:<7} p50 {p50:8.1f} ms   p99 {p99:8.1f} ms   {len(ms) / elapsed:8.0f} req/s")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="simulated DB time per request")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    if not DATABASE_URL.startswith("postgres"):
+        print("DATABASE_URL must point at Postgres", file=sys.stderr)
+        return 1
+
+    server = serve(build_app(args.latency_ms / 1000), args.port)
+    print(f"{args.requests} requests, concurrency {args.concurrency}, {args.latency_ms:g} ms per query, 1 worker")
+    try:
+        for label in ("before", "after"):
+            latencies, elapsed = asyncio.run(load(f"http://127.0.0.1:{args.port}/{label}", args.requests, args.concurrency))
+            report(label, latencies, elapsed)
+    finally:
+        server.should_exit = True
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
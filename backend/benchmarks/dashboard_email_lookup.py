@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Benchmark: per-user dashboard queries before / after migrations 37 + 38.
+
+Seeds a scratch schema (`bench_dashboard`) on the Postgres pointed to by
+DATABASE_URL with N donations (default 1,000,000) spread over ~50k donors
+whose emails are stored in mixed case, then times the three queries behind
+GET /api/user/dashboard-stats for a sample of donors:
+
+  before  — unindexed `email = :email` over every donation (the old queries)
+  after   — emails normalized, status backfilled, indexes from migrations
+            37/38 in place, queries as in routers/user.py today
+
+Never touches the application tables; the schema is dropped afterwards
+unless --keep is passed.
+
+    DATABASE_URL=postgresql://... python benchmarks/dashboard_email_lookup.py --rows 1000000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+from sqlalchemy import create_engine, text
+
+SCHEMA = "bench_dashboard"
+
+SEED_SQL = f"""
+DROP SCHEMA IF EXISTS {SCHEMA} CASCADE;
+CREATE SCHEMA {SCHEMA};
+CREATE TABLE {SCHEMA}.donations (
+    id          SERIAL PRIMARY KEY,
+    name        VARCHAR(100) NOT NULL,
+    email       VARCHAR(100) NOT NULL,
+    amount      DOUBLE PRECISION NOT NULL,
+    frequency   VARCHAR(50) NOT NULL,
+    donated_at  TIMESTAMP
+);
+INSERT INTO {SCHEMA}.donations (name, email, amount, frequency, donated_at)
+SELECT
+    'Donor ' || d,
+    CASE WHEN d % 3 = 0 THEN 'Donor' || d || '@Example.com' ELSE 'donor' || d || '@example.com' END,
+    (random() * 500)::int + 5,
+    CASE WHEN g % 20 = 0 THEN 'Failed - card_declined'
+         WHEN g % 33 = 0 THEN 'Abandoned'
+         ELSE 'One-Time' END,
+    now() - (random() * interval '1000 days')
+FROM (SELECT g, (g % :donors) AS d FROM generate_series(1, :rows) AS g) s;
+ANALYZE {SCHEMA}.donations;
+"""
+
+MIGRATE_SQL = f"""
+ALTER TABLE {SCHEMA}.donations ADD COLUMN status VARCHAR(20) NOT NULL DEFAULT 'confirmed';
+UPDATE {SCHEMA}.donations SET status = CASE
+        WHEN lower(frequency) LIKE 'failed%'    THEN 'failed'
+        WHEN lower(frequency) LIKE 'abandoned%' THEN 'abandoned'
+    END
+WHERE lower(frequency) LIKE 'failed%' OR lower(frequency) LIKE 'abandoned%';
+UPDATE {SCHEMA}.donations SET email = lower(trim(email)) WHERE email <> lower(trim(email));
+CREATE INDEX ON {SCHEMA}.donations(email);
+CREATE INDEX ON {SCHEMA}.donations(lower(email), donated_at DESC) WHERE status = 'confirmed';
+VACUUM ANALYZE {SCHEMA}.donations;
+"""
+
+BEFORE = [
+    f"SELECT sum(amount) FROM {SCHEMA}.donations WHERE email = :email",
+    f"SELECT count(id) FROM {SCHEMA}.donations WHERE email = :email",
+    f"SELECT * FROM {SCHEMA}.donations WHERE email = :email ORDER BY donated_at DESC LIMIT 5",
+]
+
+AFTER = [
+    f"SELECT sum(amount) FROM {SCHEMA}.donations WHERE status = 'confirmed' AND lower(email) = :email",
+    f"SELECT count(id) FROM {SCHEMA}.donations WHERE status = 'confirmed' AND lower(email) = :email",
+    f"SELECT * FROM {SCHEMA}.donations WHERE status = 'confirmed' AND lower(email) = :email "
+    f"ORDER BY donated_at DESC LIMIT 5",
+]
+
+
+def _time_dashboard(conn, queries, emails):
+    timings = []
+    for email in emails:
+        start = time.perf_counter()
+        for q in queries:
+            conn.execute(text(q), {"email": email}).all()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {
+        "p50_ms": statistics.median(timings),
+        "p95_ms": timings[int(len(timings) * 0.95) - 1],
+        "max_ms": timings[-1],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--donors", type=int, default=50_000)
+    parser.add_argument("--samples", type=int, default=200)
+    parser.add_argument("--keep", action="store_true", help="keep the bench schema afterwards")
+    args = parser.parse_args()
+
+    url = os.getenv("DATABASE_URL", "")
+    if not url.startswith("postgresql"):
+        sys.exit("DATABASE_URL must point at a (scratch) Postgres database")
+
+    engine = create_engine(url, isolation_level="AUTOCOMMIT")
+    rng = random.Random(42)
+    donors = rng.sample(range(args.donors), min(args.samples, args.donors))
+    with engine.connect() as conn:
+        print(f"Seeding {args.rows:,} donations over {args.donors:,} donors…")
+        for stmt in SEED_SQL.split(";"):
+            if stmt.strip():
+                conn.execute(text(stmt), {"rows": args.rows, "donors": args.donors})
+        # The old code compared the stored (mixed-case) address exactly.
+        raw = [f"Donor{d}@Example.com" if d % 3 == 0 else f"donor{d}@example.com" for d in donors]
+        before = _time_dashboard(conn, BEFORE, raw)
+
+        print("Applying migrations 37/38 equivalents…")
+        for stmt in MIGRATE_SQL.split(";"):
+            if stmt.strip():
+                conn.execute(text(stmt))
+        after = _time_dashboard(conn, AFTER, [e.lower() for e in raw])
+
+        if not args.keep:
+            conn.execute(text(f"DROP SCHEMA {SCHEMA} CASCADE"))
+
+    print(f"\nDashboard (3 queries) per user, {args.samples} donors sampled:")
+    print(f"{'':8}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}")
+    for label, r in (("before", before), ("after", after)):
+        print(f"{label:8}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}{r['max_ms']:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
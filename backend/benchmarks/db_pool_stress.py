@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Stress test: connection pools under peak campaign + traffic load.
+
+Starts the processes a deployment runs (WEB_CONCURRENCY uvicorn workers
+plus DB_EXTRA_PROCESSES, i.e. the arq worker) against the Postgres in
+DATABASE_URL. Each one imports database.py exactly as the app does and
+saturates both pools for --seconds:
+
+  --threads  sync sessions at once, as FastAPI's threadpool runs `def`
+             routes and the worker's to_thread sends (anyio default: 40)
+  --tasks    async sessions at once, as `async def` routes on the event loop
+
+each holding its connection for --hold seconds (pg_sleep). Meanwhile the
+parent samples pg_stat_activity. It runs two configurations:
+
+  before  — pool_size=20, max_overflow=40 per engine (the old fixed sizes)
+  after   — pools derived from DB_MAX_CONNECTIONS / WEB_CONCURRENCY
+
+and reports the peak server connections, "too many connections" errors,
+pool timeouts and checkout waits. "after" should show zero connection
+errors and a peak under max_connections; overload shows up instead as
+checkout waits (and timeouts, past DB_POOL_TIMEOUT).
+
+    DATABASE_URL=postgresql://... WEB_CONCURRENCY=4 \\
+        python benchmarks/db_pool_stress.py --seconds 20
+
+Set DB_MAX_CONNECTIONS to the server's max_connections (SHOW
+max_connections). Behind PgBouncer, run it once with DATABASE_URL on
+PgBouncer and DB_PGBOUNCER=transaction, and DIRECT_DATABASE_URL on
+Postgres for the sampling connection.
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+MODES = {
+    "before": {"DB_POOL_SIZE": "20", "DB_MAX_OVERFLOW": "40"},
+    "after": {},
+}
+
+# Postgres: "sorry, too many clients already" / "remaining connection
+# slots are reserved ..."; PgBouncer: "no more connections allowed"
+TOO_MANY = ("too many clients", "too many connections", "connection slots are reserved", "no more connections")
+
+
+def _classify(exc: BaseException) -> str:
+    from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+    if isinstance(exc, PoolTimeoutError):
+        return "pool_timeouts"
+    if any(marker in str(exc).lower() for marker in TOO_MANY):
+        return "too_many_connections"
+    return "other_errors"
+
+
+def _worker(env: dict, args, start_barrier, results):
+    os.environ.update(env)
+    from sqlalchemy import text
+
+    import database
+
+    counts = {"ok": 0, "pool_timeouts": 0, "too_many_connections": 0, "other_errors": 0}
+    lock = threading.Lock()
+    query = text("SELECT pg_sleep(:hold)")
+    start_barrier.wait()
+    deadline = time.monotonic() + args.seconds
+
+    def count(outcome: str):
+        with lock:
+            counts[outcome] += 1
+
+    def sync_loop():
+        while time.monotonic() < deadline:
+            try:
+                with database.SessionLocal() as db:
+                    db.execute(query, {"hold": args.hold})
+                count("ok")
+            except Exception as e:
+                count(_classify(e))
+
+    async def async_loop():
+        while time.monotonic() < deadline:
+            try:
+                async with database.AsyncSessionLocal() as db:
+                    await db.execute(query, {"hold": args.hold})
+                count("ok")
+            except Exception as e:
+                count(_classify(e))
+
+    async def async_load():
+        await asyncio.gather(*(async_loop() for _ in range(args.tasks)))
+        await database.async_engine.dispose()
+
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        for _ in range(args.threads):
+            pool.submit(sync_loop)
+        asyncio.run(async_load())
+
+    results.append((counts, database.pool_metrics()))
+    database.engine.dispose()
+
+
+def _sample_connections(url: str, stop: threading.Event, samples: list):
+    from sqlalchemy import create_engine, text
+    from sqlalchemy.pool import NullPool
+
+    with create_engine(url, poolclass=NullPool).connect() as connection:
+        samples.append(int(connection.execute(text("SHOW max_connections")).scalar()))
+        while not stop.is_set():
+            samples.append(connection.execute(text(
+                "SELECT count(*) FROM pg_stat_activity WHERE application_name = 'myzakat_backend'"
+            )).scalar())
+            connection.commit()
+            stop.wait(0.2)
+
+
+def run(mode: str, args) -> int:
+    from database import DIRECT_DATABASE_URL, pool_sizing
+
+    env = dict(MODES[mode])
+    saved = dict(os.environ)
+    os.environ.update(env)
+    sizing = pool_sizing()
+    os.environ.clear()
+    os.environ.update(saved)
+
+    context = multiprocessing.get_context("spawn")
+    manager = context.Manager()
+    results = manager.list()
+    barrier = manager.Barrier(sizing.processes)
+
+    stop, samples = threading.Event(), []
+    sampler = threading.Thread(target=_sample_connections, args=(DIRECT_DATABASE_URL, stop, samples), daemon=True)
+    sampler.start()
+    processes = [context.Process(target=_worker, args=(env, args, barrier, results)) for _ in range(sizing.processes)]
+    for p in processes:
+        p.start()
+    for p in processes:
+        p.join()
+    stop.set()
+    sampler.join()
+
+    max_connections, connections = samples[0], samples[1:] or [0]
+    totals = {key: sum(counts[key] for counts, _ in results) for key in results[0][0]}
+    waits = [m[engine]["wait_ms_max"] for _, m in results for engine in ("sync", "async")]
+    print(f"{mode:<7} processes={sizing.processes} pool={sizing.pool_size}+{sizing.max_overflow} x2 "
+          f"(up to {sizing.processes * 2 * (sizing.pool_size + sizing.max_overflow)} connections)")
+    print(f"        peak server connections={max(connections)} / max_connections={max_connections}")
+    print(f"        queries ok={totals['ok']} too_many_connections={totals['too_many_connections']} "
+          f"pool_timeouts={totals['pool_timeouts']} other_errors={totals['other_errors']} "
+          f"checkout_wait_max_ms={max(waits):.0f}")
+    return totals["too_many_connections"]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=20)
+    parser.add_argument("--threads", type=int, default=40)
+    parser.add_argument("--tasks", type=int, default=100)
+    parser.add_argument("--hold", type=float, default=0.05, help="seconds each query holds its connection")
+    parser.add_argument("--mode", choices=[*MODES, "both"], default="both")
+    args = parser.parse_args()
+
+    from database import DATABASE_URL
+    if DATABASE_URL.startswith("sqlite"):
+        sys.exit("Needs Postgres; set DATABASE_URL")
+
+    failures = {mode: run(mode, args) for mode in (MODES if args.mode == "both" else [args.mode])}
+    # The old sizes are expected to fail; the derived ones must not.
+    sys.exit(1 if failures.get("after") else 0)
+
+
+if __name__ == "__main__":
+    main()
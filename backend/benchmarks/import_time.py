@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Report: what `import main` costs a worker at boot.
+
+Runs `python -X importtime -c "import main"` in a fresh interpreter (as
+a uvicorn worker would) and prints the wall time, peak RSS, and the
+modules with the largest cumulative import time. Use it to find what to
+put behind lazy_imports.lazy_module, and check the modules it reports as
+deferred stay that way (tests/test_import_time.py enforces that).
+
+    python benchmarks/import_time.py --top 25
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Only needed once a request uses them; see lazy_imports.py
+DEFERRED_MODULES = ("stripe", "reportlab", "PIL", "premailer", "lxml", "cssutils", "boto3", "botocore", "resend")
+
+PROBE = """
+import resource, sys, time
+start = time.perf_counter()
+import main
+elapsed = time.perf_counter() - start
+rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+loaded = sorted({m.split(".")[0] for m in sys.modules} & set(sys.argv[1:]))
+print(f"RESULT {elapsed:.3f} {rss_mb:.0f} {','.join(loaded)}")
+"""
+
+
+def profile_import(env: dict | None = None) -> tuple[float, float, list[str], list[tuple[int, str]]]:
+    """(seconds, peak RSS MB, deferred modules that got loaded, [(cumulative µs, module)])."""
+    env = {**os.environ, "TESTING": "true", **(env or {})}
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE, *DEFERRED_MODULES],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    modules = []
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            _, cumulative, name = line[len("import time:"):].split("|")
+            if cumulative.strip().isdigit():
+                modules.append((int(cumulative), name.rstrip()))
+    line = next(line for line in result.stdout.splitlines() if line.startswith("RESULT "))
+    _, seconds, rss_mb, *loaded = line.split(" ")
+    return float(seconds), float(rss_mb), [m for m in ",".join(loaded).split(",") if m], modules
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args()
+
+    seconds, rss_mb, loaded, modules = profile_import()
+    print(f"import main: {seconds * 1000:.0f} ms, peak RSS {rss_mb:.0f} MB")
+    print(f"deferred modules loaded at import: {', '.join(loaded) or 'none'}")
+    print(f"\n{'cumulative ms':>14}  module")
+    for cumulative, name in sorted(modules, reverse=True)[:args.top]:
+        print(f"{cumulative / 1000:>14.1f}  {name}")
+
+
+if __name__ == "__main__":
+    main()
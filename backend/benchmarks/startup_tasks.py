@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Benchmark: per-worker startup with and without leader election.
+
+Starts N worker processes at once against the Postgres pointed to by
+DATABASE_URL, each doing what a uvicorn worker does before it serves,
+and reports how long each took until it was ready:
+
+  before  — every worker runs create_all and the admin/settings seeding
+            (the import-time behaviour of main.py)
+  after   — run_startup_tasks(): one worker wins the advisory lock and
+            seeds; the rest take one query and are ready
+
+S3 setup and the orphan scan are left out of both (they need S3, and
+the leader now runs them in the background); with them, "before" is
+slower still and runs N concurrent auto-delete scans.
+
+Creates the application tables if missing and seeds the default admin
+and settings, exactly as a deploy would.
+
+    DATABASE_URL=postgresql://... python benchmarks/startup_tasks.py --workers 4
+"""
+import argparse
+import multiprocessing
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _worker(mode: str, start_barrier, results):
+    import startup_tasks
+
+    # Don't time the storage thread; it no longer delays serving.
+    startup_tasks._initialise_storage = lambda: None
+    start_barrier.wait()
+    start = time.perf_counter()
+    if mode == "before":
+        startup_tasks.ensure_media_directories()
+        startup_tasks.Base.metadata.create_all(bind=startup_tasks.engine)
+        startup_tasks.ensure_admin_user()
+        ran = True
+    else:
+        startup_tasks.ensure_media_directories()
+        # Held until the process exits, like a real leader.
+        leader = startup_tasks.become_leader()
+        if leader:
+            startup_tasks.Base.metadata.create_all(bind=startup_tasks.engine)
+            startup_tasks.ensure_admin_user()
+        ran = leader
+    results.append(((time.perf_counter() - start) * 1000, ran))
+
+
+def run(mode: str, workers: int) -> None:
+    manager = multiprocessing.Manager()
+    results = manager.list()
+    barrier = manager.Barrier(workers)
+    processes = [multiprocessing.Process(target=_worker, args=(mode, barrier, results)) for _ in range(workers)]
+    for p in processes:
+        p.start()
+    for p in processes:
+        p.join()
+
+    times = sorted(ms for ms, _ in results)
+    print(f"{mode:<7} workers={workers} ran_tasks={sum(ran for _, ran in results)} "
+          f"ready_ms median={statistics.median(times):.0f} max={times[-1]:.0f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    from database import DATABASE_URL
+    if DATABASE_URL.startswith("sqlite"):
+        sys.exit("Needs Postgres (advisory locks); set DATABASE_URL")
+
+    run("before", args.workers)
+    run("after", args.workers)
+
+
+if __name__ == "__main__":
+    main()
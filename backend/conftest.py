@@ -1,23 +1,32 @@
 import pytest
 import os
+import tempfile
+
+# Test database - a throwaway SQLite file, so the sync engine (get_db) and the
+# async engine (get_async_db) see the same data.
+_TEST_DB_PATH = os.path.join(tempfile.mkdtemp(prefix="myzakat-tests-"), "test.db")
+SQLALCHEMY_DATABASE_URL = f"sqlite:///{_TEST_DB_PATH}"
+ASYNC_SQLALCHEMY_DATABASE_URL = f"sqlite+aiosqlite:///{_TEST_DB_PATH}"
 
 # Set testing mode BEFORE importing main to prevent database initialization
 os.environ["TESTING"] = "true"
-os.environ["DATABASE_URL"] = "sqlite:///:memory:"
+os.environ["DATABASE_URL"] = SQLALCHEMY_DATABASE_URL
+os.environ["RECEIPT_PDF_CACHE"] = "false"  # no S3 in tests
+os.environ["RESPONSE_CACHE"] = "false"  # no Redis in tests
+os.environ["SETTINGS_NOTIFY"] = "false"
+os.environ["PRINCIPAL_NOTIFY"] = "false"
 
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.pool import NullPool, StaticPool
 
 from main import app
-from database import Base, get_db
+from database import Base, get_async_db, get_async_session_factory, get_db
 from models import User, Setting
 from auth_utils import get_password_hash
 
-# Test database URL - use in-memory SQLite for testing
-SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
-
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL,
     connect_args={
@@ -28,6 +37,11 @@ engine = create_engine(
 
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# NullPool: TestClient runs each request on its own event loop, and an
+# aiosqlite connection can't be reused across loops.
+async_engine = create_async_engine(ASYNC_SQLALCHEMY_DATABASE_URL, poolclass=NullPool)
+TestingAsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 
 def override_get_db():
     """Override the database dependency to use test database"""
@@ -38,6 +52,12 @@ def override_get_db():
         db.close()
 
 
+async def override_get_async_db():
+    """Override the async database dependency to use test database"""
+    async with TestingAsyncSessionLocal() as db:
+        yield db
+
+
 @pytest.fixture(scope="session", autouse=True)
 def setup_test_database():
     """Set up test database tables once for the session"""
@@ -51,6 +71,8 @@ def test_app():
     """Create a test FastAPI application"""
     # Override the database dependency
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    app.dependency_overrides[get_async_session_factory] = lambda: TestingAsyncSessionLocal
     return app
 
 
@@ -190,3 +212,49 @@ def mock_stripe(monkeypatch):
     monkeypatch.setattr("stripe.Subscription.delete", mock_subscription_delete)
     monkeypatch.setattr("stripe.Subscription.cancel", mock_subscription_delete)
 
+
+class FakeResponseCacheRedis:
+    """Just the Redis commands response_cache uses, sync and async, over one dict."""
+
+    def __init__(self):
+        self.data = {}
+        self.pending = []
+
+    @staticmethod
+    def _bytes(value):
+        return value if isinstance(value, bytes) else str(value).encode()
+
+    async def mget(self, keys):
+        return [self.data.get(k) for k in keys]
+
+    async def set(self, key, value, ex=None, nx=False):
+        if nx and key in self.data:
+            return None
+        self.data[key] = self._bytes(value)
+        return True
+
+    async def delete(self, *keys):
+        return sum(self.data.pop(k, None) is not None for k in keys)
+
+    def pipeline(self, transaction=True):
+        return self
+
+    def incr(self, key):
+        self.pending.append(key)
+
+    def execute(self):
+        for key in self.pending:
+            self.data[key] = self._bytes(int(self.data.get(key, 0)) + 1)
+        self.pending.clear()
+
+
+@pytest.fixture
+def response_cache_redis(monkeypatch):
+    """Turn the response cache on, backed by an in-memory Redis stand-in."""
+    import response_cache
+
+    fake = FakeResponseCacheRedis()
+    monkeypatch.setattr(response_cache, "RESPONSE_CACHE_ENABLED", True)
+    monkeypatch.setattr(response_cache, "_async_redis", lambda: fake)
+    monkeypatch.setattr(response_cache, "_sync_redis", lambda: fake)
+    return fake
@@ -1,27 +1,210 @@
 from sqlalchemy import create_engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 import os
+import threading
+import time
+from typing import NamedTuple
+from uuid import uuid4
 from dotenv import load_dotenv
 
 load_dotenv()
 
 # Database configuration
 DATABASE_URL = os.getenv(
-    "DATABASE_URL", 
+    "DATABASE_URL",
     "postgresql://postgres:password@db:5432/myzakat"
 )
 
-# Optimize database connection pooling for high concurrency
+# Session-level state (the startup advisory lock) needs a real server
+# connection; behind a transaction-mode PgBouncer point this at Postgres.
+DIRECT_DATABASE_URL = os.getenv("DIRECT_DATABASE_URL") or DATABASE_URL
+
+# "transaction" when DATABASE_URL goes through PgBouncer in transaction
+# pooling mode: consecutive transactions may land on different server
+# connections, so nothing may rely on server-side prepared statements.
+PGBOUNCER_MODE = os.getenv("DB_PGBOUNCER", "").strip().lower()
+_transaction_pooling = PGBOUNCER_MODE == "transaction"
+
+
+# ─────────────────────────────────────────────────────────────────────
+# Pool sizing
+# ─────────────────────────────────────────────────────────────────────
+#
+# Every process that imports this module opens two pools (sync + async).
+# A fixed pool_size=20/max_overflow=40 per engine allowed 4 uvicorn
+# workers and the arq worker 600 connections against max_connections=100.
+# Instead, split the connections Postgres (or PgBouncer) actually has
+# between the processes that share them:
+#
+#   per process = (DB_MAX_CONNECTIONS - DB_RESERVED_CONNECTIONS)
+#                 // (WEB_CONCURRENCY + DB_EXTRA_PROCESSES)
+#
+# and give each engine half of that, three quarters kept open and the
+# rest as overflow. Background threads (settings subscriber, S3 cleanup,
+# the leader's orphan scan) check out of the same pools, so they can't
+# add connections beyond the budget; a request that can't get one waits
+# up to DB_POOL_TIMEOUT seconds and then fails instead of Postgres
+# refusing everyone with "too many connections".
+
+class PoolSizing(NamedTuple):
+    max_connections: int
+    reserved: int
+    processes: int
+    per_process: int
+    pool_size: int
+    max_overflow: int
+    timeout: float
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value not in (None, "") else default
+
+
+def pool_sizing() -> PoolSizing:
+    """Per-engine pool settings for this process, from the environment."""
+    max_connections = _env_int("DB_MAX_CONNECTIONS", 100)
+    # superuser_reserved_connections, psql/migrations, the startup lock
+    reserved = _env_int("DB_RESERVED_CONNECTIONS", 10)
+    # WEB_CONCURRENCY is also what uvicorn reads for --workers
+    processes = max(1, _env_int("WEB_CONCURRENCY", 4) + _env_int("DB_EXTRA_PROCESSES", 1))
+    per_process = max(2, (max_connections - reserved) // processes)
+
+    per_engine = per_process // 2
+    pool_size = _env_int("DB_POOL_SIZE", max(1, per_engine * 3 // 4))
+    max_overflow = _env_int("DB_MAX_OVERFLOW", max(0, per_engine - pool_size))
+    timeout = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+    return PoolSizing(max_connections, reserved, processes, per_process, pool_size, max_overflow, timeout)
+
+
+# ─────────────────────────────────────────────────────────────────────
+# Checkout metrics
+# ─────────────────────────────────────────────────────────────────────
+
+SLOW_CHECKOUT_MS = float(os.getenv("DB_POOL_SLOW_CHECKOUT_MS", "100"))
+
+
+class _CheckoutStats:
+    """Checkout counts and wait times for one pool, across pool recreation."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.slow = 0
+        self.wait_ms_total = 0.0
+        self.wait_ms_max = 0.0
+
+    def record(self, wait_ms: float, outcome: str):
+        with self._lock:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+            if wait_ms >= SLOW_CHECKOUT_MS:
+                self.slow += 1
+            self.wait_ms_total += wait_ms
+            self.wait_ms_max = max(self.wait_ms_max, wait_ms)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            attempts = self.checkouts + self.timeouts + self.errors
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "connect_errors": self.errors,
+                f"waits_over_{SLOW_CHECKOUT_MS:g}ms": self.slow,
+                "wait_ms_avg": round(self.wait_ms_total / attempts, 2) if attempts else 0.0,
+                "wait_ms_max": round(self.wait_ms_max, 2),
+            }
+
+
+class _MeteredPoolMixin:
+    # Keyed by class, not instance: engine.dispose() recreates the pool
+    # via self.__class__ and drops instance attributes.
+    stats: _CheckoutStats
+
+    def connect(self):
+        start = time.perf_counter()
+        outcome = "errors"
+        try:
+            connection = super().connect()
+            outcome = "checkouts"
+            return connection
+        except PoolTimeoutError:
+            outcome = "timeouts"
+            raise
+        finally:
+            self.stats.record((time.perf_counter() - start) * 1000, outcome)
+
+
+class MeteredQueuePool(_MeteredPoolMixin, QueuePool):
+    stats = _CheckoutStats()
+
+
+class MeteredAsyncQueuePool(_MeteredPoolMixin, AsyncAdaptedQueuePool):
+    stats = _CheckoutStats()
+
+
+def _pool_usage(pool) -> dict:
+    usage = {"pool": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        usage.update(
+            pool_size=pool.size(),
+            max_overflow=pool._max_overflow,
+            checked_out=pool.checkedout(),
+            idle=pool.checkedin(),
+            # negative while fewer than pool_size connections have been opened
+            overflow=max(0, pool.overflow()),
+        )
+    if isinstance(pool, _MeteredPoolMixin):
+        usage.update(pool.stats.snapshot())
+    return usage
+
+
+def pool_metrics() -> dict:
+    """Pool usage and checkout waits for this worker process."""
+    sizing = pool_sizing()
+    return {
+        "pid": os.getpid(),
+        "pgbouncer": PGBOUNCER_MODE or None,
+        "budget": {
+            "max_connections": sizing.max_connections,
+            "reserved": sizing.reserved,
+            "processes": sizing.processes,
+            "per_process": sizing.per_process,
+        },
+        "sync": _pool_usage(engine.pool),
+        "async": _pool_usage(async_engine.pool),
+    }
+
+
+# ─────────────────────────────────────────────────────────────────────
+# Engines
+# ─────────────────────────────────────────────────────────────────────
+
 # SQLite doesn't support pool_size/max_overflow or PostgreSQL-specific connect_args
 _is_sqlite = DATABASE_URL.startswith("sqlite")
+_sizing = pool_sizing()
+_pool_kwargs = dict(
+    pool_size=_sizing.pool_size,
+    max_overflow=_sizing.max_overflow,
+    pool_timeout=_sizing.timeout,
+    pool_pre_ping=True,
+    pool_recycle=3600,
+)
+
 _engine_kwargs: dict = {}
 if not _is_sqlite:
+    # psycopg2 doesn't prepare statements server-side; nothing to change for PgBouncer.
     _engine_kwargs.update(
-        pool_size=20,
-        max_overflow=40,
-        pool_pre_ping=True,
-        pool_recycle=3600,
+        _pool_kwargs,
+        poolclass=MeteredQueuePool,
         connect_args={
             "connect_timeout": 10,
             "application_name": "myzakat_backend",
@@ -31,6 +214,52 @@ if not _is_sqlite:
 engine = create_engine(DATABASE_URL, **_engine_kwargs)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+
+# Async engine for `async def` routes. Sync Session queries inside an async
+# handler block the event loop for every round-trip; hot public and tracking
+# routes use get_async_db instead so one worker can serve many requests at once.
+def _async_url(url: str) -> str:
+    if url.startswith("postgresql://") or url.startswith("postgres://"):
+        return "postgresql+asyncpg://" + url.split("://", 1)[1]
+    if url.startswith("sqlite://"):
+        return "sqlite+aiosqlite://" + url.split("://", 1)[1]
+    return url
+
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or _async_url(DATABASE_URL)
+
+
+def _async_connect_args() -> dict:
+    connect_args: dict = {
+        "timeout": 10,
+        "server_settings": {"application_name": "myzakat_backend"},
+    }
+    if _transaction_pooling:
+        # asyncpg caches named prepared statements per connection; behind
+        # PgBouncer the next execute may reach a server connection that
+        # doesn't have them ("prepared statement ... does not exist").
+        # Turn off both caches and give each statement a unique name.
+        connect_args.update(
+            statement_cache_size=0,
+            prepared_statement_cache_size=0,
+            prepared_statement_name_func=lambda: f"__asyncpg_{uuid4()}__",
+        )
+    return connect_args
+
+
+_async_engine_kwargs: dict = {}
+if not _is_sqlite:
+    _async_engine_kwargs.update(
+        _pool_kwargs,
+        poolclass=MeteredAsyncQueuePool,
+        connect_args=_async_connect_args(),
+    )
+
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **_async_engine_kwargs)
+# expire_on_commit=False: attributes stay loaded after commit, because an
+# expired attribute can't be lazy-loaded implicitly under asyncio.
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
 # Dependency to get database session
@@ -40,3 +269,13 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def get_async_session_factory():
+    """For endpoints that run several queries concurrently, one AsyncSession each."""
+    return AsyncSessionLocal
@@ -0,0 +1,270 @@
+"""Precomputed donation statistics (`donation_aggregates` + `donation_donors`).
+
+The public `/api/donations/stats` endpoint and the admin dashboard used to
+run SUM / COUNT(DISTINCT email) over the whole donations table on every
+request. They now read one `donation_aggregates` row instead.
+
+Maintenance is incremental: flush listeners on every ORM Session compute
+how each inserted / updated / deleted Donation changes the totals
+(site-wide, per day, per month, per campaign and per donor) and apply the
+deltas as atomic upserts inside the same transaction. So every write path —
+Stripe webhook, manual donations, admin edits and deletes — keeps the
+aggregates exact without having to remember to call anything.
+
+Bulk `query.update()` / `query.delete()` and raw SQL bypass the listener;
+`rebuild_donation_aggregates` recomputes everything from scratch and runs
+nightly on the worker to reconcile any drift.
+"""
+from __future__ import annotations
+
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Iterable, NamedTuple
+
+from sqlalchemy import event, select, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from logging_config import get_logger
+from models import Donation, DonationAggregate, DonationDonor
+
+logger = get_logger(__name__)
+
+_TRACKED = ("amount", "status", "email", "donated_at", "utm_campaign")
+
+
+class _Contribution(NamedTuple):
+    amount: float
+    email: str
+    buckets: tuple[tuple[str, str], ...]
+
+
+def _contribution(values: dict[str, Any]) -> _Contribution | None:
+    """What one donation adds to the aggregates, or None if it isn't confirmed."""
+    if values.get("status") != "confirmed":
+        return None
+    donated_at = values.get("donated_at")
+    buckets = [("total", "")]
+    if donated_at:
+        buckets.append(("day", donated_at.strftime("%Y-%m-%d")))
+        buckets.append(("month", donated_at.strftime("%Y-%m")))
+    if values.get("utm_campaign"):
+        buckets.append(("campaign", str(values["utm_campaign"])))
+    return _Contribution(
+        amount=float(values.get("amount") or 0),
+        email=(values.get("email") or "").strip().lower(),
+        buckets=tuple(buckets),
+    )
+
+
+class _Deltas:
+    def __init__(self) -> None:
+        self.buckets: dict[tuple[str, str], list[float]] = defaultdict(lambda: [0.0, 0])
+        self.donors: dict[str, list[float]] = defaultdict(lambda: [0, 0.0])
+
+    def add(self, contrib: _Contribution | None, sign: int) -> None:
+        if contrib is None:
+            return
+        for key in contrib.buckets:
+            self.buckets[key][0] += sign * contrib.amount
+            self.buckets[key][1] += sign
+        if contrib.email:
+            self.donors[contrib.email][0] += sign
+            self.donors[contrib.email][1] += sign * contrib.amount
+
+    def __bool__(self) -> bool:
+        return any(any(v) for v in self.buckets.values()) or any(any(v) for v in self.donors.values())
+
+
+# ─────────────────────────────────────────────────────────────────────
+# Incremental maintenance (flush listener)
+# ─────────────────────────────────────────────────────────────────────
+
+def _insert_for(session: Session, table):
+    dialect = session.get_bind().dialect.name
+    return (postgresql.insert if dialect == "postgresql" else sqlite.insert)(table)
+
+
+def _apply(session: Session, deltas: _Deltas) -> None:
+    conn = session.connection()
+    now = datetime.utcnow()
+
+    donor_change = 0
+    donors = DonationDonor.__table__
+    for email, (count, amount) in deltas.donors.items():
+        if not count and not amount:
+            continue
+        stmt = _insert_for(session, donors).values(email=email, donation_count=count, total_amount=amount)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[donors.c.email],
+            set_={
+                "donation_count": donors.c.donation_count + count,
+                "total_amount": donors.c.total_amount + amount,
+            },
+        ).returning(donors.c.donation_count)
+        new_count = conn.execute(stmt).scalar_one()
+        old_count = new_count - count
+        if old_count <= 0 < new_count:
+            donor_change += 1
+        elif new_count <= 0 < old_count:
+            donor_change -= 1
+
+    aggregates = DonationAggregate.__table__
+    for (scope, bucket), (amount, count) in deltas.buckets.items():
+        donors_delta = donor_change if scope == "total" else 0
+        stmt = _insert_for(session, aggregates).values(
+            scope=scope, bucket=bucket, total_amount=amount, donation_count=count,
+            donor_count=donors_delta, updated_at=now,
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[aggregates.c.scope, aggregates.c.bucket],
+            set_={
+                "total_amount": aggregates.c.total_amount + amount,
+                "donation_count": aggregates.c.donation_count + count,
+                "donor_count": aggregates.c.donor_count + donors_delta,
+                "updated_at": now,
+            },
+        )
+        conn.execute(stmt)
+
+
+def _stored_values(session: Session, objs: list[Donation]) -> dict[int, dict[str, Any]]:
+    """The rows as they are in the database, before this flush writes them.
+
+    Attribute history is not enough: after a commit every instance is
+    expired, so assigning to it records no previous value.
+    """
+    if not objs:
+        return {}
+    columns = [getattr(Donation, attr) for attr in _TRACKED]
+    with session.no_autoflush:
+        rows = session.execute(
+            select(Donation.id, *columns).where(Donation.id.in_([o.id for o in objs]))
+        ).all()
+    return {row[0]: dict(zip(_TRACKED, row[1:])) for row in rows}
+
+
+def _new_values(obj: Donation) -> dict[str, Any]:
+    return {attr: getattr(obj, attr) for attr in _TRACKED}
+
+
+@event.listens_for(Session, "before_flush")
+def _capture_donation_changes(session: Session, flush_context, instances) -> None:
+    # Updates and deletes are diffed before the flush, while the previous
+    # values can still be loaded; inserts wait for after_flush so column
+    # defaults (donated_at) are populated.
+    deltas = session.info["donation_deltas"] = _Deltas()
+    changed = [
+        obj for obj in session.dirty
+        if isinstance(obj, Donation) and session.is_modified(obj, include_collections=False)
+    ]
+    deleted = [obj for obj in session.deleted if isinstance(obj, Donation)]
+    stored = _stored_values(session, changed + deleted)
+    for obj in changed:
+        old, new = stored.get(obj.id), _new_values(obj)
+        if old is not None and old != new:
+            deltas.add(_contribution(old), -1)
+            deltas.add(_contribution(new), +1)
+    for obj in deleted:
+        if obj.id in stored:
+            deltas.add(_contribution(stored[obj.id]), -1)
+
+
+@event.listens_for(Session, "after_flush")
+def _apply_donation_changes(session: Session, flush_context) -> None:
+    deltas = session.info.pop("donation_deltas", None) or _Deltas()
+    for obj in session.new:
+        if isinstance(obj, Donation):
+            deltas.add(_contribution(_new_values(obj)), +1)
+    if deltas:
+        _apply(session, deltas)
+
+
+# ─────────────────────────────────────────────────────────────────────
+# Reads
+# ─────────────────────────────────────────────────────────────────────
+
+def get_donation_totals(db: Session) -> DonationAggregate:
+    """The site-wide totals row, or zeros if it doesn't exist yet.
+
+    Never rebuilds on the request path: the migration backfills the row, the
+    flush listener creates it with the first confirmed donation, and the
+    nightly reconcile repairs anything else. The zeros row is transient.
+    """
+    row = (
+        db.query(DonationAggregate)
+        .filter(DonationAggregate.scope == "total", DonationAggregate.bucket == "")
+        .first()
+    )
+    if row is None:
+        row = DonationAggregate(scope="total", bucket="", total_amount=0.0, donation_count=0, donor_count=0)
+    return row
+
+
+def get_donation_buckets(db: Session, scope: str, *, limit: int = 12) -> list[DonationAggregate]:
+    """Most recent day / month buckets, or the top campaigns by amount."""
+    query = db.query(DonationAggregate).filter(DonationAggregate.scope == scope)
+    if scope == "campaign":
+        query = query.order_by(DonationAggregate.total_amount.desc())
+    else:
+        query = query.order_by(DonationAggregate.bucket.desc())
+    return query.limit(limit).all()
+
+
+# ─────────────────────────────────────────────────────────────────────
+# Reconciliation
+# ─────────────────────────────────────────────────────────────────────
+
+def _scan(db: Session) -> Iterable[dict[str, Any]]:
+    columns = [getattr(Donation, attr) for attr in _TRACKED]
+    for row in db.query(*columns).yield_per(1000):
+        yield dict(zip(_TRACKED, row))
+
+
+def rebuild_donation_aggregates(db: Session) -> dict[str, int]:
+    """Recompute both tables from the donations table. Commits.
+
+    Uses the same `_contribution` bucketing as the flush listener, so a
+    rebuild over unchanged data is a no-op.
+
+    On PostgreSQL both tables are locked in SHARE ROW EXCLUSIVE mode before
+    the scan. That waits for transactions that already applied their deltas
+    to commit, so the scan sees their donations, and it holds back new
+    upserts (which need ROW EXCLUSIVE) until the rebuilt rows are
+    committed. Without it a donation committed mid-scan had its delta
+    deleted and wasn't counted either. Reads are not blocked.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(text(
+            f"LOCK TABLE {DonationAggregate.__tablename__}, {DonationDonor.__tablename__} "
+            "IN SHARE ROW EXCLUSIVE MODE"
+        ))
+    deltas = _Deltas()
+    for values in _scan(db):
+        deltas.add(_contribution(values), +1)
+
+    donor_count = sum(1 for count, _ in deltas.donors.values() if count > 0)
+    now = datetime.utcnow()
+    db.query(DonationAggregate).delete(synchronize_session=False)
+    db.query(DonationDonor).delete(synchronize_session=False)
+    deltas.buckets.setdefault(("total", ""), [0.0, 0])  # the totals row always exists
+    db.bulk_insert_mappings(DonationAggregate, [
+        {
+            "scope": scope,
+            "bucket": bucket,
+            "total_amount": amount,
+            "donation_count": count,
+            "donor_count": donor_count if scope == "total" else 0,
+            "updated_at": now,
+        }
+        for (scope, bucket), (amount, count) in deltas.buckets.items()
+    ])
+    db.bulk_insert_mappings(DonationDonor, [
+        {"email": email, "donation_count": count, "total_amount": amount}
+        for email, (count, amount) in deltas.donors.items()
+        if count > 0
+    ])
+    db.commit()
+    summary = {"buckets": len(deltas.buckets), "donors": donor_count}
+    logger.info("Rebuilt donation aggregates: %s", summary)
+    return summary
@@ -19,6 +19,7 @@ from typing import Optional
 from logging_config import get_logger
 from database import SessionLocal
 
+from marketing.attachments import deferred_attachment
 from marketing.mailer import enqueue_email
 from marketing.resend_client import encode_attachment
 
@@ -66,30 +67,43 @@ def send_donation_certificate_email(
     email: str,
     name: str,
     amount: float,
-    pdf_path: str,
+    pdf_path: Optional[str] = None,
     donation_date: Optional[datetime] = None,
+    donation_id: Optional[int] = None,
 ) -> bool:
-    """Send the official ZDF donation receipt PDF + acknowledgement email."""
+    """Send the official ZDF donation receipt PDF + acknowledgement email.
+
+    Pass `donation_id` instead of `pdf_path` to have the worker render the
+    PDF at send time — the caller then never touches ReportLab.
+    """
     if donation_date is None:
         donation_date = datetime.utcnow()
     donation_date_str = donation_date.strftime("%B %d, %Y")
     amount_str = f"${amount:,.2f}"
     donor_name = name or "Donor"
+    pdf_filename = (
+        f"ZDF_Donation_Receipt_{donor_name.replace(' ', '_')}_"
+        f"{donation_date.strftime('%Y%m%d')}.pdf"
+    )
 
     attachments = []
     try:
         if pdf_path and os.path.exists(pdf_path):
             with open(pdf_path, "rb") as pdf_file:
                 attachments.append(
-                    encode_attachment(
-                        f"ZDF_Donation_Receipt_{donor_name.replace(' ', '_')}_"
-                        f"{donation_date.strftime('%Y%m%d')}.pdf",
-                        pdf_file.read(),
-                        content_type="application/pdf",
-                    )
+                    encode_attachment(pdf_filename, pdf_file.read(), content_type="application/pdf")
+                )
+        elif donation_id is not None:
+            attachments.append(
+                deferred_attachment(
+                    "donation_receipt",
+                    filename=pdf_filename,
+                    content_type="application/pdf",
+                    donation_id=donation_id,
                 )
+            )
     except Exception as exc:
-        logger.warning("Could not attach PDF receipt %s: %s", pdf_path, exc)
+        logger.warning("Could not attach PDF receipt %s: %s", pdf_path or donation_id, exc)
 
     return _enqueue(
         "donation_receipt",
@@ -0,0 +1,67 @@
+"""Deferred imports for heavy optional subsystems.
+
+Importing main.py used to pull in stripe, reportlab, premailer (lxml,
+cssutils), boto3 and resend, about a second of import time and tens of
+MB of RSS per worker, before the first request. Most workers never
+render a PDF or call Stripe. A module that needs one of these binds a
+stand-in instead:
+
+    stripe = lazy_module("stripe", on_load=_configure_stripe)
+    ...
+    stripe.checkout.Session.create(...)   # imported here, on first use
+
+The stand-in imports the real module on the first attribute read or
+write and forwards to it from then on. It is the real module object
+behind it, so `monkeypatch.setattr("stripe....")` in tests and
+`except stripe.error.StripeError` work as before. `on_load` runs once per
+stand-in, right after the import (e.g. to set an API key).
+
+tests/test_import_time.py keeps these modules out of `import main`.
+"""
+from __future__ import annotations
+
+import importlib
+import threading
+from types import ModuleType
+from typing import Callable, Optional
+
+
+class _LazyModule(ModuleType):
+    def __init__(self, name: str, on_load: Optional[Callable[[ModuleType], None]]):
+        super().__init__(name)
+        object.__setattr__(self, "_lazy_on_load", on_load)
+        object.__setattr__(self, "_lazy_module", None)
+        object.__setattr__(self, "_lazy_lock", threading.Lock())
+
+    def _lazy_load(self) -> ModuleType:
+        module = object.__getattribute__(self, "_lazy_module")
+        if module is not None:
+            return module
+        with object.__getattribute__(self, "_lazy_lock"):
+            module = object.__getattribute__(self, "_lazy_module")
+            if module is None:
+                module = importlib.import_module(self.__name__)
+                on_load = object.__getattribute__(self, "_lazy_on_load")
+                if on_load is not None:
+                    on_load(module)
+                object.__setattr__(self, "_lazy_module", module)
+        return module
+
+    def __getattr__(self, attr: str):
+        # Only reached for names the stand-in itself doesn't have.
+        return getattr(self._lazy_load(), attr)
+
+    def __setattr__(self, attr: str, value) -> None:
+        setattr(self._lazy_load(), attr, value)
+
+    def __dir__(self):
+        return dir(self._lazy_load())
+
+    def __repr__(self) -> str:
+        loaded = object.__getattribute__(self, "_lazy_module") is not None
+        return f"<lazy module {self.__name__!r} ({'loaded' if loaded else 'not loaded'})>"
+
+
+def lazy_module(name: str, on_load: Optional[Callable[[ModuleType], None]] = None) -> ModuleType:
+    """A stand-in for module `name` that imports it on first use."""
+    return _LazyModule(name, on_load)
@@ -5,6 +5,8 @@ All loggers inherit from root, so configuring root once gives every module
 consistent formatting. Logs go to stdout (Docker captures them → Promtail → Loki).
 """
 import logging
+import logging.handlers
+import queue
 import sys
 import os
 
@@ -41,6 +43,41 @@ def setup_logging():
     logging.getLogger("stripe").setLevel(logging.WARNING)
 
 
+def start_queued_logging(*names: str) -> logging.handlers.QueueListener:
+    """
+    Make the named loggers non-blocking for the code that logs.
+
+    Their records go onto an in-memory queue and a background thread writes
+    them out through root's handlers. Use it for loggers on the request path
+    (the audit log) so a slow stdout never stalls a response. Call after
+    setup_logging(); undo with stop_queued_logging().
+    """
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    handler = logging.handlers.QueueHandler(records)
+    for name in names:
+        logger = logging.getLogger(name)
+        logger.addHandler(handler)
+        logger.propagate = False
+
+    listener = logging.handlers.QueueListener(
+        records, *logging.getLogger().handlers, respect_handler_level=True,
+    )
+    listener.names = names
+    listener.start()
+    return listener
+
+
+def stop_queued_logging(listener: logging.handlers.QueueListener) -> None:
+    """Flush the queue and route the loggers back through root."""
+    for name in listener.names:
+        logger = logging.getLogger(name)
+        for handler in list(logger.handlers):
+            if isinstance(handler, logging.handlers.QueueHandler) and handler.queue is listener.queue:
+                logger.removeHandler(handler)
+        logger.propagate = True
+    listener.stop()
+
+
 def get_logger(name: str) -> logging.Logger:
     """Get a named logger. Usage: logger = get_logger(__name__)"""
     return logging.getLogger(name)
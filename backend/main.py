@@ -3,147 +3,21 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 import os
 from dotenv import load_dotenv
-from sqlalchemy.orm import Session
 
 load_dotenv()
 
-from logging_config import setup_logging, get_logger
+from logging_config import setup_logging, get_logger, start_queued_logging, stop_queued_logging
 setup_logging()
 logger = get_logger("main")
 
-from database import engine, Base, get_db
-from models import User, Setting
-from auth_utils import get_password_hash
-from s3_service import ensure_bucket_exists
+from database import async_engine
 from audit_middleware import AuditMiddleware
-from routers import auth, admin, donations, events, stories, contact, testimonials, subscriptions, volunteers, settings, user, slideshow, urgent_needs, media, static_files, gallery, program_categories, programs, cleanup, s3_media, campaigns, marketing, marketing_templates, marketing_segments, marketing_campaigns, fundraising_projects, tracking, project_proposals
+from startup_tasks import release_leadership, run_startup_tasks
+from routers import auth, admin, donations, events, stories, contact, testimonials, subscriptions, volunteers, settings, user, slideshow, urgent_needs, media, static_files, gallery, program_categories, programs, cleanup, s3_media, campaigns, marketing, marketing_templates, marketing_segments, marketing_campaigns, fundraising_projects, tracking, project_proposals, public
 
 # Check if running in test mode
 TESTING_MODE = os.getenv("TESTING", "false").lower() == "true"
 
-# Create database tables only if not in test mode
-if not TESTING_MODE:
-    Base.metadata.create_all(bind=engine)
-
-def ensure_admin_user():
-    """Ensure at least one admin user exists"""
-    db = next(get_db())
-    try:
-        # Check if any admin user exists
-        admin_user = db.query(User).filter(User.is_admin == True).first()
-        if not admin_user:
-            # Creating default admin user
-            hashed_password = get_password_hash("admin123")
-            admin_user = User(
-                email="admin@example.com",
-                password=hashed_password,
-                name="Super Admin",
-                is_active=True,
-                is_admin=True,
-                email_verified=True  # Admin users don't need email verification
-            )
-            db.add(admin_user)
-            db.commit()
-            pass  # Admin user created successfully
-        else:
-            pass  # Admin user exists
-            
-        # Ensure default settings exist
-        default_settings = [
-            ('meals_provided', '25000', 'Total number of meals provided to families in need'),
-            ('families_supported', '1200', 'Total number of families supported through our programs'),
-            ('orphans_cared_for', '800', 'Total number of orphans receiving care and support'),
-            ('total_raised', '500000', 'Total amount raised in USD for all programs'),
-            ('hero_video', '', 'Main video displayed on the homepage hero section'),
-            ('gallery_item_1', '', 'Gallery image/video 1'),
-            ('gallery_item_2', '', 'Gallery image/video 2'),
-            ('gallery_item_3', '', 'Gallery image/video 3'),
-            ('gallery_item_4', '', 'Gallery image/video 4'),
-            ('gallery_item_5', '', 'Gallery image/video 5'),
-            ('gallery_item_6', '', 'Gallery image/video 6'),
-            ('sticky_donation_bar_enabled', 'false', 'Enable or disable the sticky donation bar on the homepage'),
-        ]
-        
-        for key, value, description in default_settings:
-            setting = db.query(Setting).filter(Setting.key == key).first()
-            if not setting:
-                setting = Setting(key=key, value=value, description=description)
-                db.add(setting)
-        
-        db.commit()
-        # Default settings ensured
-        
-    except Exception as e:
-        logger.error("Error ensuring admin user: %s", e)
-        db.rollback()
-    finally:
-        db.close()
-
-# Ensure admin user exists on startup (skip in test mode)
-if not TESTING_MODE:
-    ensure_admin_user()
-
-# Ensure media directories exist
-def ensure_media_directories():
-    """Ensure media upload directories exist"""
-    import os
-    directories = [
-        "uploads/media/videos",
-        "uploads/media/images",
-        "uploads/events",
-        "uploads/stories",
-        "uploads/testimonials",
-        "uploads/program_categories",
-        "uploads/programs"
-    ]
-    
-    for directory in directories:
-        os.makedirs(directory, exist_ok=True)
-        # Directory ensured
-    
-    # Ensure video upload directory
-    video_dir = "uploads/media/videos"
-    if not os.path.exists(video_dir):
-        os.makedirs(video_dir, exist_ok=True)
-
-# Ensure media directories (skip in test mode)
-if not TESTING_MODE:
-    ensure_media_directories()
-    # Initialize S3 bucket
-    try:
-        ensure_bucket_exists()
-        logger.info("S3 bucket initialized successfully")
-    except Exception as e:
-        logger.warning("Could not initialize S3 bucket: %s — uploads will fall back to local storage", e)
-    
-    # Run automatic cleanup of orphaned media on startup (in background)
-    import threading
-    def run_startup_cleanup():
-        try:
-            from routers.cleanup import cleanup_orphaned_media
-            from database import SessionLocal
-            import time
-            # Wait a bit for database to be ready
-            time.sleep(5)
-            logger.info("Running automatic cleanup of orphaned media")
-            db = SessionLocal()
-            try:
-                result = cleanup_orphaned_media(db=db, current_admin=None, auto_delete=True)
-                if result["orphaned_count"] > 0:
-                    logger.info("Cleaned up %d orphaned media entries", result["deleted_count"])
-                else:
-                    logger.info("No orphaned media found")
-            except Exception as e:
-                logger.warning("Could not run automatic cleanup: %s", e)
-            finally:
-                db.close()
-        except Exception as e:
-            logger.warning("Could not initialize cleanup system: %s", e)
-    
-    # Run cleanup in background thread
-    cleanup_thread = threading.Thread(target=run_startup_cleanup, daemon=True)
-    cleanup_thread.start()
-
 app = FastAPI(
     title="MyZakat API",
     description="Professional donation platform API",
@@ -181,6 +55,7 @@ if is_production:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=["X-Next-Cursor"],
     )
 else:
     # In development, use specific origins
@@ -190,6 +65,7 @@ else:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=["X-Next-Cursor"],
     )
 
 # Audit middleware — logs every state-changing request with user email
@@ -228,6 +104,42 @@ app.include_router(marketing_campaigns.router, prefix="/api/marketing", tags=["m
 app.include_router(project_proposals.router, prefix="/api/project-proposals", tags=["project-proposals"])
 app.include_router(fundraising_projects.router, prefix="/api/fundraising-projects", tags=["fundraising-projects"])
 app.include_router(tracking.router, prefix="/api/tracking", tags=["tracking"])
+app.include_router(public.router, prefix="/api/public", tags=["public"])
+
+# Schema, seed data and the orphan scan run in one worker per deployment;
+# see startup_tasks.py. Skipped in test mode.
+@app.on_event("startup")
+def run_startup_tasks_once():
+    if not TESTING_MODE:
+        run_startup_tasks()
+
+
+@app.on_event("shutdown")
+def release_startup_lock():
+    release_leadership()
+
+
+# Audit lines are written on the request path; hand them to a background
+# thread instead of blocking the event loop on stdout.
+_queued_log_listener = None
+
+
+@app.on_event("startup")
+async def start_audit_log_queue():
+    global _queued_log_listener
+    _queued_log_listener = start_queued_logging("audit")
+
+
+@app.on_event("shutdown")
+async def stop_audit_log_queue():
+    if _queued_log_listener is not None:
+        stop_queued_logging(_queued_log_listener)
+
+
+@app.on_event("shutdown")
+async def dispose_async_engine():
+    await async_engine.dispose()
+
 
 @app.get("/")
 async def root():
@@ -0,0 +1,256 @@
+"""Attachment store-by-reference for the email outbox.
+
+Outbox rows used to carry every attachment inline as base64 JSON, so a
+campaign attachment was written once per recipient. Bodies now live in
+`email_attachment_blobs`, keyed by their SHA-256, and the outbox row only
+stores a reference:
+
+    {"filename": "...", "content_type": "application/pdf", "sha256": "...", "size": 1234}
+
+The API side converts attachments with `store_attachment` /
+`to_attachment_refs` (called by ComplianceMailer.queue). The worker turns
+references back into Resend's inline shape with `resolve_attachments`,
+through a process-wide LRU cache bounded by bytes, so a campaign fan-out
+reads each blob from Postgres once per worker process rather than once per
+recipient.
+
+Legacy rows that still hold `content_b64` are passed through unchanged.
+
+An entry can also be *deferred* — a recipe instead of bytes:
+
+    {"filename": "...", "content_type": "application/pdf",
+     "generate": "donation_receipt", "params": {"donation_id": 42}}
+
+so expensive attachments (receipt PDFs) are rendered by the worker rather
+than in the request that queued the email. `materialize_attachments` runs
+the generator, stores the result like any other blob and swaps the recipe
+for a reference, so a retried send never renders twice.
+"""
+from __future__ import annotations
+
+import base64
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from logging_config import get_logger
+from models import Donation, EmailAttachmentBlob, YearEndReceipt
+
+from .resend_client import ResendDeliveryError
+
+logger = get_logger(__name__)
+
+CACHE_MAX_BYTES = int(os.getenv("EMAIL_ATTACHMENT_CACHE_BYTES", str(64 * 1024 * 1024)))
+
+
+# ─────────────────────────────────────────────────────────────────────
+# Storing (API side)
+# ─────────────────────────────────────────────────────────────────────
+
+def store_attachment(
+    db: Session,
+    content: bytes,
+    *,
+    filename: str,
+    content_type: str = "application/octet-stream",
+) -> dict[str, Any]:
+    """Persist `content` once (keyed by SHA-256) and return its reference. Does NOT commit."""
+    digest = hashlib.sha256(content).hexdigest()
+    exists = db.query(EmailAttachmentBlob.sha256).filter(EmailAttachmentBlob.sha256 == digest).first()
+    if not exists:
+        try:
+            with db.begin_nested():
+                db.add(EmailAttachmentBlob(sha256=digest, content=content, size=len(content)))
+        except IntegrityError:
+            # Another request stored the same bytes first — that's the point.
+            pass
+    return {"filename": filename, "content_type": content_type, "sha256": digest, "size": len(content)}
+
+
+def to_attachment_refs(db: Session, attachments: list[dict[str, Any]] | None) -> list[dict[str, Any]]:
+    """Convert inline (`content_b64`) attachments into references. Does NOT commit.
+
+    Entries that are already references pass through untouched, so callers
+    that store once up front (campaign fan-out) pay nothing per recipient.
+    """
+    refs: list[dict[str, Any]] = []
+    for a in attachments or []:
+        if "sha256" in a or "content_b64" not in a:
+            refs.append(a)
+            continue
+        refs.append(store_attachment(
+            db,
+            base64.b64decode(a["content_b64"]),
+            filename=a["filename"],
+            content_type=a.get("content_type", "application/octet-stream"),
+        ))
+    return refs
+
+
+# ─────────────────────────────────────────────────────────────────────
+# Deferred attachments (rendered on the worker)
+# ─────────────────────────────────────────────────────────────────────
+
+def _render_donation_receipt(db: Session, params: dict[str, Any]) -> bytes:
+    from pdf_service import get_donation_receipt_pdf
+
+    donation = db.query(Donation).filter(Donation.id == params.get("donation_id")).first()
+    if not donation:
+        raise ResendDeliveryError(f"Donation {params.get('donation_id')} not found for receipt")
+    return get_donation_receipt_pdf(
+        donor_name=donation.name,
+        amount=donation.amount,
+        donation_date=donation.donated_at or datetime.utcnow(),
+        donation_id=donation.id,
+    )
+
+
+def _load_year_end_receipt(db: Session, params: dict[str, Any]) -> bytes:
+    """Annual receipts are rendered in bulk ahead of time (year_end_receipts.py); fetch from the private bucket."""
+    from s3_service import download_private_file
+
+    receipt = db.query(YearEndReceipt).filter(YearEndReceipt.id == params.get("receipt_id")).first()
+    if not receipt:
+        raise ResendDeliveryError(f"Year-end receipt {params.get('receipt_id')} not found")
+    content = download_private_file(receipt.s3_key)
+    if not content:
+        raise ResendDeliveryError(f"Year-end receipt PDF missing from storage: {receipt.s3_key}")
+    return content
+
+
+GENERATORS: dict[str, Callable[[Session, dict[str, Any]], bytes]] = {
+    "donation_receipt": _render_donation_receipt,
+    "year_end_receipt": _load_year_end_receipt,
+}
+
+
+def deferred_attachment(kind: str, *, filename: str, content_type: str, **params: Any) -> dict[str, Any]:
+    """Build a recipe entry for an attachment the worker should render."""
+    if kind not in GENERATORS:
+        raise ValueError(f"Unknown attachment generator: {kind}")
+    return {"filename": filename, "content_type": content_type, "generate": kind, "params": params}
+
+
+def materialize_attachments(db: Session, attachments: list[dict[str, Any]] | None) -> list[dict[str, Any]] | None:
+    """Render deferred entries into blob references. Does NOT commit.
+
+    Returns the new attachment list, or None if nothing was deferred. A
+    generator failure is raised as ResendDeliveryError so the send goes
+    through the normal retry / fail path.
+    """
+    if not any("generate" in a for a in attachments or []):
+        return None
+    refs: list[dict[str, Any]] = []
+    for a in attachments:
+        if "generate" not in a:
+            refs.append(a)
+            continue
+        try:
+            content = GENERATORS[a["generate"]](db, a.get("params") or {})
+        except ResendDeliveryError:
+            raise
+        except Exception as exc:
+            raise ResendDeliveryError(f"Could not render {a['generate']} attachment: {exc}") from exc
+        refs.append(store_attachment(db, content, filename=a["filename"], content_type=a["content_type"]))
+    return refs
+
+
+# ─────────────────────────────────────────────────────────────────────
+# Resolving (worker side)
+# ─────────────────────────────────────────────────────────────────────
+
+class AttachmentCache:
+    """LRU of base64 attachment bodies keyed by SHA-256, bounded by total bytes.
+
+    A blob larger than the whole budget is never cached. Thread-safe so it
+    can be shared by every job in the worker process.
+    """
+
+    def __init__(self, max_bytes: int = CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._items: OrderedDict[str, str] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, sha256: str) -> str | None:
+        with self._lock:
+            value = self._items.get(sha256)
+            if value is not None:
+                self._items.move_to_end(sha256)
+            return value
+
+    def put(self, sha256: str, content_b64: str) -> None:
+        size = len(content_b64)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if sha256 in self._items:
+                self._items.move_to_end(sha256)
+                return
+            self._items[sha256] = content_b64
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+
+_cache = AttachmentCache()
+
+
+def resolve_attachments(
+    db: Session,
+    attachments: list[dict[str, Any]] | None,
+    *,
+    cache: AttachmentCache | None = None,
+) -> list[dict[str, Any]]:
+    """Turn outbox attachment entries into Resend's inline shape.
+
+    Cache misses are loaded with one `IN (...)` query. A reference whose
+    blob is gone raises ResendDeliveryError so the send is retried / failed
+    through the normal path rather than going out without its attachment.
+    """
+    cache = cache or _cache
+    bodies: dict[str, str] = {}
+    missing: set[str] = set()
+    for a in attachments or []:
+        sha = a.get("sha256")
+        if sha and sha not in bodies:
+            cached = cache.get(sha)
+            if cached is None:
+                missing.add(sha)
+            else:
+                bodies[sha] = cached
+
+    if missing:
+        for blob in db.query(EmailAttachmentBlob).filter(EmailAttachmentBlob.sha256.in_(missing)).all():
+            encoded = base64.b64encode(blob.content).decode("ascii")
+            cache.put(blob.sha256, encoded)
+            bodies[blob.sha256] = encoded
+        lost = missing - bodies.keys()
+        if lost:
+            raise ResendDeliveryError(f"Attachment blob(s) missing: {', '.join(sorted(lost))}")
+
+    resolved: list[dict[str, Any]] = []
+    for a in attachments or []:
+        if "sha256" not in a:
+            resolved.append(a)  # legacy inline row
+            continue
+        resolved.append({
+            "filename": a["filename"],
+            "content_b64": bodies[a["sha256"]],
+            "content_type": a.get("content_type", "application/octet-stream"),
+        })
+    return resolved
@@ -53,21 +53,23 @@ def marketing_contacts_query(db: Session):
     are computed per-email via a separate aggregate sub-query so that a row
     sourced from `users` still gets correct donation stats.
     """
-    # Aggregate per-email donation stats.
+    # Aggregate per-email donation stats. Every source table stores emails
+    # normalized (models.normalize_email, backfilled by migration 38), so
+    # group and join on the plain columns: lower() would defeat their indexes.
     donation_agg = (
         select(
-            func.lower(Donation.email).label("agg_email"),
+            Donation.email.label("agg_email"),
             func.coalesce(func.sum(Donation.amount), 0).label("total_donated"),
             func.count(Donation.id).label("donation_count"),
             func.max(Donation.donated_at).label("last_donation_at"),
         )
-        .group_by(func.lower(Donation.email))
+        .group_by(Donation.email)
         .subquery()
     )
 
     # Branch 1: users
     q_users = select(
-        func.lower(User.email).label("email"),
+        User.email.label("email"),
         User.name.label("name"),
         literal(True).label("has_email_consent"),  # registered users have consented to receive emails
         literal(False).label("sms_consent"),
@@ -76,7 +78,7 @@ def marketing_contacts_query(db: Session):
 
     # Branch 2: newsletter subscriptions
     q_subs = select(
-        func.lower(Subscription.email).label("email"),
+        Subscription.email.label("email"),
         Subscription.name.label("name"),
         Subscription.wants_email.label("has_email_consent"),
         Subscription.wants_sms.label("sms_consent"),
@@ -85,7 +87,7 @@ def marketing_contacts_query(db: Session):
 
     # Branch 3: volunteers
     q_volunteers = select(
-        func.lower(Volunteer.email).label("email"),
+        Volunteer.email.label("email"),
         Volunteer.name.label("name"),
         literal(True).label("has_email_consent"),  # volunteers consented when they signed up
         literal(False).label("sms_consent"),
@@ -94,27 +96,27 @@ def marketing_contacts_query(db: Session):
 
     # Branch 4: one-time donors (people in donations but not subs/users)
     q_donors = select(
-        func.lower(Donation.email).label("email"),
+        Donation.email.label("email"),
         Donation.name.label("name"),
         literal(True).label("has_email_consent"),  # donors gave email on the donation form
         literal(False).label("sms_consent"),
         literal("donor").label("source"),
-    ).group_by(func.lower(Donation.email), Donation.name)
+    ).group_by(Donation.email, Donation.name)
 
     # Branch 5: recurring donors
     q_recurring = select(
-        func.lower(DonationSubscription.email).label("email"),
+        DonationSubscription.email.label("email"),
         DonationSubscription.name.label("name"),
         literal(True).label("has_email_consent"),
         literal(False).label("sms_consent"),
         literal("recurring").label("source"),
     ).where(DonationSubscription.status == "active").group_by(
-        func.lower(DonationSubscription.email), DonationSubscription.name
+        DonationSubscription.email, DonationSubscription.name
     )
 
     union_sub = union_all(q_users, q_subs, q_volunteers, q_donors, q_recurring).subquery("u")
 
-    # De-duplicate by lower(email). When the same address appears in several
+    # De-duplicate by email. When the same address appears in several
     # branches we collapse to one row, keeping the first non-null name.
     dedup = (
         select(
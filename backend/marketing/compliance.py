@@ -11,7 +11,7 @@ import os
 import secrets
 from datetime import datetime, timedelta
 from hashlib import sha256
-from typing import Optional
+from typing import Iterable, Optional
 
 from sqlalchemy.orm import Session
 
@@ -48,6 +48,20 @@ def is_suppressed(db: Session, email: str, scope: str = "all") -> bool:
     return False
 
 
+def suppressed_emails(db: Session, emails: Iterable[str], scope: str = "all") -> set[str]:
+    """Bulk `is_suppressed`: the subset of `emails` (normalized) suppressed for `scope` or 'all'."""
+    normalized = {e.strip().lower() for e in emails if e}
+    if not normalized:
+        return set()
+    scopes = {"all", scope}
+    return {
+        row.email
+        for row in db.query(EmailSuppression.email)
+        .filter(EmailSuppression.email.in_(list(normalized)), EmailSuppression.scope.in_(list(scopes)))
+        .all()
+    }
+
+
 def suppress_email(
     db: Session,
     email: str,
@@ -81,6 +95,47 @@ def suppress_email(
     return row
 
 
+def suppress_emails_bulk(
+    db: Session,
+    entries: Iterable[tuple[str, str, str | None]],
+    *,
+    scope: str = "all",
+) -> int:
+    """Add many suppressions in one round-trip. Does NOT commit.
+
+    `entries` is an iterable of (email, reason, source_message_id). Addresses
+    already suppressed for `scope` — or repeated within `entries` — are
+    skipped, so the call is idempotent like `suppress_email`. Returns the
+    number of rows added; the caller commits as part of its own batch.
+    """
+    pending: dict[str, tuple[str, str | None]] = {}
+    for email, reason, source_message_id in entries:
+        if email:
+            pending.setdefault(email.strip().lower(), (reason, source_message_id))
+    if not pending:
+        return 0
+
+    existing = {
+        row.email
+        for row in db.query(EmailSuppression.email)
+        .filter(EmailSuppression.email.in_(list(pending)), EmailSuppression.scope == scope)
+        .all()
+    }
+    added = 0
+    for normalized, (reason, source_message_id) in pending.items():
+        if normalized in existing:
+            continue
+        db.add(EmailSuppression(
+            email=normalized,
+            scope=scope,
+            reason=reason,
+            source_message_id=source_message_id,
+        ))
+        added += 1
+        logger.info("Suppressed %s scope=%s reason=%s", normalized, scope, reason)
+    return added
+
+
 def unsuppress_email(db: Session, email: str, scope: str = "all") -> bool:
     """Remove a suppression — admin override for false positives."""
     normalized = email.strip().lower()
@@ -0,0 +1,158 @@
+"""Outbox dispatcher: lease-based claiming, crash recovery and backlog metrics.
+
+These are the DB-side halves of the worker's safety net (the Arq job that
+drives them lives in `queue.dispatch_outbox`):
+
+  - `claim_due_outbox` selects due 'pending' rows with
+    `FOR UPDATE SKIP LOCKED` and stamps a short `lease_expires_at` on them,
+    so two workers running the cron never hand out the same row twice.
+  - `claim_for_send` is the atomic pending → sending transition done by
+    `send_email_task`; it also takes a lease that covers the Resend call.
+  - `recover_stuck_sends` returns rows whose sending lease ran out (worker
+    crashed or was killed mid-send) to 'pending', or fails them once they
+    are out of attempts.
+  - `outbox_backlog_metrics` reports depth and age for the admin API / logs.
+
+On SQLite (tests) `FOR UPDATE SKIP LOCKED` is silently omitted.
+"""
+from __future__ import annotations
+
+import os
+from datetime import datetime, timedelta
+from typing import Any
+
+from sqlalchemy import and_, func, or_
+from sqlalchemy.orm import Session
+
+from logging_config import get_logger
+from models import EmailOutbox
+
+logger = get_logger(__name__)
+
+# How long a dispatched-but-not-yet-started row is hidden from other scans.
+DISPATCH_LEASE_SECONDS = int(os.getenv("OUTBOX_DISPATCH_LEASE_SECONDS", "120"))
+# How long a send attempt may run before the row is considered abandoned.
+SEND_LEASE_SECONDS = int(os.getenv("OUTBOX_SEND_LEASE_SECONDS", "300"))
+# Attempts allowed when a row doesn't set its own max_attempts.
+MAX_ATTEMPTS = int(os.getenv("EMAIL_MAX_ATTEMPTS", "3"))
+
+
+def _due_filter(now: datetime):
+    return and_(
+        EmailOutbox.status == "pending",
+        EmailOutbox.queue_after <= now,
+        or_(EmailOutbox.lease_expires_at.is_(None), EmailOutbox.lease_expires_at <= now),
+    )
+
+
+def claim_due_outbox(
+    db: Session,
+    limit: int,
+    *,
+    lease_seconds: int = DISPATCH_LEASE_SECONDS,
+) -> list[tuple[int, int]]:
+    """Lease up to `limit` due rows and return their (id, attempts). Commits."""
+    now = datetime.utcnow()
+    rows = (
+        db.query(EmailOutbox.id, EmailOutbox.attempts)
+        .filter(_due_filter(now))
+        .order_by(EmailOutbox.id.asc())
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+        .all()
+    )
+    if rows:
+        db.query(EmailOutbox).filter(EmailOutbox.id.in_([r.id for r in rows])).update(
+            {EmailOutbox.lease_expires_at: now + timedelta(seconds=lease_seconds)},
+            synchronize_session=False,
+        )
+    db.commit()
+    return [(r.id, r.attempts or 0) for r in rows]
+
+
+def claim_for_send(db: Session, outbox_id: int) -> EmailOutbox | None:
+    """Atomically move a row from 'pending' to 'sending'. Commits.
+
+    Returns the row if this caller won it, or None if it is already sent,
+    suppressed, failed or being sent by another worker.
+    """
+    claimed = (
+        db.query(EmailOutbox)
+        .filter(EmailOutbox.id == outbox_id, EmailOutbox.status == "pending")
+        .update(
+            {
+                EmailOutbox.status: "sending",
+                EmailOutbox.attempts: EmailOutbox.attempts + 1,
+                EmailOutbox.lease_expires_at: datetime.utcnow() + timedelta(seconds=SEND_LEASE_SECONDS),
+            },
+            synchronize_session=False,
+        )
+    )
+    db.commit()
+    if not claimed:
+        return None
+    return db.query(EmailOutbox).filter(EmailOutbox.id == outbox_id).first()
+
+
+def recover_stuck_sends(db: Session) -> int:
+    """Return abandoned 'sending' rows to the queue. Commits; returns the count.
+
+    A worker that dies between the Resend call and its commit leaves the row
+    in 'sending' forever. Once the lease has expired we retry it — accepting
+    a small chance of a duplicate delivery over silently dropping the email.
+    Rows from before leases existed fall back to `updated_at`.
+    """
+    now = datetime.utcnow()
+    stale = or_(
+        EmailOutbox.lease_expires_at <= now,
+        and_(
+            EmailOutbox.lease_expires_at.is_(None),
+            EmailOutbox.updated_at <= now - timedelta(seconds=SEND_LEASE_SECONDS),
+        ),
+    )
+    rows = (
+        db.query(EmailOutbox)
+        .filter(EmailOutbox.status == "sending", stale)
+        .with_for_update(skip_locked=True)
+        .all()
+    )
+    for row in rows:
+        row.lease_expires_at = None
+        if (row.attempts or 0) >= (row.max_attempts or MAX_ATTEMPTS):
+            row.status = "failed"
+            row.error = "Worker stopped mid-send and no attempts remain"
+        else:
+            row.status = "pending"
+            row.queue_after = now
+    db.commit()
+    if rows:
+        logger.warning("Recovered %s outbox rows stuck in 'sending'", len(rows))
+    return len(rows)
+
+
+def outbox_backlog_metrics(db: Session) -> dict[str, Any]:
+    """Depth + age of the outbox backlog. Cheap: served by the status indexes."""
+    now = datetime.utcnow()
+    counts = dict(
+        db.query(EmailOutbox.status, func.count(EmailOutbox.id))
+        .filter(EmailOutbox.status.in_(("pending", "sending")))
+        .group_by(EmailOutbox.status)
+        .all()
+    )
+    due, oldest_due = (
+        db.query(func.count(EmailOutbox.id), func.min(EmailOutbox.queue_after))
+        .filter(EmailOutbox.status == "pending", EmailOutbox.queue_after <= now)
+        .one()
+    )
+    stuck = (
+        db.query(func.count(EmailOutbox.id))
+        .filter(EmailOutbox.status == "sending", EmailOutbox.lease_expires_at <= now)
+        .scalar()
+    )
+    return {
+        "pending": counts.get("pending", 0),
+        "sending": counts.get("sending", 0),
+        "due": due or 0,
+        "oldest_due_age_seconds": int((now - oldest_due).total_seconds()) if oldest_due else 0,
+        "stuck_sending": stuck or 0,
+    }
@@ -17,14 +17,15 @@ from __future__ import annotations
 import os
 import secrets
 from datetime import datetime
-from typing import Any
+from typing import Any, Iterable
 
 from sqlalchemy.orm import Session
 
 from logging_config import get_logger
 from models import EmailOutbox
 
-from .compliance import generate_unsubscribe_token, is_suppressed
+from .attachments import to_attachment_refs
+from .compliance import generate_unsubscribe_token, is_suppressed, suppressed_emails
 from .renderer import render
 
 logger = get_logger(__name__)
@@ -74,6 +75,10 @@ class ComplianceMailer:
         Either `template_slug` (Jinja render) OR `body_html` + `body_text` must
         be provided. Marketing emails must use a template — transactional can
         pass raw bodies (we don't use that path in P1, but it's available).
+
+        `attachments` may be inline (`encode_attachment`) or references from
+        `marketing.attachments.store_attachment`; inline bodies are moved to
+        the blob store so the outbox row only carries a reference.
         """
         if not to_email:
             raise ValueError("to_email is required")
@@ -92,7 +97,8 @@ class ComplianceMailer:
                 subject=subject,
                 body_html=body_html or "",
                 body_text=body_text or "",
-                attachments=attachments or [],
+                # Never sent, so keep the file names but not the bodies.
+                attachments=[{k: v for k, v in a.items() if k != "content_b64"} for a in attachments or []],
                 context=context or {},
                 idempotency_key=idempotency_key,
                 status="suppressed",
@@ -135,7 +141,7 @@ class ComplianceMailer:
             subject=subject,
             body_html=html,
             body_text=text,
-            attachments=attachments or [],
+            attachments=to_attachment_refs(self.db, attachments),
             context=ctx,
             idempotency_key=idempotency_key or secrets.token_urlsafe(24),
             status="pending",
@@ -153,11 +159,69 @@ class ComplianceMailer:
             enqueue_send_job(row.id)
         except Exception as exc:
             # Don't crash the request — the row stays in 'pending' state and
-            # will be picked up by the cron scan_outbox job on the worker.
+            # will be picked up by the dispatch_outbox cron on the worker.
             logger.warning("Could not enqueue outbox %s immediately (will be retried): %s", row.id, exc)
 
         return row
 
+    def queue_many(
+        self,
+        messages: Iterable[dict[str, Any]],
+        *,
+        template_slug: str,
+        category: str = "transactional",
+    ) -> list[EmailOutbox]:
+        """Render + persist many emails at once. Flushes, does NOT commit.
+
+        Each message is a dict of `queue()` keywords: to_email, subject,
+        context and optionally to_name, attachments, idempotency_key.
+        Suppression is checked with one query for the whole batch, and the
+        caller commits the rows together with its own bookkeeping. No Arq
+        job is enqueued per row: the dispatch_outbox cron claims due
+        'pending' rows in adaptive batches, which suits thousands of rows
+        better than thousands of Redis jobs. Returns the rows in input
+        order, suppressed ones included.
+        """
+        if category == "marketing":
+            raise ValueError("queue_many is for transactional mail (marketing needs per-recipient unsubscribe tokens)")
+        messages = list(messages)
+        suppressed = suppressed_emails(self.db, (m["to_email"] for m in messages), scope=category)
+
+        rows: list[EmailOutbox] = []
+        for m in messages:
+            to_email = m["to_email"].strip().lower()
+            ctx = dict(m.get("context") or {})
+            ctx.setdefault("subject", m["subject"])
+            row = EmailOutbox(
+                category=category,
+                template_slug=template_slug,
+                to_email=to_email,
+                to_name=m.get("to_name"),
+                from_email=self.from_email,
+                from_name=self.from_name,
+                reply_to=self.reply_to,
+                subject=m["subject"],
+                context=ctx,
+                idempotency_key=m.get("idempotency_key") or secrets.token_urlsafe(24),
+            )
+            if to_email in suppressed:
+                row.status = "suppressed"
+                row.error = "Recipient on suppression list at queue time"
+                row.body_html = row.body_text = ""
+                row.attachments = [{k: v for k, v in a.items() if k != "content_b64"} for a in m.get("attachments") or []]
+            else:
+                row.status = "pending"
+                row.body_html, row.body_text = render(template_slug, ctx)
+                row.attachments = to_attachment_refs(self.db, m.get("attachments"))
+            rows.append(row)
+
+        self.db.add_all(rows)
+        self.db.flush()
+        if suppressed:
+            logger.info("queue_many: skipped %s suppressed recipient(s)", sum(r.status == "suppressed" for r in rows))
+        return rows
+
+
 
 def enqueue_email(
     db: Session,
@@ -1,33 +1,64 @@
-"""Arq worker: send_email_task + outbox scanner cron.
+"""Arq worker: send_email_task + outbox scanner cron + Resend webhook applier.
 
 Runs in a separate `worker` container in docker-compose. The FastAPI app
 enqueues jobs from request handlers; the worker pulls them from Redis,
 calls Resend, updates the outbox row.
 
-Also runs a 60-second cron that scans for any 'pending' rows the immediate
-enqueue might have missed (e.g. Redis was briefly down when the API tried
-to enqueue). This is the durability guarantee.
+Also runs the outbox dispatcher cron, which claims any due 'pending' rows
+the immediate enqueue might have missed (e.g. Redis was briefly down when
+the API tried to enqueue, or the row is coming out of retry backoff) and
+returns rows stranded in 'sending' by a crashed worker. This is the
+durability guarantee; see `marketing.dispatcher` for the claim/lease logic.
+
+Resend webhook deliveries are persisted by the API and applied here in
+batches (`process_resend_events_task`), with the same cron-backed safety net.
+Stripe webhook events are handled the same way (`process_stripe_events_task`,
+see stripe_events.py). A nightly cron reconciles the donation stats aggregates,
+and an hourly one reconciles donations and subscriptions against Stripe's
+list APIs (`reconcile_stripe_task`, see stripe_reconcile.py); the admin's
+"update subscription status" button queues just the subscription pass
+under the same lock (`refresh_subscriptions_task`). Bulk annual
+receipt runs are advanced in time-boxed slices by
+`generate_year_end_receipts_task` (see year_end_receipts.py).
 """
 from __future__ import annotations
 
+import asyncio
 import os
+import time
 from datetime import datetime, timedelta
-from typing import Any
+from typing import Any, Callable
+from uuid import uuid4
 
-from arq import cron
+from arq import cron, func
 from arq.connections import RedisSettings
 
 from database import SessionLocal
 from logging_config import get_logger
-from models import EmailOutbox
-from sqlalchemy import or_
 
+from .attachments import materialize_attachments, resolve_attachments
+from .dispatcher import (
+    MAX_ATTEMPTS,
+    claim_due_outbox,
+    claim_for_send,
+    outbox_backlog_metrics,
+    recover_stuck_sends,
+)
 from .resend_client import ResendDeliveryError, send_email as resend_send
 
 logger = get_logger(__name__)
 
 REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379/0")
-MAX_ATTEMPTS = int(os.getenv("EMAIL_MAX_ATTEMPTS", "3"))
+
+# Dispatcher tuning. Batches start small and double while the backlog keeps
+# filling them; one run stops claiming after the time budget so it finishes
+# well inside the 15s cron interval.
+DISPATCH_MIN_BATCH = int(os.getenv("OUTBOX_DISPATCH_MIN_BATCH", "50"))
+DISPATCH_MAX_BATCH = int(os.getenv("OUTBOX_DISPATCH_MAX_BATCH", "1000"))
+DISPATCH_TIME_BUDGET_SECONDS = float(os.getenv("OUTBOX_DISPATCH_TIME_BUDGET", "12"))
+# When a run finds nothing due, skip up to this many following ticks
+# (1, 2, 4, ... capped) — 4 ticks at 15s = one idle scan per minute.
+DISPATCH_MAX_IDLE_SKIP = int(os.getenv("OUTBOX_DISPATCH_MAX_IDLE_SKIP", "3"))
 
 
 # ─────────────────────────────────────────────────────────────────────
@@ -37,24 +68,26 @@ MAX_ATTEMPTS = int(os.getenv("EMAIL_MAX_ATTEMPTS", "3"))
 async def send_email_task(ctx: dict[str, Any], outbox_id: int) -> None:
     """Pull outbox row, attempt delivery, update status.
 
-    Idempotent: if the row is already in 'sent' state we exit immediately.
-    On failure we increment attempts and (if under max) re-enqueue with
-    exponential backoff.
+    Idempotent: the row is claimed with an atomic pending → sending update,
+    so a duplicate job (or a row another worker is already sending) exits
+    immediately. On failure we increment attempts and (if under max) put the
+    row back to 'pending' with exponential backoff.
     """
     db = SessionLocal()
     try:
-        row = db.query(EmailOutbox).filter(EmailOutbox.id == outbox_id).first()
+        row = claim_for_send(db, outbox_id)
         if not row:
-            logger.warning("send_email_task: outbox row %s not found", outbox_id)
+            logger.debug("send_email_task: outbox row %s not pending — skipping", outbox_id)
             return
-        if row.status in ("sent", "suppressed"):
-            return  # Already handled — idempotent no-op.
-
-        row.status = "sending"
-        row.attempts = (row.attempts or 0) + 1
-        db.commit()
 
         try:
+            # Render deferred attachments (receipt PDFs) once; the stored
+            # references are reused if this send has to be retried.
+            refs = materialize_attachments(db, row.attachments)
+            if refs is not None:
+                row.attachments = refs
+                db.commit()
+            attachments = resolve_attachments(db, row.attachments)
             message_id = resend_send(
                 to_email=row.to_email,
                 to_name=row.to_name,
@@ -64,7 +97,7 @@ async def send_email_task(ctx: dict[str, Any], outbox_id: int) -> None:
                 body_html=row.body_html,
                 body_text=row.body_text or "",
                 reply_to=row.reply_to,
-                attachments=row.attachments or None,
+                attachments=attachments or None,
                 idempotency_key=row.idempotency_key,
                 tags=[
                     {"name": "category", "value": row.category},
@@ -75,18 +108,20 @@ async def send_email_task(ctx: dict[str, Any], outbox_id: int) -> None:
             row.status = "sent"
             row.sent_at = datetime.utcnow()
             row.error = None
+            row.lease_expires_at = None
             db.commit()
             logger.info("Sent outbox %s to %s (resend id=%s)", row.id, row.to_email, message_id)
 
         except ResendDeliveryError as exc:
             row.error = str(exc)[:2000]
+            row.lease_expires_at = None
             if row.attempts >= (row.max_attempts or MAX_ATTEMPTS):
                 row.status = "failed"
                 db.commit()
                 logger.error("Outbox %s permanently failed after %s attempts: %s", row.id, row.attempts, exc)
             else:
-                # Re-queue with exponential backoff. Arq will pick it up via
-                # the scan_outbox cron at queue_after.
+                # Re-queue with exponential backoff. The dispatch_outbox cron
+                # claims it again once queue_after has passed.
                 backoff_seconds = 2 ** row.attempts * 30
                 row.status = "pending"
                 row.queue_after = datetime.utcnow() + timedelta(seconds=backoff_seconds)
@@ -99,38 +134,238 @@ async def send_email_task(ctx: dict[str, Any], outbox_id: int) -> None:
         db.close()
 
 
+async def process_resend_events_task(ctx: dict[str, Any]) -> None:
+    """Apply every pending Resend webhook row (see marketing.webhooks).
+
+    Runs may overlap (cron plus webhook-triggered jobs); each batch is
+    claimed with SKIP LOCKED, so they split the rows rather than repeat them.
+    """
+    from .webhooks import apply_pending_resend_events
+
+    def _run() -> int:
+        db = SessionLocal()
+        try:
+            return apply_pending_resend_events(db)
+        finally:
+            db.close()
+
+    handled = await asyncio.to_thread(_run)
+    if handled:
+        logger.info("process_resend_events: applied %s webhook events", handled)
+
+
+STRIPE_EVENTS_LOCK_KEY = "lock:process-stripe-events"
+STRIPE_EVENTS_LOCK_SECONDS = 300
+# Stop claiming well inside both the lock TTL and the 60s job timeout.
+STRIPE_EVENTS_TIME_BUDGET_SECONDS = float(os.getenv("STRIPE_EVENTS_TIME_BUDGET", "40"))
+
+# Delete the lock only if it still holds our token: after a TTL expiry it
+# may belong to the next consumer.
+_RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+async def process_stripe_events_task(ctx: dict[str, Any]) -> None:
+    """Apply pending Stripe webhook events in order (see stripe_events.py).
+
+    Single-flight: per-object ordering needs exactly one consumer, so a run
+    that finds the Redis lock taken exits. The holder works for at most
+    STRIPE_EVENTS_TIME_BUDGET_SECONDS, in a thread so the event loop that
+    sends email stays free; the cron continues a longer backlog.
+    """
+    from stripe_events import process_pending_stripe_events, stripe_event_metrics
+
+    redis = ctx["redis"]
+    token = uuid4().hex
+    if not await redis.set(STRIPE_EVENTS_LOCK_KEY, token, nx=True, ex=STRIPE_EVENTS_LOCK_SECONDS):
+        return
+
+    def _run() -> tuple[int, dict[str, Any] | None]:
+        db = SessionLocal()
+        try:
+            attempted = process_pending_stripe_events(db, time_budget=STRIPE_EVENTS_TIME_BUDGET_SECONDS)
+            return attempted, stripe_event_metrics(db) if attempted else None
+        finally:
+            db.close()
+
+    release = True
+    try:
+        attempted, metrics = await asyncio.to_thread(_run)
+    except asyncio.CancelledError:
+        # Job timeout: the thread runs on until its time budget, so leave
+        # the lock to expire rather than let a second consumer start now.
+        release = False
+        raise
+    finally:
+        if release:
+            await redis.eval(_RELEASE_LOCK_SCRIPT, 1, STRIPE_EVENTS_LOCK_KEY, token)
+    if attempted:
+        logger.info("process_stripe_events: attempted %s events; queue=%s", attempted, metrics)
+
+
+async def reconcile_donation_aggregates_task(ctx: dict[str, Any]) -> None:
+    """Nightly: rebuild donation_aggregates from the donations table (see donation_stats.py)."""
+    from donation_stats import rebuild_donation_aggregates
+
+    db = SessionLocal()
+    try:
+        rebuild_donation_aggregates(db)
+    finally:
+        db.close()
+
+
+STRIPE_RECONCILE_LOCK_KEY = "lock:reconcile-stripe"
+STRIPE_RECONCILE_TIMEOUT_SECONDS = 15 * 60
+
+
+async def _run_stripe_pass(ctx: dict[str, Any], name: str, work: Callable[[Any], dict[str, int]]) -> None:
+    """Run a blocking Stripe pass in a thread, under the reconcile lock.
+
+    Stripe passes share one lock, so an admin's on-demand refresh never
+    overlaps the hourly reconciliation (or another click).
+    """
+    import stripe
+
+    stripe.api_key = stripe.api_key or os.getenv("STRIPE_SECRET_KEY")
+    if not stripe.api_key:
+        return
+    redis = ctx["redis"]
+    if not await redis.set(STRIPE_RECONCILE_LOCK_KEY, "1", nx=True, ex=STRIPE_RECONCILE_TIMEOUT_SECONDS):
+        logger.info("%s: another Stripe pass is running; skipped", name)
+        return
+
+    def _run() -> dict[str, int]:
+        db = SessionLocal()
+        try:
+            return work(db)
+        finally:
+            db.close()
+
+    try:
+        summary = await asyncio.to_thread(_run)
+        logger.info("%s: %s", name, summary)
+    finally:
+        await redis.delete(STRIPE_RECONCILE_LOCK_KEY)
+
+
+async def reconcile_stripe_task(ctx: dict[str, Any]) -> None:
+    """Hourly: insert paid Stripe sessions missing locally and refresh subscription statuses.
+
+    The work is blocking (Stripe SDK + sync Session) and can take minutes on
+    a large account, so it runs in a thread and never stalls the event loop
+    that sends email.
+    """
+    from stripe_reconcile import run_stripe_reconciliation
+
+    await _run_stripe_pass(ctx, "reconcile_stripe", run_stripe_reconciliation)
+
+
+async def refresh_subscriptions_task(ctx: dict[str, Any]) -> None:
+    """On demand (admin button): refresh every subscription's status from Stripe."""
+    from stripe_reconcile import refresh_subscription_statuses
+
+    await _run_stripe_pass(ctx, "refresh_subscriptions", refresh_subscription_statuses)
+
+
+YEAR_END_LOCK_KEY = "lock:year-end-receipts"
+YEAR_END_TIME_BUDGET_SECONDS = int(os.getenv("YEAR_END_TIME_BUDGET_SECONDS", "240"))
+# A chunk that starts just before the budget runs out still has to finish.
+YEAR_END_JOB_TIMEOUT_SECONDS = YEAR_END_TIME_BUDGET_SECONDS + 300
+
+
+async def generate_year_end_receipts_task(ctx: dict[str, Any]) -> None:
+    """Advance active year-end receipt runs for one time-boxed slice.
+
+    Enqueued when an admin starts a run, and resumed by the per-minute cron
+    until the run completes, so a run of any size survives worker restarts
+    and never holds a job slot for long. Rendering happens on a process
+    pool from a thread, keeping the event loop free.
+    """
+    from year_end_receipts import process_year_end_runs
+
+    redis = ctx["redis"]
+    if not await redis.set(YEAR_END_LOCK_KEY, "1", nx=True, ex=YEAR_END_JOB_TIMEOUT_SECONDS):
+        return
+
+    def _run() -> int:
+        db = SessionLocal()
+        try:
+            return process_year_end_runs(db, time_budget=YEAR_END_TIME_BUDGET_SECONDS)
+        finally:
+            db.close()
+
+    try:
+        created = await asyncio.to_thread(_run)
+        if created:
+            logger.info("generate_year_end_receipts: %s receipts this slice", created)
+    finally:
+        await redis.delete(YEAR_END_LOCK_KEY)
+
+
 # ─────────────────────────────────────────────────────────────────────
-# Cron: outbox scanner (safety net)
+# Cron: outbox dispatcher (safety net)
 # ─────────────────────────────────────────────────────────────────────
 
-async def scan_outbox(ctx: dict[str, Any]) -> None:
-    """Every 60s, pick up any 'pending' rows whose queue_after has passed.
+async def dispatch_outbox(ctx: dict[str, Any]) -> None:
+    """Claim due 'pending' rows and enqueue a send job for each.
 
     This is the safety net that catches:
       - rows where the API couldn't reach Redis at enqueue time
       - rows in retry backoff
       - rows enqueued before the worker started
+      - rows left in 'sending' by a worker that died mid-send
+
+    Rows are claimed with FOR UPDATE SKIP LOCKED plus a lease, so several
+    workers can run this cron without enqueueing the same row twice. While
+    batches come back full the batch size doubles and the run keeps
+    draining until the backlog is empty or the time budget is spent; when
+    nothing is due, later ticks are skipped with exponential backoff.
     """
+    state = ctx.setdefault("outbox_dispatch", {"batch": DISPATCH_MIN_BATCH, "idle_runs": 0, "skip": 0})
+    if state["skip"] > 0:
+        state["skip"] -= 1
+        return
+
     db = SessionLocal()
     try:
-        now = datetime.utcnow()
-        rows = (
-            db.query(EmailOutbox)
-            .filter(EmailOutbox.status == "pending", EmailOutbox.queue_after <= now)
-            .order_by(EmailOutbox.id.asc())
-            .limit(50)
-            .all()
-        )
-        if not rows:
-            return
+        recovered = recover_stuck_sends(db)
+
         arq_pool = ctx["redis"]
-        for row in rows:
-            await arq_pool.enqueue_job(
-                "send_email_task",
-                row.id,
-                _job_id=f"send-email-{row.id}-{row.attempts}",
+        deadline = time.monotonic() + DISPATCH_TIME_BUDGET_SECONDS
+        batch = state["batch"]
+        enqueued = batches = 0
+        while True:
+            claimed = claim_due_outbox(db, batch)
+            for outbox_id, attempts in claimed:
+                await arq_pool.enqueue_job(
+                    "send_email_task",
+                    outbox_id,
+                    _job_id=f"send-email-{outbox_id}-{attempts}",
+                )
+            enqueued += len(claimed)
+            batches += 1
+            if len(claimed) < batch or time.monotonic() >= deadline:
+                break
+            batch = min(batch * 2, DISPATCH_MAX_BATCH)
+
+        # Keep a large batch for the next run only if this one was still
+        # saturated; otherwise fall back to the minimum.
+        state["batch"] = batch if len(claimed) == batch else DISPATCH_MIN_BATCH
+
+        if enqueued or recovered:
+            state["idle_runs"] = 0
+            metrics = outbox_backlog_metrics(db)
+            logger.info(
+                "dispatch_outbox: enqueued %s rows in %s batches, recovered %s; backlog=%s",
+                enqueued, batches, recovered, metrics,
             )
-        logger.info("scan_outbox: enqueued %s rows", len(rows))
+        else:
+            state["idle_runs"] += 1
+            state["skip"] = min(2 ** (state["idle_runs"] - 1) - 1, DISPATCH_MAX_IDLE_SKIP)
     finally:
         db.close()
 
@@ -155,9 +390,25 @@ def _redis_settings() -> RedisSettings:
 class WorkerSettings:
     """Arq worker entrypoint — register via `arq backend.marketing.queue.WorkerSettings`."""
 
-    functions = [send_email_task]
+    functions = [
+        send_email_task,
+        process_resend_events_task,
+        process_stripe_events_task,
+        func(generate_year_end_receipts_task, timeout=YEAR_END_JOB_TIMEOUT_SECONDS),
+        func(refresh_subscriptions_task, timeout=STRIPE_RECONCILE_TIMEOUT_SECONDS),
+    ]
     cron_jobs = [
-        cron(scan_outbox, second={0, 15, 30, 45}),  # every 15s
+        cron(dispatch_outbox, second={0, 15, 30, 45}),  # every 15s, idle backoff inside
+        # Safety net for webhook rows whose immediate enqueue was missed.
+        cron(process_resend_events_task, second={5, 35}),
+        # Safety net + retry driver for Stripe events (backoff, stale claims).
+        cron(process_stripe_events_task, second={10, 25, 40, 55}),
+        # Reconcile incrementally-maintained donation stats against the source rows.
+        cron(reconcile_donation_aggregates_task, hour={3}, minute={15}, second={0}),
+        # Catch Stripe payments whose webhooks never arrived.
+        cron(reconcile_stripe_task, minute={40}, second={0}, timeout=STRIPE_RECONCILE_TIMEOUT_SECONDS),
+        # Resume year-end receipt runs (a no-op query when none is active).
+        cron(generate_year_end_receipts_task, second={50}, timeout=YEAR_END_JOB_TIMEOUT_SECONDS),
     ]
     redis_settings = _redis_settings()
     max_jobs = 10
@@ -166,15 +417,15 @@ class WorkerSettings:
 
 
 # ─────────────────────────────────────────────────────────────────────
-# Enqueue from the API side (called by ComplianceMailer.queue)
+# Enqueue from the API side (ComplianceMailer.queue, Resend webhook)
 # ─────────────────────────────────────────────────────────────────────
 
-def enqueue_send_job(outbox_id: int) -> None:
+def _enqueue_job(function: str, *args: Any, _job_id: str) -> None:
     """Synchronous helper used from request handlers.
 
     Connects briefly to Redis, enqueues the job, then disconnects. If Redis
-    is unavailable the call raises and the caller logs it — the scan_outbox
-    cron will pick up the row next time.
+    is unavailable the call raises and the caller logs it — the worker's
+    cron safety net will pick the work up next time.
     """
     import asyncio
 
@@ -183,7 +434,7 @@ def enqueue_send_job(outbox_id: int) -> None:
     async def _do() -> None:
         pool = await create_pool(_redis_settings())
         try:
-            await pool.enqueue_job("send_email_task", outbox_id, _job_id=f"send-email-{outbox_id}-0")
+            await pool.enqueue_job(function, *args, _job_id=_job_id)
         finally:
             await pool.close()
 
@@ -194,3 +445,32 @@ def enqueue_send_job(outbox_id: int) -> None:
     except RuntimeError:
         # No running loop — sync context; create one ad-hoc.
         asyncio.run(_do())
+
+
+def enqueue_send_job(outbox_id: int) -> None:
+    """Enqueue delivery of one outbox row (see `_enqueue_job`)."""
+    _enqueue_job("send_email_task", outbox_id, _job_id=f"send-email-{outbox_id}-0")
+
+
+def enqueue_resend_events_job() -> None:
+    """Ask the worker to apply pending Resend webhook rows.
+
+    The job id is bucketed per second so a burst of webhook deliveries
+    coalesces into one batch run instead of one job per event.
+    """
+    _enqueue_job("process_resend_events_task", _job_id=f"resend-events-{int(time.time())}")
+
+
+def enqueue_stripe_events_job() -> None:
+    """Ask the worker to apply pending Stripe webhook events (per-second job id, like Resend)."""
+    _enqueue_job("process_stripe_events_task", _job_id=f"stripe-events-{int(time.time())}")
+
+
+def enqueue_year_end_receipts_job() -> None:
+    """Start working on a just-started year-end run now instead of at the next cron tick."""
+    _enqueue_job("generate_year_end_receipts_task", _job_id=f"year-end-receipts-{int(time.time())}")
+
+
+def enqueue_subscription_refresh_job() -> None:
+    """Refresh subscription statuses from Stripe now (per-minute job id, so repeat clicks collapse)."""
+    _enqueue_job("refresh_subscriptions_task", _job_id=f"refresh-subscriptions-{int(time.time()) // 60}")
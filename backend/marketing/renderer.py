@@ -13,12 +13,14 @@ from pathlib import Path
 from typing import Any
 
 from jinja2 import Environment, FileSystemLoader, StrictUndefined, select_autoescape
-from premailer import transform as premailer_transform
-
+from lazy_imports import lazy_module
 from logging_config import get_logger
 
 logger = get_logger(__name__)
 
+# lxml + cssutils: only needed once something is actually rendered.
+premailer = lazy_module("premailer")
+
 TEMPLATES_DIR = Path(__file__).resolve().parent.parent / "email_templates"
 
 _env_html = Environment(
@@ -70,7 +72,7 @@ def render(template_slug: str, context: dict[str, Any] | None = None) -> tuple[s
 
     html_tpl = _env_html.get_template(f"{template_slug}.html")
     raw_html = html_tpl.render(**ctx)
-    inlined_html = premailer_transform(
+    inlined_html = premailer.transform(
         raw_html,
         # base_url makes premailer resolve relative <img src>, <a href>, and
         # background: url(...) references to absolute URLs. WITHOUT it, an
@@ -10,8 +10,7 @@ import base64
 import os
 from typing import Any
 
-import resend
-
+from lazy_imports import lazy_module
 from logging_config import get_logger
 
 logger = get_logger(__name__)
@@ -20,8 +19,15 @@ RESEND_API_KEY = os.getenv("RESEND_API_KEY", "")
 DEFAULT_FROM_EMAIL = os.getenv("RESEND_FROM_EMAIL", "MyZakat <noreply@myzakat.org>")
 DEFAULT_REPLY_TO = os.getenv("RESEND_REPLY_TO", "info@myzakat.org")
 
-if RESEND_API_KEY:
-    resend.api_key = RESEND_API_KEY
+
+
+def _configure_resend(module) -> None:
+    if RESEND_API_KEY:
+        module.api_key = RESEND_API_KEY
+
+
+# The SDK is only needed by the worker that actually sends.
+resend = lazy_module("resend", on_load=_configure_resend)
 
 
 class ResendDeliveryError(Exception):
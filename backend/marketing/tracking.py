@@ -54,7 +54,8 @@ def make_token(kind: str, send_id: int) -> str:
     campaign_sends.open_token / .click_token. Single-use is not enforced
     (an open pixel can fire multiple times legitimately).
     """
-    random_part = secrets.token_urlsafe(12)
+    # Hex, so the random part can't contain the "_" separator.
+    random_part = secrets.token_hex(9)
     payload = f"{kind}|{send_id}|{random_part}"
     sig = _sign(payload)
     return f"{kind}_{send_id}_{random_part}_{sig}"
@@ -63,10 +64,10 @@ def make_token(kind: str, send_id: int) -> str:
 def parse_token(token: str) -> tuple[str, int] | None:
     """Verify the HMAC and return (kind, send_id) or None if invalid."""
     try:
-        parts = token.split("_")
-        if len(parts) != 4:
-            return None
-        kind, send_id_str, random_part, sig = parts
+        # Tokens issued before the random part was hex may contain "_" in
+        # it; kind, send id and signature never do, so split around it.
+        kind, send_id_str, rest = token.split("_", 2)
+        random_part, sig = rest.rsplit("_", 1)
         send_id = int(send_id_str)
         payload = f"{kind}|{send_id}|{random_part}"
         if not hmac.compare_digest(_sign(payload), sig):
@@ -97,7 +98,7 @@ def click_url(send_id: int, token: str, target_url: str) -> str:
 _HREF_RE = re.compile(r"""(<a\b[^>]*\bhref\s*=\s*)(["'])([^"']+)(["'])""", re.IGNORECASE)
 
 
-def _append_utms(url: str, *, campaign_id: int, send_id: int) -> str:
+def _append_utms(url: str, *, campaign_id: int, send_id: int | str) -> str:
     """Append UTM params for analytics + post-donation attribution.
 
     Idempotent — if the URL already has a utm_source we don't override.
@@ -131,34 +132,107 @@ def rewrite_html_for_tracking(
 
     `skip_url_prefixes` lets us avoid rewriting links we already control
     (e.g. unsubscribe URLs that need to stay one-click compliant).
+
+    One-off convenience wrapper — campaign fan-out should hold a single
+    `CampaignLinkRewriter` for the whole send so URL work is done once.
+    """
+    rewriter = CampaignLinkRewriter(campaign_id, skip_url_prefixes=skip_url_prefixes)
+    return rewriter.rewrite(body_html, send_id=send_id, click_token=click_token, open_token=open_token)
+
+
+# Placeholder stamped into utm_content while precomputing a link. It only
+# contains characters that both urlencode passes leave untouched, so the
+# per-send id can be spliced in with a plain str.join.
+_SEND_ID_SLOT = "__MZSENDID__"
+_BODY_CLOSE_RE = re.compile(r"</body>", re.IGNORECASE)
+_PIXEL_SLOT = object()
+
+
+class CampaignLinkRewriter:
+    """Per-campaign tracking rewriter — does the URL work once, not per recipient.
+
+    The body HTML is split into static segments and link slots the first time
+    it is seen (identical bodies — the common case for non-personalised
+    links — are only scanned once). Each distinct href is UTM-augmented and
+    urlencoded once per campaign; at fan-out time only the click token, the
+    `utm_content` send id and the open pixel are stamped in.
+
+    Output is byte-for-byte identical to the previous per-recipient rewrite.
     """
-    skip = tuple(skip_url_prefixes) + ("mailto:", "tel:", "#")
-
-    def _replace(match: re.Match) -> str:
-        prefix, q1, url, q2 = match.group(1), match.group(2), match.group(3), match.group(4)
-        # Skip URLs we don't want to touch.
-        if url.startswith(skip):
-            return match.group(0)
-        # Add UTMs to the underlying URL, then wrap in click redirect.
-        utm_url = _append_utms(url, campaign_id=campaign_id, send_id=send_id)
-        wrapped = click_url(send_id, click_token, utm_url)
-        return f"{prefix}{q1}{wrapped}{q2}"
-
-    rewritten = _HREF_RE.sub(_replace, body_html)
-
-    # Inject the open pixel just before </body> (or at end if no </body>).
-    pixel = (
-        f'<img src="{open_pixel_url(send_id, open_token)}" '
-        f'width="1" height="1" border="0" alt="" '
-        f'style="display:block;width:1px;height:1px;border:0;" />'
-    )
-    if "</body>" in rewritten.lower():
-        # Insert before the closing body tag, case-insensitively.
-        rewritten = re.sub(r"</body>", pixel + "</body>", rewritten, count=1, flags=re.IGNORECASE)
-    else:
-        rewritten = rewritten + pixel
-
-    return rewritten
+
+    MAX_COMPILED_BODIES = 64
+
+    def __init__(self, campaign_id: int, *, skip_url_prefixes: Iterable[str] = ()):
+        self.campaign_id = campaign_id
+        self._skip = tuple(skip_url_prefixes) + ("mailto:", "tel:", "#")
+        self._click_base = f"{TRACKING_BASE_URL.rstrip('/')}/api/tracking/click/"
+        self._open_base = f"{TRACKING_BASE_URL.rstrip('/')}/api/tracking/open/"
+        # raw href → encoded `u=` value split around the send-id slot
+        # (None when the href must be left untouched).
+        self._links: dict[str, tuple[str, ...] | None] = {}
+        # body html → list of static strings / link pieces / pixel marker.
+        self._compiled: dict[str, list] = {}
+
+    def _link_pieces(self, url: str) -> tuple[str, ...] | None:
+        if url in self._links:
+            return self._links[url]
+        pieces: tuple[str, ...] | None = None
+        if not url.startswith(self._skip):
+            utm_url = _append_utms(url, campaign_id=self.campaign_id, send_id=_SEND_ID_SLOT)
+            encoded = urlencode({"u": utm_url})
+            pieces = tuple(encoded.split(_SEND_ID_SLOT))
+        self._links[url] = pieces
+        return pieces
+
+    def _compile(self, body_html: str) -> list:
+        parts: list = []
+        pos = 0
+        for match in _HREF_RE.finditer(body_html):
+            pieces = self._link_pieces(match.group(3))
+            if pieces is None:
+                continue  # left verbatim — folded into the next static segment
+            prefix = match.group(1) + match.group(2)
+            parts.append(body_html[pos:match.start()] + prefix)
+            parts.append(pieces)
+            pos = match.end() - len(match.group(4))
+        parts.append(body_html[pos:])
+
+        # Open pixel goes before the first </body> of the static text, or at
+        # the very end if the body has no closing tag.
+        for i, part in enumerate(parts):
+            if isinstance(part, str):
+                m = _BODY_CLOSE_RE.search(part)
+                if m:
+                    parts[i:i + 1] = [part[:m.start()], _PIXEL_SLOT, "</body>" + part[m.end():]]
+                    break
+        else:
+            parts.append(_PIXEL_SLOT)
+        return parts
+
+    def rewrite(self, body_html: str, *, send_id: int, click_token: str, open_token: str) -> str:
+        parts = self._compiled.get(body_html)
+        if parts is None:
+            if len(self._compiled) >= self.MAX_COMPILED_BODIES:
+                self._compiled.pop(next(iter(self._compiled)))
+            parts = self._compile(body_html)
+            self._compiled[body_html] = parts
+
+        sid = str(send_id)
+        click_prefix = f"{self._click_base}{click_token}?"
+        pixel = (
+            f'<img src="{self._open_base}{open_token}.gif" '
+            f'width="1" height="1" border="0" alt="" '
+            f'style="display:block;width:1px;height:1px;border:0;" />'
+        )
+        out = []
+        for part in parts:
+            if isinstance(part, str):
+                out.append(part)
+            elif part is _PIXEL_SLOT:
+                out.append(pixel)
+            else:
+                out.append(click_prefix + sid.join(part))
+        return "".join(out)
 
 
 # ─────────────────────────────────────────────────────────────────────
@@ -0,0 +1,243 @@
+"""Resend webhook ingestion: dedupe on receipt, apply in batches on the worker.
+
+The public endpoint (routers/marketing.py) only verifies the Svix signature
+and calls `record_resend_event`, which inserts one `resend_webhook_events`
+row keyed on the `svix-id` header. Resend retries the same delivery with
+the same id, so a retry hits the unique constraint and is acknowledged
+without being counted twice.
+
+`apply_pending_resend_events` runs on the Arq worker. It locks a batch of
+pending rows (FOR UPDATE SKIP LOCKED, so concurrent runs take disjoint
+batches) and resolves their outbox rows and campaign sends with one
+`IN (...)` query each. It then applies status changes, adds suppressions
+in bulk and bumps campaign counters atomically, all in a single commit per
+batch.
+"""
+from __future__ import annotations
+
+import hashlib
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from logging_config import get_logger
+from models import CampaignSend, EmailEvent, EmailOutbox, MarketingCampaign, ResendWebhookEvent
+
+from .compliance import suppress_emails_bulk
+
+logger = get_logger(__name__)
+
+DEFAULT_BATCH_SIZE = 500
+
+
+# ─────────────────────────────────────────────────────────────────────
+# Ingestion (request path)
+# ─────────────────────────────────────────────────────────────────────
+
+def record_resend_event(
+    db: Session,
+    event: dict[str, Any],
+    *,
+    svix_id: str | None,
+    raw_body: bytes,
+) -> ResendWebhookEvent | None:
+    """Persist a verified webhook delivery. Returns None if it was already recorded.
+
+    Without a `svix-id` (signature verification disabled in dev) we fall back
+    to a hash of the raw body so byte-identical retries still dedupe.
+    """
+    dedupe_key = svix_id or f"sha256:{hashlib.sha256(raw_body).hexdigest()}"
+    row = ResendWebhookEvent(
+        svix_id=dedupe_key[:255],
+        event_type=str(event.get("type", ""))[:50],
+        payload=event,
+        status="pending",
+    )
+    db.add(row)
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        return None
+    db.refresh(row)
+    return row
+
+
+# ─────────────────────────────────────────────────────────────────────
+# Batch application (worker)
+# ─────────────────────────────────────────────────────────────────────
+
+def _parse(payload: dict[str, Any]) -> tuple[str, str, str | None, dict[str, Any]]:
+    """Pull (event_type, recipient, message_id, data) out of a Resend payload."""
+    data = payload.get("data", {}) or {}
+    to_field = data.get("to") or []
+    recipient = to_field[0] if to_field else data.get("email", "")
+    message_id = data.get("email_id") or data.get("id")
+    return payload.get("type", ""), (recipient or "").lower(), message_id, data
+
+
+def apply_resend_events(db: Session, rows: list[ResendWebhookEvent]) -> dict[str, int]:
+    """Apply a batch of webhook rows and commit once. Returns per-type counts.
+
+    Behaviour per event type matches the old inline handler:
+      - bounced (hard)  → suppress, mark send bounced, bump bounced_count
+      - complained      → suppress, mark send complained, bump complained_count
+      - delivered       → mark outbox + send 'sent', bump delivered_count
+    Every recognised event also appends an EmailEvent row. Unknown types are
+    just marked processed.
+    """
+    parsed = [(row, *_parse(row.payload or {})) for row in rows]
+
+    message_ids = {mid for _, _, _, mid, _ in parsed if mid}
+    outbox_by_msg: dict[str, EmailOutbox] = {}
+    if message_ids:
+        outbox_by_msg = {
+            o.provider_message_id: o
+            for o in db.query(EmailOutbox).filter(EmailOutbox.provider_message_id.in_(message_ids)).all()
+        }
+    send_by_outbox: dict[int, CampaignSend] = {}
+    if outbox_by_msg:
+        outbox_ids = [o.id for o in outbox_by_msg.values()]
+        send_by_outbox = {
+            cs.outbox_id: cs
+            for cs in db.query(CampaignSend).filter(CampaignSend.outbox_id.in_(outbox_ids)).all()
+        }
+
+    suppressions: list[tuple[str, str, str | None]] = []
+    campaign_deltas: dict[int, Counter] = defaultdict(Counter)
+    counts: Counter = Counter()
+    now = datetime.utcnow()
+
+    for row, event_type, recipient, message_id, data in parsed:
+        row.status = "processed"
+        row.processed_at = now
+        if not recipient:
+            counts["ignored"] += 1
+            continue
+
+        outbox_row = outbox_by_msg.get(message_id) if message_id else None
+        cs_row = send_by_outbox.get(outbox_row.id) if outbox_row else None
+
+        def _log_event(etype: str, meta: dict) -> None:
+            db.add(EmailEvent(
+                campaign_send_id=cs_row.id if cs_row else None,
+                outbox_id=outbox_row.id if outbox_row else None,
+                recipient_email=recipient,
+                campaign_id=cs_row.campaign_id if cs_row else None,
+                event_type=etype,
+                event_metadata=meta,
+            ))
+
+        if event_type in ("email.bounced", "bounced"):
+            bounce_type = (data.get("bounce", {}) or {}).get("type", "")
+            is_hard = "hard" in bounce_type.lower() or "permanent" in bounce_type.lower() or not bounce_type
+            if is_hard:
+                suppressions.append((recipient, "hard_bounce", message_id))
+            _log_event("bounce", {"bounce_type": bounce_type, "is_hard": is_hard})
+            if cs_row and is_hard and not cs_row.bounced:
+                cs_row.bounced = True
+                if cs_row.campaign_id:
+                    campaign_deltas[cs_row.campaign_id]["bounced_count"] += 1
+            counts["bounced"] += 1
+
+        elif event_type in ("email.complained", "complained"):
+            suppressions.append((recipient, "complaint", message_id))
+            _log_event("complaint", {})
+            if cs_row and not cs_row.complained:
+                cs_row.complained = True
+                if cs_row.campaign_id:
+                    campaign_deltas[cs_row.campaign_id]["complained_count"] += 1
+            counts["complained"] += 1
+
+        elif event_type in ("email.delivered", "delivered"):
+            if outbox_row and outbox_row.status != "sent":
+                outbox_row.status = "sent"
+                outbox_row.sent_at = outbox_row.sent_at or now
+            _log_event("delivered", {})
+            if cs_row and cs_row.status != "sent":
+                cs_row.status = "sent"
+                if cs_row.campaign_id:
+                    campaign_deltas[cs_row.campaign_id]["delivered_count"] += 1
+            counts["delivered"] += 1
+
+        else:
+            counts["ignored"] += 1
+
+    suppress_emails_bulk(db, suppressions)
+
+    # Counter bumps as `col = col + n` so concurrent tracking hits on the same
+    # campaign row never lose an increment.
+    for campaign_id, deltas in campaign_deltas.items():
+        db.query(MarketingCampaign).filter(MarketingCampaign.id == campaign_id).update(
+            {getattr(MarketingCampaign, col): getattr(MarketingCampaign, col) + n for col, n in deltas.items()},
+            synchronize_session=False,
+        )
+
+    db.commit()
+    return dict(counts)
+
+
+def _lock_pending(db: Session, *, limit: int = 1, row_id: int | None = None) -> list[ResendWebhookEvent]:
+    """Lock pending rows (oldest first) until the caller's next commit or rollback.
+
+    SKIP LOCKED lets concurrent runs (the s5/s35 cron plus the jobs the
+    webhook route enqueues) take disjoint batches. apply_resend_events
+    marks the rows processed in the same transaction, so no run can apply
+    a row another one already has.
+    """
+    query = db.query(ResendWebhookEvent).filter(ResendWebhookEvent.status == "pending")
+    if row_id is not None:
+        query = query.filter(ResendWebhookEvent.id == row_id)
+    return (
+        query.order_by(ResendWebhookEvent.id.asc())
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+        .all()
+    )
+
+
+def apply_pending_resend_events(db: Session, *, batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """Drain pending webhook rows in batches. Returns the number of rows handled.
+
+    If a batch fails to apply it is retried row by row, so one malformed
+    payload is marked 'failed' instead of blocking everything behind it.
+    """
+    handled = 0
+    while True:
+        rows = _lock_pending(db, limit=batch_size)
+        if not rows:
+            return handled
+
+        try:
+            counts = apply_resend_events(db, rows)
+            logger.info("Applied %s Resend webhook events: %s", len(rows), counts)
+        except Exception as exc:
+            db.rollback()
+            logger.warning("Resend webhook batch failed (%s) — retrying row by row", exc)
+            for row_id in [r.id for r in rows]:
+                # The rollback released our locks; another run may have taken the row since.
+                locked = _lock_pending(db, row_id=row_id)
+                if not locked:
+                    db.commit()
+                    continue
+                try:
+                    apply_resend_events(db, locked)
+                except Exception as row_exc:
+                    db.rollback()
+                    locked = _lock_pending(db, row_id=row_id)
+                    if not locked:
+                        db.commit()
+                        continue
+                    row = locked[0]
+                    row.status = "failed"
+                    row.error = str(row_exc)[:2000]
+                    row.processed_at = datetime.utcnow()
+                    db.commit()
+                    logger.error("Resend webhook event %s failed: %s", row_id, row_exc)
+
+        handled += len(rows)
+        if len(rows) < batch_size:
+            return handled
@@ -3,12 +3,14 @@ Media processing utilities for compression and thumbnail generation
 """
 import os
 import io
-from PIL import Image
 from typing import Optional, Tuple
 import subprocess
 import tempfile
+from lazy_imports import lazy_module
 from logging_config import get_logger
 
+Image = lazy_module("PIL.Image")  # loaded by the first upload that needs it
+
 logger = get_logger(__name__)
 
 # Image compression settings
@@ -1,5 +1,6 @@
-from sqlalchemy import Column, Integer, String, Text, Float, DateTime, Boolean, ForeignKey, UniqueConstraint, JSON
+from sqlalchemy import Column, Integer, String, Text, Float, DateTime, Boolean, ForeignKey, UniqueConstraint, JSON, LargeBinary
 from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import validates
 from sqlalchemy.sql import func
 from database import Base
 from datetime import datetime
@@ -10,6 +11,16 @@ from datetime import datetime
 JSONType = JSON().with_variant(JSONB(), "postgresql")
 
 
+def normalize_email(value: str | None) -> str | None:
+    """Contact emails are stored trimmed + lower-cased, so lookups and joins
+    can compare them directly and use a plain B-tree index."""
+    return value.strip().lower() if isinstance(value, str) else value
+
+
+def _normalize_email_attr(self, key, value):
+    return normalize_email(value)
+
+
 class GalleryItem(Base):
     __tablename__ = "gallery_items"
     
@@ -27,20 +38,41 @@ class ContactSubmission(Base):
     
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(100), nullable=False)
-    email = Column(String(100), nullable=False)
+    email = Column(String(100), nullable=False, index=True)
     message = Column(Text, nullable=False)
     submitted_at = Column(DateTime, default=datetime.utcnow)
     resolved = Column(Boolean, default=False)
 
+    _validate_email = validates("email")(_normalize_email_attr)
+
+
+DONATION_STATUSES = ("confirmed", "pending", "failed", "abandoned")
+
+
+def donation_status_for(frequency: str | None) -> str:
+    """Status implied by a legacy `frequency` value ("Failed - …", "Abandoned", …)."""
+    f = (frequency or "").lower()
+    for status in ("failed", "abandoned", "pending"):
+        if f.startswith(status):
+            return status
+    return "confirmed"
+
+
+def _default_donation_status(context) -> str:
+    return donation_status_for(context.get_current_parameters().get("frequency"))
+
 
 class Donation(Base):
     __tablename__ = "donations"
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(100), nullable=False)
-    email = Column(String(100), nullable=False)
+    email = Column(String(100), nullable=False, index=True)
     amount = Column(Float, nullable=False)
     frequency = Column(String(50), nullable=False)
+    # confirmed | pending | failed | abandoned. Payment paths set it explicitly;
+    # otherwise it is derived from `frequency`, which used to carry the state.
+    status = Column(String(20), nullable=False, default=_default_donation_status, server_default="confirmed")
     stripe_session_id = Column(String(255), nullable=True)  # Track Stripe session for updates
     certificate_filename = Column(String(255), nullable=True)  # PDF certificate filename
     donated_at = Column(DateTime, default=datetime.utcnow)
@@ -56,6 +88,78 @@ class Donation(Base):
     utm_campaign = Column(String(100), nullable=True, index=True)
     utm_content = Column(String(100), nullable=True)
 
+    _validate_email = validates("email")(_normalize_email_attr)
+
+
+class DonationAggregate(Base):
+    """Precomputed confirmed-donation totals, one row per (scope, bucket).
+
+    scope='total' (bucket '') carries the site-wide totals incl. distinct
+    donors; 'day' / 'month' buckets are 'YYYY-MM-DD' / 'YYYY-MM' of
+    donated_at; 'campaign' buckets are the utm_campaign value. Maintained
+    incrementally on every flush that touches a Donation and rebuilt
+    nightly (donation_stats.py).
+    """
+    __tablename__ = "donation_aggregates"
+    __table_args__ = (UniqueConstraint("scope", "bucket", name="uq_donation_aggregates_scope_bucket"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    scope = Column(String(20), nullable=False)
+    bucket = Column(String(100), nullable=False, default="")
+    total_amount = Column(Float, nullable=False, default=0)
+    donation_count = Column(Integer, nullable=False, default=0)
+    donor_count = Column(Integer, nullable=False, default=0)  # only maintained for scope='total'
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class DonationDonor(Base):
+    """Confirmed donations per (lower-cased) email — backs the distinct-donor count."""
+    __tablename__ = "donation_donors"
+
+    email = Column(String(255), primary_key=True)
+    donation_count = Column(Integer, nullable=False, default=0)
+    total_amount = Column(Float, nullable=False, default=0)
+
+
+class YearEndReceiptRun(Base):
+    """Progress of the bulk annual-receipt run for one tax year (year_end_receipts.py).
+
+    Donors are processed in email order; `cursor` is the last email whose
+    chunk committed, so a crashed or re-enqueued run resumes after it.
+    """
+    __tablename__ = "year_end_receipt_runs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    tax_year = Column(Integer, nullable=False, unique=True)
+    status = Column(String(20), nullable=False, default="pending")  # pending | running | completed | failed
+    send_emails = Column(Boolean, nullable=False, default=True)
+    cursor = Column(String(255), nullable=True)
+    total_donors = Column(Integer, nullable=False, default=0)
+    processed_donors = Column(Integer, nullable=False, default=0)
+    emailed = Column(Integer, nullable=False, default=0)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    completed_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class YearEndReceipt(Base):
+    """One donor's consolidated receipt for a tax year; the PDF lives in S3 at `s3_key`."""
+    __tablename__ = "year_end_receipts"
+    __table_args__ = (UniqueConstraint("tax_year", "email", name="uq_year_end_receipt_donor"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    tax_year = Column(Integer, nullable=False)
+    email = Column(String(255), nullable=False)
+    donor_name = Column(String(100), nullable=False)
+    receipt_number = Column(String(50), nullable=False)
+    donation_count = Column(Integer, nullable=False)
+    total_amount = Column(Float, nullable=False)
+    s3_key = Column(String(500), nullable=False)
+    outbox_id = Column(Integer, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
 
 class User(Base):
     __tablename__ = "users"
@@ -78,6 +182,8 @@ class User(Base):
     def is_manager(self) -> bool:
         return self.role == "manager"
 
+    _validate_email = validates("email")(_normalize_email_attr)
+
 
 class Event(Base):
     __tablename__ = "events"
@@ -96,10 +202,12 @@ class Volunteer(Base):
     
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(100), nullable=False)
-    email = Column(String(100), nullable=False)
+    email = Column(String(100), nullable=False, index=True)
     interest = Column(String(100), nullable=False)
     submitted_at = Column(DateTime, default=datetime.utcnow)
 
+    _validate_email = validates("email")(_normalize_email_attr)
+
 
 class Story(Base):
     __tablename__ = "stories"
@@ -149,7 +257,7 @@ class Subscription(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(100), nullable=True)
-    email = Column(String(100), nullable=False)
+    email = Column(String(100), nullable=False, index=True)
     phone = Column(String(30), nullable=True, index=True)
     wants_email = Column(Boolean, default=True)
     wants_sms = Column(Boolean, default=False)
@@ -160,6 +268,8 @@ class Subscription(Base):
     sms_consent_ip = Column(String(45), nullable=True)
     sms_consent_text = Column(Text, nullable=True)
 
+    _validate_email = validates("email")(_normalize_email_attr)
+
 
 class DonationSubscription(Base):
     __tablename__ = "donation_subscriptions"
@@ -169,7 +279,7 @@ class DonationSubscription(Base):
     stripe_customer_id = Column(String(255), nullable=False)
     stripe_session_id = Column(String(255), nullable=True)  # Track Stripe session for updates
     name = Column(String(100), nullable=False)
-    email = Column(String(100), nullable=False)
+    email = Column(String(100), nullable=False, index=True)
     amount = Column(Float, nullable=False)
     purpose = Column(String(100), nullable=False)
     interval = Column(String(20), nullable=False)  # "month" or "year"
@@ -185,6 +295,49 @@ class DonationSubscription(Base):
     utm_campaign = Column(String(100), nullable=True, index=True)
     utm_content = Column(String(100), nullable=True)
 
+    _validate_email = validates("email")(_normalize_email_attr)
+
+
+class StripeEvent(Base):
+    """Stripe webhook deliveries: durable idempotency record + work queue.
+
+    The webhook verifies the signature and inserts one row per Stripe event
+    id (unique, so retries landing on any API worker collapse onto it). The
+    Arq worker then applies pending rows in order per Stripe object, with
+    retry/backoff, and parks events that keep failing as 'dead'.
+    """
+    __tablename__ = "stripe_events"
+
+    id = Column(Integer, primary_key=True, index=True)
+    event_id = Column(String(255), unique=True, nullable=False)
+    event_type = Column(String(100), nullable=False)
+    # Events sharing an object id (the subscription for subscription/invoice
+    # events, else data.object.id) are applied strictly in Stripe order.
+    object_id = Column(String(255), nullable=True, index=True)
+    payload = Column(JSONType, nullable=True)
+    status = Column(String(20), nullable=False, default="pending", index=True)  # pending | processing | processed | dead
+    attempts = Column(Integer, nullable=False, default=0)
+    error = Column(Text, nullable=True)
+    event_created_at = Column(DateTime, nullable=True)  # Stripe's `created`
+    received_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    claimed_at = Column(DateTime, nullable=True)
+    processed_at = Column(DateTime, nullable=True)
+
+
+class StripeSyncCheckpoint(Base):
+    """How far each Stripe reconciliation stream has got (stripe_reconcile.py).
+
+    `synced_until` is the unix time the last successful run started; the
+    next run lists objects created since then (minus an overlap).
+    """
+    __tablename__ = "stripe_sync_checkpoints"
+
+    name = Column(String(50), primary_key=True)
+    synced_until = Column(Integer, nullable=False)
+    last_summary = Column(JSONType, nullable=True)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
 
 class Setting(Base):
     __tablename__ = "settings"
@@ -280,7 +433,7 @@ class Program(Base):
     id = Column(Integer, primary_key=True, index=True)
     category_id = Column(Integer, nullable=False, index=True)  # Foreign key to program_categories
     title = Column(String(255), nullable=False)
-    slug = Column(String(255), nullable=False, index=True)
+    slug = Column(String(255), nullable=False, unique=True, index=True)  # set on write, see routers/programs.py
     description = Column(Text, nullable=True)
     short_description = Column(Text, nullable=True)
     image_url = Column(String(500), nullable=True)
@@ -323,16 +476,35 @@ class EmailOutbox(Base):
     context = Column(JSONType, nullable=False, default=dict)
     idempotency_key = Column(String(128), unique=True, nullable=True)
     status = Column(String(20), nullable=False, default="pending", index=True)
-    provider_message_id = Column(String(255), nullable=True)
+    provider_message_id = Column(String(255), nullable=True, index=True)
     error = Column(Text, nullable=True)
     attempts = Column(Integer, nullable=False, default=0)
     max_attempts = Column(Integer, nullable=False, default=3)
     queue_after = Column(DateTime, nullable=False, default=datetime.utcnow)
+    # Set when the dispatcher hands the row to a worker (and again for the
+    # duration of a send). Expired leases are reclaimed by the next scan.
+    lease_expires_at = Column(DateTime, nullable=True)
     sent_at = Column(DateTime, nullable=True)
     created_at = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
     updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
 
 
+class EmailAttachmentBlob(Base):
+    """Content-addressed attachment bodies, stored once per distinct file.
+
+    `EmailOutbox.attachments` holds references ({"filename", "content_type",
+    "sha256", "size"}) instead of inline base64, so a campaign attachment
+    sent to N recipients is stored once rather than N times. The worker
+    resolves references at send time (marketing.attachments).
+    """
+    __tablename__ = "email_attachment_blobs"
+
+    sha256 = Column(String(64), primary_key=True)
+    content = Column(LargeBinary, nullable=False)
+    size = Column(Integer, nullable=False)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+
 class EmailSuppression(Base):
     """Global suppression list — checked by ComplianceMailer before every send.
 
@@ -506,7 +678,7 @@ class CampaignSend(Base):
     campaign_id = Column(Integer, ForeignKey("marketing_campaigns.id", ondelete="CASCADE"), nullable=False, index=True)
     recipient_email = Column(String(255), nullable=False)
     recipient_name = Column(String(255), nullable=True)
-    outbox_id = Column(Integer, ForeignKey("email_outbox.id", ondelete="SET NULL"), nullable=True)
+    outbox_id = Column(Integer, ForeignKey("email_outbox.id", ondelete="SET NULL"), nullable=True, index=True)
     status = Column(String(20), nullable=False, default="pending", index=True)
     error = Column(Text, nullable=True)
     created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
@@ -553,6 +725,26 @@ class EmailEvent(Base):
     event_metadata = Column("metadata", JSONType, nullable=False, default=dict)
 
 
+class ResendWebhookEvent(Base):
+    """Raw Resend webhook deliveries, deduplicated on the Svix message id.
+
+    The webhook endpoint only verifies the signature and inserts a row here,
+    so provider retries of the same delivery collapse onto one row. The Arq
+    worker applies pending rows in batches (outbox / send status, suppressions,
+    campaign counters).
+    """
+    __tablename__ = "resend_webhook_events"
+
+    id = Column(Integer, primary_key=True, index=True)
+    svix_id = Column(String(255), unique=True, nullable=False)
+    event_type = Column(String(50), nullable=False)
+    payload = Column(JSONType, nullable=False, default=dict)
+    status = Column(String(20), nullable=False, default="pending", index=True)  # pending | processed | failed
+    error = Column(Text, nullable=True)
+    received_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    processed_at = Column(DateTime, nullable=True)
+
+
 class FundraisingProject(Base):
     """A visible fundraising target with a public progress bar.
 
@@ -647,3 +839,5 @@ class ProjectProposal(Base):
     sms_consent = Column(Boolean, nullable=False, default=False)
     sms_consent_at = Column(DateTime, nullable=True)
     sms_consent_text = Column(Text, nullable=True)
+
+    _validate_email = validates("email")(_normalize_email_attr)
@@ -0,0 +1,145 @@
+"""Keyset (seek) pagination with opaque cursors.
+
+OFFSET pagination makes the database read and throw away every skipped
+row, so deep pages get slower the further you go. Keyset pagination
+instead remembers the last row's sort key and asks for rows strictly
+after it, which an index on (sort_key, id) answers directly:
+
+    rows, next_cursor = keyset_paginate(
+        db.query(Donation), Donation.donated_at, Donation.id,
+        cursor=cursor, limit=limit,
+    )
+
+`id` breaks ties so the order is total. The sort column must be NOT NULL
+(or pass `Model.id` for both). The cursor is an opaque URL-safe string;
+clients pass back `next_cursor` verbatim and get None on the last page.
+
+Endpoints that return `{"total", "items"}` add `next_cursor` and
+`total_is_estimate`. Those that return a bare list put the cursor in the
+`X-Next-Cursor` response header instead.
+
+Totals come from `count_rows`. It runs an exact COUNT for small results.
+For large ones on Postgres it uses the planner's row estimate, which is
+derived from pg_class.reltuples and the column statistics, so a list
+page never scans a large table just to show a number.
+"""
+from __future__ import annotations
+
+import base64
+import json
+from datetime import date, datetime
+from typing import Any
+
+from fastapi import HTTPException, Response
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Query, Session
+
+from logging_config import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+# Below this many (estimated) rows an exact COUNT is cheap enough.
+EXACT_COUNT_BELOW = 10_000
+
+
+def clamp_limit(limit: int | None, default: int = DEFAULT_PAGE_SIZE) -> int:
+    return max(1, min(limit or default, MAX_PAGE_SIZE))
+
+
+def encode_cursor(values: list[Any]) -> str:
+    def _plain(v):
+        return v.isoformat() if isinstance(v, (datetime, date)) else v
+    raw = json.dumps([_plain(v) for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, columns: list) -> list[Any]:
+    """Inverse of encode_cursor, coercing values back to the columns' types."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError("wrong arity")
+        out = []
+        for value, column in zip(values, columns):
+            python_type = column.type.python_type
+            if python_type is datetime:
+                value = datetime.fromisoformat(value)
+            elif python_type is date:
+                value = date.fromisoformat(value)
+            elif not isinstance(value, python_type):
+                value = python_type(value)
+            out.append(value)
+        return out
+    except (ValueError, TypeError, json.JSONDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def keyset_paginate(
+    query: Query,
+    sort_column,
+    id_column,
+    *,
+    cursor: str | None,
+    limit: int,
+    descending: bool = True,
+) -> tuple[list, str | None]:
+    """Return one page of `query` ordered by (sort_column, id_column) and the next cursor."""
+    columns = [sort_column] if sort_column is id_column else [sort_column, id_column]
+    if cursor:
+        after = decode_cursor(cursor, columns)
+        key = tuple_(*columns) if len(columns) > 1 else columns[0]
+        bound = tuple_(*after) if len(columns) > 1 else after[0]
+        query = query.filter(key < bound if descending else key > bound)
+    order = [c.desc() if descending else c.asc() for c in columns]
+    rows = query.order_by(*order).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor([getattr(last, c.key) for c in columns])
+    return rows, next_cursor
+
+
+def set_next_cursor(response: Response, next_cursor: str | None) -> None:
+    """For endpoints whose body is a bare list."""
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+
+
+# ─────────────────────────────────────────────────────────────────────
+# Counts
+# ─────────────────────────────────────────────────────────────────────
+
+def _planner_estimate(db: Session, query: Query) -> int | None:
+    compiled = query.statement.compile(dialect=db.get_bind().dialect)
+    try:
+        with db.begin_nested():  # a failed EXPLAIN must not abort the request's transaction
+            plan = db.connection().exec_driver_sql(
+                "EXPLAIN (FORMAT JSON) " + str(compiled), compiled.params or {}
+            ).scalar()
+    except Exception as exc:  # never fail a list page over a count
+        logger.warning("Row estimate failed, falling back to COUNT: %s", exc)
+        return None
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def count_rows(db: Session, query: Query, *, exact_below: int = EXACT_COUNT_BELOW) -> tuple[int, bool]:
+    """Return (count, is_estimate) for `query`."""
+    query = query.order_by(None)
+    if db.get_bind().dialect.name == "postgresql":
+        estimate = _planner_estimate(db, query)
+        if estimate is not None and estimate >= exact_below:
+            return estimate, True
+    return query.count(), False
+
+
+def page_envelope(db: Session, query: Query, items: list, next_cursor: str | None) -> dict[str, Any]:
+    """`{"total", "total_is_estimate", "next_cursor", "items"}` for a page of `query`."""
+    total, estimated = count_rows(db, query)
+    return {"total": total, "total_is_estimate": estimated, "next_cursor": next_cursor, "items": items}
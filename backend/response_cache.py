@@ -0,0 +1,429 @@
+"""Shared Redis cache for the public homepage read endpoints.
+
+A homepage view issues about ten public GETs (slides, programs, stories,
+impact stats, ...). Each ran its queries on every view, yet the data only
+changes when someone edits it. `cached_response` stores an endpoint's
+finished JSON bytes in Redis and serves them directly on a hit: no DB
+session is checked out and nothing is serialised.
+
+    @router.get("/", response_model=List[ProgramResponse])
+    @cached_response("programs", model=List[ProgramResponse])
+    async def get_programs(...): ...
+
+Invalidation is by content version. Each cached route names the content
+groups it reads. Each group has a counter in Redis, and an entry records
+the versions it was built from; once any of them moves the entry is a
+miss. Versions are bumped by ORM listeners when a transaction that wrote
+one of the group's models commits (like donation_stats), so every admin
+write path invalidates without having to remember to. Bulk
+`query.update()` and raw SQL bypass the listeners; `ttl` bounds how long
+those go unnoticed, or call `bump_content_version` directly.
+
+Freshness: an entry younger than `ttl` is served as is. Between `ttl` and
+`ttl + stale_while_revalidate` it is still served, and one request (a
+Redis lock makes it single-flight) rebuilds it in the background with its
+own DB session. A miss takes the same lock: one request builds, and the
+others serve the entry from before the version bump if there is one, or
+wait up to MISS_WAIT_SECONDS for the builder rather than all querying. Responses carry a strong ETag (If-None-Match gets a 304)
+and a Cache-Control that lets browsers do the same stale-while-revalidate
+dance against the ETag.
+
+Redis trouble never fails a request: the endpoint just runs uncached.
+RESPONSE_CACHE=false turns the cache off; set it the same on the API and
+the worker, since the worker's writes bump versions too.
+"""
+from __future__ import annotations
+
+import functools
+import hashlib
+import asyncio
+import inspect
+import json
+import os
+import time
+from typing import Any, Awaitable, Callable, Iterable, NamedTuple
+from urllib.parse import urlencode
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from starlette.background import BackgroundTask
+
+from logging_config import get_logger
+from models import (
+    Donation,
+    FundraisingProject,
+    GalleryItem,
+    Program,
+    ProgramCategory,
+    Setting,
+    SlideshowSlide,
+    Story,
+    Testimonial,
+    UrgentNeed,
+)
+
+logger = get_logger(__name__)
+
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE", "true").lower() != "false"
+REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379/0")
+
+DEFAULT_TTL = 600
+DEFAULT_STALE_WHILE_REVALIDATE = 3600
+REFRESH_LOCK_SECONDS = 30
+# How long a request that lost the build lock on a miss waits for the winner.
+MISS_WAIT_SECONDS = 2.0
+MISS_POLL_SECONDS = 0.05
+# Redis calls on the request path must fail fast; the DB is the fallback.
+REDIS_TIMEOUT_SECONDS = 0.25
+
+KEY_PREFIX = "respcache"
+
+# Which content group a write to each model invalidates.
+CONTENT_GROUPS: dict[type, str] = {
+    SlideshowSlide: "slideshow",
+    GalleryItem: "gallery",
+    Program: "programs",
+    ProgramCategory: "program_categories",
+    UrgentNeed: "urgent_needs",
+    Testimonial: "testimonials",
+    Story: "stories",
+    FundraisingProject: "fundraising_projects",
+    Setting: "settings",
+    Donation: "donations",
+}
+
+
+def _version_key(group: str) -> str:
+    return f"{KEY_PREFIX}:version:{group}"
+
+
+def entry_key(name: str, params: dict[str, Any]) -> str:
+    return f"{KEY_PREFIX}:entry:{name}?{urlencode(sorted(params.items()))}"
+
+
+# ─────────────────────────────────────────────────────────────────────
+# Redis clients
+# ─────────────────────────────────────────────────────────────────────
+
+_async_client = None
+_sync_client = None
+
+
+def _async_redis():
+    global _async_client
+    if _async_client is None:
+        import redis.asyncio as aioredis
+
+        _async_client = aioredis.Redis.from_url(
+            REDIS_URL, socket_timeout=REDIS_TIMEOUT_SECONDS, socket_connect_timeout=REDIS_TIMEOUT_SECONDS,
+        )
+    return _async_client
+
+
+def _sync_redis():
+    global _sync_client
+    if _sync_client is None:
+        import redis
+
+        _sync_client = redis.Redis.from_url(
+            REDIS_URL, socket_timeout=REDIS_TIMEOUT_SECONDS, socket_connect_timeout=REDIS_TIMEOUT_SECONDS,
+        )
+    return _sync_client
+
+
+# ─────────────────────────────────────────────────────────────────────
+# Version bumps (write side)
+# ─────────────────────────────────────────────────────────────────────
+
+def bump_content_version(*groups: str) -> None:
+    """Invalidate every cached response built from any of `groups`."""
+    if not RESPONSE_CACHE_ENABLED or not groups:
+        return
+    try:
+        pipe = _sync_redis().pipeline(transaction=False)
+        for group in sorted(set(groups)):
+            pipe.incr(_version_key(group))
+        pipe.execute()
+    except Exception as exc:
+        logger.warning("Could not bump response cache versions %s: %s", sorted(groups), exc)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changed_groups(session: Session, flush_context) -> None:
+    groups = {
+        CONTENT_GROUPS[type(obj)]
+        for obj in (*session.new, *session.dirty, *session.deleted)
+        if type(obj) in CONTENT_GROUPS
+    }
+    if groups:
+        session.info.setdefault("response_cache_groups", set()).update(groups)
+
+
+@event.listens_for(Session, "after_commit")
+def _bump_changed_groups(session: Session) -> None:
+    groups = session.info.pop("response_cache_groups", None)
+    if groups:
+        bump_content_version(*groups)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changed_groups(session: Session) -> None:
+    session.info.pop("response_cache_groups", None)
+
+
+# ─────────────────────────────────────────────────────────────────────
+# Entries (read side)
+# ─────────────────────────────────────────────────────────────────────
+
+class CacheEntry(NamedTuple):
+    versions: list[int]
+    stored_at: float
+    etag: str
+    body: bytes
+
+
+def _pack(entry: CacheEntry) -> bytes:
+    header = json.dumps({"versions": entry.versions, "stored_at": entry.stored_at, "etag": entry.etag})
+    return header.encode() + b"\n" + entry.body
+
+
+def _unpack(raw: bytes) -> CacheEntry:
+    header, body = raw.split(b"\n", 1)
+    meta = json.loads(header)
+    return CacheEntry(meta["versions"], meta["stored_at"], meta["etag"], body)
+
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+async def _read_stored(key: str, groups: list[str]) -> tuple[CacheEntry | None, list[int]]:
+    """Return (stored entry, whatever versions it was built from; current versions)."""
+    raw, *versions = await _async_redis().mget([key, *(_version_key(g) for g in groups)])
+    return (None if raw is None else _unpack(raw)), [int(v or 0) for v in versions]
+
+
+async def read_entry(key: str, groups: Iterable[str]) -> tuple[CacheEntry | None, list[int]]:
+    """Return (entry if still on the current versions, current versions) in one round-trip."""
+    entry, versions = await _read_stored(key, list(groups))
+    return (entry if entry is not None and entry.versions == versions else None), versions
+
+
+async def write_entry(key: str, versions: list[int], body: bytes, *, ttl: int, stale_while_revalidate: int) -> CacheEntry:
+    entry = CacheEntry(versions, time.time(), make_etag(body), body)
+    await _async_redis().set(key, _pack(entry), ex=ttl + stale_while_revalidate)
+    return entry
+
+
+async def claim_refresh(key: str) -> bool:
+    return bool(await _async_redis().set(f"{key}:refreshing", "1", nx=True, ex=REFRESH_LOCK_SECONDS))
+
+
+async def release_refresh(key: str) -> None:
+    try:
+        await _async_redis().delete(f"{key}:refreshing")
+    except Exception as exc:
+        logger.warning("Could not release the refresh lock of %s: %s", key, exc)
+
+
+async def _wait_for_entry(key: str, groups: list[str]) -> CacheEntry | None:
+    """Poll for the entry another request is building; None if it doesn't show up in time."""
+    deadline = time.monotonic() + MISS_WAIT_SECONDS
+    while time.monotonic() < deadline:
+        await asyncio.sleep(MISS_POLL_SECONDS)
+        try:
+            entry, _ = await read_entry(key, groups)
+        except Exception:
+            return None
+        if entry is not None:
+            return entry
+    return None
+
+
+def cached_json_response(
+    request: Request,
+    entry: CacheEntry,
+    *,
+    stale_while_revalidate: int,
+    state: str,
+    background: BackgroundTask | None = None,
+) -> Response:
+    headers = {
+        "ETag": entry.etag,
+        "Cache-Control": f"public, max-age=0, stale-while-revalidate={stale_while_revalidate}",
+        "X-Cache": state,
+    }
+    if_none_match = request.headers.get("if-none-match", "")
+    if entry.etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(",")):
+        return Response(status_code=304, headers=headers, background=background)
+    return Response(content=entry.body, media_type="application/json", headers=headers, background=background)
+
+
+def encode_json(result: Any, adapter: TypeAdapter | None = None) -> bytes:
+    """Serialise like FastAPI would (through the response model when there is one)."""
+    if adapter is not None:
+        return adapter.dump_json(adapter.validate_python(result, from_attributes=True))
+    return json.dumps(
+        jsonable_encoder(result), ensure_ascii=False, allow_nan=False, separators=(",", ":"),
+    ).encode()
+
+
+# ─────────────────────────────────────────────────────────────────────
+# Serving
+# ─────────────────────────────────────────────────────────────────────
+
+async def serve_cached(
+    request: Request,
+    key: str,
+    groups: Iterable[str],
+    build: Callable[[], Awaitable[bytes]],
+    *,
+    ttl: int = DEFAULT_TTL,
+    stale_while_revalidate: int = DEFAULT_STALE_WHILE_REVALIDATE,
+    rebuild: Callable[[], Awaitable[bytes]] | None = None,
+) -> Response | None:
+    """Serve `key` from the cache, building it with `build` on a miss.
+
+    `rebuild` produces the body for a background refresh, after the
+    request is gone (defaults to `build`, which must then not depend on
+    request-scoped state). Returns None if the cache is off or Redis can't
+    be read; the caller then serves the response uncached.
+    """
+    if not RESPONSE_CACHE_ENABLED:
+        return None
+    groups = list(groups)
+    try:
+        entry, versions = await _read_stored(key, groups)
+    except Exception as exc:
+        logger.warning("Response cache unavailable for %s: %s", key, exc)
+        return None
+
+    outdated = entry if entry is not None and entry.versions != versions else None
+    if outdated is not None:
+        entry = None
+    if entry is not None:
+        age = time.time() - entry.stored_at
+        if age < ttl:
+            return cached_json_response(request, entry, stale_while_revalidate=stale_while_revalidate, state="HIT")
+        if age < ttl + stale_while_revalidate:
+            async def refresh() -> None:
+                try:
+                    _, current = await read_entry(key, groups)
+                    body = await (rebuild or build)()
+                    await write_entry(key, current, body, ttl=ttl, stale_while_revalidate=stale_while_revalidate)
+                except Exception as exc:
+                    logger.warning("Background refresh of %s failed: %s", key, exc)
+                finally:
+                    await release_refresh(key)
+
+            background = None
+            try:
+                if await claim_refresh(key):
+                    background = BackgroundTask(refresh)
+            except Exception as exc:
+                logger.warning("Could not claim refresh of %s: %s", key, exc)
+            return cached_json_response(
+                request, entry, stale_while_revalidate=stale_while_revalidate, state="STALE", background=background,
+            )
+
+    # Miss: single-flight the build, so a cold key or a version bump under
+    # load doesn't send every concurrent request to the database.
+    try:
+        claimed = await claim_refresh(key)
+    except Exception as exc:
+        logger.warning("Could not claim build of %s: %s", key, exc)
+        claimed = True
+    if not claimed:
+        if outdated is not None:
+            return cached_json_response(request, outdated, stale_while_revalidate=stale_while_revalidate, state="STALE")
+        entry = await _wait_for_entry(key, groups)
+        if entry is not None:
+            return cached_json_response(request, entry, stale_while_revalidate=stale_while_revalidate, state="HIT")
+
+    try:
+        body = await build()
+        try:
+            entry = await write_entry(key, versions, body, ttl=ttl, stale_while_revalidate=stale_while_revalidate)
+        except Exception as exc:
+            logger.warning("Could not store %s in the response cache: %s", key, exc)
+            entry = CacheEntry(versions, time.time(), make_etag(body), body)
+    finally:
+        if claimed:
+            await release_refresh(key)
+    return cached_json_response(request, entry, stale_while_revalidate=stale_while_revalidate, state="MISS")
+
+
+async def _call_with_fresh_sessions(endpoint: Callable[..., Awaitable[Any]], kwargs: dict[str, Any]) -> Any:
+    """Run `endpoint` outside its request: swap request-scoped DB sessions for new ones."""
+    from database import AsyncSessionLocal, SessionLocal
+
+    sync_sessions: list[Session] = []
+    async_sessions: list[AsyncSession] = []
+    call_kwargs = dict(kwargs)
+    for name, value in kwargs.items():
+        if isinstance(value, AsyncSession):
+            call_kwargs[name] = AsyncSessionLocal()
+            async_sessions.append(call_kwargs[name])
+        elif isinstance(value, Session):
+            call_kwargs[name] = SessionLocal()
+            sync_sessions.append(call_kwargs[name])
+    try:
+        return await endpoint(**call_kwargs)
+    finally:
+        for db in sync_sessions:
+            db.close()
+        for adb in async_sessions:
+            await adb.close()
+
+
+def cached_response(
+    *groups: str,
+    model: Any = None,
+    ttl: int = DEFAULT_TTL,
+    stale_while_revalidate: int = DEFAULT_STALE_WHILE_REVALIDATE,
+):
+    """Cache an `async def` GET endpoint's JSON in Redis, keyed by its query parameters.
+
+    Put it under the route decorator. `groups` are the content groups the
+    endpoint reads (see CONTENT_GROUPS). Pass the route's `response_model`
+    as `model` so cached bytes match what FastAPI would have sent.
+    """
+    adapter = TypeAdapter(model) if model is not None else None
+
+    def decorator(endpoint):
+        assert inspect.iscoroutinefunction(endpoint), "cached_response needs an async endpoint"
+        name = f"{endpoint.__module__}.{endpoint.__qualname__}"
+        # Resolved here: FastAPI would evaluate string annotations in this module's globals.
+        signature = inspect.signature(endpoint, eval_str=True)
+        takes_request = "request" in signature.parameters
+
+        @functools.wraps(endpoint)
+        async def wrapper(**kwargs):
+            request: Request = kwargs["request"] if takes_request else kwargs.pop("request")
+            if not RESPONSE_CACHE_ENABLED:
+                return await endpoint(**kwargs)
+
+            async def build() -> bytes:
+                return encode_json(await endpoint(**kwargs), adapter)
+
+            async def rebuild() -> bytes:
+                return encode_json(await _call_with_fresh_sessions(endpoint, kwargs), adapter)
+
+            params = {k: v for k, v in kwargs.items() if isinstance(v, (str, int, float, bool)) or v is None}
+            response = await serve_cached(
+                request, entry_key(name, params), groups, build,
+                ttl=ttl, stale_while_revalidate=stale_while_revalidate, rebuild=rebuild,
+            )
+            return response if response is not None else await endpoint(**kwargs)
+
+        parameters = list(signature.parameters.values())
+        if not takes_request:
+            parameters.append(inspect.Parameter("request", inspect.Parameter.KEYWORD_ONLY, annotation=Request))
+        wrapper.__signature__ = signature.replace(parameters=parameters)
+        return wrapper
+
+    return decorator
@@ -1,16 +1,19 @@
-from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException, status
+from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException, Response, status
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 import aiofiles
 import os
 from datetime import datetime
+from typing import Optional
 from s3_service import upload_file, generate_object_key, get_file_url
 from media_processing import compress_image, compress_video, generate_video_thumbnail, should_compress_image, should_compress_video
 
-from database import get_db
-from models import ContactSubmission, Donation, Event, Volunteer, Story, Testimonial, Subscription, Setting, User
+from database import get_db, pool_metrics
+from models import ContactSubmission, Donation, Event, Volunteer, Story, Testimonial, Subscription, Setting, User, normalize_email
 from schemas import UserResponse, PasswordChange, AdminUserCreate, AdminUserUpdate, AdminPasswordReset
-from auth_utils import get_current_admin, verify_password, get_password_hash
+from auth_utils import Principal, get_current_admin, verify_password, get_password_hash
+from pagination import clamp_limit, keyset_paginate, set_next_cursor
+from donation_stats import get_donation_buckets, get_donation_totals
 from logging_config import get_logger
 
 logger = get_logger(__name__)
@@ -24,15 +27,10 @@ async def get_dashboard_stats(
     current_admin = Depends(get_current_admin)
 ):
     # Donation stats — only count confirmed donations
-    # (exclude Failed, Abandoned, and any legacy Pending records)
-    confirmed_filter = (
-        ~Donation.frequency.like('Failed%')
-        & ~Donation.frequency.like('Abandoned%')
-        & ~Donation.frequency.like('Pending%')
-    )
-    total_donations = db.query(func.sum(Donation.amount)).filter(confirmed_filter).scalar() or 0
-    total_donors = db.query(Donation.email).filter(confirmed_filter).distinct().count()
-    top_donor = db.query(Donation).filter(confirmed_filter).order_by(Donation.amount.desc()).first()
+    totals = get_donation_totals(db)  # precomputed — see donation_stats.py
+    total_donations = totals.total_amount
+    total_donors = totals.donor_count
+    top_donor = db.query(Donation).filter(Donation.status == "confirmed").order_by(Donation.amount.desc()).first()
     
     # Contact stats
     total_messages = db.query(ContactSubmission).count()
@@ -82,6 +80,29 @@ async def get_dashboard_stats(
     }
 
 
+@router.get("/dashboard/donation-trends")
+async def get_donation_trends(
+    scope: str = "month",
+    limit: int = 12,
+    db: Session = Depends(get_db),
+    current_admin = Depends(get_current_admin)
+):
+    """Confirmed-donation totals per day, month or campaign (precomputed)."""
+    if scope not in ("day", "month", "campaign"):
+        raise HTTPException(status_code=400, detail="scope must be day, month or campaign")
+    buckets = get_donation_buckets(db, scope, limit=max(1, min(limit, 366)))
+    return [
+        {"bucket": b.bucket, "total_amount": b.total_amount, "donations": b.donation_count}
+        for b in buckets
+    ]
+
+
+@router.get("/db-pool/metrics")
+async def db_pool_metrics(current_admin = Depends(get_current_admin)):
+    """Connection pool usage and checkout waits for the worker that serves this. Admin only."""
+    return pool_metrics()
+
+
 @router.post("/upload-media")
 async def upload_media(
     file: UploadFile = File(...),
@@ -221,13 +242,17 @@ def _user_to_dict(user: User) -> dict:
 
 @router.get("/users")
 async def get_all_users(
-    skip: int = 0,
+    response: Response,
+    cursor: Optional[str] = None,
     limit: int = 100,
     db: Session = Depends(get_db),
     current_admin = Depends(get_current_admin)
 ):
-    """Get all registered users"""
-    users = db.query(User).offset(skip).limit(limit).all()
+    """Get registered users, oldest first (next page: X-Next-Cursor header)"""
+    users, next_cursor = keyset_paginate(
+        db.query(User), User.id, User.id, cursor=cursor, limit=clamp_limit(limit), descending=False,
+    )
+    set_next_cursor(response, next_cursor)
     return [_user_to_dict(u) for u in users]
 
 
@@ -242,7 +267,7 @@ async def create_user(
     The created account is marked as email_verified so the new user can log in
     immediately without going through the email verification flow.
     """
-    existing = db.query(User).filter(User.email == payload.email).first()
+    existing = db.query(User).filter(User.email == normalize_email(payload.email)).first()
     if existing:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -281,8 +306,8 @@ async def update_user(
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    if payload.email and payload.email != user.email:
-        clash = db.query(User).filter(User.email == payload.email, User.id != user_id).first()
+    if payload.email and normalize_email(payload.email) != user.email:
+        clash = db.query(User).filter(User.email == normalize_email(payload.email), User.id != user_id).first()
         if clash:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -465,11 +490,12 @@ async def delete_user(
 async def change_password(
     password_data: PasswordChange,
     db: Session = Depends(get_db),
-    current_admin: User = Depends(get_current_admin)
+    current_admin: Principal = Depends(get_current_admin)
 ):
     """Change the current admin user's password"""
+    user = db.get(User, current_admin.id)
     # Verify the current password (schema field is `current_password`, not `old_password`)
-    if not verify_password(password_data.current_password, current_admin.password):
+    if user is None or not verify_password(password_data.current_password, user.password):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Incorrect current password"
@@ -481,8 +507,8 @@ async def change_password(
             detail="New password must be at least 8 characters",
         )
 
-    current_admin.password = get_password_hash(password_data.new_password)
-    current_admin.updated_at = datetime.utcnow()
+    user.password = get_password_hash(password_data.new_password)
+    user.updated_at = datetime.utcnow()
     db.commit()
 
     return {"message": "Password changed successfully"}
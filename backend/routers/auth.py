@@ -4,7 +4,7 @@ from datetime import timedelta, datetime
 import secrets
 
 from database import get_db
-from models import User
+from models import User, normalize_email
 from schemas import UserRegister, UserLogin, UserResponse, Token, ResendVerificationRequest
 from auth_utils import verify_password, create_access_token, get_password_hash, ACCESS_TOKEN_EXPIRE_MINUTES, get_current_user
 from email_service import send_verification_email
@@ -16,7 +16,7 @@ router = APIRouter()
 @router.post("/register", response_model=UserResponse)
 async def register_user(user: UserRegister, db: Session = Depends(get_db)):
     # Check if user already exists
-    existing_user = db.query(User).filter(User.email == user.email).first()
+    existing_user = db.query(User).filter(User.email == normalize_email(user.email)).first()
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -60,7 +60,7 @@ async def register_user(user: UserRegister, db: Session = Depends(get_db)):
 # User Login (works for both regular users and admins)
 @router.post("/login", response_model=Token)
 async def login(user_login: UserLogin, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == user_login.email).first()
+    user = db.query(User).filter(User.email == normalize_email(user_login.email)).first()
     
     if not user or not verify_password(user_login.password, user.password):
         raise HTTPException(
@@ -137,7 +137,7 @@ async def resend_verification_email(request: ResendVerificationRequest, db: Sess
     """
     Resend verification email to user
     """
-    user = db.query(User).filter(User.email == request.email).first()
+    user = db.query(User).filter(User.email == normalize_email(request.email)).first()
     
     if not user:
         # Don't reveal if email exists or not for security
@@ -1,6 +1,6 @@
-from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Response
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from pydantic import BaseModel
 
 from database import get_db
@@ -13,6 +13,7 @@ from email_service import (
     send_contact_acknowledgement,
 )
 from logging_config import get_logger
+from pagination import clamp_limit, keyset_paginate, set_next_cursor
 
 logger = get_logger(__name__)
 
@@ -50,7 +51,8 @@ async def create_contact_submission(
 
 @router.get("/", response_model=List[ContactResponse])
 async def get_contact_submissions(
-    skip: int = 0,
+    response: Response,
+    cursor: Optional[str] = None,
     limit: int = 100,
     resolved: bool = None,
     db: Session = Depends(get_db),
@@ -60,7 +62,11 @@ async def get_contact_submissions(
     if resolved is not None:
         query = query.filter(ContactSubmission.resolved == resolved)
     
-    contacts = query.offset(skip).limit(limit).all()
+    contacts, next_cursor = keyset_paginate(
+        query, ContactSubmission.id, ContactSubmission.id,
+        cursor=cursor, limit=clamp_limit(limit), descending=False,
+    )
+    set_next_cursor(response, next_cursor)
     return contacts
 
 
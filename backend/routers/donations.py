@@ -1,37 +1,48 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Request, File, Form, UploadFile
+from fastapi import APIRouter, Depends, HTTPException, status, Request, File, Form, UploadFile, Query
 from fastapi.responses import JSONResponse, Response, StreamingResponse
-from io import BytesIO
+from io import BytesIO, StringIO
+import csv
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, or_, select
 from typing import List, Optional
-import stripe
+import json
 import os
 from datetime import datetime, timedelta
 from calendar import monthrange
 from dotenv import load_dotenv
 
 from database import get_db
-from models import Donation, DonationSubscription
+from models import Donation, DonationSubscription, StripeEvent, YearEndReceiptRun, DONATION_STATUSES, donation_status_for, normalize_email
 from schemas import DonationCreate, DonationUpdate, DonationResponse, PaymentCreate, PaymentSession, ZakatCalculation, ZakatResult, SubscriptionCreate, SubscriptionSession
 from auth_utils import get_current_admin
-from pdf_service import generate_donation_certificate, generate_donation_certificate_to_bytes
 from email_service import send_donation_certificate_email
+from donation_stats import get_donation_totals
+from stripe_events import record_stripe_event, retry_dead_stripe_event, stripe_event_metrics
+from stripe_reconcile import run_stripe_reconciliation
+from year_end_receipts import run_progress, start_year_end_run
 from logging_config import get_logger
+from pagination import clamp_limit, keyset_paginate, set_next_cursor
 from s3_service import upload_file, download_file, generate_object_key, file_exists
+from response_cache import cached_response
+from lazy_imports import lazy_module
+from settings_service import get_settings
 
 load_dotenv()
 
-# Track processed webhook event IDs to prevent duplicate processing from Stripe retries.
-# In production with multiple workers, consider using Redis or a DB table instead.
-_processed_events: set = set()
-_MAX_PROCESSED_EVENTS = 5000  # Cap memory usage
-
 logger = get_logger(__name__)
 
 # Configure Stripe API key
 stripe_secret_key = os.getenv("STRIPE_SECRET_KEY")
-if stripe_secret_key and stripe_secret_key.startswith(('sk_test_', 'sk_live_')):
-    stripe.api_key = stripe_secret_key
+
+
+def _configure_stripe(module):
+    if stripe_secret_key and stripe_secret_key.startswith(('sk_test_', 'sk_live_')):
+        module.api_key = stripe_secret_key
+
+
+# Imported on first use, not at worker boot; see lazy_imports.py
+stripe = lazy_module("stripe", on_load=_configure_stripe)
+pdf_service = lazy_module("pdf_service")
 
 router = APIRouter()
 
@@ -64,7 +75,7 @@ def generate_certificate(donation: Donation, db: Session) -> str:
         filepath = os.path.join(certificates_dir, filename)
         
         # Generate PDF receipt
-        generate_donation_certificate(
+        pdf_service.generate_donation_certificate(
             donor_name=donation.name,
             amount=donation.amount,
             donation_date=donation.donated_at,
@@ -90,65 +101,38 @@ def generate_certificate(donation: Donation, db: Session) -> str:
 
 def email_certificate(donation: Donation) -> bool:
     """
-    Send certificate via email for a donation (generated on-the-fly)
-    
+    Queue the receipt email for a donation.
+
+    Only the outbox row is written here; the Arq worker renders the PDF
+    (marketing.attachments) when it sends, so Stripe webhooks and admin
+    requests never wait on ReportLab.
+
     Args:
-        donation: Donation object
-        
+        donation: Donation object (must already be committed)
+
     Returns:
-        True if email sent successfully, False otherwise
+        True if the email was queued, False otherwise
     """
     try:
         # Ensure donated_at is set
         if not donation.donated_at:
             donation.donated_at = datetime.utcnow()
 
-        # Generate PDF receipt on-the-fly (no file storage)
-        pdf_bytes = generate_donation_certificate_to_bytes(
-            donor_name=donation.name,
+        success = send_donation_certificate_email(
+            email=donation.email,
+            name=donation.name,
             amount=donation.amount,
             donation_date=donation.donated_at,
             donation_id=donation.id,
         )
 
-        # Create temporary file for email attachment
-        import tempfile
-        certificates_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "certificates")
-        os.makedirs(certificates_dir, exist_ok=True)
+        if success:
+            logger.info("Certificate email queued for donation %s", donation.id)
+        else:
+            logger.warning("Failed to queue certificate email for donation %s", donation.id)
 
-        with tempfile.NamedTemporaryFile(
-            mode='wb',
-            suffix='.pdf',
-            dir=certificates_dir,
-            delete=False
-        ) as temp_file:
-            temp_file.write(pdf_bytes)
-            temp_path = temp_file.name
+        return success
 
-        try:
-            # Send email with PDF attachment
-            success = send_donation_certificate_email(
-                email=donation.email,
-                name=donation.name,
-                amount=donation.amount,
-                pdf_path=temp_path,
-                donation_date=donation.donated_at,
-            )
-            
-            if success:
-                logger.info("Certificate emailed successfully for donation %s", donation.id)
-            else:
-                logger.warning("Failed to email certificate for donation %s", donation.id)
-            
-            return success
-        finally:
-            # Clean up temporary file
-            try:
-                if os.path.exists(temp_path):
-                    os.remove(temp_path)
-            except Exception as cleanup_error:
-                logger.warning("Failed to delete temporary certificate file: %s", str(cleanup_error))
-        
     except Exception as e:
         import traceback
         logger.error("Failed to email certificate for donation %s: %s", donation.id, str(e))
@@ -165,17 +149,123 @@ async def create_donation(donation: DonationCreate, db: Session = Depends(get_db
     return db_donation
 
 
+def _donation_filters(
+    start: Optional[datetime],
+    end: Optional[datetime],
+    status_filter: Optional[str],
+    frequency: Optional[str] = None,
+    search: Optional[str] = None,
+) -> list:
+    """Admin list / export filters. `start` is inclusive, `end` exclusive."""
+    filters = []
+    if start:
+        filters.append(Donation.donated_at >= start)
+    if end:
+        filters.append(Donation.donated_at < end)
+    if status_filter:
+        if status_filter not in DONATION_STATUSES:
+            raise HTTPException(status_code=400, detail=f"status must be one of {', '.join(DONATION_STATUSES)}")
+        filters.append(Donation.status == status_filter)
+    if frequency:
+        filters.append(Donation.frequency.ilike(f"%{frequency}%"))
+    if search:
+        filters.append(or_(Donation.name.ilike(f"%{search}%"), Donation.email.ilike(f"%{search}%")))
+    return filters
+
+
 @router.get("/", response_model=List[DonationResponse])
 async def get_donations(
-    skip: int = 0,
-    limit: int = 100000,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = 500,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    status_filter: Optional[str] = Query(None, alias="status"),
+    frequency: Optional[str] = None,
+    search: Optional[str] = None,
     db: Session = Depends(get_db),
     current_admin = Depends(get_current_admin)
 ):
-    donations = db.query(Donation).offset(skip).limit(limit).all()
+    """Admin: one page of matching donations, newest first.
+
+    Pass the `X-Next-Cursor` response header back as `cursor` (with the
+    same filters) for the next page; it is absent on the last page. For a
+    full dump use /export.
+    """
+    filters = _donation_filters(start, end, status_filter, frequency, search)
+    donations, next_cursor = keyset_paginate(
+        db.query(Donation).filter(*filters), Donation.id, Donation.id,
+        cursor=cursor, limit=clamp_limit(limit),
+    )
+    set_next_cursor(response, next_cursor)
     return donations
 
 
+EXPORT_COLUMNS = (
+    "id", "name", "email", "amount", "frequency", "status", "payment_method",
+    "donated_at", "stripe_session_id", "utm_source", "utm_medium", "utm_campaign", "notes",
+)
+EXPORT_BATCH = 1000
+
+
+def _csv_safe(value):
+    """Neutralise spreadsheet formulas in free-text cells (CSV injection)."""
+    if isinstance(value, str) and value[:1] in ("=", "+", "-", "@"):
+        return "'" + value
+    return value
+
+
+def _export_rows(db: Session, filters: list, fmt: str):
+    """Yield the export body in chunks, reading through a server-side cursor."""
+    columns = [getattr(Donation, c) for c in EXPORT_COLUMNS]
+    stmt = select(*columns).where(*filters).order_by(Donation.id)
+    result = db.execute(stmt.execution_options(stream_results=True, yield_per=EXPORT_BATCH))
+
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    if fmt == "csv":
+        writer.writerow(EXPORT_COLUMNS)
+    for partition in result.partitions():
+        for row in partition:
+            if fmt == "csv":
+                writer.writerow([_csv_safe(v) for v in row])
+            else:
+                buffer.write(json.dumps(dict(zip(EXPORT_COLUMNS, row)), default=str) + "\n")
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+@router.get("/export")
+async def export_donations(
+    fmt: str = Query("csv", alias="format", pattern="^(csv|ndjson)$"),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    status_filter: Optional[str] = Query(None, alias="status"),
+    frequency: Optional[str] = None,
+    search: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_admin = Depends(get_current_admin),
+):
+    """Admin: stream every matching donation as CSV or NDJSON.
+
+    Rows are fetched in batches and written as they arrive, so memory stays
+    flat regardless of table size. Takes the same filters as the list.
+    """
+    filters = _donation_filters(start, end, status_filter, frequency, search)
+
+    media_type = "text/csv" if fmt == "csv" else "application/x-ndjson"
+    filename = f"donations-{datetime.utcnow():%Y%m%d}.{fmt}"
+    logger.info("Admin %s exporting donations (%s, filters=%s)", current_admin.email, fmt, len(filters))
+    return StreamingResponse(
+        _export_rows(db, filters, fmt),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
 @router.put("/{donation_id}", response_model=DonationResponse)
 async def update_donation(
     donation_id: int,
@@ -199,6 +289,12 @@ async def update_donation(
             data["payment_method"], data["payment_method"]
         )
 
+    # Editing a legacy-style frequency ("Failed - …" → "One-Time") still moves the status.
+    if data.get("frequency") and "status" not in data:
+        implied = donation_status_for(data["frequency"])
+        if implied != donation_status_for(donation.frequency):
+            data["status"] = implied
+
     for field, value in data.items():
         setattr(donation, field, value)
 
@@ -325,6 +421,7 @@ async def create_manual_donation(
         email=email.strip(),
         amount=amount,
         frequency="Manual",
+        status="confirmed",
         payment_method=payment_method,
         proof_filename=proof_filename,
         notes=notes.strip() if notes else None,
@@ -384,8 +481,7 @@ async def get_donation_proof(
 
 def _is_eligible_for_receipt(donation: Donation) -> bool:
     """A receipt is only meaningful for successfully received donations."""
-    f = (donation.frequency or "").lower()
-    if f.startswith(("failed", "abandoned", "pending")):
+    if donation.status != "confirmed":
         return False
     if not donation.amount or donation.amount <= 0:
         return False
@@ -415,7 +511,7 @@ async def admin_download_receipt(
         db.commit()
 
     try:
-        pdf_bytes = generate_donation_certificate_to_bytes(
+        pdf_bytes = pdf_service.get_donation_receipt_pdf(
             donor_name=donation.name,
             amount=donation.amount,
             donation_date=donation.donated_at,
@@ -485,36 +581,26 @@ async def admin_email_receipt(
 
 
 @router.get("/stats")
+@cached_response("donations", "settings", ttl=30, stale_while_revalidate=300)
 async def get_donation_stats(db: Session = Depends(get_db)):
-    from models import Setting
-    
-    # Only count confirmed payments (exclude Failed, Abandoned, Pending)
-    confirmed_filter = ~Donation.frequency.like('Failed%') & \
-                       ~Donation.frequency.like('Abandoned%') & \
-                       ~Donation.frequency.like('Pending%')
-    total_donations = db.query(func.sum(Donation.amount)).filter(confirmed_filter).scalar() or 0
-    total_donors = db.query(Donation.email).filter(confirmed_filter).distinct().count()
-    recent_donations = db.query(Donation).filter(confirmed_filter).order_by(Donation.donated_at.desc()).limit(5).all()
+    # Only count confirmed payments (exclude failed, abandoned, pending)
+    totals = get_donation_totals(db)  # precomputed — see donation_stats.py
+    total_donations = totals.total_amount
+    total_donors = totals.donor_count
+    recent_donations = db.query(Donation).filter(Donation.status == "confirmed").order_by(Donation.donated_at.desc()).limit(5).all()
     
     # Get impact stats from settings
-    settings = db.query(Setting).filter(Setting.key.in_([
-        'meals_provided',
-        'families_supported', 
-        'orphans_cared_for',
-        'total_raised'
-    ])).all()
-    
-    settings_dict = {s.key: s.value for s in settings}
+    settings = get_settings(db)
     
     return {
         "total_donations": total_donations,
         "total_donors": total_donors,
         "recent_donations": recent_donations,
-        "total_raised": float(settings_dict.get('total_raised', '0')),
+        "total_raised": settings.get_float('total_raised'),
         "impact": {
-            "meals": int(settings_dict.get('meals_provided', '0')),
-            "families": int(settings_dict.get('families_supported', '0')),
-            "orphans": int(settings_dict.get('orphans_cared_for', '0'))
+            "meals": settings.get_int('meals_provided'),
+            "families": settings.get_int('families_supported'),
+            "orphans": settings.get_int('orphans_cared_for')
         }
     }
 
@@ -537,6 +623,7 @@ def _mask_donor_name(full_name: Optional[str]) -> str:
 
 
 @router.get("/recent-public")
+@cached_response("donations", ttl=30, stale_while_revalidate=300)
 async def get_recent_public_donations(limit: int = 5, db: Session = Depends(get_db)):
     """Public, privacy-safe list of top recent donations for the donate page.
 
@@ -544,14 +631,9 @@ async def get_recent_public_donations(limit: int = 5, db: Session = Depends(get_
     Sorted by amount (largest first). Excludes failed/abandoned/pending.
     """
     limit = max(1, min(limit, 10))
-    confirmed_filter = (
-        ~Donation.frequency.like('Failed%')
-        & ~Donation.frequency.like('Abandoned%')
-        & ~Donation.frequency.like('Pending%')
-    )
     donations = (
         db.query(Donation)
-        .filter(confirmed_filter, Donation.amount > 0)
+        .filter(Donation.status == "confirmed", Donation.amount > 0)
         .order_by(Donation.amount.desc())
         .limit(limit)
         .all()
@@ -990,58 +1072,31 @@ async def get_subscriptions(
     } for sub in subscriptions]
 
 
-@router.post("/update-subscription-status")
-async def update_subscription_status(db: Session = Depends(get_db)):
-    """Update subscription status from Stripe"""
+@router.post("/update-subscription-status", status_code=status.HTTP_202_ACCEPTED)
+def update_subscription_status(current_admin = Depends(get_current_admin)):
+    """Queue a refresh of every subscription's status from Stripe (stripe_reconcile.py).
+
+    Listing every Stripe subscription can take minutes, so the worker does
+    it (`refresh_subscriptions_task`), under the same lock as its hourly
+    reconciliation. Reload the subscription list to see the result.
+    """
     if not stripe.api_key:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Stripe not configured"
         )
-    
+
+    from marketing.queue import enqueue_subscription_refresh_job
+
     try:
-        # Get all pending subscriptions
-        pending_subs = db.query(DonationSubscription).filter(
-            DonationSubscription.status == "pending"
-        ).all()
-        
-        updated_count = 0
-        for sub in pending_subs:
-            if sub.stripe_subscription_id.startswith("pending_"):
-                # Try to find the actual subscription ID
-                session_id = sub.stripe_subscription_id.replace("pending_", "")
-                try:
-                    session = stripe.checkout.Session.retrieve(session_id)
-                    if session.subscription:
-                        stripe_sub = stripe.Subscription.retrieve(session.subscription)
-                        sub.stripe_subscription_id = session.subscription
-                        sub.status = stripe_sub.status
-                        sub.updated_at = datetime.utcnow()
-                        updated_count += 1
-                except Exception as e:
-                    logger.warning("Failed to update pending subscription %s: %s", sub.id, e)
-                    continue
-            else:
-                # Update status from existing subscription ID
-                try:
-                    stripe_sub = stripe.Subscription.retrieve(sub.stripe_subscription_id)
-                    if sub.status != stripe_sub.status:
-                        sub.status = stripe_sub.status
-                        sub.updated_at = datetime.utcnow()
-                        updated_count += 1
-                except Exception as e:
-                    logger.warning("Failed to retrieve subscription %s: %s", sub.stripe_subscription_id, e)
-                    continue
-        
-        db.commit()
-        return {"status": "success", "updated": updated_count}
-        
-    except Exception as e:
-        db.rollback()
+        enqueue_subscription_refresh_job()
+    except Exception as exc:
+        logger.warning("Could not queue the subscription refresh: %s", exc)
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Update failed: {str(e)}"
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Could not queue the refresh; the hourly reconciliation will still run",
         )
+    return {"status": "queued"}
 
 
 @router.get("/sync-debug")
@@ -1062,8 +1117,8 @@ async def sync_debug_info(current_admin = Depends(get_current_admin)):
     }
 
 @router.post("/sync-stripe-data")
-async def sync_stripe_data(db: Session = Depends(get_db), current_admin = Depends(get_current_admin)):
-    """Manually sync recent Stripe data (development helper)"""
+def sync_stripe_data(db: Session = Depends(get_db), current_admin = Depends(get_current_admin)):
+    """Run the Stripe reconciliation now instead of waiting for the hourly worker job (development helper)"""
     # Only allow in development/local environment
     environment = os.getenv("ENVIRONMENT", "development").lower()
     if environment == "production":
@@ -1079,93 +1134,11 @@ async def sync_stripe_data(db: Session = Depends(get_db), current_admin = Depend
         )
     
     try:
-        # Get recent checkout sessions
-        sessions = stripe.checkout.Session.list(limit=20)
-        synced_count = 0
-        
-        for session in sessions.data:
-            if session.payment_status == "paid":
-                if session.mode == "payment":
-                    # One-time payment
-                    existing = db.query(Donation).filter(
-                        Donation.email == session.customer_email,
-                        Donation.amount == session.amount_total / 100.0
-                    ).first()
-                    
-                    if not existing:
-                        # Handle missing customer details gracefully
-                        customer_name = "Unknown"
-                        if session.customer_details and hasattr(session.customer_details, 'name'):
-                            customer_name = session.customer_details.name or "Unknown"
-                        
-                        donation = Donation(
-                            name=customer_name,
-                            email=session.customer_email or "unknown@example.com",
-                            amount=session.amount_total / 100.0,
-                            frequency="One-Time (Synced)"
-                        )
-                        db.add(donation)
-                        synced_count += 1
-                        
-                elif session.mode == "subscription" and session.subscription:
-                    # Subscription
-                    existing = db.query(DonationSubscription).filter(
-                        DonationSubscription.stripe_subscription_id == session.subscription
-                    ).first()
-                    
-                    if not existing:
-                        try:
-                            stripe_sub = stripe.Subscription.retrieve(session.subscription)
-                            customer = stripe.Customer.retrieve(session.customer)
-                            
-                            # Handle missing customer data gracefully
-                            customer_name = "Unknown"
-                            customer_email = "unknown@example.com"
-                            
-                            if hasattr(customer, 'name') and customer.name:
-                                customer_name = customer.name
-                            if hasattr(customer, 'email') and customer.email:
-                                customer_email = customer.email
-                            
-                            # Handle subscription data safely
-                            amount = 0.0
-                            interval = "month"
-                            if stripe_sub.items and stripe_sub.items.data:
-                                price = stripe_sub.items.data[0].price
-                                if price.unit_amount:
-                                    amount = price.unit_amount / 100.0
-                                if price.recurring and price.recurring.interval:
-                                    interval = price.recurring.interval
-                            
-                            subscription = DonationSubscription(
-                                stripe_subscription_id=session.subscription,
-                                stripe_customer_id=session.customer,
-                                name=customer_name,
-                                email=customer_email,
-                                amount=amount,
-                                purpose="General Donation (Synced)",
-                                interval=interval,
-                                payment_day=1,  # Default
-                                status=stripe_sub.status,
-                                next_payment_date=datetime.utcfromtimestamp(stripe_sub.current_period_end) if stripe_sub.current_period_end else None
-                            )
-                            db.add(subscription)
-                            synced_count += 1
-                        except Exception as sub_error:
-                            # Log subscription sync error but continue with other sessions
-                            logger.error("Error syncing subscription %s: %s", session.subscription, str(sub_error))
-                            continue
-        
-        db.commit()
-        return {"status": "success", "synced": synced_count}
-        
+        summary = run_stripe_reconciliation(db)
+        return {"status": "success", **summary}
     except Exception as e:
         db.rollback()
-        # Log the full error for debugging
-        import traceback
-        logger.error("Stripe sync error: %s", str(e))
-        logger.error("Traceback: %s", traceback.format_exc())
-        
+        logger.exception("Stripe sync error: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Sync failed: {str(e)}"
@@ -1202,13 +1175,15 @@ async def debug_subscriptions(db: Session = Depends(get_db), current_admin = Dep
 async def stripe_webhook(request: Request, db: Session = Depends(get_db)):
     """Handle Stripe webhooks for payment confirmation.
 
-    Idempotency: Each event ID is tracked so Stripe retries don't create
-    duplicate records. For one-time payments, the pending donation (created
-    at session time) is updated — never duplicated. For subscriptions,
-    only invoice.payment_succeeded creates a donation record.
-    """
-    global _processed_events
+    The request path only verifies the signature, records the raw event in
+    `stripe_events` and acknowledges; the Arq worker applies it
+    (`process_stripe_event`) so a slow DB or mail path never makes Stripe
+    time out and retry.
 
+    Idempotency: the event id is unique in `stripe_events`, so Stripe
+    retries — on any worker, across restarts — are acknowledged without
+    being recorded twice.
+    """
     try:
         payload = await request.body()
         sig_header = request.headers.get("stripe-signature")
@@ -1231,284 +1206,398 @@ async def stripe_webhook(request: Request, db: Session = Depends(get_db)):
         event_id = event.get("id", "")
         event_type = event["type"]
 
-        # ── Idempotency: skip already-processed events ──
-        if event_id in _processed_events:
+        # Persist the verified raw body — a plain dict the worker can replay.
+        if not record_stripe_event(db, json.loads(payload)):
             logger.info("Skipping duplicate webhook event: %s (%s)", event_id, event_type)
             return {"status": "already_processed"}
 
-        _processed_events.add(event_id)
-        if len(_processed_events) > _MAX_PROCESSED_EVENTS:
-            _processed_events = set(list(_processed_events)[_MAX_PROCESSED_EVENTS // 2:])
-
-        logger.info("Processing webhook: %s (event %s)", event_type, event_id)
-
-        # ── checkout.session.completed ──
-        if event_type == "checkout.session.completed":
-            session = event["data"]["object"]
-            session_mode = session.get("mode", "payment")
-            session_id = session.get("id")
-
-            if session_mode == "payment":
-                customer_email = session.get("customer_email", "")
-                amount = session.get("amount_total", 0) / 100.0
-                metadata = session.get("metadata") or {}
-                donor_name = metadata.get("donor_name", "")
-                if not donor_name:
-                    details = session.get("customer_details") or {}
-                    donor_name = details.get("name", "")
-                frequency = metadata.get("frequency", "One-Time")
-
-                # Marketing attribution carried through from Donate page → Stripe metadata.
-                utm_source = metadata.get("utm_source")
-                utm_medium = metadata.get("utm_medium")
-                utm_campaign = metadata.get("utm_campaign")
-                utm_content = metadata.get("utm_content")
+        try:
+            from marketing.queue import enqueue_stripe_events_job
 
-                try:
-                    existing = db.query(Donation).filter(
-                        Donation.stripe_session_id == session_id
-                    ).first()
-
-                    if existing:
-                        existing.name = donor_name or existing.name
-                        existing.email = customer_email or existing.email
-                        existing.amount = amount
-                        existing.frequency = frequency
-                        existing.certificate_filename = "available"
-                        if utm_source:   existing.utm_source = utm_source
-                        if utm_medium:   existing.utm_medium = utm_medium
-                        if utm_campaign: existing.utm_campaign = utm_campaign
-                        if utm_content:  existing.utm_content = utm_content
-                        if not existing.donated_at:
-                            existing.donated_at = datetime.utcnow()
-                        db.commit()
-                        db.refresh(existing)
-                        logger.info("Donation %s confirmed (updated pending) — sending certificate to %s", existing.id, existing.email)
-                        _record_marketing_conversion(db, existing)
-                        _send_certificate_safe(existing)
-                    else:
-                        new_donation = Donation(
-                            name=donor_name or "Anonymous",
-                            email=customer_email,
-                            amount=amount,
-                            frequency=frequency,
-                            stripe_session_id=session_id,
-                            donated_at=datetime.utcnow(),
-                            certificate_filename="available",
-                            utm_source=utm_source,
-                            utm_medium=utm_medium,
-                            utm_campaign=utm_campaign,
-                            utm_content=utm_content,
-                        )
-                        db.add(new_donation)
-                        db.commit()
-                        db.refresh(new_donation)
-                        logger.info("Donation %s created (no pending found)", new_donation.id)
-                        _record_marketing_conversion(db, new_donation)
-                        _send_certificate_safe(new_donation)
+            enqueue_stripe_events_job()
+        except Exception as exc:
+            # The row is safe in stripe_events; the worker cron will pick it up.
+            logger.warning("Could not enqueue Stripe event %s immediately: %s", event_id, exc)
 
-                except Exception as e:
-                    logger.error("Error processing payment webhook: %s", e)
-                    db.rollback()
-                    raise
+        logger.info("Webhook recorded: %s (event %s)", event_type, event_id)
+        return {"status": "received"}
 
-            elif session_mode == "subscription":
-                try:
-                    sub = db.query(DonationSubscription).filter(
-                        DonationSubscription.stripe_session_id == session_id
-                    ).first()
-                    if sub:
-                        sub.status = "checkout_completed"
-                        db.commit()
-                except Exception as e:
-                    logger.error("Error updating subscription checkout: %s", e)
-                    db.rollback()
+    except stripe.error.SignatureVerificationError as e:
+        logger.error("Webhook signature verification failed: %s", str(e))
+        return JSONResponse(status_code=400, content={"status": "signature verification failed"})
+    except Exception as e:
+        logger.error("Webhook processing error: %s", str(e))
+        return JSONResponse(status_code=500, content={"status": "webhook error"})
+
+
+@router.get("/stripe-events/metrics")
+async def get_stripe_event_metrics(db: Session = Depends(get_db), current_admin = Depends(get_current_admin)):
+    """Stripe event queue depth and processing lag (admin only)"""
+    return stripe_event_metrics(db)
 
-        # ── customer.subscription.created — activate subscription, NO donation ──
-        elif event_type == "customer.subscription.created":
-            subscription = event["data"]["object"]
-            subscription_id = subscription.get("id")
-            customer_id = subscription.get("customer")
+
+@router.get("/stripe-events/dead")
+async def get_dead_stripe_events(
+    limit: int = 50,
+    db: Session = Depends(get_db),
+    current_admin = Depends(get_current_admin)
+):
+    """Dead-lettered Stripe events, newest first (admin only)"""
+    rows = (
+        db.query(StripeEvent)
+        .filter(StripeEvent.status == "dead")
+        .order_by(StripeEvent.received_at.desc())
+        .limit(min(limit, 200))
+        .all()
+    )
+    return [
+        {
+            "event_id": r.event_id,
+            "event_type": r.event_type,
+            "object_id": r.object_id,
+            "attempts": r.attempts,
+            "error": r.error,
+            "received_at": r.received_at,
+            "processed_at": r.processed_at,
+        }
+        for r in rows
+    ]
+
+
+@router.post("/stripe-events/{event_id}/retry")
+async def retry_stripe_event(event_id: str, db: Session = Depends(get_db), current_admin = Depends(get_current_admin)):
+    """Re-queue a dead-lettered Stripe event (admin only)"""
+    if not retry_dead_stripe_event(db, event_id):
+        raise HTTPException(status_code=404, detail="No dead-lettered event with that id")
+    try:
+        from marketing.queue import enqueue_stripe_events_job
+
+        enqueue_stripe_events_job()
+    except Exception as exc:
+        logger.warning("Could not enqueue Stripe event retry %s immediately: %s", event_id, exc)
+    return {"message": f"Event {event_id} re-queued"}
+
+
+@router.post("/year-end-receipts", status_code=status.HTTP_202_ACCEPTED)
+async def start_year_end_receipts(
+    tax_year: int,
+    send_emails: bool = True,
+    db: Session = Depends(get_db),
+    current_admin = Depends(get_current_admin)
+):
+    """Start (or resume) the bulk annual receipt run for a tax year (admin only).
+
+    The worker renders, stores and emails the receipts; poll
+    GET /year-end-receipts/{tax_year} for progress.
+    """
+    if not 2000 <= tax_year <= datetime.utcnow().year:
+        raise HTTPException(status_code=400, detail="Invalid tax year")
+    run = start_year_end_run(db, tax_year, send_emails=send_emails)
+    try:
+        from marketing.queue import enqueue_year_end_receipts_job
+
+        enqueue_year_end_receipts_job()
+    except Exception as exc:
+        # The run row is committed; the worker cron picks it up within a minute.
+        logger.warning("Could not enqueue year-end receipts %s immediately: %s", tax_year, exc)
+    return run_progress(run)
+
+
+@router.get("/year-end-receipts/{tax_year}")
+async def get_year_end_receipts_progress(
+    tax_year: int,
+    db: Session = Depends(get_db),
+    current_admin = Depends(get_current_admin)
+):
+    """Progress of the annual receipt run for a tax year (admin only)"""
+    run = db.query(YearEndReceiptRun).filter(YearEndReceiptRun.tax_year == tax_year).first()
+    if not run:
+        raise HTTPException(status_code=404, detail="No receipt run for that year")
+    return run_progress(run)
+
+
+def process_stripe_event(db: Session, event: dict) -> None:
+    """Apply one Stripe event. Called by the worker (stripe_events.py).
+
+    For one-time payments, the pending donation (created at session time)
+    is updated — never duplicated. For subscriptions, only
+    invoice.payment_succeeded creates a donation record. Any exception is
+    propagated so the consumer retries the event (and eventually
+    dead-letters it).
+    """
+    event_id = event.get("id", "")
+    event_type = event["type"]
+    logger.info("Processing webhook: %s (event %s)", event_type, event_id)
+
+    # ── checkout.session.completed ──
+    if event_type == "checkout.session.completed":
+        session = event["data"]["object"]
+        session_mode = session.get("mode", "payment")
+        session_id = session.get("id")
+
+        if session_mode == "payment":
+            customer_email = session.get("customer_email", "")
+            amount = session.get("amount_total", 0) / 100.0
+            metadata = session.get("metadata") or {}
+            donor_name = metadata.get("donor_name", "")
+            if not donor_name:
+                details = session.get("customer_details") or {}
+                donor_name = details.get("name", "")
+            frequency = metadata.get("frequency", "One-Time")
+
+            # Marketing attribution carried through from Donate page → Stripe metadata.
+            utm_source = metadata.get("utm_source")
+            utm_medium = metadata.get("utm_medium")
+            utm_campaign = metadata.get("utm_campaign")
+            utm_content = metadata.get("utm_content")
 
             try:
-                customer = stripe.Customer.retrieve(customer_id)
-                metadata = subscription.get("metadata") or customer.get("metadata") or {}
-                amount = subscription["items"]["data"][0]["price"]["unit_amount"] / 100.0
-                interval = subscription["items"]["data"][0]["price"]["recurring"]["interval"]
-
-                existing_sub = db.query(DonationSubscription).filter(
-                    DonationSubscription.email == customer.email,
-                    DonationSubscription.status.in_(["pending", "checkout_completed"])
+                existing = db.query(Donation).filter(
+                    Donation.stripe_session_id == session_id
                 ).first()
 
-                if existing_sub:
-                    existing_sub.stripe_subscription_id = subscription_id
-                    existing_sub.stripe_customer_id = customer_id
-                    existing_sub.status = "active"
+                if existing:
+                    existing.name = donor_name or existing.name
+                    existing.email = customer_email or existing.email
+                    existing.amount = amount
+                    existing.frequency = frequency
+                    existing.status = "confirmed"
+                    existing.certificate_filename = "available"
+                    if utm_source:   existing.utm_source = utm_source
+                    if utm_medium:   existing.utm_medium = utm_medium
+                    if utm_campaign: existing.utm_campaign = utm_campaign
+                    if utm_content:  existing.utm_content = utm_content
+                    if not existing.donated_at:
+                        existing.donated_at = datetime.utcnow()
+                    db.commit()
+                    db.refresh(existing)
+                    logger.info("Donation %s confirmed (updated pending) — sending certificate to %s", existing.id, existing.email)
+                    _record_marketing_conversion(db, existing)
+                    _send_certificate_safe(existing)
                 else:
-                    db.add(DonationSubscription(
-                        stripe_subscription_id=subscription_id,
-                        stripe_customer_id=customer_id,
-                        name=metadata.get("donor_name", customer.name or ""),
-                        email=customer.email,
+                    new_donation = Donation(
+                        name=donor_name or "Anonymous",
+                        email=customer_email,
                         amount=amount,
-                        purpose=metadata.get("purpose", "General Donation"),
-                        interval=interval,
-                        payment_day=1,
-                        status="active",
-                    ))
+                        frequency=frequency,
+                        status="confirmed",
+                        stripe_session_id=session_id,
+                        donated_at=datetime.utcnow(),
+                        certificate_filename="available",
+                        utm_source=utm_source,
+                        utm_medium=utm_medium,
+                        utm_campaign=utm_campaign,
+                        utm_content=utm_content,
+                    )
+                    db.add(new_donation)
+                    db.commit()
+                    db.refresh(new_donation)
+                    logger.info("Donation %s created (no pending found)", new_donation.id)
+                    _record_marketing_conversion(db, new_donation)
+                    _send_certificate_safe(new_donation)
 
-                # NOTE: No donation record here. invoice.payment_succeeded
-                # creates exactly one donation per actual charge.
-                db.commit()
-                logger.info("Subscription %s activated for %s", subscription_id, customer.email)
+            except Exception as e:
+                logger.error("Error processing payment webhook: %s", e)
+                db.rollback()
+                raise
 
+        elif session_mode == "subscription":
+            try:
+                sub = db.query(DonationSubscription).filter(
+                    DonationSubscription.stripe_session_id == session_id
+                ).first()
+                if sub:
+                    sub.status = "checkout_completed"
+                    db.commit()
             except Exception as e:
-                logger.error("Error processing subscription created: %s", e)
+                logger.error("Error updating subscription checkout: %s", e)
                 db.rollback()
+                raise
 
-        # ── invoice.payment_succeeded — ONE donation per actual charge ──
-        elif event_type == "invoice.payment_succeeded":
-            invoice = event["data"]["object"]
-            invoice_id = invoice.get("id", "")
-            subscription_id = invoice.get("subscription")
+    # ── customer.subscription.created — activate subscription, NO donation ──
+    elif event_type == "customer.subscription.created":
+        subscription = event["data"]["object"]
+        subscription_id = subscription.get("id")
+        customer_id = subscription.get("customer")
 
-            if subscription_id:
-                amount_paid = invoice.get("amount_paid", 0) / 100.0
-                billing_reason = invoice.get("billing_reason", "")
+        try:
+            customer = stripe.Customer.retrieve(customer_id)
+            metadata = subscription.get("metadata") or customer.get("metadata") or {}
+            amount = subscription["items"]["data"][0]["price"]["unit_amount"] / 100.0
+            interval = subscription["items"]["data"][0]["price"]["recurring"]["interval"]
+
+            existing_sub = db.query(DonationSubscription).filter(
+                DonationSubscription.email == normalize_email(customer.email),
+                DonationSubscription.status.in_(["pending", "checkout_completed"])
+            ).first()
+
+            if existing_sub:
+                existing_sub.stripe_subscription_id = subscription_id
+                existing_sub.stripe_customer_id = customer_id
+                existing_sub.status = "active"
+            else:
+                db.add(DonationSubscription(
+                    stripe_subscription_id=subscription_id,
+                    stripe_customer_id=customer_id,
+                    name=metadata.get("donor_name", customer.name or ""),
+                    email=customer.email,
+                    amount=amount,
+                    purpose=metadata.get("purpose", "General Donation"),
+                    interval=interval,
+                    payment_day=1,
+                    status="active",
+                ))
+
+            # NOTE: No donation record here. invoice.payment_succeeded
+            # creates exactly one donation per actual charge.
+            db.commit()
+            logger.info("Subscription %s activated for %s", subscription_id, customer.email)
 
-                # Guard: check if we already recorded a donation for this invoice
-                existing_invoice_donation = db.query(Donation).filter(
-                    Donation.stripe_session_id == invoice_id
-                ).first()
-                if existing_invoice_donation:
-                    logger.info("Invoice %s already recorded, skipping", invoice_id)
-                else:
-                    db_sub = db.query(DonationSubscription).filter(
-                        DonationSubscription.stripe_subscription_id == subscription_id
-                    ).first()
-
-                    if db_sub:
-                        try:
-                            donation = Donation(
-                                name=db_sub.name,
-                                email=db_sub.email,
-                                amount=amount_paid,
-                                frequency=f"Recurring {db_sub.interval}ly",
-                                stripe_session_id=invoice_id,
-                                donated_at=datetime.utcnow(),
-                                certificate_filename="available",
-                            )
-                            db.add(donation)
-
-                            db_sub.next_payment_date = calculate_next_payment_date(
-                                db_sub.payment_day, db_sub.payment_month, db_sub.interval
-                            )
-                            db_sub.updated_at = datetime.utcnow()
-                            db.commit()
-                            db.refresh(donation)
-                            logger.info("Subscription payment recorded: donation %s ($%s)", donation.id, amount_paid)
-                            _send_certificate_safe(donation)
-                        except Exception as e:
-                            logger.error("Error processing subscription payment: %s", e)
-                            db.rollback()
-
-        # ── invoice.payment_failed ──
-        elif event_type == "invoice.payment_failed":
-            subscription_id = event["data"]["object"].get("subscription")
-            if subscription_id:
+        except Exception as e:
+            logger.error("Error processing subscription created: %s", e)
+            db.rollback()
+            raise
+
+    # ── invoice.payment_succeeded — ONE donation per actual charge ──
+    elif event_type == "invoice.payment_succeeded":
+        invoice = event["data"]["object"]
+        invoice_id = invoice.get("id", "")
+        subscription_id = invoice.get("subscription")
+
+        if subscription_id:
+            amount_paid = invoice.get("amount_paid", 0) / 100.0
+            billing_reason = invoice.get("billing_reason", "")
+
+            # Guard: check if we already recorded a donation for this invoice
+            existing_invoice_donation = db.query(Donation).filter(
+                Donation.stripe_session_id == invoice_id
+            ).first()
+            if existing_invoice_donation:
+                logger.info("Invoice %s already recorded, skipping", invoice_id)
+            else:
                 db_sub = db.query(DonationSubscription).filter(
                     DonationSubscription.stripe_subscription_id == subscription_id
                 ).first()
-                if db_sub:
-                    db_sub.status = "past_due"
-                    db_sub.updated_at = datetime.utcnow()
-                    db.commit()
 
-        # ── customer.subscription.deleted ──
-        elif event_type == "customer.subscription.deleted":
-            subscription_id = event["data"]["object"].get("id")
-            if subscription_id:
-                db_sub = db.query(DonationSubscription).filter(
-                    DonationSubscription.stripe_subscription_id == subscription_id
-                ).first()
                 if db_sub:
-                    db_sub.status = "canceled"
-                    db_sub.updated_at = datetime.utcnow()
-                    db.commit()
-
-        # ── checkout.session.expired — user abandoned checkout ──
-        elif event_type == "checkout.session.expired":
-            session = event["data"]["object"]
-            session_id = session.get("id")
-            amount = session.get("amount_total", 0) / 100.0
-            customer_email = session.get("customer_email", "")
-            details = session.get("customer_details") or {}
-            if not customer_email:
-                customer_email = details.get("email", "")
-            donor_name = details.get("name", "") or (session.get("metadata") or {}).get("donor_name", "")
-
-            if customer_email and amount > 0:
-                # Avoid duplicates if the same session already recorded
-                exists = db.query(Donation).filter(
-                    Donation.stripe_session_id == session_id
-                ).first()
-                if not exists:
                     try:
-                        db.add(Donation(
-                            name=donor_name or "Anonymous",
-                            email=customer_email,
-                            amount=amount,
-                            frequency="Abandoned",
-                            stripe_session_id=session_id,
+                        donation = Donation(
+                            name=db_sub.name,
+                            email=db_sub.email,
+                            amount=amount_paid,
+                            frequency=f"Recurring {db_sub.interval}ly",
+                            status="confirmed",
+                            stripe_session_id=invoice_id,
                             donated_at=datetime.utcnow(),
-                        ))
-                        db.commit()
-                        logger.info("Recorded abandoned checkout for %s ($%s)", customer_email, amount)
-                    except Exception as e:
-                        logger.error("Error recording abandoned checkout: %s", e)
-                        db.rollback()
+                            certificate_filename="available",
+                        )
+                        db.add(donation)
 
-        # ── charge.failed — payment was declined ──
-        elif event_type == "charge.failed":
-            charge = event["data"]["object"]
-            charge_id = charge.get("id", "")
-            amount = charge.get("amount", 0) / 100.0
-            customer_email = charge.get("billing_details", {}).get("email") or charge.get("receipt_email", "")
-            donor_name = charge.get("billing_details", {}).get("name", "") or "Anonymous"
-            failure_code = charge.get("failure_code") or charge.get("outcome", {}).get("reason") or "declined"
-            failure_message = charge.get("failure_message") or charge.get("outcome", {}).get("seller_message", "")
-
-            if customer_email and amount > 0:
-                exists = db.query(Donation).filter(
-                    Donation.stripe_session_id == charge_id
-                ).first()
-                if not exists:
-                    try:
-                        reason = failure_code[:40]  # keep frequency column short
-                        db.add(Donation(
-                            name=donor_name,
-                            email=customer_email,
-                            amount=amount,
-                            frequency=f"Failed - {reason}",
-                            stripe_session_id=charge_id,
-                            donated_at=datetime.utcnow(),
-                        ))
+                        db_sub.next_payment_date = calculate_next_payment_date(
+                            db_sub.payment_day, db_sub.payment_month, db_sub.interval
+                        )
+                        db_sub.updated_at = datetime.utcnow()
                         db.commit()
-                        logger.info("Recorded failed charge for %s ($%s): %s — %s", customer_email, amount, failure_code, failure_message)
+                        db.refresh(donation)
+                        logger.info("Subscription payment recorded: donation %s ($%s)", donation.id, amount_paid)
+                        _send_certificate_safe(donation)
                     except Exception as e:
-                        logger.error("Error recording failed charge: %s", e)
+                        logger.error("Error processing subscription payment: %s", e)
                         db.rollback()
+                        raise
+
+    # ── invoice.payment_failed ──
+    elif event_type == "invoice.payment_failed":
+        subscription_id = event["data"]["object"].get("subscription")
+        if subscription_id:
+            db_sub = db.query(DonationSubscription).filter(
+                DonationSubscription.stripe_subscription_id == subscription_id
+            ).first()
+            if db_sub:
+                db_sub.status = "past_due"
+                db_sub.updated_at = datetime.utcnow()
+                db.commit()
 
-        logger.info("Webhook processed successfully: %s", event_type)
-        return {"status": "success"}
+    # ── customer.subscription.deleted ──
+    elif event_type == "customer.subscription.deleted":
+        subscription_id = event["data"]["object"].get("id")
+        if subscription_id:
+            db_sub = db.query(DonationSubscription).filter(
+                DonationSubscription.stripe_subscription_id == subscription_id
+            ).first()
+            if db_sub:
+                db_sub.status = "canceled"
+                db_sub.updated_at = datetime.utcnow()
+                db.commit()
 
-    except stripe.error.SignatureVerificationError as e:
-        logger.error("Webhook signature verification failed: %s", str(e))
-        return JSONResponse(status_code=400, content={"status": "signature verification failed"})
-    except Exception as e:
-        logger.error("Webhook processing error: %s", str(e))
-        return JSONResponse(status_code=500, content={"status": "webhook error"})
+    # ── checkout.session.expired — user abandoned checkout ──
+    elif event_type == "checkout.session.expired":
+        session = event["data"]["object"]
+        session_id = session.get("id")
+        amount = session.get("amount_total", 0) / 100.0
+        customer_email = session.get("customer_email", "")
+        details = session.get("customer_details") or {}
+        if not customer_email:
+            customer_email = details.get("email", "")
+        donor_name = details.get("name", "") or (session.get("metadata") or {}).get("donor_name", "")
+
+        if customer_email and amount > 0:
+            # Avoid duplicates if the same session already recorded
+            exists = db.query(Donation).filter(
+                Donation.stripe_session_id == session_id
+            ).first()
+            if not exists:
+                try:
+                    db.add(Donation(
+                        name=donor_name or "Anonymous",
+                        email=customer_email,
+                        amount=amount,
+                        frequency="Abandoned",
+                        status="abandoned",
+                        stripe_session_id=session_id,
+                        donated_at=datetime.utcnow(),
+                    ))
+                    db.commit()
+                    logger.info("Recorded abandoned checkout for %s ($%s)", customer_email, amount)
+                except Exception as e:
+                    logger.error("Error recording abandoned checkout: %s", e)
+                    db.rollback()
+                    raise
+
+    # ── charge.failed — payment was declined ──
+    elif event_type == "charge.failed":
+        charge = event["data"]["object"]
+        charge_id = charge.get("id", "")
+        amount = charge.get("amount", 0) / 100.0
+        customer_email = charge.get("billing_details", {}).get("email") or charge.get("receipt_email", "")
+        donor_name = charge.get("billing_details", {}).get("name", "") or "Anonymous"
+        failure_code = charge.get("failure_code") or charge.get("outcome", {}).get("reason") or "declined"
+        failure_message = charge.get("failure_message") or charge.get("outcome", {}).get("seller_message", "")
+
+        if customer_email and amount > 0:
+            exists = db.query(Donation).filter(
+                Donation.stripe_session_id == charge_id
+            ).first()
+            if not exists:
+                try:
+                    reason = failure_code[:40]  # keep frequency column short
+                    db.add(Donation(
+                        name=donor_name,
+                        email=customer_email,
+                        amount=amount,
+                        frequency=f"Failed - {reason}",
+                        status="failed",
+                        stripe_session_id=charge_id,
+                        donated_at=datetime.utcnow(),
+                    ))
+                    db.commit()
+                    logger.info("Recorded failed charge for %s ($%s): %s — %s", customer_email, amount, failure_code, failure_message)
+                except Exception as e:
+                    logger.error("Error recording failed charge: %s", e)
+                    db.rollback()
+                    raise
+
+    logger.info("Webhook processed successfully: %s", event_type)
 
 
 def _send_certificate_safe(donation: Donation):
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Response
 from sqlalchemy.orm import Session
 from typing import List, Optional
 import os
@@ -8,6 +8,7 @@ from database import get_db
 from models import Event
 from schemas import EventCreate, EventResponse
 from auth_utils import get_current_admin
+from pagination import clamp_limit, keyset_paginate, set_next_cursor
 from s3_service import upload_file, delete_file, generate_object_key, extract_object_key_from_url
 from media_processing import compress_image, should_compress_image
 
@@ -86,7 +87,8 @@ async def create_event(
 
 @router.get("/", response_model=List[EventResponse])
 async def get_events(
-    skip: int = 0,
+    response: Response,
+    cursor: Optional[str] = None,
     limit: int = 100,
     upcoming_only: bool = False,
     db: Session = Depends(get_db)
@@ -95,7 +97,9 @@ async def get_events(
     if upcoming_only:
         query = query.filter(Event.date >= datetime.utcnow())
     
-    events = query.order_by(Event.created_at.desc()).offset(skip).limit(limit).all()
+    # Newest first; id follows creation order (created_at is nullable, so not a keyset key).
+    events, next_cursor = keyset_paginate(query, Event.id, Event.id, cursor=cursor, limit=clamp_limit(limit))
+    set_next_cursor(response, next_cursor)
     return events
 
 
@@ -21,6 +21,7 @@ from auth_utils import get_current_admin
 from database import get_db
 from logging_config import get_logger
 from models import FundraisingProject, User
+from response_cache import cached_response
 
 logger = get_logger(__name__)
 router = APIRouter()
@@ -28,7 +29,7 @@ router = APIRouter()
 
 # ── Helpers ──────────────────────────────────────────────────────────
 
-def _serialize(p: FundraisingProject) -> dict:
+def serialize_project(p: FundraisingProject) -> dict:
     remaining_cents = max(0, (p.goal_cents or 0) - (p.spent_cents or 0))
     goal = (p.goal_cents or 0) / 100.0
     spent = (p.spent_cents or 0) / 100.0
@@ -113,6 +114,7 @@ class SpentAdjust(BaseModel):
 # ── Public endpoints ────────────────────────────────────────────────
 
 @router.get("/")
+@cached_response("fundraising_projects")
 async def list_public(
     include_inactive: bool = False,
     db: Session = Depends(get_db),
@@ -133,7 +135,7 @@ async def list_public(
         FundraisingProject.display_order.asc(),
         FundraisingProject.id.asc(),
     ).all()
-    return [_serialize(p) for p in rows]
+    return [serialize_project(p) for p in rows]
 
 
 @router.get("/by-slug/{slug}")
@@ -141,7 +143,7 @@ async def get_by_slug(slug: str, db: Session = Depends(get_db)):
     p = db.query(FundraisingProject).filter(FundraisingProject.slug == slug).first()
     if not p or not p.is_active:
         raise HTTPException(status_code=404, detail="Project not found")
-    return _serialize(p)
+    return serialize_project(p)
 
 
 # ── Admin endpoints ─────────────────────────────────────────────────
@@ -156,7 +158,7 @@ async def list_admin(
         .order_by(FundraisingProject.display_order.asc(), FundraisingProject.id.desc())
         .all()
     )
-    return [_serialize(p) for p in rows]
+    return [serialize_project(p) for p in rows]
 
 
 @router.get("/{project_id}")
@@ -168,7 +170,7 @@ async def get_admin(
     p = db.query(FundraisingProject).filter(FundraisingProject.id == project_id).first()
     if not p:
         raise HTTPException(status_code=404, detail="Project not found")
-    return _serialize(p)
+    return serialize_project(p)
 
 
 @router.post("/", status_code=status.HTTP_201_CREATED)
@@ -201,7 +203,7 @@ async def create_project(
     db.commit()
     db.refresh(p)
     logger.info("Admin %s created project %s (%s)", current_admin.email, p.id, p.slug)
-    return _serialize(p)
+    return serialize_project(p)
 
 
 @router.put("/{project_id}")
@@ -238,7 +240,7 @@ async def update_project(
     p.updated_at = datetime.utcnow()
     db.commit()
     db.refresh(p)
-    return _serialize(p)
+    return serialize_project(p)
 
 
 @router.post("/{project_id}/adjust-spent")
@@ -264,7 +266,7 @@ async def adjust_spent(
     p.updated_at = datetime.utcnow()
     db.commit()
     db.refresh(p)
-    return _serialize(p)
+    return serialize_project(p)
 
 
 @router.delete("/{project_id}")
@@ -11,6 +11,7 @@ from schemas import GalleryItemCreate, GalleryItemUpdate, GalleryItemResponse
 from auth_utils import get_current_admin
 from s3_service import upload_file, delete_file, generate_object_key, extract_object_key_from_url
 from media_processing import compress_image, compress_video, generate_video_thumbnail, should_compress_image, should_compress_video
+from response_cache import cached_response
 
 router = APIRouter()
 
@@ -20,6 +21,7 @@ VIDEO_UPLOAD_DIR = "uploads/media/videos"
 
 
 @router.get("/", response_model=List[GalleryItemResponse])
+@cached_response("gallery", model=List[GalleryItemResponse])
 async def get_gallery_items(
     active_only: bool = True,
     db: Session = Depends(get_db)
@@ -14,7 +14,6 @@ Admin (requires admin):
 from __future__ import annotations
 
 import os
-from datetime import datetime
 from typing import Optional
 
 from fastapi import APIRouter, Depends, HTTPException, Request, status
@@ -25,6 +24,7 @@ from sqlalchemy.orm import Session
 from auth_utils import get_current_admin
 from database import get_db
 from logging_config import get_logger
+from pagination import clamp_limit, keyset_paginate, page_envelope
 from marketing.compliance import (
     consume_unsubscribe_token,
     is_suppressed,
@@ -32,7 +32,9 @@ from marketing.compliance import (
     suppress_email,
     unsuppress_email,
 )
-from models import CampaignSend, EmailEvent, EmailOutbox, EmailSuppression, MarketingCampaign, User
+from marketing.dispatcher import outbox_backlog_metrics
+from marketing.webhooks import record_resend_event
+from models import EmailOutbox, EmailSuppression, User
 
 logger = get_logger(__name__)
 
@@ -104,6 +106,9 @@ async def resend_webhook(request: Request, db: Session = Depends(get_db)):
       - email.complained    → suppress permanently
       - email.delivery_delayed → log only, do not suppress
       - email.delivered     → mark outbox row as delivered (idempotent)
+
+    The request path only verifies, dedupes on `svix-id` and records the
+    event — the effects above are applied asynchronously by the worker.
     """
     raw_body = await request.body()
 
@@ -131,84 +136,25 @@ async def resend_webhook(request: Request, db: Session = Depends(get_db)):
         raise HTTPException(status_code=400, detail="Malformed JSON body")
 
     event_type = event.get("type", "")
-    data = event.get("data", {}) or {}
-    to_field = data.get("to") or []
-    recipient = to_field[0] if to_field else data.get("email", "")
-    message_id = data.get("email_id") or data.get("id")
-
-    logger.info("Resend webhook: type=%s recipient=%s msg=%s", event_type, recipient, message_id)
-
-    if not recipient:
-        return {"received": True, "action": "no-op (no recipient)"}
-
-    # Find the associated campaign_send via outbox.provider_message_id so we
-    # can update aggregate counters and insert an event row.
-    outbox_row = None
-    cs_row: CampaignSend | None = None
-    if message_id:
-        outbox_row = (
-            db.query(EmailOutbox)
-            .filter(EmailOutbox.provider_message_id == message_id)
-            .first()
-        )
-        if outbox_row:
-            cs_row = (
-                db.query(CampaignSend)
-                .filter(CampaignSend.outbox_id == outbox_row.id)
-                .first()
-            )
-
-    def _log_event(etype: str, *, url_value: str | None = None, meta: dict | None = None) -> None:
-        ev = EmailEvent(
-            campaign_send_id=cs_row.id if cs_row else None,
-            outbox_id=outbox_row.id if outbox_row else None,
-            recipient_email=recipient.lower(),
-            campaign_id=cs_row.campaign_id if cs_row else None,
-            event_type=etype,
-            url=url_value,
-            event_metadata=meta or {},
-        )
-        db.add(ev)
-
-    if event_type in ("email.bounced", "bounced"):
-        bounce_type = (data.get("bounce", {}) or {}).get("type", "")
-        is_hard = "hard" in bounce_type.lower() or "permanent" in bounce_type.lower() or not bounce_type
-        if is_hard:
-            suppress_email(db, recipient, reason="hard_bounce", source_message_id=message_id)
-        _log_event("bounce", meta={"bounce_type": bounce_type, "is_hard": is_hard})
-        if cs_row and is_hard and not cs_row.bounced:
-            cs_row.bounced = True
-            if cs_row.campaign_id:
-                camp = db.query(MarketingCampaign).filter(MarketingCampaign.id == cs_row.campaign_id).first()
-                if camp:
-                    camp.bounced_count = (camp.bounced_count or 0) + 1
-        db.commit()
-
-    elif event_type in ("email.complained", "complained"):
-        suppress_email(db, recipient, reason="complaint", source_message_id=message_id)
-        _log_event("complaint", meta={})
-        if cs_row and not cs_row.complained:
-            cs_row.complained = True
-            if cs_row.campaign_id:
-                camp = db.query(MarketingCampaign).filter(MarketingCampaign.id == cs_row.campaign_id).first()
-                if camp:
-                    camp.complained_count = (camp.complained_count or 0) + 1
-        db.commit()
-
-    elif event_type in ("email.delivered", "delivered"):
-        if outbox_row and outbox_row.status != "sent":
-            outbox_row.status = "sent"
-            outbox_row.sent_at = outbox_row.sent_at or datetime.utcnow()
-        _log_event("delivered", meta={})
-        if cs_row and cs_row.status != "sent":
-            cs_row.status = "sent"
-            if cs_row.campaign_id:
-                camp = db.query(MarketingCampaign).filter(MarketingCampaign.id == cs_row.campaign_id).first()
-                if camp:
-                    camp.delivered_count = (camp.delivered_count or 0) + 1
-        db.commit()
-
-    return {"received": True, "event_type": event_type, "recipient": recipient}
+
+    # Persist + acknowledge. Provider retries reuse the same svix-id and are
+    # dropped here; status / suppression / counter updates are applied in
+    # batches by the worker (marketing.webhooks.apply_pending_resend_events).
+    row = record_resend_event(db, event, svix_id=request.headers.get("svix-id"), raw_body=raw_body)
+    if row is None:
+        logger.info("Resend webhook: duplicate delivery %s (%s) ignored", request.headers.get("svix-id"), event_type)
+        return {"received": True, "duplicate": True, "event_type": event_type}
+
+    logger.info("Resend webhook: type=%s recorded as event %s", event_type, row.id)
+    try:
+        from marketing.queue import enqueue_resend_events_job  # noqa: WPS433
+
+        enqueue_resend_events_job()
+    except Exception as exc:
+        # Row stays 'pending' — the worker cron applies it on its next pass.
+        logger.warning("Could not enqueue Resend event processing (will be retried): %s", exc)
+
+    return {"received": True, "event_type": event_type}
 
 
 # ─────────────────────────────────────────────────────────────────────
@@ -217,22 +163,21 @@ async def resend_webhook(request: Request, db: Session = Depends(get_db)):
 
 @router.get("/outbox")
 async def list_outbox(
-    skip: int = 0,
+    cursor: Optional[str] = None,
     limit: int = 50,
     status_filter: Optional[str] = None,
     db: Session = Depends(get_db),
     current_admin: User = Depends(get_current_admin),
 ):
-    """Paginated view of recent emails. Admin only."""
+    """Paginated view of recent emails, newest first. Admin only."""
     query = db.query(EmailOutbox)
     if status_filter:
         query = query.filter(EmailOutbox.status == status_filter)
-    query = query.order_by(EmailOutbox.created_at.desc())
-    total = query.count()
-    rows = query.offset(skip).limit(min(limit, 200)).all()
-    return {
-        "total": total,
-        "items": [
+    rows, next_cursor = keyset_paginate(
+        query, EmailOutbox.created_at, EmailOutbox.id, cursor=cursor, limit=min(clamp_limit(limit), 200),
+    )
+    return page_envelope(
+        db, query, next_cursor=next_cursor, items=[
             {
                 "id": r.id,
                 "category": r.category,
@@ -249,7 +194,16 @@ async def list_outbox(
             }
             for r in rows
         ],
-    }
+    )
+
+
+@router.get("/outbox/metrics")
+async def outbox_metrics(
+    db: Session = Depends(get_db),
+    current_admin: User = Depends(get_current_admin),
+):
+    """Outbox backlog depth + age (pending, due, in-flight, stuck). Admin only."""
+    return outbox_backlog_metrics(db)
 
 
 @router.get("/outbox/{outbox_id}")
@@ -290,7 +244,7 @@ class SuppressionCreate(BaseModel):
 
 @router.get("/suppressions")
 async def list_suppressions(
-    skip: int = 0,
+    cursor: Optional[str] = None,
     limit: int = 100,
     q: Optional[str] = None,
     db: Session = Depends(get_db),
@@ -299,12 +253,11 @@ async def list_suppressions(
     query = db.query(EmailSuppression)
     if q:
         query = query.filter(EmailSuppression.email.ilike(f"%{q.lower()}%"))
-    query = query.order_by(EmailSuppression.created_at.desc())
-    total = query.count()
-    rows = query.offset(skip).limit(min(limit, 500)).all()
-    return {
-        "total": total,
-        "items": [
+    rows, next_cursor = keyset_paginate(
+        query, EmailSuppression.created_at, EmailSuppression.id, cursor=cursor, limit=min(clamp_limit(limit), 500),
+    )
+    return page_envelope(
+        db, query, next_cursor=next_cursor, items=[
             {
                 "id": r.id,
                 "email": r.email,
@@ -316,7 +269,7 @@ async def list_suppressions(
             }
             for r in rows
         ],
-    }
+    )
 
 
 @router.post("/suppressions", status_code=status.HTTP_201_CREATED)
@@ -22,13 +22,13 @@ from sqlalchemy.orm import Session
 from auth_utils import get_current_admin
 from database import get_db
 from logging_config import get_logger
+from pagination import clamp_limit, keyset_paginate, page_envelope
+from marketing.attachments import store_attachment
 from marketing.audience import iter_segment_recipients
 from marketing.mailer import ComplianceMailer
-from marketing.renderer import _default_context, _env_html, _env_text
-from marketing.resend_client import encode_attachment
-from marketing.tracking import make_token, rewrite_html_for_tracking
+from marketing.renderer import _default_context, _env_html, _env_text, premailer
+from marketing.tracking import CampaignLinkRewriter, make_token
 from s3_service import download_file, extract_object_key_from_url
-from premailer import transform as premailer_transform
 from jinja2 import Template as JinjaTemplate
 from models import (
     AudienceSegment,
@@ -42,8 +42,8 @@ logger = get_logger(__name__)
 router = APIRouter()
 
 
-def _fetch_campaign_attachments(urls: list[str]) -> list[dict[str, Any]]:
-    """Resolve each campaign attachment URL into Resend-shaped bytes.
+def _fetch_campaign_attachments(db: Session, urls: list[str]) -> list[dict[str, Any]]:
+    """Download each campaign attachment URL into the blob store; return references.
 
     Supports:
       - Backend-proxy URLs:  /api/uploads/media/... → S3 download_file
@@ -80,7 +80,9 @@ def _fetch_campaign_attachments(urls: list[str]) -> list[dict[str, Any]]:
                 logger.warning("Skipping attachment %s — too large (%s bytes)", url, len(content))
                 continue
             content_type, _ = mimetypes.guess_type(filename)
-            results.append(encode_attachment(filename, content, content_type=content_type or "application/octet-stream"))
+            results.append(store_attachment(
+                db, content, filename=filename, content_type=content_type or "application/octet-stream",
+            ))
             logger.info("Attached %s (%s bytes) to campaign send", filename, len(content))
         except Exception as exc:
             logger.warning("Could not fetch campaign attachment %s: %s", url, exc)
@@ -272,13 +274,18 @@ async def send_campaign_now(
     db.commit()
 
     # Resolve attachments ONCE before the fan-out so we don't re-download the
-    # same file N times (one per recipient). Resend re-uses the base64 payload
-    # for each recipient — fine for small files, but limits the practical
+    # same file N times (one per recipient). The bytes go into the blob store
+    # once and every outbox row only carries a reference. Resend still
+    # receives the full payload per recipient, which limits the practical
     # per-campaign attachment payload to ~25MB before the email-size limit
     # bites. Big files belong on S3 with a download link in the body.
-    resolved_attachments = _fetch_campaign_attachments(c.attachment_urls or [])
+    resolved_attachments = _fetch_campaign_attachments(db, c.attachment_urls or [])
+    db.commit()
 
     mailer = ComplianceMailer(db)
+    # One rewriter for the whole fan-out: each distinct link is UTM-tagged and
+    # encoded once, and identical bodies are only scanned once.
+    link_rewriter = CampaignLinkRewriter(c.id)
     total = 0
     queued = 0
     suppressed = 0
@@ -317,7 +324,7 @@ async def send_campaign_now(
                     db.add(cs)
                 db.commit()
                 continue
-            inlined_html = premailer_transform(rendered_html, base_url=ctx.get("frontend_url"), keep_style_tags=False, disable_validation=True)
+            inlined_html = premailer.transform(rendered_html, base_url=ctx.get("frontend_url"), keep_style_tags=False, disable_validation=True)
 
             # Create / fetch the per-recipient send row FIRST so we have a stable
             # id to embed in tracking URLs. Tokens are HMAC-signed and recorded
@@ -339,9 +346,8 @@ async def send_campaign_now(
             # Rewrite outgoing links + inject the open pixel BEFORE we hand off
             # to ComplianceMailer. Skip URLs we never want to wrap (mailto:,
             # tel:, unsubscribe links — those are appended later by ComplianceMailer).
-            tracked_html = rewrite_html_for_tracking(
+            tracked_html = link_rewriter.rewrite(
                 inlined_html,
-                campaign_id=c.id,
                 send_id=cs.id,
                 click_token=cs.click_token,
                 open_token=cs.open_token,
@@ -401,7 +407,7 @@ async def send_campaign_now(
 @router.get("/campaigns/{campaign_id}/sends")
 async def list_campaign_sends(
     campaign_id: int,
-    skip: int = 0,
+    cursor: Optional[str] = None,
     limit: int = 100,
     status_filter: Optional[str] = None,
     db: Session = Depends(get_db),
@@ -410,11 +416,11 @@ async def list_campaign_sends(
     q = db.query(CampaignSend).filter(CampaignSend.campaign_id == campaign_id)
     if status_filter:
         q = q.filter(CampaignSend.status == status_filter)
-    total = q.count()
-    rows = q.order_by(CampaignSend.id.desc()).offset(skip).limit(min(limit, 500)).all()
-    return {
-        "total": total,
-        "items": [
+    rows, next_cursor = keyset_paginate(
+        q, CampaignSend.id, CampaignSend.id, cursor=cursor, limit=min(clamp_limit(limit), 500),
+    )
+    return page_envelope(
+        db, q, next_cursor=next_cursor, items=[
             {
                 "id": r.id,
                 "recipient_email": r.recipient_email,
@@ -426,7 +432,7 @@ async def list_campaign_sends(
             }
             for r in rows
         ],
-    }
+    )
 
 
 # ─────────────────────────────────────────────────────────────────────
@@ -454,17 +460,27 @@ async def campaign_analytics(
         raise HTTPException(status_code=404, detail="Campaign not found")
 
     # Per-recipient counts from campaign_sends (always up-to-date).
-    base_q = db.query(CampaignSend).filter(CampaignSend.campaign_id == c.id)
-    total_rows = base_q.count()
-    queued = base_q.filter(CampaignSend.status.in_(("queued", "sent"))).count()
-    sent_status = base_q.filter(CampaignSend.status == "sent").count()
-    suppressed = base_q.filter(CampaignSend.status == "suppressed").count()
-    failed = base_q.filter(CampaignSend.status == "failed").count()
-    opened = base_q.filter(CampaignSend.open_count > 0, CampaignSend.is_mpp == False).count()  # noqa: E712
-    clicked = base_q.filter(CampaignSend.click_count > 0).count()
-    bounced = base_q.filter(CampaignSend.bounced == True).count()  # noqa: E712
-    complained = base_q.filter(CampaignSend.complained == True).count()  # noqa: E712
-    mpp_only = base_q.filter(CampaignSend.is_mpp == True, CampaignSend.click_count == 0).count()  # noqa: E712
+    # One pass over the campaign's rows instead of a COUNT per metric.
+    n = _f.count(CampaignSend.id)
+    (
+        total_rows, queued, sent_status, suppressed, failed,
+        opened, clicked, bounced, complained, mpp_only,
+    ) = (
+        db.query(
+            n,
+            n.filter(CampaignSend.status.in_(("queued", "sent"))),
+            n.filter(CampaignSend.status == "sent"),
+            n.filter(CampaignSend.status == "suppressed"),
+            n.filter(CampaignSend.status == "failed"),
+            n.filter(CampaignSend.open_count > 0, CampaignSend.is_mpp == False),  # noqa: E712
+            n.filter(CampaignSend.click_count > 0),
+            n.filter(CampaignSend.bounced == True),  # noqa: E712
+            n.filter(CampaignSend.complained == True),  # noqa: E712
+            n.filter(CampaignSend.is_mpp == True, CampaignSend.click_count == 0),  # noqa: E712
+        )
+        .filter(CampaignSend.campaign_id == c.id)
+        .one()
+    )
 
     denom = max(queued, 1)  # avoid div/0 in the rate display
 
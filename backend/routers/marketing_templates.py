@@ -12,8 +12,7 @@ from auth_utils import get_current_admin
 from database import get_db
 from logging_config import get_logger
 from marketing.mailer import enqueue_email
-from marketing.renderer import _env_html, _env_text, _default_context  # we render user-authored bodies
-from premailer import transform as premailer_transform
+from marketing.renderer import _env_html, _env_text, _default_context, premailer  # we render user-authored bodies
 from jinja2 import Template as JinjaTemplate
 from models import EmailTemplate, EmailTemplateVersion, User
 
@@ -205,7 +204,7 @@ async def render_preview(
         # Render the user-authored HTML through Jinja.
         rendered = _env_html.from_string(payload.body_html).render(**ctx)
         # CSS-inline.
-        inlined = premailer_transform(rendered, base_url=ctx.get("frontend_url"), keep_style_tags=False, disable_validation=True)
+        inlined = premailer.transform(rendered, base_url=ctx.get("frontend_url"), keep_style_tags=False, disable_validation=True)
         return {"body_html": inlined, "subject": JinjaTemplate(payload.subject).render(**ctx)}
     except Exception as exc:
         raise HTTPException(status_code=400, detail=f"Render error: {exc}")
@@ -232,7 +231,7 @@ async def send_test_email(
     rendered_subject = JinjaTemplate(t.subject).render(**ctx)
     rendered_html = _env_html.from_string(t.body_html).render(**ctx)
     rendered_text = _env_text.from_string(t.body_text or "").render(**ctx) if t.body_text else ""
-    inlined_html = premailer_transform(rendered_html, base_url=ctx.get("frontend_url"), keep_style_tags=False, disable_validation=True)
+    inlined_html = premailer.transform(rendered_html, base_url=ctx.get("frontend_url"), keep_style_tags=False, disable_validation=True)
 
     from marketing.mailer import ComplianceMailer
 
@@ -8,7 +8,8 @@ from pathlib import Path
 
 from database import get_db
 from auth_utils import get_current_admin
-from models import Story, Testimonial, Setting, GalleryItem, Event
+from models import Story, Testimonial, GalleryItem, Event
+from settings_service import get_settings
 from s3_service import upload_file, delete_file, file_exists, get_file_url, generate_object_key, list_files, get_file_info, extract_object_key_from_url
 
 router = APIRouter()
@@ -29,6 +30,9 @@ async def list_videos(
     videos = []
     video_extensions = ('.mp4', '.webm', '.ogg', '.avi', '.mov')
     
+    settings = get_settings(db)
+    program_videos = set(settings.with_prefix('program_video_').values())
+    
     # Helper function to check where a video is used
     def get_used_in(filename_or_url: str) -> list:
         used_in = []
@@ -46,11 +50,9 @@ async def list_videos(
         if db.query(GalleryItem).filter(GalleryItem.media_filename == filename_or_url).first():
             used_in.append("gallery")
         # Check Settings for hero_video and program_videos
-        hero_video = db.query(Setting).filter(Setting.key == 'hero_video', Setting.value == filename_or_url).first()
-        if hero_video:
+        if settings.get('hero_video') == filename_or_url:
             used_in.append("hero")
-        program_videos = db.query(Setting).filter(Setting.key.like('program_video_%'), Setting.value == filename_or_url).all()
-        if program_videos:
+        if filename_or_url in program_videos:
             used_in.append("programs")
         return used_in
     
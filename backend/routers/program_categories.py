@@ -10,6 +10,7 @@ from models import ProgramCategory
 from schemas import ProgramCategoryCreate, ProgramCategoryUpdate, ProgramCategoryResponse
 from auth_utils import get_current_admin
 from s3_service import upload_file, delete_file, generate_object_key, extract_object_key_from_url
+from response_cache import cached_response
 
 router = APIRouter()
 
@@ -19,6 +20,7 @@ UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 
 
 @router.get("/", response_model=List[ProgramCategoryResponse])
+@cached_response("program_categories", model=List[ProgramCategoryResponse])
 async def get_categories(
     active_only: bool = False,
     db: Session = Depends(get_db)
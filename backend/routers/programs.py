@@ -1,4 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import List, Optional
 import os
@@ -6,11 +9,12 @@ import shutil
 import re
 from pathlib import Path
 
-from database import get_db
+from database import get_async_db, get_db
 from models import Program, ProgramCategory
 from schemas import ProgramCreate, ProgramUpdate, ProgramResponse
 from auth_utils import get_current_admin
 from s3_service import upload_file, delete_file, generate_object_key, extract_object_key_from_url
+from response_cache import cached_response
 
 router = APIRouter()
 
@@ -19,57 +23,70 @@ UPLOAD_DIR = Path("uploads/programs")
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 
 
+def slugify(text: str) -> str:
+    """Convert text to URL-friendly slug"""
+    text = re.sub(r'[^\w\s-]', '', text.lower())
+    return re.sub(r'[-\s]+', '-', text).strip('-')
+
+
+def _unique_slug(db: Session, title: str, exclude_id: Optional[int] = None) -> str:
+    """Slug from the title, suffixed -1, -2, ... until no other program has it."""
+    base_slug = slugify(title) or "program"
+    taken = db.query(Program.slug).filter(
+        (Program.slug == base_slug) | Program.slug.like(f"{base_slug}-%")
+    )
+    if exclude_id is not None:
+        taken = taken.filter(Program.id != exclude_id)
+    taken = {slug for (slug,) in taken}
+    slug, counter = base_slug, 1
+    while slug in taken:
+        slug = f"{base_slug}-{counter}"
+        counter += 1
+    return slug
+
+
+def _commit_program(db: Session, program: Program) -> Program:
+    try:
+        db.commit()
+    except IntegrityError:
+        # The unique index caught a concurrent writer taking the same slug.
+        db.rollback()
+        raise HTTPException(status_code=400, detail="Program with this slug already exists")
+    db.refresh(program)
+    return program
+
+
 @router.get("/", response_model=List[ProgramResponse])
+@cached_response("programs", model=List[ProgramResponse])
 async def get_programs(
     category_id: Optional[int] = None,
     active_only: bool = False,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get all programs, optionally filtered by category and active status"""
+    """Get all programs, optionally filtered by category and active status.
+
+    Read-only: slugs are assigned when a program is written (see
+    `_unique_slug`), so this is one query and its response is cacheable.
+    """
     try:
-        import re
-        
-        query = db.query(Program)
+        query = select(Program)
         
         if category_id:
-            query = query.filter(Program.category_id == category_id)
+            query = query.where(Program.category_id == category_id)
         
         if active_only:
-            query = query.filter(Program.is_active == True)
+            query = query.where(Program.is_active == True)
         
-        programs = query.order_by(Program.display_order, Program.title).all()
-        
-        # Fix any programs with NULL slugs
-        needs_commit = False
-        for program in programs:
-            if not program.slug and program.title:
-                # Generate slug from title
-                slug = re.sub(r'[^\w\s-]', '', program.title.lower())
-                slug = re.sub(r'[-\s]+', '-', slug).strip('-')
-                # Ensure uniqueness
-                base_slug = slug
-                counter = 1
-                while db.query(Program).filter(Program.slug == slug).first():
-                    slug = f"{base_slug}-{counter}"
-                    counter += 1
-                program.slug = slug
-                needs_commit = True
-        
-        if needs_commit:
-            db.commit()
-            # Refresh all programs
-            programs = query.order_by(Program.display_order, Program.title).all()
-        
-        return programs
+        return (await db.scalars(query.order_by(Program.display_order, Program.title))).all()
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching programs: {str(e)}")
 
 
 @router.get("/slug/{slug}", response_model=ProgramResponse)
-async def get_program_by_slug(slug: str, db: Session = Depends(get_db)):
+async def get_program_by_slug(slug: str, db: AsyncSession = Depends(get_async_db)):
     """Get a specific program by slug"""
     try:
-        program = db.query(Program).filter(Program.slug == slug).first()
+        program = await db.scalar(select(Program).where(Program.slug == slug).limit(1))
         if not program:
             raise HTTPException(status_code=404, detail="Program not found")
         return program
@@ -80,10 +97,10 @@ async def get_program_by_slug(slug: str, db: Session = Depends(get_db)):
 
 
 @router.get("/{program_id}", response_model=ProgramResponse)
-async def get_program(program_id: int, db: Session = Depends(get_db)):
+async def get_program(program_id: int, db: AsyncSession = Depends(get_async_db)):
     """Get a specific program by ID"""
     try:
-        program = db.query(Program).filter(Program.id == program_id).first()
+        program = await db.get(Program, program_id)
         if not program:
             raise HTTPException(status_code=404, detail="Program not found")
         return program
@@ -105,16 +122,19 @@ async def create_program(
     if not category:
         raise HTTPException(status_code=404, detail="Category not found")
     
-    # Check if slug already exists
-    existing = db.query(Program).filter(Program.slug == program.slug).first()
-    if existing:
-        raise HTTPException(status_code=400, detail="Program with this slug already exists")
+    program_data = program.dict()
+    program_data["slug"] = (program_data.get("slug") or "").strip()
+    if program_data["slug"]:
+        # Check if slug already exists
+        existing = db.query(Program).filter(Program.slug == program_data["slug"]).first()
+        if existing:
+            raise HTTPException(status_code=400, detail="Program with this slug already exists")
+    else:
+        program_data["slug"] = _unique_slug(db, program.title)
     
-    db_program = Program(**program.dict())
+    db_program = Program(**program_data)
     db.add(db_program)
-    db.commit()
-    db.refresh(db_program)
-    return db_program
+    return _commit_program(db, db_program)
 
 
 @router.put("/{program_id}", response_model=ProgramResponse)
@@ -136,6 +156,12 @@ async def update_program(
         if not category:
             raise HTTPException(status_code=404, detail="Category not found")
     
+    # A cleared slug is regenerated from the (possibly new) title
+    if 'slug' in update_data:
+        update_data['slug'] = (update_data['slug'] or '').strip()
+        if not update_data['slug']:
+            update_data['slug'] = _unique_slug(db, update_data.get('title') or program.title, exclude_id=program_id)
+    
     # Check if slug conflicts with other programs
     if 'slug' in update_data:
         existing = db.query(Program).filter(
@@ -179,9 +205,7 @@ async def update_program(
     for field, value in update_data.items():
         setattr(program, field, value)
     
-    db.commit()
-    db.refresh(program)
-    return program
+    return _commit_program(db, program)
 
 
 @router.delete("/{program_id}")
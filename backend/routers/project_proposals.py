@@ -26,6 +26,7 @@ from sqlalchemy.orm import Session
 from auth_utils import get_current_manager_or_admin
 from database import get_db
 from logging_config import get_logger
+from pagination import clamp_limit, keyset_paginate, page_envelope
 from models import ProjectProposal, User
 
 logger = get_logger(__name__)
@@ -183,7 +184,7 @@ async def submit_proposal(payload: ProposalSubmit, request: Request, db: Session
 @router.get("/")
 async def list_proposals(
     status_filter: Optional[str] = None,
-    skip: int = 0,
+    cursor: Optional[str] = None,
     limit: int = 100,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_manager_or_admin),
@@ -191,9 +192,10 @@ async def list_proposals(
     q = db.query(ProjectProposal)
     if status_filter and status_filter in VALID_STATUSES:
         q = q.filter(ProjectProposal.status == status_filter)
-    total = q.count()
-    rows = q.order_by(ProjectProposal.submitted_at.desc()).offset(skip).limit(min(limit, 500)).all()
-    return {"total": total, "items": [_serialize(p, include_admin=True) for p in rows]}
+    rows, next_cursor = keyset_paginate(
+        q, ProjectProposal.submitted_at, ProjectProposal.id, cursor=cursor, limit=min(clamp_limit(limit), 500),
+    )
+    return page_envelope(db, q, next_cursor=next_cursor, items=[_serialize(p, include_admin=True) for p in rows])
 
 
 @router.get("/{proposal_id}")
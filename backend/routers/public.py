@@ -0,0 +1,278 @@
+"""Aggregated public data for the SPA's first paint.
+
+    GET /api/public/bootstrap                               → every section
+    GET /api/public/bootstrap?fields=slideshow,impact_stats → just those
+
+The homepage used to fire a waterfall of about ten public requests
+(slideshow, impact stats, programs, stories, ...). Each one paid for
+routing, a DB session checkout and JSON encoding. This endpoint returns
+all of it in one response, keyed by section name.
+
+The sections load on BOOTSTRAP_SESSIONS AsyncSessions at once (two by
+default), each running its share of the sections in turn. A session per
+section would check out eleven of the async pool's nine connections for
+one cold request. The composed payload goes through response_cache under the content versions
+of the sections it contains. It gets the same ETag / 304 /
+stale-while-revalidate behaviour as the individual endpoints, and an
+admin edit to any included section invalidates it. Donation totals
+change with every gift, so they are not versioned: a payload that
+includes `donation_stats` uses a short TTL instead.
+
+Each section matches what the corresponding list endpoint returns for
+the homepage's parameters (active / approved items only).
+
+Mounted at /api/public in main.py.
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+from datetime import datetime
+from typing import Any, Awaitable, Callable, NamedTuple, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from database import get_async_session_factory
+from donation_stats import get_donation_totals
+from models import (
+    FundraisingProject,
+    GalleryItem,
+    Program,
+    ProgramCategory,
+    SlideshowSlide,
+    Story,
+    Testimonial,
+    UrgentNeed,
+)
+from response_cache import encode_json, entry_key, serve_cached
+from settings_service import SettingsSnapshot, get_settings
+from routers.fundraising_projects import serialize_project
+from schemas import (
+    GalleryItemResponse,
+    ProgramCategoryResponse,
+    ProgramResponse,
+    SettingResponse,
+    SlideshowSlideResponse,
+    StoryResponse,
+    TestimonialResponse,
+    UrgentNeedResponse,
+)
+
+router = APIRouter()
+
+BOOTSTRAP_TTL = 600
+BOOTSTRAP_STATS_TTL = 30
+# Pooled connections one bootstrap build may hold at once.
+BOOTSTRAP_SESSIONS = max(1, int(os.getenv("BOOTSTRAP_SESSIONS", "2")))
+
+
+# ─────────────────────────────────────────────────────────────────────
+# Sections
+# ─────────────────────────────────────────────────────────────────────
+
+def _dump(schema, rows) -> list[dict[str, Any]]:
+    return [schema.model_validate(row).model_dump(mode="json") for row in rows]
+
+
+async def _slideshow(db: AsyncSession) -> list[dict[str, Any]]:
+    rows = await db.scalars(
+        select(SlideshowSlide)
+        .where(SlideshowSlide.is_active == True)  # noqa: E712
+        .order_by(func.coalesce(SlideshowSlide.display_order, 999999), SlideshowSlide.id)
+    )
+    return [
+        SlideshowSlideResponse.model_validate({
+            "id": s.id,
+            "title": s.title,
+            "description": s.description,
+            "image_filename": s.image_filename,
+            "image_url": s.image_url,
+            "cta_text": s.cta_text,
+            "cta_url": s.cta_url,
+            "display_order": s.display_order if s.display_order is not None else 0,
+            "is_active": s.is_active if s.is_active is not None else True,
+            "created_at": s.created_at if s.created_at is not None else datetime.utcnow(),
+            "updated_at": s.updated_at if s.updated_at is not None else datetime.utcnow(),
+        }).model_dump(mode="json")
+        for s in rows
+    ]
+
+
+async def _settings_snapshot(db: AsyncSession) -> SettingsSnapshot:
+    return await db.run_sync(get_settings)
+
+
+def _impact(settings: SettingsSnapshot) -> dict[str, Any]:
+    return {
+        "meals": settings.get_int("meals_provided"),
+        "families": settings.get_int("families_supported"),
+        "orphans": settings.get_int("orphans_cared_for"),
+    }
+
+
+async def _impact_stats(db: AsyncSession) -> dict[str, Any]:
+    settings = await _settings_snapshot(db)
+    return {**_impact(settings), "total_raised": settings.get_float("total_raised")}
+
+
+async def _donation_stats(db: AsyncSession) -> dict[str, Any]:
+    def totals(session) -> tuple[float, int]:
+        row = get_donation_totals(session)
+        return row.total_amount, row.donor_count
+
+    total_donations, total_donors = await db.run_sync(totals)
+    settings = await _settings_snapshot(db)
+    return {
+        "total_donations": total_donations,
+        "total_donors": total_donors,
+        "total_raised": settings.get_float("total_raised"),
+        "impact": _impact(settings),
+    }
+
+
+async def _programs(db: AsyncSession) -> list[dict[str, Any]]:
+    rows = await db.scalars(
+        select(Program).where(Program.is_active == True).order_by(Program.display_order, Program.title)  # noqa: E712
+    )
+    return _dump(ProgramResponse, rows)
+
+
+async def _program_categories(db: AsyncSession) -> list[dict[str, Any]]:
+    rows = await db.scalars(
+        select(ProgramCategory)
+        .where(ProgramCategory.is_active == True)  # noqa: E712
+        .order_by(ProgramCategory.display_order, ProgramCategory.name)
+    )
+    return _dump(ProgramCategoryResponse, rows)
+
+
+async def _urgent_needs(db: AsyncSession) -> list[dict[str, Any]]:
+    rows = await db.scalars(
+        select(UrgentNeed).where(UrgentNeed.is_active == True).order_by(UrgentNeed.display_order, UrgentNeed.id)  # noqa: E712
+    )
+    return _dump(UrgentNeedResponse, rows)
+
+
+async def _gallery(db: AsyncSession) -> list[dict[str, Any]]:
+    rows = await db.scalars(
+        select(GalleryItem)
+        .where(GalleryItem.is_active == True)  # noqa: E712
+        .order_by(GalleryItem.display_order.asc(), GalleryItem.created_at.asc())
+    )
+    return _dump(GalleryItemResponse, rows)
+
+
+async def _testimonials(db: AsyncSession) -> list[dict[str, Any]]:
+    rows = await db.scalars(
+        select(Testimonial)
+        .where(Testimonial.is_approved == True)  # noqa: E712
+        .order_by(Testimonial.created_at.desc())
+        .limit(100)
+    )
+    return _dump(TestimonialResponse, rows)
+
+
+async def _stories(db: AsyncSession) -> list[dict[str, Any]]:
+    rows = await db.scalars(
+        select(Story)
+        .where(Story.is_pending_approval == False, Story.is_active == True)  # noqa: E712
+        .limit(100)
+    )
+    return _dump(StoryResponse, rows)
+
+
+async def _fundraising_projects(db: AsyncSession) -> list[dict[str, Any]]:
+    rows = await db.scalars(
+        select(FundraisingProject)
+        .where(FundraisingProject.is_active == True)  # noqa: E712
+        .order_by(
+            FundraisingProject.is_featured.desc(),
+            FundraisingProject.display_order.asc(),
+            FundraisingProject.id.asc(),
+        )
+    )
+    return [serialize_project(p) for p in rows]
+
+
+async def _settings(db: AsyncSession) -> list[dict[str, Any]]:
+    return _dump(SettingResponse, (await _settings_snapshot(db)).rows())
+
+
+class Section(NamedTuple):
+    load: Callable[[AsyncSession], Awaitable[Any]]
+    groups: tuple[str, ...]  # response_cache content groups it reads
+
+
+SECTIONS: dict[str, Section] = {
+    "slideshow": Section(_slideshow, ("slideshow",)),
+    "impact_stats": Section(_impact_stats, ("settings",)),
+    "donation_stats": Section(_donation_stats, ("settings",)),
+    "programs": Section(_programs, ("programs",)),
+    "program_categories": Section(_program_categories, ("program_categories",)),
+    "urgent_needs": Section(_urgent_needs, ("urgent_needs",)),
+    "gallery": Section(_gallery, ("gallery",)),
+    "testimonials": Section(_testimonials, ("testimonials",)),
+    "stories": Section(_stories, ("stories",)),
+    "fundraising_projects": Section(_fundraising_projects, ("fundraising_projects",)),
+    "settings": Section(_settings, ("settings",)),
+}
+
+
+def _selected_sections(fields: Optional[str]) -> list[str]:
+    if not fields:
+        return list(SECTIONS)
+    names = sorted({name.strip() for name in fields.split(",") if name.strip()})
+    unknown = [name for name in names if name not in SECTIONS]
+    if unknown or not names:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields: {', '.join(unknown) or '(none)'}. Available: {', '.join(SECTIONS)}",
+        )
+    return names
+
+
+async def build_bootstrap(session_factory: async_sessionmaker, names: list[str]) -> dict[str, Any]:
+    async def load(lane: list[str]) -> dict[str, Any]:
+        async with session_factory() as db:
+            return {name: await SECTIONS[name].load(db) for name in lane}
+
+    lanes = [names[i::BOOTSTRAP_SESSIONS] for i in range(min(BOOTSTRAP_SESSIONS, len(names)))]
+    loaded: dict[str, Any] = {}
+    for part in await asyncio.gather(*(load(lane) for lane in lanes)):
+        loaded.update(part)
+    return {name: loaded[name] for name in names}
+
+
+# ─────────────────────────────────────────────────────────────────────
+# Endpoint
+# ─────────────────────────────────────────────────────────────────────
+
+@router.get("/bootstrap")
+async def bootstrap(
+    request: Request,
+    fields: Optional[str] = None,
+    session_factory: async_sessionmaker = Depends(get_async_session_factory),
+):
+    """Everything the homepage renders on first paint, in one response.
+
+    `fields` is a comma-separated subset of the section names; unknown
+    names are a 400.
+    """
+    names = _selected_sections(fields)
+
+    async def build() -> bytes:
+        return encode_json(await build_bootstrap(session_factory, names))
+
+    groups = sorted({group for name in names for group in SECTIONS[name].groups})
+    response = await serve_cached(
+        request,
+        entry_key("public.bootstrap", {"fields": ",".join(names)}),
+        groups,
+        build,
+        ttl=BOOTSTRAP_STATS_TTL if "donation_stats" in names else BOOTSTRAP_TTL,
+    )
+    if response is None:
+        response = Response(content=await build(), media_type="application/json")
+    return response
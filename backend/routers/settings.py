@@ -6,19 +6,20 @@ from database import get_db
 from models import Setting
 from schemas import SettingCreate, SettingUpdate, SettingResponse
 from auth_utils import get_current_admin
+from response_cache import cached_response
+from settings_service import get_settings as get_settings_snapshot
 
 router = APIRouter()
 
 
 @router.get("/", response_model=List[SettingResponse])
 async def get_settings(db: Session = Depends(get_db)):
-    settings = db.query(Setting).all()
-    return settings
+    return get_settings_snapshot(db).rows()
 
 
 @router.get("/{key}", response_model=SettingResponse)
 async def get_setting(key: str, db: Session = Depends(get_db)):
-    setting = db.query(Setting).filter(Setting.key == key).first()
+    setting = get_settings_snapshot(db).row(key)
     if not setting:
         raise HTTPException(status_code=404, detail="Setting not found")
     return setting
@@ -86,21 +87,14 @@ async def delete_setting(
 
 
 @router.get("/public/impact-stats")
+@cached_response("settings")
 async def get_impact_stats(db: Session = Depends(get_db)):
     """Public endpoint to get impact statistics for the homepage"""
-    settings = db.query(Setting).filter(Setting.key.in_([
-        'meals_provided',
-        'families_supported', 
-        'orphans_cared_for',
-        'total_raised'
-    ])).all()
-    
-    # Convert to dict for easy access
-    settings_dict = {s.key: s.value for s in settings}
+    settings = get_settings_snapshot(db)
     
     return {
-        "meals": int(settings_dict.get('meals_provided', '0')),
-        "families": int(settings_dict.get('families_supported', '0')),
-        "orphans": int(settings_dict.get('orphans_cared_for', '0')),
-        "total_raised": float(settings_dict.get('total_raised', '0'))
+        "meals": settings.get_int('meals_provided'),
+        "families": settings.get_int('families_supported'),
+        "orphans": settings.get_int('orphans_cared_for'),
+        "total_raised": settings.get_float('total_raised')
     }
@@ -1,16 +1,18 @@
 from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sqlalchemy import desc, func
+from sqlalchemy import desc, func, select
 from typing import List, Optional
 from datetime import datetime
 import os
 import traceback
 
-from database import get_db
+from database import get_async_db, get_db
 from models import SlideshowSlide
 from schemas import SlideshowSlideCreate, SlideshowSlideUpdate, SlideshowSlideResponse
 from auth_utils import get_current_admin
 from s3_service import upload_file, delete_file, generate_object_key, extract_object_key_from_url
+from response_cache import cached_response
 
 router = APIRouter()
 
@@ -18,18 +20,19 @@ UPLOAD_DIR = "uploads/media/images"
 
 
 @router.get("/", response_model=List[SlideshowSlideResponse])
-async def get_slideshow_slides(active_only: bool = False, db: Session = Depends(get_db)):
+@cached_response("slideshow", model=List[SlideshowSlideResponse])
+async def get_slideshow_slides(active_only: bool = False, db: AsyncSession = Depends(get_async_db)):
     """Get all slideshow slides, optionally filtered to active only"""
     try:
-        query = db.query(SlideshowSlide)
+        query = select(SlideshowSlide)
         if active_only:
-            query = query.filter(SlideshowSlide.is_active == True)
+            query = query.where(SlideshowSlide.is_active == True)
         # Handle NULL display_order values by using COALESCE to default to a large number
         # This puts NULL values at the end
-        slides = query.order_by(
+        slides = (await db.scalars(query.order_by(
             func.coalesce(SlideshowSlide.display_order, 999999),
             SlideshowSlide.id
-        ).all()
+        ))).all()
         
         # Manually validate and serialize to catch any issues
         result = []
@@ -6,18 +6,22 @@
   approves it.
 - Admin: full access. Can approve pending stories, edit anyone's story, etc.
 """
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import List, Optional
 import os
 from datetime import datetime
 
-from database import get_db
+from database import get_async_db, get_db
 from models import Story, User
 from schemas import StoryResponse
 from auth_utils import get_current_admin, get_current_manager_or_admin
+from pagination import clamp_limit, keyset_paginate, set_next_cursor
 from s3_service import upload_file, delete_file, generate_object_key, extract_object_key_from_url
 from media_processing import compress_video, generate_video_thumbnail, should_compress_video
+from response_cache import cached_response
 
 router = APIRouter()
 
@@ -62,25 +66,27 @@ def _delete_video_asset(video_value: str) -> None:
 # ─────────────────────────────────────────────────────────────────────
 
 @router.get("/", response_model=List[StoryResponse])
+@cached_response("stories", model=List[StoryResponse])
 async def get_stories(
     skip: int = 0,
     limit: int = 100,
     active_only: bool = True,
     featured_only: bool = False,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """Public listing — hides pending-approval stories."""
-    query = db.query(Story).filter(Story.is_pending_approval == False)  # noqa: E712
+    query = select(Story).where(Story.is_pending_approval == False)  # noqa: E712
     if active_only:
-        query = query.filter(Story.is_active == True)  # noqa: E712
+        query = query.where(Story.is_active == True)  # noqa: E712
     if featured_only:
-        query = query.filter(Story.is_featured == True)  # noqa: E712
-    return query.offset(skip).limit(limit).all()
+        query = query.where(Story.is_featured == True)  # noqa: E712
+    return (await db.scalars(query.offset(skip).limit(limit))).all()
 
 
 @router.get("/admin/list", response_model=List[StoryResponse])
 async def list_stories_for_staff(
-    skip: int = 0,
+    response: Response,
+    cursor: Optional[str] = None,
     limit: int = 200,
     pending_only: bool = False,
     db: Session = Depends(get_db),
@@ -100,12 +106,14 @@ async def list_stories_for_staff(
         )
     if pending_only:
         query = query.filter(Story.is_pending_approval == True)  # noqa: E712
-    return query.order_by(Story.id.desc()).offset(skip).limit(limit).all()
+    stories, next_cursor = keyset_paginate(query, Story.id, Story.id, cursor=cursor, limit=clamp_limit(limit))
+    set_next_cursor(response, next_cursor)
+    return stories
 
 
 @router.get("/{story_id}", response_model=StoryResponse)
-async def get_story(story_id: int, db: Session = Depends(get_db)):
-    story = db.query(Story).filter(Story.id == story_id).first()
+async def get_story(story_id: int, db: AsyncSession = Depends(get_async_db)):
+    story = await db.get(Story, story_id)
     if not story or story.is_pending_approval:
         raise HTTPException(status_code=404, detail="Story not found")
     return story
@@ -7,7 +7,7 @@ from typing import List
 from pydantic import BaseModel
 
 from database import get_db
-from models import Subscription
+from models import Subscription, normalize_email
 from schemas import SubscriptionCreate, SubscriptionResponse, SmsOptInRequest, SmsOptInResponse
 from auth_utils import get_current_admin
 from logging_config import get_logger
@@ -141,7 +141,7 @@ async def sms_opt_in(
 @router.post("/", response_model=SubscriptionResponse)
 async def create_subscription(subscription: SubscriptionCreate, db: Session = Depends(get_db)):
     # Check if email already exists
-    existing = db.query(Subscription).filter(Subscription.email == subscription.email).first()
+    existing = db.query(Subscription).filter(Subscription.email == normalize_email(subscription.email)).first()
     if existing:
         raise HTTPException(status_code=400, detail="Email already subscribed")
     
@@ -1,14 +1,17 @@
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import List, Optional
 import os
 from datetime import datetime
 
-from database import get_db
+from database import get_async_db, get_db
 from models import Testimonial
 from schemas import TestimonialCreate, TestimonialResponse
 from auth_utils import get_current_admin
 from s3_service import upload_file, delete_file, generate_object_key, extract_object_key_from_url
+from response_cache import cached_response
 
 router = APIRouter()
 
@@ -110,17 +113,18 @@ async def create_testimonial(
 
 
 @router.get("/", response_model=List[TestimonialResponse])
+@cached_response("testimonials", model=List[TestimonialResponse])
 async def get_testimonials(
     skip: int = 0,
     limit: int = 100,
     approved_only: bool = True,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    query = db.query(Testimonial)
+    query = select(Testimonial)
     if approved_only:
-        query = query.filter(Testimonial.is_approved == True)
+        query = query.where(Testimonial.is_approved == True)
     
-    testimonials = query.order_by(Testimonial.created_at.desc()).offset(skip).limit(limit).all()
+    testimonials = (await db.scalars(query.order_by(Testimonial.created_at.desc()).offset(skip).limit(limit))).all()
     return testimonials
 
 
@@ -3,7 +3,9 @@
 Both endpoints are unauthenticated by design (recipients click links in
 emails without being logged in). HMAC-signed tokens validate the
 request, then we insert an EmailEvent and update the per-recipient +
-per-campaign counters.
+per-campaign counters. They use the async session (get_async_db): a
+campaign send produces bursts of opens, and sync queries here would
+block the event loop for every one of them.
 
 The endpoints are mounted at /api/tracking/ in main.py.
 """
@@ -15,9 +17,10 @@ from urllib.parse import urlparse
 
 from fastapi import APIRouter, Depends, Request, Response
 from fastapi.responses import RedirectResponse
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from database import get_db
+from database import get_async_db
 from logging_config import get_logger
 from marketing.tracking import TRANSPARENT_GIF, looks_like_mpp, parse_token
 from models import CampaignSend, EmailEvent, MarketingCampaign
@@ -44,7 +47,7 @@ def _no_cache_headers() -> dict[str, str]:
 
 
 @router.get("/open/{token}.gif")
-async def track_open(token: str, request: Request, db: Session = Depends(get_db)):
+async def track_open(token: str, request: Request, db: AsyncSession = Depends(get_async_db)):
     """Open-pixel endpoint. Always returns a 1x1 GIF regardless of token validity
     (we never want to break the email render); but only inserts an event if the
     token verifies."""
@@ -54,7 +57,9 @@ async def track_open(token: str, request: Request, db: Session = Depends(get_db)
 
     _, send_id = parsed
 
-    send = db.query(CampaignSend).filter(CampaignSend.id == send_id, CampaignSend.open_token == token).first()
+    send = await db.scalar(
+        select(CampaignSend).where(CampaignSend.id == send_id, CampaignSend.open_token == token)
+    )
     if not send:
         return Response(content=TRANSPARENT_GIF, media_type="image/gif", headers=_no_cache_headers())
 
@@ -84,10 +89,10 @@ async def track_open(token: str, request: Request, db: Session = Depends(get_db)
         send.is_mpp = is_mpp
         # Per-campaign unique opens increment only on FIRST open per recipient.
         if send.campaign_id and not is_mpp:
-            campaign = db.query(MarketingCampaign).filter(MarketingCampaign.id == send.campaign_id).first()
+            campaign = await db.get(MarketingCampaign, send.campaign_id)
             if campaign:
                 campaign.opened_count = (campaign.opened_count or 0) + 1
-    db.commit()
+    await db.commit()
 
     return Response(content=TRANSPARENT_GIF, media_type="image/gif", headers=_no_cache_headers())
 
@@ -97,7 +102,7 @@ async def track_click(
     token: str,
     request: Request,
     u: Optional[str] = None,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """Click-redirect endpoint. Records the click, then 302s to the target URL."""
     if not u:
@@ -116,7 +121,9 @@ async def track_click(
 
     _, send_id = parsed
 
-    send = db.query(CampaignSend).filter(CampaignSend.id == send_id, CampaignSend.click_token == token).first()
+    send = await db.scalar(
+        select(CampaignSend).where(CampaignSend.id == send_id, CampaignSend.click_token == token)
+    )
     if not send:
         return RedirectResponse(url=u, status_code=302)
 
@@ -146,13 +153,13 @@ async def track_click(
             send.open_count = 1
             send.first_open_at = datetime.utcnow()
             if send.campaign_id:
-                campaign = db.query(MarketingCampaign).filter(MarketingCampaign.id == send.campaign_id).first()
+                campaign = await db.get(MarketingCampaign, send.campaign_id)
                 if campaign:
                     campaign.opened_count = (campaign.opened_count or 0) + 1
         if send.campaign_id:
-            campaign = db.query(MarketingCampaign).filter(MarketingCampaign.id == send.campaign_id).first()
+            campaign = await db.get(MarketingCampaign, send.campaign_id)
             if campaign:
                 campaign.clicked_count = (campaign.clicked_count or 0) + 1
-    db.commit()
+    await db.commit()
 
     return RedirectResponse(url=u, status_code=302)
@@ -1,13 +1,15 @@
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sqlalchemy import desc
+from sqlalchemy import desc, select
 from typing import List
 import re
 
-from database import get_db
+from database import get_async_db, get_db
 from models import UrgentNeed
 from schemas import UrgentNeedCreate, UrgentNeedUpdate, UrgentNeedResponse
 from auth_utils import get_current_admin
+from response_cache import cached_response
 
 router = APIRouter()
 
@@ -21,19 +23,20 @@ def slugify(text: str) -> str:
 
 
 @router.get("/", response_model=List[UrgentNeedResponse])
-async def get_urgent_needs(active_only: bool = False, db: Session = Depends(get_db)):
+@cached_response("urgent_needs", model=List[UrgentNeedResponse])
+async def get_urgent_needs(active_only: bool = False, db: AsyncSession = Depends(get_async_db)):
     """Get all urgent needs, optionally filtered to active only"""
-    query = db.query(UrgentNeed)
+    query = select(UrgentNeed)
     if active_only:
-        query = query.filter(UrgentNeed.is_active == True)
-    needs = query.order_by(UrgentNeed.display_order, UrgentNeed.id).all()
+        query = query.where(UrgentNeed.is_active == True)
+    needs = (await db.scalars(query.order_by(UrgentNeed.display_order, UrgentNeed.id))).all()
     return needs
 
 
 @router.get("/{slug}", response_model=UrgentNeedResponse)
-async def get_urgent_need_by_slug(slug: str, db: Session = Depends(get_db)):
+async def get_urgent_need_by_slug(slug: str, db: AsyncSession = Depends(get_async_db)):
     """Get a specific urgent need by slug"""
-    need = db.query(UrgentNeed).filter(UrgentNeed.slug == slug).first()
+    need = await db.scalar(select(UrgentNeed).where(UrgentNeed.slug == slug).limit(1))
     if not need:
         raise HTTPException(status_code=404, detail="Urgent need not found")
     if not need.is_active:
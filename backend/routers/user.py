@@ -3,7 +3,6 @@ from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List
 from datetime import datetime
-import stripe
 import os
 from io import BytesIO
 from dotenv import load_dotenv
@@ -12,13 +11,20 @@ from database import get_db
 from models import User, Donation, DonationSubscription
 from schemas import DonationResponse
 from auth_utils import get_current_user
-from pdf_service import generate_donation_certificate_to_bytes
+from lazy_imports import lazy_module
 
 load_dotenv()
 
 stripe_secret_key = os.getenv("STRIPE_SECRET_KEY")
-if stripe_secret_key and stripe_secret_key.startswith(('sk_test_', 'sk_live_')):
-    stripe.api_key = stripe_secret_key
+
+
+def _configure_stripe(module):
+    if stripe_secret_key and stripe_secret_key.startswith(('sk_test_', 'sk_live_')):
+        module.api_key = stripe_secret_key
+
+
+stripe = lazy_module("stripe", on_load=_configure_stripe)
+pdf_service = lazy_module("pdf_service")
 
 router = APIRouter()
 
@@ -149,15 +155,17 @@ async def get_dashboard_stats(
     """Get dashboard statistics for the current user"""
     from sqlalchemy import func
     
+    # Confirmed donations only — served by the partial (lower(email)) index
+    confirmed = (
+        Donation.status == "confirmed",
+        func.lower(Donation.email) == current_user.email.lower(),
+    )
+
     # Total donations
-    total_donated = db.query(func.sum(Donation.amount)).filter(
-        Donation.email == current_user.email
-    ).scalar() or 0
+    total_donated = db.query(func.sum(Donation.amount)).filter(*confirmed).scalar() or 0
     
     # Count of donations
-    donation_count = db.query(Donation).filter(
-        Donation.email == current_user.email
-    ).count()
+    donation_count = db.query(func.count(Donation.id)).filter(*confirmed).scalar()
     
     # Active subscriptions count
     active_subscriptions = db.query(DonationSubscription).filter(
@@ -166,9 +174,9 @@ async def get_dashboard_stats(
     ).count()
     
     # Recent donations
-    recent_donations = db.query(Donation).filter(
-        Donation.email == current_user.email
-    ).order_by(Donation.donated_at.desc()).limit(5).all()
+    recent_donations = db.query(Donation).filter(*confirmed).order_by(
+        Donation.donated_at.desc()
+    ).limit(5).all()
     
     return {
         "total_donated": float(total_donated),
@@ -209,8 +217,8 @@ async def download_certificate(
         db.commit()
     
     try:
-        # Generate PDF receipt on-the-fly (no file storage)
-        pdf_bytes = generate_donation_certificate_to_bytes(
+        # Rendered once per distinct receipt, then served from the S3 cache
+        pdf_bytes = pdf_service.get_donation_receipt_pdf(
             donor_name=donation.name,
             amount=donation.amount,
             donation_date=donation.donated_at,
@@ -2,20 +2,25 @@
 S3-compatible storage service using MinIO
 Handles file uploads, downloads, and URL generation
 """
+import hashlib
+import hmac
+import json
 import os
-import boto3
-from botocore.client import Config
-from botocore.exceptions import ClientError, NoCredentialsError
 from typing import Optional, BinaryIO
 from datetime import datetime
 import io
 from dotenv import load_dotenv
 from logging_config import get_logger
+from lazy_imports import lazy_module
 
 load_dotenv()
 
 logger = get_logger(__name__)
 
+# boto3 costs ~50ms and several MB to import; load it with the first S3 call.
+boto3 = lazy_module("boto3")
+botocore_exceptions = lazy_module("botocore.exceptions")
+
 # S3 Configuration
 S3_ENDPOINT = os.getenv("S3_ENDPOINT", "http://minio:9000")
 S3_ACCESS_KEY = os.getenv("S3_ACCESS_KEY", "minioadmin")
@@ -35,6 +40,8 @@ def get_s3_client():
     """Get or create S3 client"""
     global s3_client
     if s3_client is None:
+        from botocore.client import Config
+
         s3_client = boto3.client(
             's3',
             endpoint_url=S3_ENDPOINT,
@@ -107,7 +114,7 @@ def ensure_bucket_exists():
                 logger.warning("   You may need to set it manually in MinIO console")
             # Ensure CORS is configured on existing bucket
             ensure_bucket_cors()
-        except ClientError as e:
+        except botocore_exceptions.ClientError as e:
             error_code = e.response.get('Error', {}).get('Code', '')
             if error_code == '404':
                 # Bucket doesn't exist, create it
@@ -275,7 +282,7 @@ def file_exists(object_key: str) -> bool:
         client = get_s3_client()
         client.head_object(Bucket=S3_BUCKET_NAME, Key=object_key)
         return True
-    except ClientError as e:
+    except botocore_exceptions.ClientError as e:
         if e.response.get('Error', {}).get('Code') == '404':
             return False
         raise
@@ -368,7 +375,7 @@ def download_file(object_key: str) -> Optional[bytes]:
         client = get_s3_client()
         response = client.get_object(Bucket=S3_BUCKET_NAME, Key=object_key)
         return response['Body'].read()
-    except ClientError as e:
+    except botocore_exceptions.ClientError as e:
         if e.response.get('Error', {}).get('Code') == 'NoSuchKey':
             return None
         raise
@@ -396,7 +403,7 @@ def get_file_info(object_key: str) -> Optional[dict]:
             'last_modified': response.get('LastModified'),
             'etag': response.get('ETag', '').strip('"')
         }
-    except ClientError as e:
+    except botocore_exceptions.ClientError as e:
         if e.response.get('Error', {}).get('Code') == '404':
             return None
         raise
@@ -513,3 +520,65 @@ def extract_object_key_from_url(url: str) -> Optional[str]:
     except Exception:
         return None
 
+
+
+# ─────────────────────────────────────────────────────────────────────
+# Private documents (receipts)
+# ─────────────────────────────────────────────────────────────────────
+#
+# The media bucket grants anonymous s3:GetObject on every key, so anything
+# personal (tax receipts) lives in a second bucket with no bucket policy.
+# Objects there are only read by the backend and handed out by
+# authenticated endpoints; their keys are HMACs over a server secret, so
+# they can't be derived from a receipt number or an email address.
+
+S3_PRIVATE_BUCKET_NAME = os.getenv("S3_PRIVATE_BUCKET_NAME", f"{S3_BUCKET_NAME}-private")
+PRIVATE_KEY_SECRET = os.getenv("SECRET_KEY", "dev-only-insecure-secret-key")
+
+private_bucket_exists = False
+
+
+def ensure_private_bucket_exists():
+    """Create the private bucket if needed and make sure it has no public policy."""
+    global private_bucket_exists
+    if private_bucket_exists:
+        return
+    client = get_s3_client()
+    try:
+        client.head_bucket(Bucket=S3_PRIVATE_BUCKET_NAME)
+    except botocore_exceptions.ClientError as e:
+        if e.response.get('Error', {}).get('Code', '') != '404':
+            raise
+        client.create_bucket(Bucket=S3_PRIVATE_BUCKET_NAME)
+        logger.info("Created private bucket %s", S3_PRIVATE_BUCKET_NAME)
+    try:
+        client.delete_bucket_policy(Bucket=S3_PRIVATE_BUCKET_NAME)
+    except botocore_exceptions.ClientError as e:
+        if e.response.get('Error', {}).get('Code', '') != 'NoSuchBucketPolicy':
+            logger.warning("Could not clear the policy on %s: %s", S3_PRIVATE_BUCKET_NAME, e)
+    private_bucket_exists = True
+
+
+def private_object_key(prefix: str, *parts: object) -> str:
+    """``prefix/<hmac>.pdf`` for ``parts``: stable for the same inputs, unguessable without SECRET_KEY."""
+    message = json.dumps([str(part) for part in parts], separators=(",", ":"), ensure_ascii=False)
+    digest = hmac.new(PRIVATE_KEY_SECRET.encode(), message.encode(), hashlib.sha256).hexdigest()
+    return f"{prefix}/{digest}.pdf"
+
+
+def upload_private_file(file_content: bytes, object_key: str, content_type: Optional[str] = None) -> None:
+    """Store ``file_content`` in the private bucket. There is no URL to return."""
+    ensure_private_bucket_exists()
+    extra_args = {'ContentType': content_type} if content_type else {}
+    get_s3_client().put_object(Bucket=S3_PRIVATE_BUCKET_NAME, Key=object_key, Body=file_content, **extra_args)
+
+
+def download_private_file(object_key: str) -> Optional[bytes]:
+    """Content of a private object, or None if it doesn't exist."""
+    try:
+        response = get_s3_client().get_object(Bucket=S3_PRIVATE_BUCKET_NAME, Key=object_key)
+        return response['Body'].read()
+    except botocore_exceptions.ClientError as e:
+        if e.response.get('Error', {}).get('Code') in ('NoSuchKey', 'NoSuchBucket'):
+            return None
+        raise
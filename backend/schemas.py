@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr, Field
-from typing import Optional, List
+from typing import Optional, List, Literal
 from datetime import datetime
 
 # User schemas
@@ -308,6 +308,7 @@ class DonationUpdate(BaseModel):
     email: Optional[EmailStr] = None
     amount: Optional[float] = Field(default=None, gt=0)
     frequency: Optional[str] = None
+    status: Optional[Literal["confirmed", "pending", "failed", "abandoned"]] = None
     payment_method: Optional[str] = None
     notes: Optional[str] = None
     donated_at: Optional[datetime] = None
@@ -318,6 +319,7 @@ class DonationResponse(BaseModel):
     email: str
     amount: float
     frequency: str
+    status: str = "confirmed"
     stripe_session_id: Optional[str]
     certificate_filename: Optional[str]
     donated_at: datetime
@@ -511,7 +513,7 @@ class ProgramCategoryResponse(BaseModel):
 class ProgramCreate(BaseModel):
     category_id: int
     title: str
-    slug: str
+    slug: Optional[str] = None  # generated from the title when blank
     description: Optional[str] = None
     short_description: Optional[str] = None
     image_url: Optional[str] = None
@@ -542,7 +544,7 @@ class ProgramResponse(BaseModel):
     id: int
     category_id: int
     title: str
-    slug: Optional[str]  # Made optional to handle existing NULL values
+    slug: str
     description: Optional[str]
     short_description: Optional[str]
     image_url: Optional[str]
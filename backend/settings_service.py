@@ -0,0 +1,251 @@
+"""In-process snapshot of the `settings` table.
+
+Settings are read on hot paths: impact stats, donation stats, the media
+library's "used in" checks, and the SPA's /api/settings/. They change a
+few times a month. Each of those reads used to query the table. Now each
+worker keeps one immutable snapshot of every row, and reads are
+dictionary lookups:
+
+    settings = get_settings(db)
+    meals = settings.get_int("meals_provided")
+
+`db` is only used when the snapshot has to be (re)loaded. Async callers
+go through `await db.run_sync(get_settings)`.
+
+Invalidation: ORM listeners notice commits that wrote a `Setting`. This
+covers flushes and bulk `update()` / `delete()` statements. On commit
+the local snapshot is dropped, `settings:version` is bumped in Redis, and
+the new version is published on `settings:changed`. Every worker runs one
+subscriber thread, started on first use, and drops its snapshot when a
+message arrives. It also drops it on (re)subscribe, in case something was
+published while it wasn't listening. While a worker isn't subscribed
+(Redis down, or SETTINGS_NOTIFY=false) a snapshot is trusted for at most
+UNSUBSCRIBED_MAX_AGE seconds. The same bound applies to raw SQL edits
+made outside the app.
+
+Redis trouble never fails a request or a write; it only falls back to
+the max age.
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+from datetime import datetime
+from types import MappingProxyType
+from typing import Mapping, NamedTuple, Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import ORMExecuteState, Session
+
+from logging_config import get_logger
+from models import Setting
+
+logger = get_logger(__name__)
+
+SETTINGS_NOTIFY_ENABLED = os.getenv("SETTINGS_NOTIFY", "true").lower() != "false"
+REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379/0")
+
+CHANNEL = "settings:changed"
+VERSION_KEY = "settings:version"
+UNSUBSCRIBED_MAX_AGE = 30
+RESUBSCRIBE_DELAY_SECONDS = 5
+# Publishing happens inside the committing request; fail fast.
+REDIS_TIMEOUT_SECONDS = 0.25
+
+_TRUE_VALUES = {"1", "true", "yes", "on"}
+
+
+class SettingRow(NamedTuple):
+    id: int
+    key: str
+    value: str
+    description: Optional[str]
+    updated_at: Optional[datetime]
+
+
+class SettingsSnapshot:
+    """Every setting as of one load. Never mutated; replaced wholesale."""
+
+    __slots__ = ("_rows", "loaded_at")
+
+    def __init__(self, rows: list[SettingRow]):
+        self._rows: Mapping[str, SettingRow] = MappingProxyType({row.key: row for row in rows})
+        self.loaded_at = time.monotonic()
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._rows
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def rows(self) -> list[SettingRow]:
+        return list(self._rows.values())
+
+    def row(self, key: str) -> Optional[SettingRow]:
+        return self._rows.get(key)
+
+    def get(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        row = self._rows.get(key)
+        return row.value if row is not None else default
+
+    def _parse(self, key: str, parse, default):
+        value = self.get(key)
+        if value is None or not value.strip():
+            return default
+        try:
+            return parse(value.strip())
+        except ValueError:
+            logger.warning("Setting %s=%r is not a valid %s; using %r", key, value, parse.__name__, default)
+            return default
+
+    def get_str(self, key: str, default: str = "") -> str:
+        return self.get(key, default)
+
+    def get_int(self, key: str, default: int = 0) -> int:
+        return self._parse(key, int, default)
+
+    def get_float(self, key: str, default: float = 0.0) -> float:
+        return self._parse(key, float, default)
+
+    def get_bool(self, key: str, default: bool = False) -> bool:
+        return self._parse(key, lambda value: value.lower() in _TRUE_VALUES, default)
+
+    def with_prefix(self, prefix: str) -> dict[str, str]:
+        """{key: value} for every setting whose key starts with `prefix`."""
+        return {key: row.value for key, row in self._rows.items() if key.startswith(prefix)}
+
+
+# ─────────────────────────────────────────────────────────────────────
+# Snapshot (read side)
+# ─────────────────────────────────────────────────────────────────────
+
+_lock = threading.Lock()
+_snapshot: Optional[SettingsSnapshot] = None
+# Bumped by every invalidation, so a load that raced an edit is not installed.
+_generation = 0
+_subscribed = threading.Event()
+_subscriber: Optional[threading.Thread] = None
+
+
+def _is_fresh(snapshot: Optional[SettingsSnapshot]) -> bool:
+    if snapshot is None:
+        return False
+    if _subscribed.is_set():
+        return True
+    return time.monotonic() - snapshot.loaded_at < UNSUBSCRIBED_MAX_AGE
+
+
+def get_settings(db: Session) -> SettingsSnapshot:
+    """The current settings snapshot, loading it with `db` if needed."""
+    global _snapshot
+    snapshot = _snapshot
+    if _is_fresh(snapshot):
+        return snapshot
+
+    _ensure_subscriber()
+    # No lock around the query: async callers run this through run_sync on
+    # the event loop thread, where blocking on a lock held by another
+    # coroutine would deadlock. A burst of misses after an edit just loads
+    # a few times.
+    generation = _generation
+    rows = db.query(Setting.id, Setting.key, Setting.value, Setting.description, Setting.updated_at).all()
+    snapshot = SettingsSnapshot([SettingRow(*row) for row in rows])
+    with _lock:
+        if generation == _generation:
+            _snapshot = snapshot
+    return snapshot
+
+
+def invalidate_settings() -> None:
+    """Drop this worker's snapshot; the next read reloads it."""
+    global _snapshot, _generation
+    with _lock:
+        _generation += 1
+        _snapshot = None
+
+
+# ─────────────────────────────────────────────────────────────────────
+# Change notifications
+# ─────────────────────────────────────────────────────────────────────
+
+_publisher = None
+
+
+def _publisher_redis():
+    global _publisher
+    if _publisher is None:
+        import redis
+
+        _publisher = redis.Redis.from_url(
+            REDIS_URL, socket_timeout=REDIS_TIMEOUT_SECONDS, socket_connect_timeout=REDIS_TIMEOUT_SECONDS,
+        )
+    return _publisher
+
+
+def publish_settings_change() -> None:
+    """Tell every worker to reload its settings snapshot."""
+    if not SETTINGS_NOTIFY_ENABLED:
+        return
+    try:
+        client = _publisher_redis()
+        client.publish(CHANNEL, client.incr(VERSION_KEY))
+    except Exception as exc:
+        logger.warning("Could not publish settings change: %s", exc)
+
+
+def _listen() -> None:
+    import redis
+
+    while True:
+        try:
+            client = redis.Redis.from_url(REDIS_URL, health_check_interval=30)
+            pubsub = client.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(CHANNEL)
+            _subscribed.set()
+            invalidate_settings()
+            for message in pubsub.listen():
+                if message["type"] == "message":
+                    logger.debug("Settings version %s published; reloading", message["data"])
+                    invalidate_settings()
+        except Exception as exc:
+            logger.warning("Settings subscription lost: %s", exc)
+        finally:
+            _subscribed.clear()
+        time.sleep(RESUBSCRIBE_DELAY_SECONDS)
+
+
+def _ensure_subscriber() -> None:
+    # Started lazily so it lives in the worker process, not a pre-fork parent.
+    global _subscriber
+    if not SETTINGS_NOTIFY_ENABLED or (_subscriber is not None and _subscriber.is_alive()):
+        return
+    with _lock:
+        if _subscriber is None or not _subscriber.is_alive():
+            _subscriber = threading.Thread(target=_listen, name="settings-subscriber", daemon=True)
+            _subscriber.start()
+
+
+@event.listens_for(Session, "after_flush")
+def _note_settings_flush(session: Session, flush_context) -> None:
+    if any(isinstance(obj, Setting) for obj in (*session.new, *session.dirty, *session.deleted)):
+        session.info["settings_changed"] = True
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _note_settings_statement(state: ORMExecuteState) -> None:
+    if (state.is_insert or state.is_update or state.is_delete) and \
+            getattr(getattr(state.statement, "table", None), "name", None) == Setting.__tablename__:
+        state.session.info["settings_changed"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _settings_committed(session: Session) -> None:
+    if session.info.pop("settings_changed", False):
+        invalidate_settings()
+        publish_settings_change()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_settings_change(session: Session) -> None:
+    session.info.pop("settings_changed", None)
@@ -0,0 +1,210 @@
+"""One-time startup work, run by one worker per deployment.
+
+Each uvicorn worker imports main.py. The schema check, admin/default
+settings seeding, S3 bucket setup and the orphaned media scan used to run
+in every worker, so four times per deploy with `--workers 4`, and four
+concurrent auto-delete scans. Now the workers race for a Postgres
+advisory lock:
+
+  leader     creates missing tables and seeds defaults before it starts
+             serving, then sets up the bucket and runs the orphan scan in
+             a background thread. It holds the lock until it exits.
+  followers  fail the lock (one query) and start serving immediately.
+
+The lock key is derived from DEPLOY_ID when it is set, otherwise from
+the models and this module's source. A deploy that changes the schema or
+the seed data therefore gets a new leader even while an older container
+still holds the previous key. Restarts of the same code re-run the
+idempotent tasks.
+
+Media directories are local to each container, so every worker still
+ensures them (a few mkdirs). SQLite has no advisory locks; there every
+process is the leader.
+"""
+import hashlib
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.pool import NullPool
+
+from auth_utils import get_password_hash
+from database import Base, DATABASE_URL, DIRECT_DATABASE_URL, SessionLocal, engine
+from logging_config import get_logger
+from models import Setting, User
+
+logger = get_logger(__name__)
+
+# Give the rest of the stack a moment before scanning S3 with auto-delete.
+ORPHAN_SCAN_DELAY_SECONDS = 5
+
+DEFAULT_SETTINGS = [
+    ('meals_provided', '25000', 'Total number of meals provided to families in need'),
+    ('families_supported', '1200', 'Total number of families supported through our programs'),
+    ('orphans_cared_for', '800', 'Total number of orphans receiving care and support'),
+    ('total_raised', '500000', 'Total amount raised in USD for all programs'),
+    ('hero_video', '', 'Main video displayed on the homepage hero section'),
+    ('gallery_item_1', '', 'Gallery image/video 1'),
+    ('gallery_item_2', '', 'Gallery image/video 2'),
+    ('gallery_item_3', '', 'Gallery image/video 3'),
+    ('gallery_item_4', '', 'Gallery image/video 4'),
+    ('gallery_item_5', '', 'Gallery image/video 5'),
+    ('gallery_item_6', '', 'Gallery image/video 6'),
+    ('sticky_donation_bar_enabled', 'false', 'Enable or disable the sticky donation bar on the homepage'),
+]
+
+MEDIA_DIRECTORIES = [
+    "uploads/media/videos",
+    "uploads/media/images",
+    "uploads/events",
+    "uploads/stories",
+    "uploads/testimonials",
+    "uploads/program_categories",
+    "uploads/programs",
+]
+
+
+# ─────────────────────────────────────────────────────────────────────
+# Tasks
+# ─────────────────────────────────────────────────────────────────────
+
+def ensure_admin_user():
+    """Ensure at least one admin user and the default settings exist"""
+    db = SessionLocal()
+    try:
+        if not db.query(User.id).filter(User.is_admin == True).first():  # noqa: E712
+            db.add(User(
+                email="admin@example.com",
+                password=get_password_hash("admin123"),
+                name="Super Admin",
+                is_active=True,
+                is_admin=True,
+                email_verified=True  # Admin users don't need email verification
+            ))
+
+        # One query for all the keys rather than one per default
+        keys = [key for key, _, _ in DEFAULT_SETTINGS]
+        existing = {key for (key,) in db.query(Setting.key).filter(Setting.key.in_(keys))}
+        db.add_all([
+            Setting(key=key, value=value, description=description)
+            for key, value, description in DEFAULT_SETTINGS
+            if key not in existing
+        ])
+        db.commit()
+    except Exception as e:
+        logger.error("Error ensuring admin user: %s", e)
+        db.rollback()
+    finally:
+        db.close()
+
+
+def ensure_media_directories():
+    """Ensure media upload directories exist"""
+    for directory in MEDIA_DIRECTORIES:
+        os.makedirs(directory, exist_ok=True)
+
+
+def _initialise_storage():
+    from routers.cleanup import cleanup_orphaned_media
+    from s3_service import ensure_bucket_exists
+
+    try:
+        ensure_bucket_exists()
+        logger.info("S3 bucket initialized successfully")
+    except Exception as e:
+        logger.warning("Could not initialize S3 bucket: %s — uploads will fall back to local storage", e)
+
+    time.sleep(ORPHAN_SCAN_DELAY_SECONDS)
+    logger.info("Running automatic cleanup of orphaned media")
+    db = SessionLocal()
+    try:
+        result = cleanup_orphaned_media(db=db, current_admin=None, auto_delete=True)
+        if result["orphaned_count"] > 0:
+            logger.info("Cleaned up %d orphaned media entries", result["deleted_count"])
+        else:
+            logger.info("No orphaned media found")
+    except Exception as e:
+        logger.warning("Could not run automatic cleanup: %s", e)
+    finally:
+        db.close()
+
+
+# ─────────────────────────────────────────────────────────────────────
+# Leader election
+# ─────────────────────────────────────────────────────────────────────
+
+_leader_connection: Optional[Connection] = None
+
+
+def deployment_lock_key() -> int:
+    """Signed 64-bit advisory lock key for this deployment."""
+    deploy_id = os.getenv("DEPLOY_ID")
+    if not deploy_id:
+        here = Path(__file__).resolve().parent
+        digest = hashlib.sha256()
+        for name in ("models.py", "startup_tasks.py"):
+            digest.update((here / name).read_bytes())
+        deploy_id = digest.hexdigest()
+    key = hashlib.sha256(f"myzakat-startup:{deploy_id}".encode()).digest()[:8]
+    return int.from_bytes(key, "big", signed=True)
+
+
+def become_leader() -> bool:
+    """Try to take this deployment's startup lock; keep it if we get it."""
+    global _leader_connection
+    if DATABASE_URL.startswith("sqlite"):
+        return True
+
+    # Own connection outside the pool: the session-level lock lives as long
+    # as the connection does, i.e. until this process exits. Direct to
+    # Postgres, since a transaction-mode PgBouncer would hand the lock's
+    # server connection to other clients between transactions.
+    connection = create_engine(DIRECT_DATABASE_URL, poolclass=NullPool).connect()
+    try:
+        acquired = connection.execute(
+            text("SELECT pg_try_advisory_lock(:key)"), {"key": deployment_lock_key()}
+        ).scalar()
+        connection.commit()
+    except Exception:
+        connection.close()
+        raise
+    if not acquired:
+        connection.close()
+        return False
+    _leader_connection = connection
+    return True
+
+
+def release_leadership():
+    global _leader_connection
+    if _leader_connection is not None:
+        _leader_connection.close()
+        _leader_connection = None
+
+
+def run_startup_tasks():
+    """Run the per-deployment startup work if this worker wins the lock."""
+    start = time.perf_counter()
+    ensure_media_directories()
+
+    try:
+        leader = become_leader()
+    except Exception as e:
+        # Can't coordinate (database unreachable?): behave as before and run them.
+        logger.warning("Could not take the startup lock (%s); running startup tasks anyway", e)
+        leader = True
+
+    if not leader:
+        logger.info("Startup tasks owned by another worker; serving after %.0f ms",
+                    (time.perf_counter() - start) * 1000)
+        return
+
+    Base.metadata.create_all(bind=engine)
+    ensure_admin_user()
+    threading.Thread(target=_initialise_storage, name="startup-storage", daemon=True).start()
+    logger.info("Startup tasks (schema, seed data) done in %.0f ms; storage setup continues in the background",
+                (time.perf_counter() - start) * 1000)
@@ -0,0 +1,238 @@
+"""Stripe webhook ingestion: durable dedupe on receipt, ordered apply on the worker.
+
+Stripe delivers events at least once and retries for days; with several API
+workers a retry usually lands on a different process than the original.
+The webhook endpoint therefore only verifies the signature and calls
+`record_stripe_event`, which inserts one `stripe_events` row keyed on the
+event id. A retry hits the unique index and is acknowledged without being
+recorded twice.
+
+`process_pending_stripe_events` runs on the Arq worker (single-flight, see
+`marketing.queue.process_stripe_events_task`). It applies pending rows in
+Stripe `created` order through `routers.donations.process_stripe_event`:
+
+  - events for the same object (`object_id`) never overtake each other —
+    while an earlier event for an object is waiting to be retried, later
+    ones for that object wait too;
+  - a failing event is retried with exponential backoff, and after
+    MAX_ATTEMPTS it is marked 'dead' (dead letter) so it stops blocking its
+    object; an admin can re-queue it with `retry_dead_stripe_event`;
+  - a row left in 'processing' by a crashed worker is returned to 'pending'
+    after CLAIM_TIMEOUT_SECONDS.
+
+`stripe_event_metrics` reports queue depth and processing lag.
+"""
+from __future__ import annotations
+
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Any
+
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from logging_config import get_logger
+from models import StripeEvent
+
+logger = get_logger(__name__)
+
+MAX_ATTEMPTS = int(os.getenv("STRIPE_EVENT_MAX_ATTEMPTS", "6"))
+CLAIM_TIMEOUT_SECONDS = int(os.getenv("STRIPE_EVENT_CLAIM_TIMEOUT_SECONDS", "300"))
+DEFAULT_BATCH_SIZE = 200
+
+
+# ─────────────────────────────────────────────────────────────────────
+# Ingestion (request path)
+# ─────────────────────────────────────────────────────────────────────
+
+def _object_id(event: dict[str, Any]) -> str | None:
+    """Ordering key: the subscription for subscription-scoped events, else the object id."""
+    obj = (event.get("data") or {}).get("object") or {}
+    return obj.get("subscription") or obj.get("id")
+
+
+def record_stripe_event(db: Session, event: dict[str, Any]) -> StripeEvent | None:
+    """Persist a verified Stripe event. Commits. Returns None if already recorded."""
+    created = event.get("created")
+    row = StripeEvent(
+        event_id=str(event.get("id", ""))[:255],
+        event_type=str(event.get("type", ""))[:100],
+        object_id=(_object_id(event) or None),
+        payload=event,
+        status="pending",
+        event_created_at=datetime.utcfromtimestamp(created) if isinstance(created, (int, float)) else None,
+    )
+    db.add(row)
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        return None
+    db.refresh(row)
+    return row
+
+
+# ─────────────────────────────────────────────────────────────────────
+# Consumer (worker)
+# ─────────────────────────────────────────────────────────────────────
+
+def _recover_stale_claims(db: Session, now: datetime) -> None:
+    recovered = (
+        db.query(StripeEvent)
+        .filter(
+            StripeEvent.status == "processing",
+            StripeEvent.claimed_at < now - timedelta(seconds=CLAIM_TIMEOUT_SECONDS),
+        )
+        .update({StripeEvent.status: "pending"}, synchronize_session=False)
+    )
+    db.commit()
+    if recovered:
+        logger.warning("Recovered %s Stripe events stuck in 'processing'", recovered)
+
+
+def _claim(db: Session, row_id: int, now: datetime) -> bool:
+    claimed = (
+        db.query(StripeEvent)
+        .filter(StripeEvent.id == row_id, StripeEvent.status == "pending")
+        .update(
+            {
+                StripeEvent.status: "processing",
+                StripeEvent.claimed_at: now,
+                StripeEvent.attempts: StripeEvent.attempts + 1,
+            },
+            synchronize_session=False,
+        )
+    )
+    db.commit()
+    return bool(claimed)
+
+
+def _apply_one(db: Session, row: StripeEvent) -> bool:
+    """Process one claimed row. Returns True if it succeeded."""
+    from routers.donations import process_stripe_event
+
+    try:
+        process_stripe_event(db, row.payload)
+    except Exception as exc:
+        db.rollback()
+        db.refresh(row)
+        row.error = str(exc)[:2000]
+        if row.attempts >= MAX_ATTEMPTS:
+            row.status = "dead"
+            row.processed_at = datetime.utcnow()
+            logger.error(
+                "Stripe event %s (%s) dead-lettered after %s attempts: %s",
+                row.event_id, row.event_type, row.attempts, exc,
+            )
+        else:
+            backoff_seconds = 2 ** row.attempts * 15
+            row.status = "pending"
+            row.next_attempt_at = datetime.utcnow() + timedelta(seconds=backoff_seconds)
+            logger.warning(
+                "Stripe event %s (%s) failed (attempt %s/%s) — retrying in %ss: %s",
+                row.event_id, row.event_type, row.attempts, MAX_ATTEMPTS, backoff_seconds, exc,
+            )
+        db.commit()
+        return False
+
+    row.status = "processed"
+    row.error = None
+    row.processed_at = datetime.utcnow()
+    db.commit()
+    return True
+
+
+def process_pending_stripe_events(
+    db: Session,
+    *,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    time_budget: float | None = None,
+) -> int:
+    """Apply pending events in Stripe order. Returns the number of events attempted.
+
+    Must not run concurrently with itself — per-object ordering relies on a
+    single consumer (the worker task holds a Redis lock). With `time_budget`
+    it stops claiming after that many seconds, so a large backlog can't
+    outlive the lock; the next run picks up where it stopped.
+    """
+    deadline = time.monotonic() + time_budget if time_budget is not None else None
+    now = datetime.utcnow()
+    _recover_stale_claims(db, now)
+
+    attempted = 0
+    after: tuple[datetime, int] | None = None
+    blocked: set[str] = set()
+    while True:
+        query = db.query(StripeEvent).filter(StripeEvent.status == "pending")
+        order_key = func.coalesce(StripeEvent.event_created_at, StripeEvent.received_at)
+        if after is not None:
+            query = query.filter(
+                (order_key > after[0]) | ((order_key == after[0]) & (StripeEvent.id > after[1]))
+            )
+        rows = query.order_by(order_key.asc(), StripeEvent.id.asc()).limit(batch_size).all()
+        if not rows:
+            return attempted
+
+        for row in rows:
+            if deadline is not None and time.monotonic() >= deadline:
+                return attempted
+            after = (row.event_created_at or row.received_at, row.id)
+            if row.object_id and row.object_id in blocked:
+                continue
+            if row.next_attempt_at and row.next_attempt_at > datetime.utcnow():
+                # Backing off — later events for the same object must wait.
+                if row.object_id:
+                    blocked.add(row.object_id)
+                continue
+            if not _claim(db, row.id, datetime.utcnow()):
+                continue
+            db.refresh(row)
+            attempted += 1
+            if not _apply_one(db, row) and row.status == "pending" and row.object_id:
+                # Waiting for a retry; a dead-lettered event no longer blocks.
+                blocked.add(row.object_id)
+
+        if len(rows) < batch_size:
+            return attempted
+
+
+def retry_dead_stripe_event(db: Session, event_id: str) -> bool:
+    """Re-queue a dead-lettered event with a fresh attempt budget. Commits."""
+    requeued = (
+        db.query(StripeEvent)
+        .filter(StripeEvent.event_id == event_id, StripeEvent.status == "dead")
+        .update(
+            {
+                StripeEvent.status: "pending",
+                StripeEvent.attempts: 0,
+                StripeEvent.next_attempt_at: datetime.utcnow(),
+            },
+            synchronize_session=False,
+        )
+    )
+    db.commit()
+    return bool(requeued)
+
+
+def stripe_event_metrics(db: Session) -> dict[str, Any]:
+    """Queue depth per status plus processing lag (age of the oldest pending event)."""
+    now = datetime.utcnow()
+    counts = dict(
+        db.query(StripeEvent.status, func.count(StripeEvent.id))
+        .group_by(StripeEvent.status)
+        .all()
+    )
+    oldest_pending = (
+        db.query(func.min(StripeEvent.received_at))
+        .filter(StripeEvent.status.in_(("pending", "processing")))
+        .scalar()
+    )
+    return {
+        "pending": counts.get("pending", 0),
+        "processing": counts.get("processing", 0),
+        "processed": counts.get("processed", 0),
+        "dead": counts.get("dead", 0),
+        "lag_seconds": int((now - oldest_pending).total_seconds()) if oldest_pending else 0,
+    }
@@ -0,0 +1,289 @@
+"""Bulk reconciliation of local donation records against Stripe.
+
+Webhooks (stripe_events.py) are the primary path; this is the safety net
+for payments whose events never arrived or were never recorded. It runs
+hourly on the Arq worker (`marketing.queue.reconcile_stripe_task`) and
+backs the admin "sync" / "update status" buttons.
+
+  - `sync_checkout_sessions` pages through checkout sessions created since
+    the stream's checkpoint (minus SESSION_OVERLAP_SECONDS, because a
+    session can be paid up to a day after it is created) with
+    `auto_paging_iter`. It inserts any paid one-time donation or
+    subscription that is missing locally. Known ids are loaded with one
+    IN query per page of sessions, not one query per session.
+  - `refresh_subscription_statuses` lists every Stripe subscription (100
+    per API call) instead of retrieving each local row. It resolves legacy
+    'pending_<session id>' placeholders with concurrent session lookups,
+    then bulk-updates the rows whose status changed.
+
+Per-object Stripe calls run on a small thread pool behind a token bucket
+(STRIPE_SYNC_CONCURRENCY / STRIPE_SYNC_RPS), so a large backlog stays below
+Stripe's rate limit. Every function takes `client` (default: the stripe
+module); tests pass a local stub with the same surface.
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from itertools import islice
+from typing import Any, Callable, Iterable, Iterator
+
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Session
+
+from lazy_imports import lazy_module
+from logging_config import get_logger
+from models import Donation, DonationSubscription, StripeSyncCheckpoint
+
+logger = get_logger(__name__)
+
+stripe = lazy_module("stripe")
+
+PAGE_SIZE = 100  # Stripe's maximum for list endpoints
+CONCURRENCY = int(os.getenv("STRIPE_SYNC_CONCURRENCY", "8"))
+REQUESTS_PER_SECOND = float(os.getenv("STRIPE_SYNC_RPS", "20"))  # live limit is 100/s, test mode 25/s
+SESSION_OVERLAP_SECONDS = 24 * 3600
+INITIAL_LOOKBACK_DAYS = int(os.getenv("STRIPE_SYNC_INITIAL_LOOKBACK_DAYS", "30"))
+
+CHECKOUT_SESSIONS = "checkout_sessions"
+
+
+# ─────────────────────────────────────────────────────────────────────
+# Concurrency helpers
+# ─────────────────────────────────────────────────────────────────────
+
+class RateLimiter:
+    """Thread-safe token bucket: at most `rate` acquisitions per second."""
+
+    def __init__(self, rate: float = REQUESTS_PER_SECOND):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if wait > 0:
+            time.sleep(wait)
+
+
+def fetch_concurrently(
+    fn: Callable[[str], Any],
+    keys: Iterable[str],
+    *,
+    limiter: RateLimiter | None = None,
+    workers: int = CONCURRENCY,
+) -> dict[str, Any]:
+    """Call `fn(key)` for each key on a thread pool. Failed keys are logged and omitted."""
+    keys = list(dict.fromkeys(keys))
+    if not keys:
+        return {}
+    limiter = limiter or RateLimiter()
+
+    def _call(key: str):
+        limiter.acquire()
+        try:
+            return key, fn(key)
+        except Exception as exc:
+            logger.warning("Stripe lookup failed for %s: %s", key, exc)
+            return key, None
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(keys)))) as pool:
+        return {key: result for key, result in pool.map(_call, keys) if result is not None}
+
+
+def _batched(items: Iterable[Any], size: int) -> Iterator[list[Any]]:
+    it = iter(items)
+    while batch := list(islice(it, size)):
+        yield batch
+
+
+# ─────────────────────────────────────────────────────────────────────
+# Checkpoints
+# ─────────────────────────────────────────────────────────────────────
+
+def _checkpoint(db: Session, name: str) -> StripeSyncCheckpoint | None:
+    return db.query(StripeSyncCheckpoint).filter(StripeSyncCheckpoint.name == name).first()
+
+
+def _save_checkpoint(db: Session, name: str, synced_until: int, summary: dict[str, Any]) -> None:
+    row = _checkpoint(db, name)
+    if row is None:
+        row = StripeSyncCheckpoint(name=name, synced_until=synced_until)
+        db.add(row)
+    row.synced_until = synced_until
+    row.last_summary = summary
+    db.commit()
+
+
+# ─────────────────────────────────────────────────────────────────────
+# Checkout sessions → missing donations / subscriptions
+# ─────────────────────────────────────────────────────────────────────
+
+def _donation_from_session(session: dict[str, Any]) -> Donation:
+    metadata = session.get("metadata") or {}
+    details = session.get("customer_details") or {}
+    return Donation(
+        name=metadata.get("donor_name") or details.get("name") or "Unknown",
+        email=session.get("customer_email") or details.get("email") or "unknown@example.com",
+        amount=(session.get("amount_total") or 0) / 100.0,
+        frequency="One-Time (Synced)",
+        status="confirmed",
+        stripe_session_id=session["id"],
+        donated_at=datetime.utcfromtimestamp(session["created"]) if session.get("created") else datetime.utcnow(),
+        certificate_filename="available",
+        utm_source=metadata.get("utm_source"),
+        utm_medium=metadata.get("utm_medium"),
+        utm_campaign=metadata.get("utm_campaign"),
+        utm_content=metadata.get("utm_content"),
+    )
+
+
+def _subscription_from_stripe(session: dict[str, Any], sub: dict[str, Any]) -> DonationSubscription:
+    customer = sub.get("customer") if isinstance(sub.get("customer"), dict) else {}
+    metadata = sub.get("metadata") or session.get("metadata") or {}
+    items = (sub.get("items") or {}).get("data") or []
+    price = items[0].get("price") if items else {}
+    period_end = sub.get("current_period_end")
+    return DonationSubscription(
+        stripe_subscription_id=sub["id"],
+        stripe_customer_id=customer.get("id") or session.get("customer") or "",
+        stripe_session_id=session["id"],
+        name=metadata.get("donor_name") or customer.get("name") or "Unknown",
+        email=customer.get("email") or session.get("customer_email") or "unknown@example.com",
+        amount=((price or {}).get("unit_amount") or 0) / 100.0,
+        purpose=metadata.get("purpose") or "General Donation (Synced)",
+        interval=((price or {}).get("recurring") or {}).get("interval") or "month",
+        payment_day=1,
+        status=sub.get("status") or "active",
+        next_payment_date=datetime.utcfromtimestamp(period_end) if period_end else None,
+    )
+
+
+def _sync_session_page(db: Session, client, sessions: list[dict[str, Any]], summary: dict[str, int]) -> None:
+    paid = [s for s in sessions if s.get("payment_status") == "paid"]
+    payments = [s for s in paid if s.get("mode") == "payment"]
+    subscriptions = [s for s in paid if s.get("mode") == "subscription" and s.get("subscription")]
+
+    if payments:
+        known = {
+            sid for (sid,) in db.query(Donation.stripe_session_id)
+            .filter(Donation.stripe_session_id.in_([s["id"] for s in payments]))
+        }
+        # Rows created by the old sync carried no session id; match them on (email, amount).
+        unmatched = [s for s in payments if s["id"] not in known]
+        legacy = set()
+        if unmatched:
+            keys = [(_donation_from_session(s).email, (s.get("amount_total") or 0) / 100.0) for s in unmatched]
+            legacy = set(
+                db.query(Donation.email, Donation.amount)
+                .filter(Donation.stripe_session_id.is_(None), tuple_(Donation.email, Donation.amount).in_(keys))
+            )
+        for s in unmatched:
+            donation = _donation_from_session(s)
+            if (donation.email, donation.amount) in legacy:
+                continue
+            db.add(donation)
+            summary["donations"] += 1
+
+    if subscriptions:
+        sub_ids = [s["subscription"] for s in subscriptions]
+        known = {
+            sid for (sid,) in db.query(DonationSubscription.stripe_subscription_id)
+            .filter(DonationSubscription.stripe_subscription_id.in_(sub_ids))
+        }
+        missing = [s for s in subscriptions if s["subscription"] not in known]
+        fetched = fetch_concurrently(
+            lambda sid: client.Subscription.retrieve(sid, expand=["customer"]),
+            [s["subscription"] for s in missing],
+        )
+        for s in missing:
+            if s["subscription"] in fetched:
+                db.add(_subscription_from_stripe(s, fetched[s["subscription"]]))
+                summary["subscriptions"] += 1
+
+
+def sync_checkout_sessions(db: Session, client=stripe, *, since: int | None = None) -> dict[str, int]:
+    """Insert paid sessions that are missing locally. Commits per page; returns counts."""
+    started = int(time.time())
+    if since is None:
+        checkpoint = _checkpoint(db, CHECKOUT_SESSIONS)
+        since = (
+            checkpoint.synced_until - SESSION_OVERLAP_SECONDS if checkpoint
+            else started - INITIAL_LOOKBACK_DAYS * 86400
+        )
+
+    summary = {"scanned": 0, "donations": 0, "subscriptions": 0}
+    pages = client.checkout.Session.list(created={"gte": since}, limit=PAGE_SIZE).auto_paging_iter()
+    for page in _batched(pages, PAGE_SIZE):
+        summary["scanned"] += len(page)
+        _sync_session_page(db, client, page, summary)
+        db.commit()
+
+    _save_checkpoint(db, CHECKOUT_SESSIONS, started, summary)
+    logger.info("Stripe session sync since %s: %s", datetime.utcfromtimestamp(since).isoformat(), summary)
+    return summary
+
+
+# ─────────────────────────────────────────────────────────────────────
+# Subscription statuses
+# ─────────────────────────────────────────────────────────────────────
+
+def refresh_subscription_statuses(db: Session, client=stripe) -> dict[str, int]:
+    """Bring every local subscription's status in line with Stripe. Commits."""
+    local = db.query(
+        DonationSubscription.id, DonationSubscription.stripe_subscription_id, DonationSubscription.status,
+    ).all()
+    if not local:
+        return {"updated": 0, "resolved_pending": 0}
+
+    # Legacy placeholders: 'pending_<checkout session id>' → the real subscription id.
+    placeholders = {
+        row.id: row.stripe_subscription_id.removeprefix("pending_")
+        for row in local if row.stripe_subscription_id.startswith("pending_")
+    }
+    sessions = fetch_concurrently(lambda sid: client.checkout.Session.retrieve(sid), placeholders.values())
+    real_ids = {
+        row_id: sessions[sid].get("subscription")
+        for row_id, sid in placeholders.items()
+        if sid in sessions and sessions[sid].get("subscription")
+    }
+
+    wanted = {row.stripe_subscription_id for row in local} | set(real_ids.values())
+    remote: dict[str, str] = {}
+    for sub in client.Subscription.list(status="all", limit=PAGE_SIZE).auto_paging_iter():
+        if sub["id"] in wanted:
+            remote[sub["id"]] = sub.get("status")
+
+    now = datetime.utcnow()
+    changes = []
+    for row in local:
+        stripe_id = real_ids.get(row.id, row.stripe_subscription_id)
+        new_status = remote.get(stripe_id)
+        change = {}
+        if row.id in real_ids:
+            change["stripe_subscription_id"] = stripe_id
+        if new_status and new_status != row.status:
+            change["status"] = new_status
+        if change:
+            changes.append({"id": row.id, "updated_at": now, **change})
+
+    for batch in _batched(changes, 500):
+        db.bulk_update_mappings(DonationSubscription, batch)
+    db.commit()
+    summary = {"updated": len(changes), "resolved_pending": len(real_ids)}
+    if changes:
+        logger.info("Stripe subscription refresh: %s", summary)
+    return summary
+
+
+def run_stripe_reconciliation(db: Session, client=stripe) -> dict[str, int]:
+    """Both passes; what the worker cron and the admin sync button run."""
+    sessions = sync_checkout_sessions(db, client)
+    statuses = refresh_subscription_statuses(db, client)
+    return {**sessions, **statuses, "synced": sessions["donations"] + sessions["subscriptions"]}
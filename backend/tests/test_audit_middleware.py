@@ -0,0 +1,84 @@
+"""
+Tests for the ASGI audit middleware (audit_middleware.py).
+"""
+import asyncio
+import json
+import logging
+
+import pytest
+
+import audit_middleware
+from audit_middleware import ACTION_MAP, AuditMiddleware, _describe_action
+
+
+def _scope(method: str, path: str, headers=()):
+    return {"type": "http", "method": method, "path": path, "headers": list(headers),
+            "query_string": b"", "client": ("1.2.3.4", 1234)}
+
+
+def _run(middleware, scope, body: bytes = b""):
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(middleware(scope, receive, send))
+    return receive, send, sent
+
+
+@pytest.fixture
+def audit_log(monkeypatch, caplog):
+    # The app's "audit" logger may be queued (no propagation); log to a plain one.
+    monkeypatch.setattr(audit_middleware, "logger", logging.getLogger("audit_under_test"))
+    caplog.set_level(logging.INFO, logger="audit_under_test")
+    return caplog
+
+
+@pytest.mark.unit
+class TestAuditMiddleware:
+
+    def test_skipped_requests_get_the_original_receive_and_send(self):
+        seen = {}
+
+        async def app(scope, receive, send):
+            seen["channels"] = (receive, send)
+
+        for method, path in [("GET", "/api/uploads/videos/a.mp4"), ("POST", "/api/settings/x"), ("GET", "/api/admin/users")]:
+            receive, send, _ = _run(AuditMiddleware(app), _scope(method, path))
+            assert seen.pop("channels") == (receive, send)
+
+    def test_combined_regex_matches_like_a_scan_of_action_map(self):
+        samples = {
+            ("DELETE", "/api/admin/users/5"): "deleted user #5",
+            ("POST", "/api/programs/3/upload-video"): "uploaded video for program #3",
+            ("POST", "/api/programs"): "created a new program",
+            ("POST", "/api/gallery/reorder"): "reordered the gallery",
+            ("DELETE", "/api/s3-media/videos/a.mp4"): "deleted file 'videos/a.mp4' from S3",
+            ("POST", "/api/unknown"): None,
+            ("TRACE", "/api/stories"): None,
+        }
+        for (method, path), expected in samples.items():
+            assert _describe_action(method, path) == expected
+
+        for method, pattern, action in ACTION_MAP:
+            if not callable(action):
+                assert _describe_action(method, pattern.pattern.strip("^$").rstrip("/?")) == action
+
+    def test_logs_status_and_login_email(self, audit_log):
+        async def app(scope, receive, send):
+            body = json.loads((await receive())["body"])
+            assert body["email"] == "zak@example.com"  # the app still sees the body
+            await send({"type": "http.response.start", "status": 401, "headers": []})
+            await send({"type": "http.response.body", "body": b"{}"})
+
+        _, _, sent = _run(AuditMiddleware(app), _scope("POST", "/api/auth/login"),
+                          body=b'{"email": "zak@example.com", "password": "x"}')
+
+        assert sent[0]["status"] == 401
+        [record] = audit_log.records
+        assert record.levelno == logging.WARNING
+        assert "zak: logged in — failed (401)" in record.getMessage()
+        assert "email=zak@example.com" in record.getMessage() and "ip=1.2.3.4" in record.getMessage()
@@ -1,9 +1,11 @@
 import pytest
 from fastapi.testclient import TestClient
+from sqlalchemy import event
 from sqlalchemy.orm import Session
 
+from conftest import engine
 from models import User
-from auth_utils import create_access_token, verify_token
+from auth_utils import create_access_token, get_password_hash, verify_token
 
 
 @pytest.mark.auth
@@ -53,6 +55,15 @@ class TestAuthAPI:
         assert "access_token" in data
         assert data["token_type"] == "bearer"
     
+    def test_login_email_is_case_insensitive(self, client: TestClient, admin_user: User):
+        """Emails are stored lower-cased, so a differently-cased login still matches"""
+        response = client.post(
+            "/api/auth/login",
+            json={"email": "  TestAdmin@Example.com", "password": "testpass"}
+        )
+
+        assert response.status_code == 200
+    
     def test_login_invalid_username(self, client: TestClient, admin_user: User):
         """Test login with invalid email"""
         response = client.post(
@@ -128,3 +139,92 @@ class TestAuthAPI:
         # In a real scenario with shorter expiration times,
         # we would test token expiration here
 
+
+
+@pytest.mark.auth
+class TestPrincipalCache:
+    """Admin calls resolve the caller from the per-worker principal cache"""
+
+    def test_admin_calls_do_not_query_users(self, client: TestClient, auth_headers: dict, db_session: Session):
+        client.post("/api/settings/", headers=auth_headers, json={"key": "site_name", "value": "MyZakat"})
+        statements = []
+
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(engine, "before_cursor_execute", record)
+        try:
+            # Audited write: the dependency resolves the principal, the audit log reuses it.
+            response = client.put("/api/settings/site_name", headers=auth_headers, json={"value": "My Zakat"})
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+
+        assert response.status_code == 200
+        assert not [s for s in statements if "FROM users" in s]
+
+    def test_deactivating_a_user_takes_effect_immediately(
+        self, client: TestClient, auth_headers: dict, db_session: Session,
+    ):
+        other = User(email="other@example.com", password=get_password_hash("otherpass"),
+                     name="Other Admin", is_active=True, is_admin=True, role="admin")
+        db_session.add(other)
+        db_session.commit()
+        other_headers = {"Authorization": f"Bearer {create_access_token(data={'sub': other.email})}"}
+        assert client.get("/api/admin/users", headers=other_headers).status_code == 200
+
+        response = client.patch(f"/api/admin/users/{other.id}/toggle-active", headers=auth_headers)
+        assert response.json()["is_active"] is False
+        assert client.get("/api/admin/users", headers=other_headers).status_code == 401
+
+    def test_cache_is_bounded_least_recently_used_first(self, db_session: Session, monkeypatch):
+        import auth_utils
+
+        emails = [f"donor{i}@example.com" for i in range(3)]
+        db_session.add_all([User(email=e, password="x", is_active=True) for e in emails])
+        db_session.commit()
+        auth_utils.invalidate_principal()
+        monkeypatch.setattr(auth_utils, "PRINCIPAL_CACHE_MAX", 2)
+
+        auth_utils.load_principal(emails[0], db_session)
+        auth_utils.load_principal(emails[1], db_session)
+        auth_utils.load_principal(emails[0], db_session)  # now most recently used
+        auth_utils.load_principal(emails[2], db_session)
+        assert list(auth_utils._principals) == [emails[0], emails[2]]
+
+    def test_commit_publishes_changed_principals_to_other_workers(self, db_session: Session, monkeypatch):
+        import auth_utils
+
+        published = []
+
+        class Publisher:
+            def publish(self, channel, message):
+                published.append((channel, message))
+
+        user = User(email="donor@example.com", password="x", is_active=True)
+        db_session.add(user)
+        db_session.commit()
+        monkeypatch.setattr(auth_utils, "PRINCIPAL_NOTIFY_ENABLED", True)
+        monkeypatch.setattr(auth_utils, "_ensure_principal_subscriber", lambda: None)
+        monkeypatch.setattr(auth_utils, "_principal_publisher_redis", lambda: Publisher())
+
+        user.is_active = False
+        db_session.commit()
+        assert published == [(auth_utils.PRINCIPAL_CHANNEL, '["donor@example.com"]')]
+
+        # What another worker's subscriber does with that message
+        auth_utils.load_principal("donor@example.com", db_session)
+        auth_utils._apply_principal_message(published[0][1].encode())
+        assert "donor@example.com" not in auth_utils._principals
+
+    def test_revoking_admin_takes_effect_immediately(
+        self, client: TestClient, auth_headers: dict, db_session: Session,
+    ):
+        other = User(email="other@example.com", password=get_password_hash("otherpass"),
+                     is_active=True, is_admin=True, role="admin")
+        db_session.add(other)
+        db_session.commit()
+        other_headers = {"Authorization": f"Bearer {create_access_token(data={'sub': other.email})}"}
+        assert client.get("/api/admin/users", headers=other_headers).status_code == 200
+
+        client.patch(f"/api/admin/users/{other.id}/toggle-admin", headers=auth_headers)
+        assert client.get("/api/admin/users", headers=other_headers).status_code == 403
@@ -0,0 +1,85 @@
+"""
+Tests for connection pool sizing and checkout metrics (database.py).
+"""
+import sqlite3
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+import database
+from database import MeteredQueuePool, pool_sizing
+
+POOL_ENV = ("DB_MAX_CONNECTIONS", "DB_RESERVED_CONNECTIONS", "WEB_CONCURRENCY",
+            "DB_EXTRA_PROCESSES", "DB_POOL_SIZE", "DB_MAX_OVERFLOW", "DB_POOL_TIMEOUT")
+
+
+@pytest.fixture
+def pool_env(monkeypatch):
+    for name in POOL_ENV:
+        monkeypatch.delenv(name, raising=False)
+    return monkeypatch
+
+
+@pytest.mark.unit
+class TestPoolSizing:
+
+    def test_defaults_fit_under_max_connections(self, pool_env):
+        sizing = pool_sizing()
+        assert sizing.processes == 5  # 4 uvicorn workers + the arq worker
+        per_process = 2 * (sizing.pool_size + sizing.max_overflow)
+        assert per_process <= sizing.per_process
+        assert sizing.processes * per_process <= sizing.max_connections - sizing.reserved
+
+    def test_follows_worker_count_and_server_limit(self, pool_env):
+        pool_env.setenv("DB_MAX_CONNECTIONS", "200")
+        pool_env.setenv("WEB_CONCURRENCY", "8")
+        sizing = pool_sizing()
+        assert sizing.processes == 9
+        assert sizing.processes * 2 * (sizing.pool_size + sizing.max_overflow) <= 190
+
+        pool_env.setenv("WEB_CONCURRENCY", "1")
+        assert pool_sizing().pool_size > sizing.pool_size
+
+    def test_explicit_sizes_win(self, pool_env):
+        pool_env.setenv("DB_POOL_SIZE", "3")
+        pool_env.setenv("DB_MAX_OVERFLOW", "0")
+        sizing = pool_sizing()
+        assert (sizing.pool_size, sizing.max_overflow) == (3, 0)
+
+
+@pytest.mark.unit
+class TestPoolMetrics:
+
+    def test_counts_checkouts_and_timeouts(self):
+        MeteredQueuePool.stats.reset()
+        pool = MeteredQueuePool(lambda: sqlite3.connect(":memory:", check_same_thread=False),
+                                pool_size=1, max_overflow=0, timeout=0.05)
+        held = pool.connect()
+        with pytest.raises(PoolTimeoutError):
+            pool.connect()
+        held.close()
+        pool.connect().close()
+
+        stats = MeteredQueuePool.stats.snapshot()
+        assert stats["checkouts"] == 2
+        assert stats["timeouts"] == 1
+        assert stats["wait_ms_max"] >= 50
+        pool.dispose()
+
+    def test_admin_endpoint(self, client: TestClient, auth_headers: dict):
+        response = client.get("/api/admin/db-pool/metrics", headers=auth_headers)
+        assert response.status_code == 200
+        body = response.json()
+        assert body["budget"]["per_process"] == pool_sizing().per_process
+        assert set(body) >= {"sync", "async"}
+
+        assert client.get("/api/admin/db-pool/metrics").status_code in (401, 403)
+
+    def test_transaction_pooling_disables_prepared_statement_caches(self, monkeypatch):
+        monkeypatch.setattr(database, "_transaction_pooling", True)
+        connect_args = database._async_connect_args()
+        assert connect_args["statement_cache_size"] == 0
+        assert connect_args["prepared_statement_cache_size"] == 0
+        names = {connect_args["prepared_statement_name_func"]() for _ in range(2)}
+        assert len(names) == 2
@@ -0,0 +1,153 @@
+"""
+Tests for the incrementally maintained donation aggregates (donation_stats.py).
+"""
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from donation_stats import get_donation_buckets, get_donation_totals, rebuild_donation_aggregates
+from models import Donation, DonationAggregate, DonationDonor
+
+
+def _snapshot(db: Session) -> dict:
+    db.expire_all()
+    buckets = {
+        (r.scope, r.bucket): (round(r.total_amount, 2), r.donation_count, r.donor_count)
+        for r in db.query(DonationAggregate).all()
+        if r.donation_count or r.scope == "total"
+    }
+    donors = {
+        r.email: (r.donation_count, round(r.total_amount, 2))
+        for r in db.query(DonationDonor).all()
+        if r.donation_count
+    }
+    return {"buckets": buckets, "donors": donors}
+
+
+def _donation(**overrides) -> Donation:
+    values = dict(
+        name="Donor",
+        email="donor@example.com",
+        amount=50,
+        frequency="One-Time",
+        donated_at=datetime(2026, 3, 14, 12, 0),
+    )
+    values.update(overrides)
+    return Donation(**values)
+
+
+@pytest.mark.unit
+class TestIncrementalAggregates:
+
+    def test_writes_match_full_rebuild(self, db_session: Session):
+        a = _donation(email="A@Example.com", amount=100, utm_campaign="7")
+        b = _donation(email="a@example.com", amount=25, donated_at=datetime(2026, 4, 1))
+        c = _donation(email="c@example.com", amount=10, frequency="Pending - One-Time")
+        d = _donation(email="d@example.com", amount=60)
+        db_session.add_all([a, b, c, d])
+        db_session.commit()
+
+        c.status = "confirmed"           # payment confirmed
+        b.amount = 40                    # admin correction
+        d.status = "failed"
+        db_session.commit()
+        db_session.delete(a)
+        db_session.commit()
+
+        incremental = _snapshot(db_session)
+        rebuild_donation_aggregates(db_session)
+        assert incremental == _snapshot(db_session)
+
+        totals = get_donation_totals(db_session)
+        assert totals.total_amount == 50
+        assert totals.donation_count == 2
+        assert totals.donor_count == 2
+
+    def test_repeat_donor_counted_once(self, db_session: Session):
+        db_session.add_all([_donation(amount=10), _donation(email="DONOR@example.com", amount=15)])
+        db_session.commit()
+
+        totals = get_donation_totals(db_session)
+        assert totals.donor_count == 1
+        assert totals.total_amount == 25
+
+    def test_missing_totals_row_reads_as_zeros_without_rebuilding(self, db_session: Session, monkeypatch):
+        import donation_stats
+
+        monkeypatch.setattr(donation_stats, "rebuild_donation_aggregates", lambda db: pytest.fail("rebuilt on read"))
+        totals = get_donation_totals(db_session)
+        assert (totals.total_amount, totals.donation_count, totals.donor_count) == (0, 0, 0)
+        assert db_session.query(DonationAggregate).count() == 0
+
+    def test_unconfirmed_donations_are_not_counted(self, db_session: Session):
+        db_session.add(_donation(frequency="Abandoned - Monthly"))
+        db_session.commit()
+
+        totals = get_donation_totals(db_session)
+        assert totals.donation_count == 0
+        assert totals.donor_count == 0
+
+    def test_month_buckets_newest_first(self, db_session: Session):
+        db_session.add_all([
+            _donation(donated_at=datetime(2026, 1, 5)),
+            _donation(donated_at=datetime(2026, 2, 5), amount=20),
+        ])
+        db_session.commit()
+
+        months = get_donation_buckets(db_session, "month")
+        assert [(m.bucket, m.total_amount) for m in months] == [("2026-02", 20), ("2026-01", 50)]
+
+
+@pytest.mark.api
+class TestDonationTrendsEndpoint:
+
+    def test_trends_requires_auth(self, client: TestClient):
+        resp = client.get("/api/admin/dashboard/donation-trends")
+        assert resp.status_code in (401, 403)
+
+    def test_trends_by_campaign(self, client: TestClient, auth_headers: dict, db_session: Session):
+        db_session.add_all([
+            _donation(utm_campaign="1", amount=30),
+            _donation(utm_campaign="2", amount=80, email="other@example.com"),
+        ])
+        db_session.commit()
+
+        resp = client.get("/api/admin/dashboard/donation-trends?scope=campaign", headers=auth_headers)
+        assert resp.status_code == 200
+        assert [b["bucket"] for b in resp.json()] == ["2", "1"]
+
+
+@pytest.mark.api
+class TestDonationStatus:
+
+    def test_status_defaults_from_legacy_frequency(self, db_session: Session):
+        rows = [_donation(frequency=f) for f in ("Monthly", "Failed - card_declined", "Abandoned", "Pending")]
+        db_session.add_all(rows)
+        db_session.commit()
+
+        assert [r.status for r in rows] == ["confirmed", "failed", "abandoned", "pending"]
+
+    def test_recent_public_only_lists_confirmed(self, client: TestClient, db_session: Session):
+        db_session.add_all([
+            _donation(name="Kept Donor", amount=20),
+            _donation(name="Declined Donor", amount=500, status="failed", frequency="One-Time"),
+        ])
+        db_session.commit()
+
+        resp = client.get("/api/donations/recent-public")
+        assert resp.status_code == 200
+        assert [d["amount"] for d in resp.json()] == [20]
+
+    def test_admin_frequency_correction_moves_status(
+        self, client: TestClient, auth_headers: dict, db_session: Session
+    ):
+        d = _donation(frequency="Failed - declined")
+        db_session.add(d)
+        db_session.commit()
+
+        resp = client.put(f"/api/donations/{d.id}", json={"frequency": "One-Time"}, headers=auth_headers)
+        assert resp.status_code == 200
+        assert resp.json()["status"] == "confirmed"
+        assert get_donation_totals(db_session).donation_count == 1
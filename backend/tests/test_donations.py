@@ -1,3 +1,5 @@
+import json
+
 import pytest
 from datetime import datetime, timedelta
 from fastapi.testclient import TestClient
@@ -35,6 +37,15 @@ class TestDonationsAPI:
         assert donation is not None
         assert donation.name == donation_data["name"]
     
+    def test_donation_email_stored_normalized(self, db_session: Session):
+        """Donor emails are trimmed + lower-cased on write so lookups can use the index"""
+        donation = Donation(name="Jane", email=" Jane.Doe@Example.COM ", amount=10, frequency="one-time")
+        db_session.add(donation)
+        db_session.commit()
+
+        assert donation.email == "jane.doe@example.com"
+        assert db_session.query(Donation).filter(Donation.email == "jane.doe@example.com").count() == 1
+    
     def test_create_donation_invalid_data(self, client: TestClient):
         """Test creating donation with invalid data"""
         # Missing required fields
@@ -275,3 +286,80 @@ class TestDonationModel:
         
         assert donation.stripe_session_id == "cs_test_session_123"
 
+
+
+@pytest.mark.api
+class TestDonationListAndExport:
+    """Keyset-paginated admin list and the streaming export"""
+
+    def _seed(self, db_session: Session, n: int = 5):
+        for i in range(n):
+            db_session.add(Donation(
+                name=f"Donor {i}", email=f"d{i}@example.com", amount=10 + i, frequency="One-Time",
+                donated_at=datetime(2026, 1, 1 + i),
+            ))
+        db_session.add(Donation(name="=HYPERLINK()", email="x@example.com", amount=1, frequency="Failed - declined"))
+        db_session.commit()
+
+    def test_list_walks_pages_with_cursor(self, client: TestClient, auth_headers: dict, db_session: Session):
+        self._seed(db_session)
+
+        seen, cursor = [], None
+        while True:
+            params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+            response = client.get("/api/donations/", params=params, headers=auth_headers)
+            assert response.status_code == 200
+            seen.extend(d["id"] for d in response.json())
+            cursor = response.headers.get("X-Next-Cursor")
+            if not cursor:
+                break
+
+        assert len(seen) == 6
+        assert seen == sorted(seen, reverse=True)
+
+    def test_list_applies_filters_across_pages(self, client: TestClient, auth_headers: dict, db_session: Session):
+        self._seed(db_session)
+        params = {"limit": 1, "status": "confirmed", "start": "2026-01-02T00:00:00", "end": "2026-01-04T00:00:00"}
+
+        first = client.get("/api/donations/", params=params, headers=auth_headers)
+        second = client.get("/api/donations/", params={**params, "cursor": first.headers["X-Next-Cursor"]},
+                            headers=auth_headers)
+        assert [d["name"] for d in first.json() + second.json()] == ["Donor 2", "Donor 1"]
+        assert "X-Next-Cursor" not in second.headers
+
+        found = client.get("/api/donations/", params={"search": "D3@EXAMPLE"}, headers=auth_headers).json()
+        assert [d["name"] for d in found] == ["Donor 3"]
+        assert client.get("/api/donations/?status=refunded", headers=auth_headers).status_code == 400
+
+    def test_list_rejects_garbage_cursor(self, client: TestClient, auth_headers: dict):
+        response = client.get("/api/donations/?cursor=not-a-cursor", headers=auth_headers)
+        assert response.status_code == 400
+
+    def test_export_csv_with_filters(self, client: TestClient, auth_headers: dict, db_session: Session):
+        self._seed(db_session)
+
+        response = client.get(
+            "/api/donations/export?status=confirmed&start=2026-01-02T00:00:00&end=2026-01-04T00:00:00",
+            headers=auth_headers,
+        )
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/csv")
+        lines = response.text.strip().splitlines()
+        assert lines[0].startswith("id,name,email,amount")
+        assert [line.split(",")[1] for line in lines[1:]] == ["Donor 1", "Donor 2"]
+
+    def test_export_ndjson_and_csv_formula_guard(
+        self, client: TestClient, auth_headers: dict, db_session: Session
+    ):
+        self._seed(db_session, n=1)
+
+        ndjson = client.get("/api/donations/export?format=ndjson", headers=auth_headers)
+        rows = [json.loads(line) for line in ndjson.text.splitlines()]
+        assert {r["status"] for r in rows} == {"confirmed", "failed"}
+        assert "=HYPERLINK()" in {r["name"] for r in rows}
+
+        csv_body = client.get("/api/donations/export", headers=auth_headers).text
+        assert "'=HYPERLINK()" in csv_body
+
+    def test_export_requires_admin(self, client: TestClient):
+        assert client.get("/api/donations/export").status_code in (401, 403)
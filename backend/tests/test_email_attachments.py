@@ -0,0 +1,97 @@
+"""
+Tests for outbox attachment store-by-reference.
+"""
+import pytest
+from sqlalchemy.orm import Session
+
+from email_service import send_donation_certificate_email
+from marketing.attachments import (
+    AttachmentCache,
+    materialize_attachments,
+    resolve_attachments,
+    store_attachment,
+)
+from marketing.mailer import ComplianceMailer
+from marketing.resend_client import ResendDeliveryError, encode_attachment
+from models import Donation, EmailAttachmentBlob, EmailOutbox
+
+
+@pytest.fixture(autouse=True)
+def _no_redis(monkeypatch):
+    monkeypatch.setattr("marketing.queue.enqueue_send_job", lambda outbox_id: None)
+
+
+@pytest.mark.unit
+class TestAttachmentStore:
+
+    def test_outbox_rows_share_one_blob(self, db_session: Session):
+        mailer = ComplianceMailer(db_session)
+        pdf = encode_attachment("receipt.pdf", b"%PDF-1.4 receipt", content_type="application/pdf")
+
+        rows = [
+            mailer.queue(to_email=f"donor{i}@example.com", subject="Receipt",
+                         body_html="<p>Thanks</p>", attachments=[pdf])
+            for i in range(3)
+        ]
+
+        assert db_session.query(EmailAttachmentBlob).count() == 1
+        ref = rows[0].attachments[0]
+        assert "content_b64" not in ref
+        assert ref["filename"] == "receipt.pdf" and ref["size"] == 16
+        assert all(r.attachments == [ref] for r in rows)
+
+    def test_resolve_round_trips_through_cache(self, db_session: Session):
+        ref = store_attachment(db_session, b"hello", filename="a.txt", content_type="text/plain")
+        db_session.commit()
+        cache = AttachmentCache(max_bytes=1024)
+
+        first = resolve_attachments(db_session, [ref], cache=cache)
+        db_session.query(EmailAttachmentBlob).delete()
+        db_session.commit()
+        second = resolve_attachments(db_session, [ref], cache=cache)
+
+        assert first == second == [encode_attachment("a.txt", b"hello", content_type="text/plain")]
+
+    def test_missing_blob_raises_delivery_error(self, db_session: Session):
+        ref = {"filename": "gone.pdf", "content_type": "application/pdf", "sha256": "0" * 64, "size": 1}
+        with pytest.raises(ResendDeliveryError):
+            resolve_attachments(db_session, [ref], cache=AttachmentCache())
+
+    def test_cache_evicts_least_recently_used(self):
+        cache = AttachmentCache(max_bytes=10)
+        cache.put("a", "aaaa")
+        cache.put("b", "bbbb")
+        cache.get("a")
+        cache.put("c", "cccc")
+        assert cache.get("b") is None
+        assert cache.get("a") == "aaaa" and cache.get("c") == "cccc"
+        assert cache.size_bytes == 8
+
+
+@pytest.mark.unit
+class TestDeferredReceipt:
+
+    def test_receipt_pdf_rendered_by_worker(self, db_session: Session, monkeypatch):
+        monkeypatch.setattr("email_service.SessionLocal", lambda: db_session)
+        donation = Donation(name="Amina Yusuf", email="amina@example.com", amount=120.0, frequency="one-time")
+        db_session.add(donation)
+        db_session.commit()
+        donation_id = donation.id
+
+        assert send_donation_certificate_email(
+            email=donation.email, name=donation.name, amount=donation.amount,
+            donation_date=donation.donated_at, donation_id=donation_id,
+        )
+        row = db_session.query(EmailOutbox).one()
+        recipe = row.attachments[0]
+        assert recipe["generate"] == "donation_receipt"
+        assert recipe["params"] == {"donation_id": donation_id}
+        assert db_session.query(EmailAttachmentBlob).count() == 0
+
+        refs = materialize_attachments(db_session, row.attachments)
+        db_session.commit()
+        assert refs[0]["filename"] == recipe["filename"]
+        [resolved] = resolve_attachments(db_session, refs, cache=AttachmentCache())
+        assert resolved["content_type"] == "application/pdf"
+        assert resolved["content_b64"].startswith("JVBERi0")  # "%PDF-"
+        assert materialize_attachments(db_session, refs) is None
@@ -0,0 +1,46 @@
+"""
+Worker boot regression test: `import main` must not pull in the heavy
+subsystems deferred by lazy_imports.py, and must stay within a time budget.
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+from import_time import profile_import  # noqa: E402
+from lazy_imports import lazy_module  # noqa: E402
+
+# Generous for CI runners; `import main` takes ~2s locally. Tighten with the env var.
+IMPORT_TIME_BUDGET_SECONDS = float(os.getenv("IMPORT_TIME_BUDGET_SECONDS", "6"))
+
+
+@pytest.mark.slow
+class TestImportTime:
+
+    def test_import_main_defers_heavy_modules_and_fits_the_budget(self):
+        seconds, rss_mb, loaded, _ = profile_import()
+        assert loaded == [], f"imported at boot: {loaded}; put them behind lazy_imports.lazy_module"
+        assert seconds < IMPORT_TIME_BUDGET_SECONDS, f"import main took {seconds:.2f}s"
+
+
+@pytest.mark.unit
+class TestLazyModule:
+
+    def test_loads_on_first_use_and_runs_on_load_once(self):
+        loads = []
+        json_module = lazy_module("json", on_load=loads.append)
+        assert loads == []
+        assert json_module.dumps([1]) == "[1]"
+        assert json_module.loads("2") == 2
+        assert [m.__name__ for m in loads] == ["json"]
+
+    def test_writes_go_to_the_real_module(self, monkeypatch):
+        import json
+
+        proxy = lazy_module("json")
+        monkeypatch.setattr(json, "lazy_marker", 1, raising=False)
+        assert proxy.lazy_marker == 1
+        proxy.lazy_marker = 2
+        assert json.lazy_marker == 2
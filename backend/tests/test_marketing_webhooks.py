@@ -0,0 +1,107 @@
+"""
+Tests for Resend webhook ingestion (svix-id dedupe + batched application).
+"""
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from marketing.webhooks import apply_pending_resend_events
+from models import (
+    CampaignSend,
+    EmailEvent,
+    EmailOutbox,
+    EmailSuppression,
+    MarketingCampaign,
+    ResendWebhookEvent,
+)
+
+
+def _post(client: TestClient, event: dict, svix_id: str):
+    return client.post(
+        "/api/marketing/webhooks/resend",
+        content=json.dumps(event),
+        headers={"svix-id": svix_id, "content-type": "application/json"},
+    )
+
+
+@pytest.fixture(autouse=True)
+def _no_redis(monkeypatch):
+    """The worker is not running in tests — rows are applied explicitly."""
+    monkeypatch.setattr("marketing.queue.enqueue_resend_events_job", lambda: None)
+
+
+@pytest.fixture
+def campaign_send(db_session: Session):
+    campaign = MarketingCampaign(name="Ramadan appeal", status="sent")
+    db_session.add(campaign)
+    db_session.flush()
+    outbox = EmailOutbox(
+        category="marketing",
+        to_email="donor@example.com",
+        from_email="noreply@myzakat.org",
+        subject="Hello",
+        body_html="<p>Hi</p>",
+        status="sent",
+        provider_message_id="msg_123",
+    )
+    db_session.add(outbox)
+    db_session.flush()
+    send = CampaignSend(
+        campaign_id=campaign.id,
+        recipient_email="donor@example.com",
+        outbox_id=outbox.id,
+        status="queued",
+    )
+    db_session.add(send)
+    db_session.commit()
+    return campaign, outbox, send
+
+
+@pytest.mark.api
+class TestResendWebhook:
+
+    def test_retried_delivery_is_recorded_once(self, client: TestClient, db_session: Session):
+        event = {"type": "email.delivered", "data": {"email_id": "msg_1", "to": ["a@example.com"]}}
+
+        first = _post(client, event, "msg_abc")
+        retry = _post(client, event, "msg_abc")
+
+        assert first.status_code == 200
+        assert retry.status_code == 200
+        assert retry.json()["duplicate"] is True
+        assert db_session.query(ResendWebhookEvent).count() == 1
+
+    def test_batch_applies_bounce_and_delivery_once(self, client: TestClient, db_session: Session, campaign_send):
+        campaign, outbox, send = campaign_send
+        delivered = {"type": "email.delivered", "data": {"email_id": "msg_123", "to": ["donor@example.com"]}}
+        bounced = {
+            "type": "email.bounced",
+            "data": {"email_id": "msg_123", "to": ["Donor@Example.com"], "bounce": {"type": "Permanent"}},
+        }
+        _post(client, delivered, "svix_1")
+        _post(client, delivered, "svix_1")  # provider retry
+        _post(client, bounced, "svix_2")
+        _post(client, bounced, "svix_2")  # provider retry
+
+        assert apply_pending_resend_events(db_session) == 2
+
+        db_session.expire_all()
+        campaign = db_session.query(MarketingCampaign).get(campaign.id)
+        send = db_session.query(CampaignSend).get(send.id)
+        assert campaign.delivered_count == 1
+        assert campaign.bounced_count == 1
+        assert send.status == "sent"
+        assert send.bounced is True
+        assert db_session.query(EmailSuppression).filter_by(email="donor@example.com").count() == 1
+        assert db_session.query(EmailEvent).filter_by(campaign_send_id=send.id).count() == 2
+        assert db_session.query(ResendWebhookEvent).filter_by(status="pending").count() == 0
+
+    def test_event_without_recipient_is_marked_processed(self, client: TestClient, db_session: Session):
+        _post(client, {"type": "email.delivered", "data": {}}, "svix_empty")
+
+        apply_pending_resend_events(db_session)
+
+        row = db_session.query(ResendWebhookEvent).filter_by(svix_id="svix_empty").one()
+        assert row.status == "processed"
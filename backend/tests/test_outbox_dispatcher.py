@@ -0,0 +1,88 @@
+"""
+Tests for the outbox dispatcher (lease claiming, crash recovery, metrics).
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from marketing.dispatcher import (
+    claim_due_outbox,
+    claim_for_send,
+    outbox_backlog_metrics,
+    recover_stuck_sends,
+)
+from models import EmailOutbox
+
+
+def _outbox(db: Session, **overrides) -> EmailOutbox:
+    row = EmailOutbox(
+        to_email="donor@example.com",
+        from_email="noreply@myzakat.org",
+        subject="Receipt",
+        body_html="<p>Thanks</p>",
+        **overrides,
+    )
+    db.add(row)
+    db.commit()
+    return row
+
+
+@pytest.mark.unit
+class TestOutboxClaiming:
+
+    def test_claimed_rows_are_leased_until_expiry(self, db_session: Session):
+        ids = [_outbox(db_session).id for _ in range(3)]
+        _outbox(db_session, queue_after=datetime.utcnow() + timedelta(hours=1))
+
+        first = claim_due_outbox(db_session, 2)
+        second = claim_due_outbox(db_session, 10)
+        assert [i for i, _ in first] == ids[:2]
+        assert [i for i, _ in second] == ids[2:]
+        assert claim_due_outbox(db_session, 10) == []
+
+        db_session.query(EmailOutbox).update({EmailOutbox.lease_expires_at: datetime.utcnow() - timedelta(seconds=1)})
+        db_session.commit()
+        assert len(claim_due_outbox(db_session, 10)) == 3
+
+    def test_send_claim_is_won_once(self, db_session: Session):
+        row_id = _outbox(db_session).id
+
+        won = claim_for_send(db_session, row_id)
+        assert won.status == "sending"
+        assert won.attempts == 1
+        assert won.lease_expires_at is not None
+        assert claim_for_send(db_session, row_id) is None
+
+    def test_expired_sending_rows_recovered(self, db_session: Session):
+        expired = datetime.utcnow() - timedelta(seconds=1)
+        retry = _outbox(db_session, status="sending", attempts=1, lease_expires_at=expired)
+        exhausted = _outbox(db_session, status="sending", attempts=3, lease_expires_at=expired)
+        in_flight = _outbox(db_session, status="sending", attempts=1,
+                            lease_expires_at=datetime.utcnow() + timedelta(minutes=5))
+
+        assert outbox_backlog_metrics(db_session)["stuck_sending"] == 2
+        assert recover_stuck_sends(db_session) == 2
+
+        db_session.expire_all()
+        assert retry.status == "pending" and retry.lease_expires_at is None
+        assert exhausted.status == "failed"
+        assert in_flight.status == "sending"
+
+
+@pytest.mark.api
+class TestOutboxMetricsEndpoint:
+
+    def test_backlog_metrics(self, client: TestClient, db_session: Session, auth_headers):
+        _outbox(db_session, queue_after=datetime.utcnow() - timedelta(minutes=2))
+        _outbox(db_session, queue_after=datetime.utcnow() + timedelta(hours=1))
+        _outbox(db_session, status="sent")
+
+        response = client.get("/api/marketing/outbox/metrics", headers=auth_headers)
+        assert response.status_code == 200
+        data = response.json()
+        assert data["pending"] == 2
+        assert data["due"] == 1
+        assert data["oldest_due_age_seconds"] >= 120
+        assert data["sending"] == 0
@@ -10,7 +10,8 @@ from unittest.mock import patch, MagicMock
 from fastapi.testclient import TestClient
 from sqlalchemy.orm import Session
 
-from models import Donation, DonationSubscription
+from models import Donation, DonationSubscription, StripeEvent
+from stripe_events import process_pending_stripe_events
 
 
 # ---------------------------------------------------------------------------
@@ -307,12 +308,17 @@ class TestStripeWebhook:
     """Tests for POST /api/donations/stripe-webhook"""
 
     @pytest.fixture(autouse=True)
-    def _setup_webhook_secret(self, monkeypatch):
-        """Set a webhook secret, mock verification, and clear idempotency cache."""
+    def _setup_webhook_secret(self, monkeypatch, db_session):
+        """Set a webhook secret and apply recorded events right away.
+
+        In production the webhook hands events to the Arq worker; here the
+        enqueue hook runs the consumer inline against the test database.
+        """
         monkeypatch.setenv("STRIPE_WEBHOOK_SECRET", "whsec_test_secret")
-        # Clear the processed events set so each test starts fresh
-        import routers.donations as donations_module
-        donations_module._processed_events.clear()
+        monkeypatch.setattr(
+            "marketing.queue.enqueue_stripe_events_job",
+            lambda: process_pending_stripe_events(db_session),
+        )
 
     def _post_webhook(self, client, event, monkeypatch):
         """Helper to post a webhook event with mocked signature verification."""
@@ -557,6 +563,86 @@ class TestStripeWebhook:
         )
         assert resp.status_code == 500
 
+    def test_duplicate_event_is_processed_once(
+        self, client: TestClient, db_session: Session, monkeypatch
+    ):
+        """A Stripe retry of an already-recorded event is acknowledged without reprocessing."""
+        event = _build_webhook_event("checkout.session.expired", {
+            "id": "cs_expired_dup",
+            "amount_total": 2500,
+            "customer_email": "dup@example.com",
+        }, event_id="evt_dup_1")
+
+        first = self._post_webhook(client, event, monkeypatch)
+        second = self._post_webhook(client, event, monkeypatch)
+        assert first.json() == {"status": "received"}
+        assert second.json() == {"status": "already_processed"}
+
+        assert db_session.query(Donation).filter(Donation.stripe_session_id == "cs_expired_dup").count() == 1
+        recorded = db_session.query(StripeEvent).filter(StripeEvent.event_id == "evt_dup_1").one()
+        assert recorded.status == "processed"
+
+    def test_failed_event_is_retried_then_dead_lettered(
+        self, client: TestClient, db_session: Session, monkeypatch
+    ):
+        """A failing event backs off, blocks later events for its object, then dead-letters."""
+        monkeypatch.setattr("stripe_events.MAX_ATTEMPTS", 2)
+        failing = _build_webhook_event("invoice.payment_failed", {"subscription": "sub_order"}, event_id="evt_order_1")
+        later = _build_webhook_event("customer.subscription.deleted", {"id": "sub_order"}, event_id="evt_order_2")
+        failing["created"], later["created"] = 1_700_000_000, 1_700_000_001
+
+        calls = []
+
+        def fake_process(db, event):
+            calls.append(event["id"])
+            if event["id"] == "evt_order_1":
+                raise RuntimeError("db blip")
+
+        monkeypatch.setattr("routers.donations.process_stripe_event", fake_process)
+        assert self._post_webhook(client, failing, monkeypatch).status_code == 200
+        assert self._post_webhook(client, later, monkeypatch).status_code == 200
+
+        # The second event shares the subscription, so it waits behind the retry.
+        assert calls == ["evt_order_1"]
+        first = db_session.query(StripeEvent).filter(StripeEvent.event_id == "evt_order_1").one()
+        assert first.status == "pending" and first.attempts == 1 and "db blip" in first.error
+
+        first.next_attempt_at = datetime.utcnow() - timedelta(seconds=1)
+        db_session.commit()
+        process_pending_stripe_events(db_session)
+
+        db_session.expire_all()
+        assert calls == ["evt_order_1", "evt_order_1", "evt_order_2"]
+        statuses = {e.event_id: e.status for e in db_session.query(StripeEvent).all()}
+        assert statuses == {"evt_order_1": "dead", "evt_order_2": "processed"}
+
+    def test_time_budget_stops_claiming(self, db_session: Session):
+        db_session.add(StripeEvent(event_id="evt_budget", event_type="charge.failed", status="pending",
+                                   next_attempt_at=datetime.utcnow() - timedelta(seconds=1)))
+        db_session.commit()
+
+        assert process_pending_stripe_events(db_session, time_budget=0) == 0
+        db_session.expire_all()
+        row = db_session.query(StripeEvent).filter(StripeEvent.event_id == "evt_budget").one()
+        assert row.status == "pending" and row.attempts == 0
+
+    def test_stripe_event_metrics_and_dead_letter_retry(
+        self, client: TestClient, db_session: Session, auth_headers
+    ):
+        db_session.add(StripeEvent(event_id="evt_dead", event_type="charge.failed", status="dead", attempts=6))
+        db_session.add(StripeEvent(event_id="evt_wait", event_type="charge.failed", status="pending",
+                                   received_at=datetime.utcnow() - timedelta(minutes=5)))
+        db_session.commit()
+
+        metrics = client.get("/api/donations/stripe-events/metrics", headers=auth_headers).json()
+        assert metrics["dead"] == 1 and metrics["pending"] == 1
+        assert metrics["lag_seconds"] >= 300
+
+        dead = client.get("/api/donations/stripe-events/dead", headers=auth_headers).json()
+        assert [d["event_id"] for d in dead] == ["evt_dead"]
+        assert client.post("/api/donations/stripe-events/evt_dead/retry", headers=auth_headers).status_code == 200
+        assert client.post("/api/donations/stripe-events/evt_dead/retry", headers=auth_headers).status_code == 404
+
     def test_webhook_invalid_signature(self, client: TestClient, monkeypatch):
         """Invalid webhook signature should return 400."""
         import stripe
@@ -0,0 +1,90 @@
+"""
+Tests for receipt rendering (pdf_service.py): template reuse, the S3
+receipt cache and batch rendering.
+"""
+from datetime import datetime
+
+import pytest
+
+import pdf_service
+from pdf_service import (
+    generate_donation_certificate_to_bytes,
+    get_donation_receipt_pdf,
+    receipt_cache_key,
+    render_receipts_batch,
+)
+
+
+@pytest.mark.unit
+class TestReceiptTemplate:
+
+    def test_template_is_built_once(self):
+        generate_donation_certificate_to_bytes("Amina Yusuf", 120.0, datetime(2026, 3, 1), 7)
+        misses = pdf_service._template.cache_info().misses
+        generate_donation_certificate_to_bytes("Omar Ali", 80.0, datetime(2026, 3, 2), 8)
+        assert pdf_service._template.cache_info().misses == misses
+
+    def test_logo_is_embedded_at_print_resolution(self):
+        logo = pdf_service._template()["logo_png"]
+        assert logo is not None and len(logo) < 64 * 1024
+
+
+@pytest.mark.unit
+class TestReceiptCache:
+
+    def test_key_covers_printed_fields_and_template_version(self, monkeypatch):
+        base = receipt_cache_key(7, 120.0, "Amina Yusuf", datetime(2026, 3, 1, 9, 0))
+        assert base == receipt_cache_key(7, 120.0, "Amina Yusuf", datetime(2026, 3, 1, 17, 30))
+        assert base != receipt_cache_key(7, 120.5, "Amina Yusuf", datetime(2026, 3, 1))
+        assert base != receipt_cache_key(7, 120.0, "Amina Y.", datetime(2026, 3, 1))
+        monkeypatch.setattr(pdf_service, "TEMPLATE_VERSION", pdf_service.TEMPLATE_VERSION + 1)
+        assert base != receipt_cache_key(7, 120.0, "Amina Yusuf", datetime(2026, 3, 1))
+
+    def test_key_depends_on_the_server_secret(self, monkeypatch):
+        key = receipt_cache_key(7, 120.0, "Amina Yusuf", datetime(2026, 3, 1))
+        assert key.startswith(pdf_service.RECEIPT_CACHE_PREFIX + "/")
+        monkeypatch.setattr("s3_service.PRIVATE_KEY_SECRET", "another-secret")
+        assert key != receipt_cache_key(7, 120.0, "Amina Yusuf", datetime(2026, 3, 1))
+
+    def test_id_less_receipts_are_keyed_by_their_receipt_number(self):
+        morning = receipt_cache_key(None, 50.0, "Omar", datetime(2026, 3, 1, 9, 0))
+        assert morning != receipt_cache_key(None, 50.0, "Omar", datetime(2026, 3, 1, 9, 5))
+        assert morning == receipt_cache_key(None, 50.0, "Omar", datetime(2026, 3, 1, 9, 0, 30))
+
+    def test_second_request_is_served_from_s3(self, monkeypatch):
+        bucket = {}
+        monkeypatch.setattr(pdf_service, "RECEIPT_CACHE_ENABLED", True)
+        monkeypatch.setattr("s3_service.download_private_file", lambda key: bucket.get(key))
+        monkeypatch.setattr("s3_service.upload_private_file", lambda content, key, **kw: bucket.setdefault(key, content))
+
+        first = get_donation_receipt_pdf("Amina Yusuf", 120.0, datetime(2026, 3, 1), 7)
+        monkeypatch.setattr(pdf_service, "generate_donation_certificate_to_bytes", lambda *a, **kw: pytest.fail("re-rendered"))
+        second = get_donation_receipt_pdf("Amina Yusuf", 120.0, datetime(2026, 3, 1), 7)
+
+        assert first == second and first.startswith(b"%PDF-") and len(bucket) == 1
+
+    def test_s3_failure_falls_back_to_rendering(self, monkeypatch):
+        def unavailable(*args, **kwargs):
+            raise ConnectionError("S3 down")
+
+        monkeypatch.setattr(pdf_service, "RECEIPT_CACHE_ENABLED", True)
+        monkeypatch.setattr("s3_service.download_private_file", unavailable)
+        monkeypatch.setattr("s3_service.upload_private_file", unavailable)
+
+        assert get_donation_receipt_pdf("Amina Yusuf", 120.0, datetime(2026, 3, 1), 7).startswith(b"%PDF-")
+
+
+@pytest.mark.unit
+class TestBatchRendering:
+
+    def test_year_end_jobs_render_in_order(self):
+        jobs = [
+            {
+                "kind": "year_end", "donor_name": f"Donor {i}", "tax_year": 2025, "receipt_number": f"ZDF-2025-A{i}",
+                "donations": [(datetime(2025, m, 1), 10.0 * i) for m in range(1, 13)],
+            }
+            for i in range(3)
+        ]
+        out = list(render_receipts_batch(iter(jobs), workers=1))
+        assert [job["donor_name"] for job, _ in out] == ["Donor 0", "Donor 1", "Donor 2"]
+        assert all(pdf.startswith(b"%PDF-") for _, pdf in out)
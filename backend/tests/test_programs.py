@@ -0,0 +1,76 @@
+"""
+Tests for program slugs: assigned when a program is written, never while
+serving the public list.
+"""
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from conftest import async_engine
+from models import Program, ProgramCategory
+
+
+@pytest.fixture
+def category(db_session: Session):
+    category = ProgramCategory(name="water", slug="water", title="Water", is_active=True)
+    db_session.add(category)
+    db_session.commit()
+    return category
+
+
+@pytest.mark.api
+class TestProgramSlugs:
+
+    def test_create_without_slug_generates_one(self, client: TestClient, auth_headers, category):
+        response = client.post("/api/programs/", headers=auth_headers,
+                               json={"category_id": category.id, "title": "Water Wells!"})
+        assert response.status_code == 200
+        assert response.json()["slug"] == "water-wells"
+
+    def test_generated_slugs_are_unique(self, client: TestClient, auth_headers, category):
+        slugs = [
+            client.post("/api/programs/", headers=auth_headers,
+                        json={"category_id": category.id, "title": "Water wells", "slug": ""}).json()["slug"]
+            for _ in range(3)
+        ]
+        assert slugs == ["water-wells", "water-wells-1", "water-wells-2"]
+
+    def test_explicit_duplicate_slug_is_rejected(self, client: TestClient, auth_headers, category, db_session: Session):
+        db_session.add(Program(category_id=category.id, title="Water wells", slug="water-wells"))
+        db_session.commit()
+        response = client.post("/api/programs/", headers=auth_headers,
+                               json={"category_id": category.id, "title": "Other", "slug": "water-wells"})
+        assert response.status_code == 400
+
+    def test_clearing_slug_on_update_regenerates_it(
+        self, client: TestClient, auth_headers, category, db_session: Session,
+    ):
+        program = Program(category_id=category.id, title="Water wells", slug="old-slug")
+        db_session.add(program)
+        db_session.commit()
+
+        response = client.put(f"/api/programs/{program.id}", headers=auth_headers,
+                              json={"title": "Clean water", "slug": ""})
+        assert response.status_code == 200
+        assert response.json()["slug"] == "clean-water"
+
+    def test_listing_programs_does_not_write(
+        self, client: TestClient, category, db_session: Session,
+    ):
+        db_session.add(Program(category_id=category.id, title="Water wells", slug="water-wells", is_active=True))
+        db_session.commit()
+
+        statements = []
+
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(async_engine.sync_engine, "before_cursor_execute", record)
+        try:
+            response = client.get("/api/programs/")
+        finally:
+            event.remove(async_engine.sync_engine, "before_cursor_execute", record)
+
+        assert response.status_code == 200 and response.json()[0]["slug"] == "water-wells"
+        assert statements and all(s.lstrip().upper().startswith("SELECT") for s in statements)
@@ -0,0 +1,90 @@
+"""
+Tests for the aggregated homepage endpoint (routers/public.py).
+"""
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from models import FundraisingProject, Program, ProgramCategory, SlideshowSlide, Story, Testimonial
+from conftest import TestingAsyncSessionLocal
+from routers import public
+from routers.public import SECTIONS, build_bootstrap
+
+
+@pytest.fixture
+def homepage_content(db_session: Session, sample_settings):
+    db_session.add_all([
+        SlideshowSlide(title="Feed a family", display_order=1, is_active=True),
+        SlideshowSlide(title="Hidden slide", display_order=2, is_active=False),
+        ProgramCategory(name="water", slug="water", title="Water", is_active=True),
+        Program(category_id=1, title="Water wells", slug="water-wells", is_active=True),
+        Story(title="Amina's well", summary="s", content="c", is_active=True),
+        Story(title="Awaiting review", summary="s", content="c", is_active=True, is_pending_approval=True),
+        Testimonial(name="Omar", text="Thank you", is_approved=True),
+        FundraisingProject(title="Gaza kitchen", slug="gaza-kitchen", short_description="Hot meals",
+                           goal_cents=100000, spent_cents=25000),
+    ])
+    db_session.commit()
+
+
+@pytest.mark.api
+class TestPublicBootstrap:
+
+    def test_returns_every_section(self, client: TestClient, homepage_content):
+        response = client.get("/api/public/bootstrap")
+        assert response.status_code == 200
+        data = response.json()
+
+        assert set(data) == set(SECTIONS)
+        assert [s["title"] for s in data["slideshow"]] == ["Feed a family"]
+        assert [s["title"] for s in data["stories"]] == ["Amina's well"]
+        assert data["impact_stats"] == {"meals": 25000, "families": 1200, "orphans": 0, "total_raised": 500000.0}
+        assert data["donation_stats"]["impact"]["meals"] == 25000
+        assert data["fundraising_projects"][0]["progress_percent"] == 25.0
+        assert {s["key"] for s in data["settings"]} == {"meals_provided", "families_supported", "total_raised"}
+
+    def test_sections_match_the_list_endpoints(self, client: TestClient, homepage_content):
+        data = client.get("/api/public/bootstrap").json()
+        assert data["programs"] == client.get("/api/programs/?active_only=true").json()
+        assert data["testimonials"] == client.get("/api/testimonials/").json()
+        assert data["program_categories"] == client.get("/api/program-categories/?active_only=true").json()
+
+    def test_sections_share_a_few_sessions(self, homepage_content):
+        opened = []
+
+        def factory():
+            opened.append(TestingAsyncSessionLocal())
+            return opened[-1]
+
+        data = asyncio.run(build_bootstrap(factory, list(SECTIONS)))
+        assert list(data) == list(SECTIONS)
+        assert len(opened) == public.BOOTSTRAP_SESSIONS
+
+    def test_field_selection(self, client: TestClient, homepage_content):
+        data = client.get("/api/public/bootstrap?fields=slideshow, impact_stats").json()
+        assert set(data) == {"slideshow", "impact_stats"}
+
+    def test_unknown_field_is_rejected(self, client: TestClient):
+        response = client.get("/api/public/bootstrap?fields=slideshow,passwords")
+        assert response.status_code == 400 and "passwords" in response.json()["detail"]
+
+    def test_cached_with_etag_and_invalidated_by_edits(
+        self, client: TestClient, db_session: Session, homepage_content, response_cache_redis,
+    ):
+        first = client.get("/api/public/bootstrap?fields=slideshow")
+        assert first.headers["x-cache"] == "MISS"
+        assert client.get("/api/public/bootstrap?fields=slideshow",
+                          headers={"If-None-Match": first.headers["etag"]}).status_code == 304
+
+        # An edit to a section that isn't selected leaves the payload cached.
+        db_session.query(Program).one().title = "Deep water wells"
+        db_session.commit()
+        assert client.get("/api/public/bootstrap?fields=slideshow").headers["x-cache"] == "HIT"
+
+        db_session.query(SlideshowSlide).filter(SlideshowSlide.is_active == True).one().title = "Feed two families"  # noqa: E712
+        db_session.commit()
+        response = client.get("/api/public/bootstrap?fields=slideshow")
+        assert response.headers["x-cache"] == "MISS"
+        assert response.json()["slideshow"][0]["title"] == "Feed two families"
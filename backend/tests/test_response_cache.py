@@ -0,0 +1,135 @@
+"""
+Tests for the public response cache (response_cache.py): hits, ETags,
+version-bump invalidation and stale-while-revalidate and single-flight misses.
+"""
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.requests import Request
+from sqlalchemy.orm import Session
+
+import response_cache
+from models import Program, Setting
+
+
+def _impact(client: TestClient, **headers):
+    return client.get("/api/settings/public/impact-stats", headers=headers)
+
+
+def _serve(key: str, build, **kwargs):
+    request = Request({"type": "http", "method": "GET", "path": "/", "headers": []})
+    return response_cache.serve_cached(request, key, ["programs"], build, **kwargs)
+
+
+def _age_entries(redis, seconds: float):
+    for key, raw in list(redis.data.items()):
+        if ":entry:" in key:
+            entry = response_cache._unpack(raw)
+            redis.data[key] = response_cache._pack(entry._replace(stored_at=entry.stored_at - seconds))
+
+
+@pytest.mark.api
+class TestResponseCache:
+
+    def test_second_view_is_served_from_redis(
+        self, client: TestClient, db_session: Session, sample_settings, response_cache_redis, monkeypatch,
+    ):
+        first = _impact(client)
+        assert first.headers["x-cache"] == "MISS" and first.json()["meals"] == 25000
+
+        with monkeypatch.context() as m:
+            m.setattr(Session, "execute", lambda *a, **kw: pytest.fail("queried the database"))
+            second = _impact(client)
+
+        assert second.headers["x-cache"] == "HIT"
+        assert second.content == first.content and second.headers["etag"] == first.headers["etag"]
+
+    def test_matching_etag_gets_304(self, client: TestClient, sample_settings, response_cache_redis):
+        etag = _impact(client).headers["etag"]
+        response = _impact(client, **{"If-None-Match": etag})
+        assert response.status_code == 304 and response.content == b""
+
+    def test_commit_bumps_version_and_invalidates(
+        self, client: TestClient, db_session: Session, sample_settings, response_cache_redis,
+    ):
+        _impact(client)
+        setting = db_session.query(Setting).filter(Setting.key == "meals_provided").one()
+        setting.value = "30000"
+        db_session.commit()
+
+        response = _impact(client)
+        assert response.headers["x-cache"] == "MISS" and response.json()["meals"] == 30000
+        assert response_cache_redis.data["respcache:version:settings"] == b"1"
+
+    def test_rollback_does_not_bump(self, db_session: Session, response_cache_redis):
+        db_session.add(Program(category_id=1, title="Water wells", slug="water-wells"))
+        db_session.flush()
+        db_session.rollback()
+        assert "respcache:version:programs" not in response_cache_redis.data
+
+    def test_stale_entry_is_served_while_one_request_refreshes(
+        self, client: TestClient, db_session: Session, sample_settings, response_cache_redis,
+    ):
+        _impact(client)
+        _age_entries(response_cache_redis, response_cache.DEFAULT_TTL + 1)
+        # Changed behind the ORM's back, so no version bump.
+        db_session.query(Setting).filter(Setting.key == "meals_provided").update({"value": "26000"})
+        db_session.commit()
+
+        stale = _impact(client)
+        assert stale.headers["x-cache"] == "STALE" and stale.json()["meals"] == 25000
+        assert "stale-while-revalidate" in stale.headers["cache-control"]
+
+        fresh = _impact(client)  # the stale response's background task rebuilt the entry
+        assert fresh.headers["x-cache"] == "HIT" and fresh.json()["meals"] == 26000
+
+    def test_query_parameters_are_cached_separately(self, client: TestClient, db_session: Session, response_cache_redis):
+        db_session.add_all([
+            Program(category_id=1, title="Water wells", slug="water-wells", is_active=True),
+            Program(category_id=1, title="Old appeal", slug="old-appeal", is_active=False),
+        ])
+        db_session.commit()
+
+        assert len(client.get("/api/programs/?active_only=true").json()) == 1
+        assert len(client.get("/api/programs/").json()) == 2
+        assert client.get("/api/programs/?active_only=true").headers["x-cache"] == "HIT"
+
+    def test_redis_outage_falls_back_to_the_database(self, client: TestClient, sample_settings, monkeypatch):
+        class Down:
+            async def mget(self, keys):
+                raise ConnectionError("redis down")
+
+        monkeypatch.setattr(response_cache, "RESPONSE_CACHE_ENABLED", True)
+        monkeypatch.setattr(response_cache, "_async_redis", lambda: Down())
+        response = _impact(client)
+        assert response.status_code == 200 and response.json()["meals"] == 25000
+        assert "x-cache" not in response.headers
+
+    def test_concurrent_misses_build_once(self, response_cache_redis):
+        builds = []
+
+        async def build():
+            builds.append(1)
+            await asyncio.sleep(0.1)
+            return b'["wells"]'
+
+        async def both():
+            return await asyncio.gather(_serve("respcache:entry:k", build), _serve("respcache:entry:k", build))
+
+        first, second = asyncio.run(both())
+        assert len(builds) == 1
+        assert {first.headers["x-cache"], second.headers["x-cache"]} == {"MISS", "HIT"}
+        assert first.body == second.body == b'["wells"]'
+        assert "respcache:entry:k:refreshing" not in response_cache_redis.data
+
+    def test_outdated_entry_is_served_while_another_request_rebuilds(self, response_cache_redis):
+        async def build():
+            return b'["wells"]'
+
+        asyncio.run(_serve("respcache:entry:k", build))
+        response_cache_redis.data["respcache:version:programs"] = b"1"
+        response_cache_redis.data["respcache:entry:k:refreshing"] = b"1"  # someone else is rebuilding
+
+        response = asyncio.run(_serve("respcache:entry:k", lambda: pytest.fail("rebuilt")))
+        assert response.headers["x-cache"] == "STALE" and response.body == b'["wells"]'
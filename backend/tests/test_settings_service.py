@@ -0,0 +1,88 @@
+"""
+Tests for the per-worker settings snapshot (settings_service.py).
+"""
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+import settings_service
+from models import Setting
+from settings_service import SettingRow, SettingsSnapshot, get_settings
+
+
+class FakePublisher:
+    def __init__(self):
+        self.version = 0
+        self.published = []
+
+    def incr(self, key):
+        self.version += 1
+        return self.version
+
+    def publish(self, channel, message):
+        self.published.append((channel, message))
+
+
+@pytest.mark.unit
+class TestSettingsSnapshot:
+
+    def test_typed_accessors(self):
+        snapshot = SettingsSnapshot([
+            SettingRow(1, "meals_provided", "25000", None, None),
+            SettingRow(2, "total_raised", "1250.50", None, None),
+            SettingRow(3, "donations_open", "Yes", None, None),
+            SettingRow(4, "families_supported", "lots", None, None),
+            SettingRow(5, "program_video_water", "water.mp4", None, None),
+        ])
+        assert snapshot.get_int("meals_provided") == 25000
+        assert snapshot.get_float("total_raised") == 1250.5
+        assert snapshot.get_bool("donations_open") is True
+        assert snapshot.get_int("families_supported", 7) == 7  # unparseable falls back
+        assert snapshot.get_int("orphans_cared_for") == 0
+        assert snapshot.with_prefix("program_video_") == {"program_video_water": "water.mp4"}
+
+
+@pytest.mark.api
+class TestSettingsService:
+
+    def test_reads_after_the_first_do_not_query(self, db_session: Session, sample_settings, monkeypatch):
+        first = get_settings(db_session)
+        with monkeypatch.context() as m:
+            m.setattr(Session, "query", lambda *a, **kw: pytest.fail("queried the database"))
+            assert get_settings(db_session) is first
+        assert first.get_int("meals_provided") == 25000
+
+    def test_admin_edit_is_visible_on_the_next_read(
+        self, client: TestClient, auth_headers, db_session: Session, sample_settings,
+    ):
+        assert client.get("/api/settings/public/impact-stats").json()["meals"] == 25000
+        response = client.put("/api/settings/meals_provided", headers=auth_headers, json={"value": "30000"})
+        assert response.status_code == 200
+        assert client.get("/api/settings/public/impact-stats").json()["meals"] == 30000
+
+    def test_bulk_update_invalidates(self, db_session: Session, sample_settings):
+        get_settings(db_session)
+        db_session.query(Setting).filter(Setting.key == "meals_provided").update({"value": "26000"})
+        db_session.commit()
+        assert get_settings(db_session).get_int("meals_provided") == 26000
+
+    def test_rollback_keeps_the_snapshot(self, db_session: Session, sample_settings):
+        snapshot = get_settings(db_session)
+        db_session.add(Setting(key="hero_video", value="hero.mp4"))
+        db_session.flush()
+        db_session.rollback()
+        assert get_settings(db_session) is snapshot
+
+    def test_commit_publishes_the_new_version(self, db_session: Session, monkeypatch):
+        publisher = FakePublisher()
+        monkeypatch.setattr(settings_service, "SETTINGS_NOTIFY_ENABLED", True)
+        monkeypatch.setattr(settings_service, "_publisher_redis", lambda: publisher)
+
+        db_session.add(Setting(key="hero_video", value="hero.mp4"))
+        db_session.commit()
+        assert publisher.published == [(settings_service.CHANNEL, 1)]
+
+    def test_published_change_invalidates_other_workers(self, db_session: Session, sample_settings):
+        snapshot = get_settings(db_session)
+        settings_service.invalidate_settings()  # what the subscriber does on a message
+        assert get_settings(db_session) is not snapshot
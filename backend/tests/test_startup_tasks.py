@@ -0,0 +1,52 @@
+"""
+Tests for the once-per-deployment startup work (startup_tasks.py).
+"""
+import pytest
+from sqlalchemy.orm import Session
+
+import startup_tasks
+from models import Setting, User
+
+
+@pytest.mark.unit
+class TestStartupTasks:
+
+    def test_seeding_is_idempotent(self, db_session: Session):
+        db_session.add(Setting(key="meals_provided", value="99", description="kept"))
+        db_session.commit()
+
+        startup_tasks.ensure_admin_user()
+        startup_tasks.ensure_admin_user()
+
+        assert db_session.query(User).filter(User.is_admin == True).count() == 1  # noqa: E712
+        assert db_session.query(Setting).count() == len(startup_tasks.DEFAULT_SETTINGS)
+        assert db_session.query(Setting).filter(Setting.key == "meals_provided").one().value == "99"
+
+    def test_followers_skip_the_tasks(self, monkeypatch):
+        ran = []
+        monkeypatch.setattr(startup_tasks, "become_leader", lambda: False)
+        monkeypatch.setattr(startup_tasks, "ensure_admin_user", lambda: ran.append("seed"))
+        monkeypatch.setattr(startup_tasks.Base.metadata, "create_all", lambda **kw: ran.append("schema"))
+
+        startup_tasks.run_startup_tasks()
+        assert ran == []
+
+    def test_leader_runs_them_once(self, monkeypatch):
+        ran = []
+        monkeypatch.setattr(startup_tasks, "become_leader", lambda: True)
+        monkeypatch.setattr(startup_tasks, "ensure_admin_user", lambda: ran.append("seed"))
+        monkeypatch.setattr(startup_tasks.Base.metadata, "create_all", lambda **kw: ran.append("schema"))
+        monkeypatch.setattr(startup_tasks, "_initialise_storage", lambda: ran.append("storage"))
+
+        startup_tasks.run_startup_tasks()
+        startup_tasks.release_leadership()
+        assert sorted(ran) == ["schema", "seed", "storage"]
+
+    def test_lock_key_follows_the_deployment(self, monkeypatch):
+        monkeypatch.delenv("DEPLOY_ID", raising=False)
+        from_code = startup_tasks.deployment_lock_key()
+        assert from_code == startup_tasks.deployment_lock_key()
+
+        monkeypatch.setenv("DEPLOY_ID", "v42")
+        assert startup_tasks.deployment_lock_key() != from_code
+        assert -2**63 <= startup_tasks.deployment_lock_key() < 2**63
@@ -0,0 +1,165 @@
+"""
+Tests for the bulk Stripe reconciliation job (stripe_reconcile.py), run
+against a local stub exposing the slice of the stripe SDK it uses.
+"""
+import time
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.orm import Session
+
+from models import Donation, DonationSubscription, StripeSyncCheckpoint
+from stripe_reconcile import (
+    SESSION_OVERLAP_SECONDS,
+    refresh_subscription_statuses,
+    run_stripe_reconciliation,
+    sync_checkout_sessions,
+)
+
+
+class _Listing:
+    def __init__(self, items):
+        self._items = items
+
+    def auto_paging_iter(self):
+        return iter(self._items)
+
+
+class StubStripe:
+    """Sessions and subscriptions as plain dicts; records list/retrieve calls."""
+
+    def __init__(self, sessions=(), subscriptions=()):
+        self.sessions = {s["id"]: s for s in sessions}
+        self.subscriptions = {s["id"]: s for s in subscriptions}
+        self.calls = []
+        self.checkout = SimpleNamespace(Session=SimpleNamespace(list=self._list_sessions, retrieve=self._get_session))
+        self.Subscription = SimpleNamespace(list=self._list_subscriptions, retrieve=self._get_subscription)
+
+    def _list_sessions(self, created, limit):
+        self.calls.append(("Session.list", created["gte"]))
+        return _Listing([s for s in self.sessions.values() if s["created"] >= created["gte"]])
+
+    def _get_session(self, session_id):
+        self.calls.append(("Session.retrieve", session_id))
+        return self.sessions[session_id]
+
+    def _list_subscriptions(self, status, limit):
+        self.calls.append(("Subscription.list", status))
+        return _Listing(list(self.subscriptions.values()))
+
+    def _get_subscription(self, sub_id, expand=None):
+        self.calls.append(("Subscription.retrieve", sub_id))
+        return self.subscriptions[sub_id]
+
+
+def _session(session_id, **overrides):
+    session = {
+        "id": session_id, "created": int(time.time()) - 60, "payment_status": "paid", "mode": "payment",
+        "amount_total": 5000, "customer_email": "Donor@Example.com", "customer": None, "subscription": None,
+        "customer_details": {"name": "Donor"}, "metadata": {"utm_source": "newsletter"},
+    }
+    session.update(overrides)
+    return session
+
+
+def _subscription(sub_id, status="active"):
+    return {
+        "id": sub_id, "status": status, "current_period_end": int(time.time()) + 86400,
+        "customer": {"id": "cus_1", "name": "Monthly Donor", "email": "monthly@example.com"},
+        "items": {"data": [{"price": {"unit_amount": 2500, "recurring": {"interval": "month"}}}]},
+        "metadata": {"purpose": "Orphans"},
+    }
+
+
+@pytest.mark.unit
+class TestSyncCheckoutSessions:
+
+    def test_missing_paid_sessions_are_inserted_once(self, db_session: Session):
+        client = StubStripe(
+            sessions=[
+                _session("cs_paid"),
+                _session("cs_open", payment_status="unpaid"),
+                _session("cs_sub", mode="subscription", subscription="sub_1"),
+            ],
+            subscriptions=[_subscription("sub_1")],
+        )
+
+        first = sync_checkout_sessions(db_session, client)
+        second = sync_checkout_sessions(db_session, client)
+
+        assert first == {"scanned": 3, "donations": 1, "subscriptions": 1}
+        assert second["donations"] == second["subscriptions"] == 0
+        donation = db_session.query(Donation).one()
+        assert (donation.stripe_session_id, donation.email, donation.amount) == ("cs_paid", "donor@example.com", 50.0)
+        assert donation.utm_source == "newsletter" and donation.status == "confirmed"
+        sub = db_session.query(DonationSubscription).one()
+        assert (sub.stripe_subscription_id, sub.amount, sub.purpose) == ("sub_1", 25.0, "Orphans")
+
+    def test_legacy_rows_without_session_id_are_not_duplicated(self, db_session: Session):
+        db_session.add(Donation(name="Donor", email="donor@example.com", amount=50.0, frequency="One-Time (Synced)"))
+        db_session.commit()
+
+        summary = sync_checkout_sessions(db_session, StubStripe(sessions=[_session("cs_paid")]))
+
+        assert summary["donations"] == 0
+        assert db_session.query(Donation).count() == 1
+
+    def test_next_run_resumes_from_checkpoint(self, db_session: Session):
+        client = StubStripe()
+        sync_checkout_sessions(db_session, client)
+        checkpoint = db_session.query(StripeSyncCheckpoint).one()
+
+        sync_checkout_sessions(db_session, client)
+
+        assert client.calls[-1] == ("Session.list", checkpoint.synced_until - SESSION_OVERLAP_SECONDS)
+
+
+@pytest.mark.unit
+class TestRefreshSubscriptionStatuses:
+
+    def _local(self, db_session: Session, stripe_id: str, status: str):
+        db_session.add(DonationSubscription(
+            stripe_subscription_id=stripe_id, stripe_customer_id="cus_1", name="D", email="d@example.com",
+            amount=10, purpose="General", interval="month", payment_day=1, status=status,
+        ))
+        db_session.commit()
+
+    def test_statuses_come_from_one_listing(self, db_session: Session):
+        self._local(db_session, "sub_1", "active")
+        self._local(db_session, "sub_2", "active")
+        self._local(db_session, "pending_cs_3", "pending")
+        client = StubStripe(
+            sessions=[_session("cs_3", mode="subscription", subscription="sub_3")],
+            subscriptions=[_subscription("sub_1"), _subscription("sub_2", "canceled"), _subscription("sub_3")],
+        )
+
+        summary = refresh_subscription_statuses(db_session, client)
+
+        assert summary == {"updated": 2, "resolved_pending": 1}
+        db_session.expire_all()
+        assert dict(db_session.query(DonationSubscription.stripe_subscription_id, DonationSubscription.status)) == {
+            "sub_1": "active", "sub_2": "canceled", "sub_3": "active",
+        }
+        assert not any(name == "Subscription.retrieve" for name, _ in client.calls)
+
+    def test_full_run_reports_synced_count(self, db_session: Session):
+        summary = run_stripe_reconciliation(db_session, StubStripe(sessions=[_session("cs_paid")]))
+        assert summary["synced"] == 1 and summary["updated"] == 0
+
+
+@pytest.mark.api
+class TestSubscriptionRefreshEndpoint:
+
+    def test_refresh_is_queued_not_run_in_the_request(self, client, auth_headers: dict, monkeypatch):
+        import marketing.queue
+        import routers.donations
+
+        queued = []
+        monkeypatch.setattr(routers.donations.stripe, "api_key", "sk_test_stub")
+        monkeypatch.setattr(marketing.queue, "_enqueue_job", lambda name, *a, _job_id: queued.append(name))
+        monkeypatch.setattr("stripe_reconcile.refresh_subscription_statuses", lambda *a, **kw: pytest.fail("ran inline"))
+
+        response = client.post("/api/donations/update-subscription-status", headers=auth_headers)
+
+        assert response.status_code == 202 and response.json() == {"status": "queued"}
+        assert queued == ["refresh_subscriptions_task"]
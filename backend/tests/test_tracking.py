@@ -0,0 +1,140 @@
+"""
+Tests for marketing tracking helpers (token signing + link rewriting)
+and the public open / click endpoints.
+"""
+import pytest
+from urllib.parse import parse_qs, urlparse
+
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from marketing.tracking import (
+    CampaignLinkRewriter,
+    _sign,
+    make_token,
+    parse_token,
+    rewrite_html_for_tracking,
+)
+from models import CampaignSend, EmailEvent, MarketingCampaign
+
+
+BODY = (
+    '<html><body><p>Hi</p>'
+    '<a href="https://myzakat.org/donate?amount=50">Give</a>'
+    '<a href="mailto:info@myzakat.org">Mail us</a>'
+    '<a href="https://example.org/?utm_content=keep">Keep</a>'
+    '</body></html>'
+)
+
+
+def _click_targets(html: str) -> list[str]:
+    """Return the decoded `u=` destination of every tracked link."""
+    targets = []
+    for chunk in html.split('href="')[1:]:
+        href = chunk.split('"', 1)[0]
+        if "/api/tracking/click/" in href:
+            targets.append(parse_qs(urlparse(href).query)["u"][0])
+    return targets
+
+
+@pytest.mark.unit
+class TestTrackingTokens:
+
+    def test_token_round_trip(self):
+        token = make_token("click", 42)
+        assert parse_token(token) == ("click", 42)
+
+    def test_random_part_never_contains_separator(self):
+        for _ in range(200):
+            assert make_token("open", 5).count("_") == 3
+
+    def test_legacy_token_with_underscore_still_parses(self):
+        payload = "click|9|ab_cd-ef"
+        assert parse_token(f"click_9_ab_cd-ef_{_sign(payload)}") == ("click", 9)
+
+    def test_tampered_token_rejected(self):
+        token = make_token("open", 7)
+        kind, send_id, random_part, sig = token.split("_")
+        assert parse_token(f"{kind}_8_{random_part}_{sig}") is None
+
+
+@pytest.mark.unit
+class TestCampaignLinkRewriter:
+
+    def test_links_wrapped_with_per_send_utms(self):
+        rewriter = CampaignLinkRewriter(3)
+        html = rewriter.rewrite(BODY, send_id=11, click_token="click_tok", open_token="open_tok")
+
+        assert "/api/tracking/click/click_tok?u=" in html
+        assert 'href="mailto:info@myzakat.org"' in html
+        donate, keep = _click_targets(html)
+        params = parse_qs(urlparse(donate).query)
+        assert params["amount"] == ["50"]
+        assert params["utm_campaign"] == ["3"]
+        assert params["utm_content"] == ["11"]
+        # Existing UTMs on the destination are never overridden.
+        assert parse_qs(urlparse(keep).query)["utm_content"] == ["keep"]
+
+    def test_open_pixel_injected_before_body_close(self):
+        html = CampaignLinkRewriter(3).rewrite(BODY, send_id=1, click_token="c", open_token="open_tok")
+        assert html.endswith('/api/tracking/open/open_tok.gif" width="1" height="1" border="0" alt="" '
+                             'style="display:block;width:1px;height:1px;border:0;" /></body></html>')
+
+    def test_reused_rewriter_stamps_each_send(self):
+        rewriter = CampaignLinkRewriter(3)
+        first = rewriter.rewrite(BODY, send_id=1, click_token="click_a", open_token="open_a")
+        second = rewriter.rewrite(BODY, send_id=2, click_token="click_b", open_token="open_b")
+
+        assert "click_a" in first and "click_b" not in first
+        assert parse_qs(urlparse(_click_targets(second)[0]).query)["utm_content"] == ["2"]
+        assert second == rewrite_html_for_tracking(
+            BODY, campaign_id=3, send_id=2, click_token="click_b", open_token="open_b",
+        )
+
+
+@pytest.fixture
+def campaign_send(db_session: Session) -> CampaignSend:
+    campaign = MarketingCampaign(name="Ramadan appeal")
+    db_session.add(campaign)
+    db_session.flush()
+    send = CampaignSend(campaign_id=campaign.id, recipient_email="amina@example.com")
+    db_session.add(send)
+    db_session.flush()
+    send.open_token = make_token("open", send.id)
+    send.click_token = make_token("click", send.id)
+    db_session.commit()
+    return send
+
+
+@pytest.mark.api
+class TestTrackingEndpoints:
+
+    def test_open_counts_unique_opens_once(self, client: TestClient, db_session: Session, campaign_send):
+        for _ in range(2):
+            response = client.get(f"/api/tracking/open/{campaign_send.open_token}.gif")
+            assert response.status_code == 200 and response.headers["content-type"] == "image/gif"
+
+        db_session.expire_all()
+        send = db_session.get(CampaignSend, campaign_send.id)
+        assert send.open_count == 2 and send.first_open_at is not None
+        assert db_session.get(MarketingCampaign, send.campaign_id).opened_count == 1
+        assert db_session.query(EmailEvent).filter(EmailEvent.event_type == "open").count() == 2
+
+    def test_click_before_open_counts_both(self, client: TestClient, db_session: Session, campaign_send):
+        response = client.get(
+            f"/api/tracking/click/{campaign_send.click_token}",
+            params={"u": "https://myzakat.org/donate"},
+            follow_redirects=False,
+        )
+        assert response.status_code == 302 and response.headers["location"] == "https://myzakat.org/donate"
+
+        db_session.expire_all()
+        send = db_session.get(CampaignSend, campaign_send.id)
+        campaign = db_session.get(MarketingCampaign, send.campaign_id)
+        assert (send.open_count, send.click_count) == (1, 1)
+        assert (campaign.opened_count, campaign.clicked_count) == (1, 1)
+
+    def test_unknown_token_still_serves_pixel(self, client: TestClient, db_session: Session):
+        response = client.get(f"/api/tracking/open/{make_token('open', 999)}.gif")
+        assert response.status_code == 200
+        assert db_session.query(EmailEvent).count() == 0
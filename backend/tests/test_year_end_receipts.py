@@ -0,0 +1,155 @@
+"""
+Tests for the bulk year-end receipt pipeline (year_end_receipts.py).
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+import year_end_receipts
+from marketing.attachments import materialize_attachments
+from models import Donation, EmailAttachmentBlob, EmailOutbox, EmailSuppression, YearEndReceipt, YearEndReceiptRun
+from year_end_receipts import process_year_end_runs, start_year_end_run
+
+
+@pytest.fixture
+def bucket(monkeypatch):
+    store = {}
+    monkeypatch.setattr(year_end_receipts, "upload_private_file", lambda content, key, **kw: store.__setitem__(key, content))
+    monkeypatch.setattr("s3_service.download_private_file", lambda key: store.get(key))
+    monkeypatch.setattr(year_end_receipts, "CHUNK_DONORS", 2)
+    return store
+
+
+def _donations(db_session: Session):
+    for email, amount, day in [
+        ("amina@example.com", 100.0, datetime(2025, 2, 1)),
+        ("amina@example.com", 50.0, datetime(2025, 11, 30)),
+        ("bilal@example.com", 25.0, datetime(2025, 6, 1)),
+        ("chen@example.com", 10.0, datetime(2025, 12, 31, 23, 59)),
+        ("chen@example.com", 999.0, datetime(2024, 12, 31)),  # other tax year
+        ("dana@example.com", 40.0, datetime(2025, 3, 3)),
+    ]:
+        db_session.add(Donation(name=email.split("@")[0].title(), email=email, amount=amount,
+                                frequency="One-Time", donated_at=day))
+    db_session.add(Donation(name="Dana", email="dana@example.com", amount=5.0, frequency="One-Time",
+                            status="failed", donated_at=datetime(2025, 4, 4)))
+    db_session.commit()
+
+
+def _run(db_session: Session) -> int:
+    return process_year_end_runs(db_session, time_budget=60, workers=1)
+
+
+@pytest.mark.unit
+class TestYearEndPipeline:
+
+    def test_one_receipt_and_email_per_donor(self, db_session: Session, bucket):
+        _donations(db_session)
+        run = start_year_end_run(db_session, 2025)
+        assert run.total_donors == 4
+
+        assert _run(db_session) == 4
+
+        db_session.refresh(run)
+        assert (run.status, run.processed_donors, run.emailed) == ("completed", 4, 4)
+        receipts = {r.email: r for r in db_session.query(YearEndReceipt).all()}
+        assert (receipts["amina@example.com"].donation_count, receipts["amina@example.com"].total_amount) == (2, 150.0)
+        assert receipts["chen@example.com"].total_amount == 10.0
+        assert receipts["dana@example.com"].total_amount == 40.0
+        assert set(bucket) == {r.s3_key for r in receipts.values()}
+        assert not any(r.receipt_number in r.s3_key for r in receipts.values())
+        assert all(pdf.startswith(b"%PDF-") for pdf in bucket.values())
+
+        outbox = db_session.query(EmailOutbox).filter(EmailOutbox.template_slug == "year_end_receipt").all()
+        assert sorted(o.to_email for o in outbox) == sorted(receipts)
+        assert all(o.status == "pending" and o.attachments[0]["generate"] == "year_end_receipt" for o in outbox)
+
+    def test_attachment_is_read_back_from_s3(self, db_session: Session, bucket):
+        _donations(db_session)
+        start_year_end_run(db_session, 2025)
+        _run(db_session)
+        row = db_session.query(EmailOutbox).filter(EmailOutbox.to_email == "bilal@example.com").one()
+
+        [ref] = materialize_attachments(db_session, row.attachments)
+        db_session.commit()
+
+        receipt = db_session.query(YearEndReceipt).filter(YearEndReceipt.email == "bilal@example.com").one()
+        assert db_session.get(EmailAttachmentBlob, ref["sha256"]).content == bucket[receipt.s3_key]
+
+    def test_failed_run_resumes_without_duplicates(self, db_session: Session, bucket, monkeypatch):
+        _donations(db_session)
+        calls = []
+
+        def flaky_upload(content, key, **kw):
+            calls.append(key)
+            if len(calls) == 3:  # first upload of the second chunk
+                raise ConnectionError("S3 unavailable")
+            bucket[key] = content
+
+        monkeypatch.setattr(year_end_receipts, "upload_private_file", flaky_upload)
+        run = start_year_end_run(db_session, 2025)
+        _run(db_session)
+        db_session.refresh(run)
+        assert run.status == "failed" and run.cursor == "bilal@example.com" and "S3 unavailable" in run.last_error
+        assert db_session.query(YearEndReceipt).count() == 2
+
+        start_year_end_run(db_session, 2025)
+        _run(db_session)
+
+        db_session.refresh(run)
+        assert (run.status, run.processed_donors) == ("completed", 4)
+        assert db_session.query(YearEndReceipt).count() == 4
+        assert db_session.query(EmailOutbox).count() == 4
+
+    def test_one_render_pool_per_slice(self, db_session: Session, bucket, monkeypatch):
+        _donations(db_session)
+        pools = []
+
+        def thread_pool(workers):  # same submit() API, without spawning processes
+            pools.append(ThreadPoolExecutor(max_workers=workers))
+            return pools[-1]
+
+        monkeypatch.setattr("pdf_service.receipt_render_pool", thread_pool)
+        run = start_year_end_run(db_session, 2025)
+        assert process_year_end_runs(db_session, time_budget=60, workers=2) == 4  # two chunks of two
+        assert len(pools) == 1
+
+        run.status, run.cursor = "pending", None  # re-walk: every donor already has a receipt
+        db_session.commit()
+        monkeypatch.setattr("pdf_service.render_receipts_batch", lambda *a, **kw: pytest.fail("rendered"))
+        assert process_year_end_runs(db_session, time_budget=60, workers=2) == 0
+
+    def test_suppressed_donor_is_recorded_not_mailed(self, db_session: Session, bucket):
+        _donations(db_session)
+        db_session.add(EmailSuppression(email="bilal@example.com", scope="all", reason="bounce"))
+        db_session.commit()
+        run = start_year_end_run(db_session, 2025)
+
+        _run(db_session)
+
+        db_session.refresh(run)
+        assert run.emailed == 3
+        row = db_session.query(EmailOutbox).filter(EmailOutbox.to_email == "bilal@example.com").one()
+        assert row.status == "suppressed"
+
+
+@pytest.mark.api
+class TestYearEndEndpoints:
+
+    def test_start_and_poll(self, client: TestClient, auth_headers: dict, db_session: Session):
+        assert client.get("/api/donations/year-end-receipts/2025", headers=auth_headers).status_code == 404
+
+        started = client.post("/api/donations/year-end-receipts?tax_year=2025&send_emails=false", headers=auth_headers)
+        assert started.status_code == 202
+        assert started.json()["status"] == "pending" and started.json()["send_emails"] is False
+
+        progress = client.get("/api/donations/year-end-receipts/2025", headers=auth_headers).json()
+        assert progress["tax_year"] == 2025 and progress["processed_donors"] == 0
+        assert db_session.query(YearEndReceiptRun).count() == 1
+
+    def test_future_year_rejected(self, client: TestClient, auth_headers: dict):
+        year = datetime.utcnow().year + 1
+        assert client.post(f"/api/donations/year-end-receipts?tax_year={year}", headers=auth_headers).status_code == 400
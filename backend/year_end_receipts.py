@@ -0,0 +1,285 @@
+"""Bulk annual (year-end) tax receipts: one consolidated PDF per donor per year.
+
+An admin starts a run for a tax year (`start_year_end_run`). The Arq
+worker advances it in time-boxed slices (`process_year_end_runs`, called
+by `marketing.queue.generate_year_end_receipts_task`). The admin start
+enqueues it immediately, and a per-minute cron keeps resuming it until it
+is done. Each slice handles donors in chunks of CHUNK_DONORS, in email
+order:
+
+  1. One grouped query over confirmed donations in the year gives each
+     donor's name, count and total, after the run's cursor.
+  2. One query loads that chunk's individual donations (the receipt lines).
+  3. pdf_service.render_receipts_batch renders the receipts on a process
+     pool started once per slice. Each finished PDF is uploaded to the private S3 bucket from a
+     thread pool while the next one renders.
+  4. One transaction records the YearEndReceipt rows, queues the emails
+     through the outbox in bulk (ComplianceMailer.queue_many, with the
+     PDF attached by reference to its S3 key), and advances the cursor and counters.
+
+Only one chunk is ever held in memory, so run size is bounded by time,
+not RAM. Resumability: the cursor only moves when its chunk commits, and
+receipts are unique per (tax_year, email). A crashed, failed or restarted
+run picks up where it stopped, and no donor is mailed twice. S3 keys are
+an HMAC of the receipt number (s3_service.private_object_key): stable, so
+a re-uploaded PDF simply overwrites itself, but never printed and not
+derivable from the receipt or the donor's email.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import nullcontext
+from datetime import datetime
+from typing import Any, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from lazy_imports import lazy_module
+from logging_config import get_logger
+from marketing.attachments import deferred_attachment
+from marketing.mailer import ComplianceMailer
+from models import Donation, YearEndReceipt, YearEndReceiptRun
+from s3_service import private_object_key, upload_private_file
+
+logger = get_logger(__name__)
+
+pdf_service = lazy_module("pdf_service")  # reportlab loads with the first run
+
+CHUNK_DONORS = int(os.getenv("YEAR_END_CHUNK_DONORS", "500"))
+UPLOAD_CONCURRENCY = int(os.getenv("YEAR_END_UPLOAD_CONCURRENCY", "8"))
+S3_PREFIX = "receipts/year-end"
+
+ACTIVE_STATUSES = ("pending", "running")
+
+
+def _year_bounds(tax_year: int) -> tuple[datetime, datetime]:
+    return datetime(tax_year, 1, 1), datetime(tax_year + 1, 1, 1)
+
+
+def _confirmed_in_year(query, tax_year: int):
+    start, end = _year_bounds(tax_year)
+    return query.filter(Donation.status == "confirmed", Donation.donated_at >= start, Donation.donated_at < end)
+
+
+def receipt_s3_key(tax_year: int, receipt_number: str) -> str:
+    """Private-bucket key for a receipt; not derivable without SECRET_KEY."""
+    return private_object_key(f"{S3_PREFIX}/{tax_year}", receipt_number)
+
+
+def run_progress(run: YearEndReceiptRun) -> dict[str, Any]:
+    return {
+        "tax_year": run.tax_year,
+        "status": run.status,
+        "send_emails": run.send_emails,
+        "total_donors": run.total_donors,
+        "processed_donors": run.processed_donors,
+        "emailed": run.emailed,
+        "last_error": run.last_error,
+        "started_at": run.started_at,
+        "completed_at": run.completed_at,
+    }
+
+
+# ─────────────────────────────────────────────────────────────────────
+# Starting a run (API side)
+# ─────────────────────────────────────────────────────────────────────
+
+def start_year_end_run(db: Session, tax_year: int, *, send_emails: bool = True) -> YearEndReceiptRun:
+    """Create the run for `tax_year`, or restart it. Commits.
+
+    A failed run resumes from its cursor. A completed run starts over from
+    the first donor; donors who already have a receipt are skipped, so
+    only donors who first gave after the last run get one.
+    """
+    run = db.query(YearEndReceiptRun).filter(YearEndReceiptRun.tax_year == tax_year).first()
+    if run is None:
+        run = YearEndReceiptRun(tax_year=tax_year)
+        db.add(run)
+    elif run.status in ACTIVE_STATUSES:
+        return run
+    elif run.status == "completed":
+        run.cursor = None
+        run.processed_donors = 0
+        run.completed_at = None
+
+    run.status = "pending"
+    run.send_emails = send_emails
+    run.last_error = None
+    run.total_donors = _confirmed_in_year(db.query(func.count(func.distinct(Donation.email))), tax_year).scalar() or 0
+    db.commit()
+    db.refresh(run)
+    return run
+
+
+# ─────────────────────────────────────────────────────────────────────
+# Processing (worker side)
+# ─────────────────────────────────────────────────────────────────────
+
+def _donor_chunk(db: Session, tax_year: int, after_email: str | None, limit: int) -> list:
+    query = _confirmed_in_year(
+        db.query(
+            Donation.email,
+            func.max(Donation.name).label("name"),
+            func.count(Donation.id).label("donation_count"),
+            func.sum(Donation.amount).label("total_amount"),
+        ),
+        tax_year,
+    )
+    if after_email is not None:
+        query = query.filter(Donation.email > after_email)
+    return query.group_by(Donation.email).order_by(Donation.email).limit(limit).all()
+
+
+def _donation_lines(db: Session, tax_year: int, emails: list[str]) -> dict[str, list[tuple[datetime, float]]]:
+    lines: dict[str, list[tuple[datetime, float]]] = defaultdict(list)
+    if emails:
+        rows = _confirmed_in_year(
+            db.query(Donation.email, Donation.donated_at, Donation.amount), tax_year,
+        ).filter(Donation.email.in_(emails)).order_by(Donation.email, Donation.donated_at)
+        for email, donated_at, amount in rows:
+            lines[email].append((donated_at, amount))
+    return lines
+
+
+def _email_message(receipt: YearEndReceipt) -> dict[str, Any]:
+    digest = hashlib.sha256(receipt.email.encode()).hexdigest()[:32]
+    return {
+        "to_email": receipt.email,
+        "to_name": receipt.donor_name,
+        "subject": f"Your {receipt.tax_year} Annual Donation Receipt — Zakat Distribution Foundation",
+        "context": {
+            "donor_name": receipt.donor_name,
+            "tax_year": receipt.tax_year,
+            "donation_count": receipt.donation_count,
+            "total_str": f"${receipt.total_amount:,.2f}",
+            "receipt_number": receipt.receipt_number,
+            "brand_color": "#1e3a8a",
+            "brand_title": "Zakat Distribution Foundation",
+            "brand_subtitle": "Your Zakat, Their Lifeline.",
+        },
+        "attachments": [deferred_attachment(
+            "year_end_receipt",
+            filename=f"ZDF_Annual_Receipt_{receipt.tax_year}_{receipt.receipt_number}.pdf",
+            content_type="application/pdf",
+            receipt_id=receipt.id,
+        )],
+        "idempotency_key": f"year-end-{receipt.tax_year}-{digest}",
+    }
+
+
+def _process_chunk(
+    db: Session, run: YearEndReceiptRun, donors: list, workers: int, pool: Optional[ProcessPoolExecutor],
+) -> int:
+    """Render, upload, record and mail one chunk; commits with the cursor. Returns receipts created."""
+    tax_year = run.tax_year
+    already = {
+        email for (email,) in db.query(YearEndReceipt.email).filter(
+            YearEndReceipt.tax_year == tax_year, YearEndReceipt.email.in_([d.email for d in donors]),
+        )
+    }
+    todo = [d for d in donors if d.email not in already]
+    lines = _donation_lines(db, tax_year, [d.email for d in todo])
+    jobs = (
+        {
+            "kind": "year_end",
+            "donor_name": d.name,
+            "tax_year": tax_year,
+            "donations": lines[d.email],
+            "receipt_number": pdf_service.generate_year_end_receipt_number(tax_year, d.email),
+            "email": d.email,
+            "donation_count": d.donation_count,
+            "total_amount": float(d.total_amount or 0),
+        }
+        for d in todo
+    )
+
+    receipts: list[YearEndReceipt] = []
+    if todo:  # a restarted run re-walks chunks that already have every receipt
+        with ThreadPoolExecutor(max_workers=UPLOAD_CONCURRENCY) as uploads:
+            pending_uploads = []
+            for job, pdf_bytes in pdf_service.render_receipts_batch(jobs, workers=workers, pool=pool):
+                key = receipt_s3_key(tax_year, job["receipt_number"])
+                pending_uploads.append(uploads.submit(upload_private_file, pdf_bytes, key, content_type="application/pdf"))
+                receipts.append(YearEndReceipt(
+                    tax_year=tax_year,
+                    email=job["email"],
+                    donor_name=job["donor_name"],
+                    receipt_number=job["receipt_number"],
+                    donation_count=job["donation_count"],
+                    total_amount=job["total_amount"],
+                    s3_key=key,
+                ))
+            for upload in pending_uploads:
+                upload.result()  # any failed upload fails the chunk before anything is recorded
+
+    db.add_all(receipts)
+    db.flush()
+    if run.send_emails and receipts:
+        rows = ComplianceMailer(db).queue_many(
+            [_email_message(r) for r in receipts], template_slug="year_end_receipt",
+        )
+        for receipt, row in zip(receipts, rows):
+            receipt.outbox_id = row.id
+        run.emailed += sum(row.status == "pending" for row in rows)
+
+    run.cursor = donors[-1].email
+    run.processed_donors += len(donors)
+    db.commit()
+    return len(receipts)
+
+
+def _advance(
+    db: Session, run: YearEndReceiptRun, deadline: float, workers: int, pool: Optional[ProcessPoolExecutor],
+) -> int:
+    if run.status == "pending":
+        run.status = "running"
+        run.started_at = run.started_at or datetime.utcnow()
+        db.commit()
+
+    created = 0
+    try:
+        while time.monotonic() < deadline:
+            donors = _donor_chunk(db, run.tax_year, run.cursor, CHUNK_DONORS)
+            if not donors:
+                run.status = "completed"
+                run.completed_at = datetime.utcnow()
+                db.commit()
+                logger.info("Year-end receipts %s completed: %s", run.tax_year, run_progress(run))
+                break
+            created += _process_chunk(db, run, donors, workers, pool)
+    except Exception as exc:
+        db.rollback()
+        logger.exception("Year-end receipts %s failed after %s: %s", run.tax_year, run.cursor, exc)
+        run.status = "failed"
+        run.last_error = str(exc)[:2000]
+        db.commit()
+    return created
+
+
+def process_year_end_runs(db: Session, *, time_budget: float, workers: Optional[int] = None) -> int:
+    """Advance every active run until it completes or `time_budget` seconds pass. Returns receipts created."""
+    if workers is None:
+        workers = pdf_service.RENDER_WORKERS
+    deadline = time.monotonic() + time_budget
+    created = 0
+    runs = (
+        db.query(YearEndReceiptRun)
+        .filter(YearEndReceiptRun.status.in_(ACTIVE_STATUSES))
+        .order_by(YearEndReceiptRun.tax_year)
+        .all()
+    )
+    if not runs:
+        return 0
+    # One pool for the whole slice: spawning workers per chunk cost more
+    # than rendering a small chunk.
+    with pdf_service.receipt_render_pool(workers) if workers > 1 else nullcontext() as pool:
+        for run in runs:
+            if time.monotonic() >= deadline:
+                break
+            created += _advance(db, run, deadline, workers, pool)
+    return created
@@ -19,7 +19,7 @@ import {
   Sparkles,
   HeartHandshake
 } from 'lucide-react'
-import { donationsAPI, storiesAPI, eventsAPI, testimonialsAPI, settingsAPI, getStaticFileUrl, galleryAPI, programCategoriesAPI } from '../utils/api'
+import { eventsAPI, publicAPI, getStaticFileUrl, galleryAPI } from '../utils/api'
 import { getOptimizedImageUrl, IMAGE_WIDTHS } from '../utils/mediaHelpers'
 import SEOHead from '../components/SEOHead'
 import { getFaqJsonLd } from '../utils/seo'
@@ -32,50 +32,30 @@ import FundraisingProjectsSection from '../components/FundraisingProjectsSection
 
 const Home = () => {
 
-  // Prioritize critical data first, then load secondary content
-  const { data: donationStats, error: statsError } = useQuery('donation-stats', donationsAPI.getStats, {
+  // Everything the page needs on first paint in one request (see /api/public/bootstrap)
+  const { data: bootstrap, error: bootstrapError } = useQuery('home-bootstrap', () =>
+    publicAPI.getBootstrap(['donation_stats', 'settings', 'stories', 'testimonials', 'program_categories']), {
     retry: 1,
     staleTime: 5 * 60 * 1000, // 5 minutes
-    onError: (error) => console.error('Stats error:', error)
+    onError: (error) => console.error('Homepage data error:', error)
   })
-  const { data: settings, error: settingsError } = useQuery('home-media-settings', settingsAPI.getAll, {
-    retry: 1,
-    staleTime: 10 * 60 * 1000, // 10 minutes - settings change rarely
-    onError: (error) => console.error('Settings error:', error)
-  })
-  
-  // Load secondary content after a delay to prioritize critical content
-  const { data: featuredStories, error: storiesError } = useQuery('featured-stories', () => 
-    storiesAPI.getAll(true, false), { // Get all active stories, not just featured
-    retry: 1,
-    staleTime: 5 * 60 * 1000,
-    enabled: !!donationStats, // Only load after critical data
-    onError: (error) => console.error('Stories error:', error)
-  })
-  const { data: upcomingEvents, error: eventsError } = useQuery('upcoming-events', () => 
+  const donationStats = bootstrap?.donation_stats
+  const settings = bootstrap?.settings
+  const featuredStories = bootstrap?.stories // all active stories, not just featured
+  const testimonials = bootstrap?.testimonials
+  const categories = bootstrap?.program_categories
+
+  // Load secondary content after the critical data
+  const { data: upcomingEvents } = useQuery('upcoming-events', () => 
     eventsAPI.getAll(true), {
     retry: 1,
     staleTime: 5 * 60 * 1000,
-    enabled: !!donationStats, // Only load after critical data
+    enabled: !!bootstrap, // Only load after critical data
     onError: (error) => console.error('Events error:', error)
   })
-  const { data: testimonials, error: testimonialsError } = useQuery('testimonials', () => 
-    testimonialsAPI.getAll(true), {
-    retry: 1,
-    staleTime: 5 * 60 * 1000,
-    enabled: !!donationStats, // Only load after critical data
-    onError: (error) => console.error('Testimonials error:', error)
-  })
-  const { data: categories, error: categoriesError } = useQuery('program-categories', () => 
-    programCategoriesAPI.getAll(true), {
-    retry: 1,
-    staleTime: 5 * 60 * 1000,
-    enabled: !!donationStats, // Only load after critical data
-    onError: (error) => console.error('Categories error:', error)
-  })
 
   // Show error state if any critical API calls fail
-  if (statsError || settingsError) {
+  if (bootstrapError) {
     return (
       <div className="min-h-screen bg-gray-50 py-12">
         <div className="section-container">
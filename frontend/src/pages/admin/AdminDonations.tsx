@@ -1,7 +1,8 @@
 import { useState, useMemo, useEffect } from 'react'
-import { useQuery, useQueryClient } from 'react-query'
+import { useInfiniteQuery, useQuery, useQueryClient } from 'react-query'
 import { Heart, Search, Download, RefreshCw, ArrowUpDown, ArrowUp, ArrowDown, Plus, Eye, X, FileText, Mail, FileDown, Pencil, Trash2, AlertTriangle, ChevronLeft, ChevronRight, ChevronsLeft, ChevronsRight } from 'lucide-react'
 import { donationsAPI } from '../../utils/api'
+import type { DonationFilters } from '../../utils/api'
 import type { Donation } from '../../types'
 import { useToast } from '../../contexts/ToastContext'
 import { useAuthStore } from '../../store/authStore'
@@ -23,12 +24,17 @@ const AdminDonations = () => {
   const [searchTerm, setSearchTerm] = useState('')
   const [frequencyFilter, setFrequencyFilter] = useState('')
   const [statusFilter, setStatusFilter] = useState<'all' | 'confirmed' | 'pending' | 'failed' | 'abandoned' | 'manual'>('all')
+  const [startDate, setStartDate] = useState('')
+  const [endDate, setEndDate] = useState('')
+  const [debouncedSearch, setDebouncedSearch] = useState('')
+  const [exporting, setExporting] = useState(false)
   const [sortField, setSortField] = useState<SortField>('donated_at')
   const [sortDir, setSortDir] = useState<SortDir>('desc')
   const [syncing, setSyncing] = useState(false)
-  // Pagination — client-side over the already-filtered set so search, sort
-  // and CSV export keep operating on every matching row, not just the
-  // currently visible page.
+  // Pagination — the server filters and returns the list a page at a time
+  // (newest first); "Load more" fetches the next one. Sorting and the table
+  // pages below operate on the rows loaded so far. Export CSV asks the
+  // server for every matching row.
   const [page, setPage] = useState(1)
   const [pageSize, setPageSize] = useState(25)
   // Manual donation modal
@@ -97,9 +103,46 @@ const AdminDonations = () => {
     }
   }, [detailsDonation, API_URL, token])
 
-  const { data: donations, isLoading } = useQuery(
-    ['admin-donations'],
-    () => donationsAPI.getAll()
+  useEffect(() => {
+    const timer = setTimeout(() => setDebouncedSearch(searchTerm.trim()), 300)
+    return () => clearTimeout(timer)
+  }, [searchTerm])
+
+  const serverFilters = useMemo<DonationFilters>(() => {
+    const filters: DonationFilters = {}
+    if (statusFilter === 'manual') {
+      // Manual entries are confirmed donations tagged by frequency
+      filters.status = 'confirmed'
+      filters.frequency = 'Manual'
+    } else {
+      if (statusFilter !== 'all') filters.status = statusFilter
+      if (frequencyFilter) filters.frequency = frequencyFilter
+    }
+    if (debouncedSearch) filters.search = debouncedSearch
+    if (startDate) filters.start = `${startDate}T00:00:00`
+    if (endDate) {
+      // The date picker is inclusive; the API's `end` is exclusive
+      const next = new Date(`${endDate}T00:00:00Z`)
+      next.setUTCDate(next.getUTCDate() + 1)
+      filters.end = `${next.toISOString().slice(0, 10)}T00:00:00`
+    }
+    return filters
+  }, [statusFilter, frequencyFilter, debouncedSearch, startDate, endDate])
+
+  const {
+    data: donationPages,
+    isLoading,
+    fetchNextPage,
+    hasNextPage,
+    isFetchingNextPage,
+  } = useInfiniteQuery(
+    ['admin-donations', serverFilters],
+    ({ pageParam }) => donationsAPI.getPage(serverFilters, pageParam),
+    { getNextPageParam: (lastPage) => lastPage.nextCursor, keepPreviousData: true }
+  )
+  const donations = useMemo(
+    () => donationPages?.pages.flatMap((p) => p.items) ?? [],
+    [donationPages]
   )
 
   const { data: stats } = useQuery('donation-stats', donationsAPI.getStats)
@@ -164,7 +207,7 @@ const AdminDonations = () => {
   // so the admin doesn't stare at an empty "page 7 of 3".
   useEffect(() => {
     setPage(1)
-  }, [searchTerm, frequencyFilter, statusFilter, pageSize])
+  }, [searchTerm, frequencyFilter, statusFilter, startDate, endDate, pageSize])
 
   const totalPages = Math.max(1, Math.ceil(filteredDonations.length / pageSize))
   const currentPage = Math.min(page, totalPages)
@@ -187,25 +230,21 @@ const AdminDonations = () => {
     }
   }
 
-  const exportToCsv = () => {
-    const csvContent = [
-      ['ID', 'Name', 'Email', 'Amount', 'Frequency', 'Date'].join(','),
-      ...filteredDonations.map((donation: Donation) => [
-        donation.id,
-        `"${donation.name}"`,
-        donation.email,
-        donation.amount,
-        `"${donation.frequency}"`,
-        new Date(donation.donated_at).toLocaleDateString()
-      ].join(','))
-    ].join('\n')
-
-    const blob = new Blob([csvContent], { type: 'text/csv' })
-    const url = window.URL.createObjectURL(blob)
-    const a = document.createElement('a')
-    a.href = url
-    a.download = 'donations.csv'
-    a.click()
+  const exportToCsv = async () => {
+    setExporting(true)
+    try {
+      const blob = await donationsAPI.export(serverFilters)
+      const url = window.URL.createObjectURL(blob)
+      const a = document.createElement('a')
+      a.href = url
+      a.download = `donations-${new Date().toISOString().slice(0, 10)}.csv`
+      a.click()
+      window.URL.revokeObjectURL(url)
+    } catch {
+      showError('Export Failed', 'Failed to export donations')
+    } finally {
+      setExporting(false)
+    }
   }
 
   // --- Manual donation submission ---
@@ -417,7 +456,7 @@ const AdminDonations = () => {
             <Heart className="w-6 h-6 sm:w-8 sm:h-8 text-primary-600 mr-2 sm:mr-3" />
             <h1 className="text-2xl sm:text-3xl font-bold text-gray-900">Donations</h1>
             <span className="ml-3 text-sm text-gray-500 bg-gray-100 px-2 py-1 rounded-full">
-              {filteredDonations.length} {filteredDonations.length === 1 ? 'record' : 'records'}
+              {filteredDonations.length}{hasNextPage ? '+' : ''} {filteredDonations.length === 1 && !hasNextPage ? 'record' : 'records'}
             </span>
           </div>
           <div className="flex flex-col sm:flex-row gap-2 sm:space-x-3">
@@ -440,10 +479,11 @@ const AdminDonations = () => {
             </button>
             <button
               onClick={exportToCsv}
+              disabled={exporting}
               className="btn-primary flex items-center justify-center text-sm sm:text-base px-4 py-2 sm:px-6 sm:py-3"
             >
               <Download className="w-4 h-4 mr-2" />
-              Export CSV
+              {exporting ? 'Exporting...' : 'Export CSV'}
             </button>
           </div>
         </div>
@@ -531,6 +571,28 @@ const AdminDonations = () => {
               <option value="abandoned">Abandoned</option>
             </select>
           </div>
+          <div className="w-full md:w-40">
+            <input
+              type="date"
+              value={startDate}
+              max={endDate || undefined}
+              onChange={(e) => setStartDate(e.target.value)}
+              className="input-field"
+              aria-label="From date"
+              title="From date"
+            />
+          </div>
+          <div className="w-full md:w-40">
+            <input
+              type="date"
+              value={endDate}
+              min={startDate || undefined}
+              onChange={(e) => setEndDate(e.target.value)}
+              className="input-field"
+              aria-label="To date"
+              title="To date"
+            />
+          </div>
         </div>
       </div>
 
@@ -652,7 +714,7 @@ const AdminDonations = () => {
         )}
 
         {/* Pagination controls */}
-        {filteredDonations.length > 0 && (
+        {(filteredDonations.length > 0 || hasNextPage) && (
           <div className="flex flex-col sm:flex-row items-start sm:items-center justify-between gap-3 px-3 sm:px-6 py-3 border-t border-gray-200 bg-gray-50 rounded-b-lg">
             <div className="flex items-center gap-3 text-sm text-gray-600">
               <span>
@@ -661,7 +723,18 @@ const AdminDonations = () => {
                 <span className="font-semibold text-gray-900">{rangeTo}</span>
                 {' of '}
                 <span className="font-semibold text-gray-900">{filteredDonations.length}</span>
+                {hasNextPage && ' loaded'}
               </span>
+              {hasNextPage && (
+                <button
+                  type="button"
+                  onClick={() => fetchNextPage()}
+                  disabled={isFetchingNextPage}
+                  className="text-primary-600 hover:text-primary-800 font-medium disabled:opacity-40"
+                >
+                  {isFetchingNextPage ? 'Loading...' : 'Load more'}
+                </button>
+              )}
               <div className="hidden sm:flex items-center gap-2">
                 <label htmlFor="page-size" className="text-gray-500">Per page:</label>
                 <select
@@ -46,9 +46,9 @@ const AdminSubscriptions = () => {
   const handleUpdateStatus = async () => {
     setUpdatingStatus(true)
     try {
-      const result = await donationsAPI.updateSubscriptionStatus()
-      await fetchSubscriptions() // Refresh the list
-      showSuccess('Status Updated', `Updated ${result.updated} subscription statuses`)
+      // The worker refreshes statuses from Stripe in the background
+      await donationsAPI.updateSubscriptionStatus()
+      showSuccess('Refresh Queued', 'Subscription statuses are being updated from Stripe. Reload in a minute to see them.')
     } catch (err) {
       setError('Failed to update subscription status')
       console.error('Error updating status:', err)
@@ -208,4 +208,24 @@ export interface Program {
   is_active: boolean
   created_at: string
   updated_at: string
-}
\ No newline at end of file
+}
+
+// GET /api/public/bootstrap — only the requested sections are present
+export interface PublicBootstrap {
+  slideshow?: any[]
+  impact_stats?: {
+    meals: number
+    families: number
+    orphans: number
+    total_raised: number
+  }
+  donation_stats?: Omit<DonationStats, 'recent_donations'> & { total_raised: number }
+  programs?: Program[]
+  program_categories?: ProgramCategory[]
+  urgent_needs?: any[]
+  gallery?: GalleryItem[]
+  testimonials?: Testimonial[]
+  stories?: Story[]
+  fundraising_projects?: any[]
+  settings?: Setting[]
+}
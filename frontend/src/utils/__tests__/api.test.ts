@@ -89,6 +89,17 @@ describe('API Utils', () => {
       expect(result).toEqual(mockResponse.data)
     })
 
+    it('fetches one filtered page of donations with its next cursor', async () => {
+      mockAxiosInstance.get.mockResolvedValue({ data: [{ id: 9 }], headers: { 'x-next-cursor': 'abc' } })
+
+      const page = await donationsAPI.getPage({ status: 'failed', search: 'amina' }, 'xyz')
+
+      expect(mockAxiosInstance.get).toHaveBeenCalledWith('/api/donations/', {
+        params: { status: 'failed', search: 'amina', cursor: 'xyz', limit: 200 },
+      })
+      expect(page).toEqual({ items: [{ id: 9 }], nextCursor: 'abc' })
+    })
+
     it('calculates zakat correctly', async () => {
       const zakatData = {
         gold_grams: 100,
@@ -224,7 +235,7 @@ describe('API Utils', () => {
       const error = new Error('Network Error')
       mockAxiosInstance.get.mockRejectedValue(error)
 
-      await expect(donationsAPI.getAll()).rejects.toThrow('Network Error')
+      await expect(donationsAPI.getPage()).rejects.toThrow('Network Error')
     })
   })
 })
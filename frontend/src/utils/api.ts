@@ -12,6 +12,7 @@ import type {
   DonationStats,
   DashboardStats,
   PaymentSession,
+  PublicBootstrap,
 } from '../types'
 
 const API_BASE_URL = import.meta.env.VITE_API_URL || 'http://localhost:8000'
@@ -79,6 +80,15 @@ export const authAPI = {
   },
 }
 
+// Server-side filters for the admin donation list and export
+export interface DonationFilters {
+  status?: 'confirmed' | 'pending' | 'failed' | 'abandoned'
+  frequency?: string
+  search?: string
+  start?: string  // inclusive, ISO datetime
+  end?: string    // exclusive, ISO datetime
+}
+
 // Donations API
 export const donationsAPI = {
   create: async (donation: Omit<Donation, 'id' | 'donated_at'>) => {
@@ -86,8 +96,23 @@ export const donationsAPI = {
     return response.data
   },
   
-  getAll: async () => {
-    const response = await api.get('/api/donations/')
+  // One page of the admin list, newest first. Pass `nextCursor` back (with
+  // the same filters) for the following page; it is undefined on the last.
+  getPage: async (
+    filters: DonationFilters = {},
+    cursor?: string,
+    limit = 200,
+  ): Promise<{ items: Donation[]; nextCursor?: string }> => {
+    const response = await api.get('/api/donations/', { params: { ...filters, cursor, limit } })
+    return { items: response.data, nextCursor: response.headers?.['x-next-cursor'] || undefined }
+  },
+
+  // Every matching donation, streamed by the server as CSV.
+  export: async (filters: DonationFilters = {}): Promise<Blob> => {
+    const response = await api.get('/api/donations/export', {
+      params: { ...filters, format: 'csv' },
+      responseType: 'blob',
+    })
     return response.data
   },
   
@@ -903,4 +928,13 @@ export const programsAPI = {
   },
 }
 
+// Aggregated homepage data: one request instead of a call per section
+export const publicAPI = {
+  getBootstrap: async (fields?: (keyof PublicBootstrap)[]): Promise<PublicBootstrap> => {
+    const params = fields ? { fields: fields.join(',') } : undefined
+    const response = await api.get('/api/public/bootstrap', { params })
+    return response.data
+  },
+}
+
 export default api
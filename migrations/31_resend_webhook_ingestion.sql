@@ -0,0 +1,35 @@
+-- Migration 31: Idempotent Resend webhook ingestion
+--
+-- The Resend webhook used to look up email_outbox by provider_message_id and
+-- campaign_sends by outbox_id with no index on either column, and had no
+-- dedupe on the Svix delivery id — provider retries double-counted delivered
+-- and bounced events.
+--
+-- Webhook deliveries are now recorded raw in `resend_webhook_events` (unique
+-- on svix_id) and applied in batches by the Arq worker.
+--
+-- Idempotent: safe to run more than once.
+
+CREATE INDEX IF NOT EXISTS idx_email_outbox_provider_message_id
+    ON email_outbox(provider_message_id);
+
+CREATE INDEX IF NOT EXISTS idx_campaign_sends_outbox_id
+    ON campaign_sends(outbox_id);
+
+CREATE TABLE IF NOT EXISTS resend_webhook_events (
+    id              SERIAL PRIMARY KEY,
+    svix_id         VARCHAR(255) NOT NULL UNIQUE,
+    event_type      VARCHAR(50)  NOT NULL,
+    payload         JSONB        NOT NULL DEFAULT '{}'::jsonb,
+    status          VARCHAR(20)  NOT NULL DEFAULT 'pending',   -- pending | processed | failed
+    error           TEXT,
+    received_at     TIMESTAMP    NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    processed_at    TIMESTAMP
+);
+
+-- The worker only ever scans pending rows, oldest first.
+CREATE INDEX IF NOT EXISTS idx_resend_webhook_events_pending
+    ON resend_webhook_events(received_at)
+    WHERE status = 'pending';
+
+SELECT 'Migration 31 completed successfully!' as message;
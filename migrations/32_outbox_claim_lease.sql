@@ -0,0 +1,26 @@
+-- Migration 32: Lease-based outbox dispatcher
+--
+-- The worker's outbox scanner used to read at most 50 pending rows every 15s
+-- without locking, so two workers could enqueue the same row, and rows left
+-- in 'sending' by a crashed worker were never retried.
+--
+-- The dispatcher now claims due rows with FOR UPDATE SKIP LOCKED and stamps a
+-- lease on them; a send attempt holds its own lease, and expired 'sending'
+-- leases are returned to 'pending'.
+--
+-- Idempotent: safe to run more than once.
+
+ALTER TABLE email_outbox
+    ADD COLUMN IF NOT EXISTS lease_expires_at TIMESTAMP;
+
+-- Claim scan: due pending rows only.
+CREATE INDEX IF NOT EXISTS idx_email_outbox_pending_due
+    ON email_outbox(queue_after, id)
+    WHERE status = 'pending';
+
+-- Crash recovery scan: in-flight rows by lease expiry.
+CREATE INDEX IF NOT EXISTS idx_email_outbox_sending_lease
+    ON email_outbox(lease_expires_at)
+    WHERE status = 'sending';
+
+SELECT 'Migration 32 completed successfully!' as message;
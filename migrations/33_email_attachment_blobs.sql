@@ -0,0 +1,21 @@
+-- Migration 33: Store outbox attachments by reference
+--
+-- email_outbox.attachments used to carry every file inline as base64 JSON,
+-- so a campaign attachment was written once per recipient (a 5 MB file to
+-- 20k recipients ≈ 130 GB of JSONB, WAL and backups).
+--
+-- Attachment bodies now live once in `email_attachment_blobs`, keyed by
+-- their SHA-256; outbox rows store {"filename", "content_type", "sha256",
+-- "size"} and the worker resolves them at send time. Existing rows with
+-- inline `content_b64` keep working unchanged.
+--
+-- Idempotent: safe to run more than once.
+
+CREATE TABLE IF NOT EXISTS email_attachment_blobs (
+    sha256          VARCHAR(64)  PRIMARY KEY,
+    content         BYTEA        NOT NULL,
+    size            INTEGER      NOT NULL,
+    created_at      TIMESTAMP    NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+SELECT 'Migration 33 completed successfully!' as message;
@@ -0,0 +1,27 @@
+-- Migration 34: Durable Stripe webhook idempotency
+--
+-- stripe_webhook used to dedupe on an in-process set of event ids, which is
+-- lost on restart and not shared between API workers, so a Stripe retry that
+-- landed on another worker was processed twice.
+--
+-- Every event id is now claimed in `stripe_events` (unique on event_id)
+-- before processing; duplicates short-circuit on the unique index.
+--
+-- Idempotent: safe to run more than once.
+
+CREATE TABLE IF NOT EXISTS stripe_events (
+    id              SERIAL PRIMARY KEY,
+    event_id        VARCHAR(255) NOT NULL UNIQUE,
+    event_type      VARCHAR(100) NOT NULL,
+    status          VARCHAR(20)  NOT NULL DEFAULT 'processing',   -- processing | processed | failed
+    attempts        INTEGER      NOT NULL DEFAULT 1,
+    error           TEXT,
+    received_at     TIMESTAMP    NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    claimed_at      TIMESTAMP    NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    processed_at    TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_stripe_events_status
+    ON stripe_events(status);
+
+SELECT 'Migration 34 completed successfully!' as message;
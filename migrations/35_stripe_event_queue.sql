@@ -0,0 +1,30 @@
+-- Migration 35: Queue-backed Stripe webhook processing
+--
+-- stripe_webhook now only verifies the signature, stores the raw event and
+-- acknowledges; the Arq worker applies events in Stripe order per object,
+-- retries failures with backoff and dead-letters events that keep failing.
+--
+-- Idempotent: safe to run more than once.
+
+ALTER TABLE stripe_events ADD COLUMN IF NOT EXISTS object_id VARCHAR(255);
+ALTER TABLE stripe_events ADD COLUMN IF NOT EXISTS payload JSONB;
+ALTER TABLE stripe_events ADD COLUMN IF NOT EXISTS event_created_at TIMESTAMP;
+ALTER TABLE stripe_events ADD COLUMN IF NOT EXISTS next_attempt_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP;
+ALTER TABLE stripe_events ALTER COLUMN status SET DEFAULT 'pending';
+ALTER TABLE stripe_events ALTER COLUMN attempts SET DEFAULT 0;
+ALTER TABLE stripe_events ALTER COLUMN claimed_at DROP NOT NULL;
+ALTER TABLE stripe_events ALTER COLUMN claimed_at DROP DEFAULT;
+
+-- Events recorded before this migration were processed inline and carry no
+-- payload to replay; park any that never succeeded as dead letters.
+UPDATE stripe_events SET status = 'dead' WHERE status = 'failed';
+
+CREATE INDEX IF NOT EXISTS idx_stripe_events_object_id
+    ON stripe_events(object_id);
+
+-- The consumer scans pending rows in Stripe order.
+CREATE INDEX IF NOT EXISTS idx_stripe_events_pending
+    ON stripe_events(COALESCE(event_created_at, received_at), id)
+    WHERE status = 'pending';
+
+SELECT 'Migration 35 completed successfully!' as message;
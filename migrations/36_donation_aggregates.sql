@@ -0,0 +1,72 @@
+-- Migration 36: Precomputed donation statistics
+--
+-- /api/donations/stats (public homepage) and the admin dashboard used to run
+-- SUM(amount) and COUNT(DISTINCT email) over the whole donations table with
+-- NOT LIKE filters on every request. They now read one row of
+-- `donation_aggregates`, which the application keeps up to date on every
+-- donation write and the worker rebuilds nightly.
+--
+-- Idempotent: safe to run more than once (the backfill is a full rebuild).
+
+CREATE TABLE IF NOT EXISTS donation_aggregates (
+    id              SERIAL PRIMARY KEY,
+    scope           VARCHAR(20)  NOT NULL,              -- total | day | month | campaign
+    bucket          VARCHAR(100) NOT NULL DEFAULT '',
+    total_amount    DOUBLE PRECISION NOT NULL DEFAULT 0,
+    donation_count  INTEGER      NOT NULL DEFAULT 0,
+    donor_count     INTEGER      NOT NULL DEFAULT 0,    -- scope = 'total' only
+    updated_at      TIMESTAMP    NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT uq_donation_aggregates_scope_bucket UNIQUE (scope, bucket)
+);
+
+CREATE TABLE IF NOT EXISTS donation_donors (
+    email           VARCHAR(255) PRIMARY KEY,           -- lower-cased
+    donation_count  INTEGER      NOT NULL DEFAULT 0,
+    total_amount    DOUBLE PRECISION NOT NULL DEFAULT 0
+);
+
+-- Backfill from confirmed donations (same rules as donation_stats.py).
+BEGIN;
+
+DELETE FROM donation_aggregates;
+DELETE FROM donation_donors;
+
+CREATE TEMP TABLE _confirmed_donations ON COMMIT DROP AS
+SELECT amount, lower(trim(email)) AS email, donated_at, utm_campaign
+FROM donations
+WHERE frequency NOT LIKE 'Failed%'
+  AND frequency NOT LIKE 'Abandoned%'
+  AND frequency NOT LIKE 'Pending%';
+
+INSERT INTO donation_donors (email, donation_count, total_amount)
+SELECT email, COUNT(*), SUM(amount)
+FROM _confirmed_donations
+WHERE email <> ''
+GROUP BY email;
+
+INSERT INTO donation_aggregates (scope, bucket, total_amount, donation_count, donor_count)
+SELECT 'total', '', COALESCE(SUM(amount), 0), COUNT(*),
+       (SELECT COUNT(*) FROM donation_donors)
+FROM _confirmed_donations;
+
+INSERT INTO donation_aggregates (scope, bucket, total_amount, donation_count)
+SELECT 'day', to_char(donated_at, 'YYYY-MM-DD'), SUM(amount), COUNT(*)
+FROM _confirmed_donations
+WHERE donated_at IS NOT NULL
+GROUP BY 2;
+
+INSERT INTO donation_aggregates (scope, bucket, total_amount, donation_count)
+SELECT 'month', to_char(donated_at, 'YYYY-MM'), SUM(amount), COUNT(*)
+FROM _confirmed_donations
+WHERE donated_at IS NOT NULL
+GROUP BY 2;
+
+INSERT INTO donation_aggregates (scope, bucket, total_amount, donation_count)
+SELECT 'campaign', utm_campaign, SUM(amount), COUNT(*)
+FROM _confirmed_donations
+WHERE utm_campaign IS NOT NULL AND utm_campaign <> ''
+GROUP BY 2;
+
+COMMIT;
+
+SELECT 'Migration 36 completed successfully!' as message;
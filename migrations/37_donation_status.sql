@@ -0,0 +1,43 @@
+-- Migration 37: Normalized donation status
+--
+-- Payment state used to be encoded as a prefix of the free-text `frequency`
+-- column ("Failed - card_declined", "Abandoned", legacy "Pending…"), so every
+-- confirmed-donations query needed three NOT LIKE filters and a full scan.
+-- `status` (confirmed | pending | failed | abandoned) is now written by every
+-- payment path; the partial indexes below only cover confirmed rows, which is
+-- what the stats, recent-donations and per-donor queries read.
+--
+-- Idempotent: safe to run more than once.
+
+ALTER TABLE donations
+    ADD COLUMN IF NOT EXISTS status VARCHAR(20) NOT NULL DEFAULT 'confirmed';
+
+-- Backfill from the legacy frequency prefixes (same rules as
+-- models.donation_status_for). Only touches rows still at the default.
+UPDATE donations
+SET status = CASE
+        WHEN lower(frequency) LIKE 'failed%'    THEN 'failed'
+        WHEN lower(frequency) LIKE 'abandoned%' THEN 'abandoned'
+        WHEN lower(frequency) LIKE 'pending%'   THEN 'pending'
+    END
+WHERE status = 'confirmed'
+  AND (lower(frequency) LIKE 'failed%'
+       OR lower(frequency) LIKE 'abandoned%'
+       OR lower(frequency) LIKE 'pending%');
+
+-- Recent donations (public stats, admin dashboard).
+CREATE INDEX IF NOT EXISTS idx_donations_confirmed_donated_at
+    ON donations(donated_at DESC)
+    WHERE status = 'confirmed';
+
+-- Per-donor totals and history (user dashboard, donor aggregates).
+CREATE INDEX IF NOT EXISTS idx_donations_confirmed_email
+    ON donations(lower(email), donated_at DESC)
+    WHERE status = 'confirmed';
+
+-- Largest donations (donate page "recent supporters", top donor).
+CREATE INDEX IF NOT EXISTS idx_donations_confirmed_amount
+    ON donations(amount DESC)
+    WHERE status = 'confirmed';
+
+SELECT 'Migration 37 completed successfully!' as message;
@@ -0,0 +1,40 @@
+-- Migration 38: Normalized, indexed contact emails
+--
+-- Donor, subscriber, volunteer and contact emails were stored as typed, with
+-- no index, so per-user lookups (user dashboard, admin user detail, Stripe
+-- reconciliation) scanned whole tables and mixed-case rows silently missed.
+-- The application now stores every contact email trimmed + lower-cased
+-- (models.normalize_email); this backfills existing rows and adds plain
+-- B-tree indexes for the equality lookups.
+--
+-- Idempotent: safe to run more than once.
+
+UPDATE donations              SET email = lower(trim(email)) WHERE email <> lower(trim(email));
+UPDATE donation_subscriptions SET email = lower(trim(email)) WHERE email <> lower(trim(email));
+UPDATE subscriptions          SET email = lower(trim(email)) WHERE email <> lower(trim(email));
+UPDATE volunteers             SET email = lower(trim(email)) WHERE email <> lower(trim(email));
+UPDATE contact_submissions    SET email = lower(trim(email)) WHERE email <> lower(trim(email));
+UPDATE project_proposals      SET email = lower(trim(email)) WHERE email <> lower(trim(email));
+
+-- users.email is UNIQUE: only normalize accounts that don't collide with
+-- another account differing by case. Collisions are listed below and must
+-- be merged by hand (re-running this migration then finishes the job).
+UPDATE users u
+SET email = lower(trim(u.email))
+WHERE u.email <> lower(trim(u.email))
+  AND NOT EXISTS (
+      SELECT 1 FROM users o
+      WHERE o.id <> u.id AND lower(trim(o.email)) = lower(trim(u.email))
+  );
+
+SELECT 'Case-colliding user account (merge manually): ' || email AS message
+FROM users
+WHERE email <> lower(trim(email));
+
+CREATE INDEX IF NOT EXISTS idx_donations_email              ON donations(email);
+CREATE INDEX IF NOT EXISTS idx_donation_subscriptions_email ON donation_subscriptions(email);
+CREATE INDEX IF NOT EXISTS idx_subscriptions_email          ON subscriptions(email);
+CREATE INDEX IF NOT EXISTS idx_volunteers_email             ON volunteers(email);
+CREATE INDEX IF NOT EXISTS idx_contact_submissions_email    ON contact_submissions(email);
+
+SELECT 'Migration 38 completed successfully!' as message;
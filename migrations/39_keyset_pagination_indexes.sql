@@ -0,0 +1,34 @@
+-- Migration 39: Indexes for keyset pagination on admin lists
+--
+-- Admin lists now page with a cursor over (sort_key, id) instead of
+-- OFFSET/LIMIT (backend/pagination.py). Each index below matches one list's
+-- ORDER BY so a page — however deep — is a short index range scan.
+-- Lists keyed on the primary key alone (users, contacts, events, stories)
+-- need nothing new.
+--
+-- Idempotent: safe to run more than once.
+
+-- /api/marketing/outbox (optionally filtered by status)
+CREATE INDEX IF NOT EXISTS idx_outbox_created_id
+    ON email_outbox(created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_outbox_status_created_id
+    ON email_outbox(status, created_at DESC, id DESC);
+
+-- /api/marketing/suppressions
+CREATE INDEX IF NOT EXISTS idx_suppressions_created_id
+    ON email_suppressions(created_at DESC, id DESC);
+
+-- /api/marketing/campaigns/{id}/sends
+CREATE INDEX IF NOT EXISTS idx_campaign_sends_campaign_id
+    ON campaign_sends(campaign_id, id DESC);
+
+-- /api/project-proposals/
+CREATE INDEX IF NOT EXISTS idx_project_proposals_submitted_id
+    ON project_proposals(submitted_at DESC, id DESC);
+
+-- Superseded by the composite indexes above.
+DROP INDEX IF EXISTS idx_outbox_created_at;
+DROP INDEX IF EXISTS idx_campaign_sends_campaign;
+DROP INDEX IF EXISTS idx_project_proposals_submitted_at;
+
+SELECT 'Migration 39 completed successfully!' as message;
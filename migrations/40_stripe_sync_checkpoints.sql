@@ -0,0 +1,22 @@
+-- Migration 40: Checkpoints for the Stripe reconciliation job
+--
+-- The hourly worker job (backend/stripe_reconcile.py) pages through
+-- Stripe's list APIs with `created[gte]` and remembers how far each stream
+-- got here, so a run only re-reads the last day instead of the whole
+-- account. It matches local rows by session id (indexed in 00_init.sql)
+-- and by subscription id, which 00_init.sql left unindexed; index it here.
+--
+-- Idempotent: safe to run more than once.
+
+CREATE TABLE IF NOT EXISTS stripe_sync_checkpoints (
+    name          VARCHAR(50) PRIMARY KEY,
+    synced_until  INTEGER NOT NULL,      -- unix seconds; the run's start time
+    last_summary  JSONB,
+    updated_at    TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+-- Subscription ids the job matches in bulk (WHERE stripe_subscription_id IN (...))
+CREATE INDEX IF NOT EXISTS idx_donation_subscriptions_stripe_subscription_id
+    ON donation_subscriptions(stripe_subscription_id);
+
+SELECT 'Migration 40 completed successfully!' as message;
@@ -0,0 +1,48 @@
+-- Migration 41: Bulk year-end (annual) tax receipts
+--
+-- backend/year_end_receipts.py renders one consolidated receipt per donor
+-- per tax year on the worker. `year_end_receipt_runs` tracks each year's
+-- progress (the cursor is the last donor email whose chunk committed, so a
+-- run resumes after a crash); `year_end_receipts` records every issued
+-- receipt and where its PDF lives in S3, and guarantees one per donor.
+--
+-- Idempotent: safe to run more than once.
+
+CREATE TABLE IF NOT EXISTS year_end_receipt_runs (
+    id                SERIAL PRIMARY KEY,
+    tax_year          INTEGER      NOT NULL UNIQUE,
+    status            VARCHAR(20)  NOT NULL DEFAULT 'pending',  -- pending | running | completed | failed
+    send_emails       BOOLEAN      NOT NULL DEFAULT TRUE,
+    cursor            VARCHAR(255),
+    total_donors      INTEGER      NOT NULL DEFAULT 0,
+    processed_donors  INTEGER      NOT NULL DEFAULT 0,
+    emailed           INTEGER      NOT NULL DEFAULT 0,
+    last_error        TEXT,
+    created_at        TIMESTAMP    NOT NULL DEFAULT NOW(),
+    started_at        TIMESTAMP,
+    completed_at      TIMESTAMP,
+    updated_at        TIMESTAMP    NOT NULL DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS year_end_receipts (
+    id              SERIAL PRIMARY KEY,
+    tax_year        INTEGER       NOT NULL,
+    email           VARCHAR(255)  NOT NULL,
+    donor_name      VARCHAR(100)  NOT NULL,
+    receipt_number  VARCHAR(50)   NOT NULL,
+    donation_count  INTEGER       NOT NULL,
+    total_amount    DOUBLE PRECISION NOT NULL,
+    s3_key          VARCHAR(500)  NOT NULL,
+    outbox_id       INTEGER,
+    created_at      TIMESTAMP     NOT NULL DEFAULT NOW(),
+    CONSTRAINT uq_year_end_receipt_donor UNIQUE (tax_year, email)
+);
+
+-- The per-chunk donor query groups confirmed donations by email, walking
+-- emails in order from the cursor within one year. With amount and name
+-- included it is answered from the index alone.
+CREATE INDEX IF NOT EXISTS idx_donations_confirmed_email_donated
+    ON donations(email, donated_at) INCLUDE (amount, name)
+    WHERE status = 'confirmed';
+
+SELECT 'Migration 41 completed successfully!' as message;
@@ -0,0 +1,57 @@
+-- Migration 42: Program slugs are assigned on write, never on read
+--
+-- GET /api/programs/ used to repair NULL slugs while serving the list
+-- (a uniqueness loop and a commit on the hottest public read). Slugs are
+-- now generated when a program is created or updated (routers/programs.py),
+-- so this migration backfills any rows that still lack one and makes the
+-- database enforce it.
+--
+-- Uniqueness stays global (idx_programs_slug_unique, migration 15) rather
+-- than per category: /api/programs/slug/{slug} looks a program up by slug
+-- alone.
+--
+-- Idempotent: safe to run more than once.
+
+-- Backfill: slug from the title, or program-<id> if the title has no usable
+-- characters. A -<id> suffix keeps the result unique, both against slugs
+-- already set and among the rows backfilled here (two slug-less rows
+-- with the same title would otherwise get the same slug).
+UPDATE programs p
+SET slug = CASE
+        WHEN base.slug = '' THEN 'program-' || p.id::text
+        WHEN base.same_slug > 1
+          OR EXISTS (SELECT 1 FROM programs o WHERE o.slug = base.slug AND o.id <> p.id)
+            THEN base.slug || '-' || p.id::text
+        ELSE base.slug
+    END
+FROM (
+    SELECT id, slug, COUNT(*) OVER (PARTITION BY slug) AS same_slug
+    FROM (
+        SELECT id, TRIM(BOTH '-' FROM LOWER(REGEXP_REPLACE(
+            REGEXP_REPLACE(title, '[^a-zA-Z0-9\s-]', '', 'g'),
+            '[-\s]+', '-', 'g'
+        ))) AS slug
+        FROM programs
+        WHERE slug IS NULL OR TRIM(slug) = ''
+    ) derived
+) base
+WHERE p.id = base.id;
+
+ALTER TABLE programs ALTER COLUMN slug SET NOT NULL;
+
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'programs_slug_not_blank') THEN
+        ALTER TABLE programs ADD CONSTRAINT programs_slug_not_blank CHECK (TRIM(slug) <> '');
+    END IF;
+END $$;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_programs_slug_unique ON programs(slug);
+
+-- The public list: active programs in display order, optionally per category.
+CREATE INDEX IF NOT EXISTS idx_programs_active_display_order
+    ON programs(display_order, title) WHERE is_active;
+CREATE INDEX IF NOT EXISTS idx_programs_category_display_order
+    ON programs(category_id, display_order, title);
+
+SELECT 'Migration 42 completed successfully!' as message;